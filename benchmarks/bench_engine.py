@@ -0,0 +1,82 @@
+"""
+引擎延迟基准测试
+对探测、关键帧截图、短片段复用分别用子进程引擎和 PyAV 进程内引擎重复执行，输出每个操作的 p50/p99 延迟
+
+用法：
+    uv run python benchmarks/bench_engine.py input.mp4 [--iterations 50] [--concurrency 1]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import PyAVEngine, SubprocessEngine, configure_thread_budget, inprocess_available  # noqa: E402
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def measure(engine, operation, args, work_dir: str) -> list:
+    """重复执行一个操作，返回每次的耗时（毫秒）"""
+    ext = os.path.splitext(args.input)[1]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def once(i: int) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            if operation == "probe":
+                await engine.probe(args.input)
+            elif operation == "keyframe":
+                await engine.extract_keyframe(args.input, os.path.join(work_dir, f"{engine.name}_{i}.jpg"), args.timestamp, 320)
+            else:
+                await engine.remux(args.input, os.path.join(work_dir, f"{engine.name}_{i}{ext}"), args.timestamp, args.remux_duration)
+            return (time.perf_counter() - start) * 1000
+
+    await once(-1)  # 预热（加载编解码器、填充页缓存）
+    return await asyncio.gather(*(once(i) for i in range(args.iterations)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--timestamp", type=float, default=5.0)
+    parser.add_argument("--remux-duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if not inprocess_available():
+        print("未安装 PyAV，只测试子进程引擎（uv sync --extra inprocess）")
+
+    configure_thread_budget(None)
+    engines = [SubprocessEngine()]
+    if inprocess_available():
+        engines.append(PyAVEngine(max_workers=max(1, args.concurrency)))
+
+    print(f"输入: {args.input}，每项 {args.iterations} 次，并发 {args.concurrency}\n")
+    print(f"{'操作':<10}{'引擎':<12}{'p50(ms)':>10}{'p99(ms)':>10}{'平均(ms)':>10}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for operation in ("probe", "keyframe", "remux"):
+            for engine in engines:
+                timings = await measure(engine, operation, args, work_dir)
+                print(
+                    f"{operation:<10}{engine.name:<12}{percentile(timings, 50):>10.1f}"
+                    f"{percentile(timings, 99):>10.1f}{statistics.mean(timings):>10.1f}"
+                )
+
+    for engine in engines:
+        if isinstance(engine, PyAVEngine):
+            engine.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
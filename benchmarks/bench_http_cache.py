@@ -0,0 +1,130 @@
+"""
+远程输入缓存基准测试
+在本机启动支持 Range 的 HTTP 服务器提供一个媒体文件，对同一 URL 依次执行探测、切割、再次探测，
+对比直接读取与经缓存读取时源站实际发送的字节数和耗时
+
+用法：
+    uv run python benchmarks/bench_http_cache.py input.mp4 [--start 00:00:05] [--duration 00:00:05]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import RemoteInputCache, configure_http_cache, resolve_input, run_ffmpeg_command  # noqa: E402
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """只提供一个文件的静态服务器，支持单个 Range 并统计发送的字节数"""
+
+    file_path = ""
+    bytes_sent = 0
+    requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send_headers(self):
+        size = os.path.getsize(self.file_path)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+            else:
+                start = max(0, size - int(match.group(2)))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{int(os.path.getmtime(self.file_path))}-{size}"')
+        self.end_headers()
+        return start, end
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        type(self).requests += 1
+        start, end = self._send_headers()
+        with open(self.file_path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining > 0:
+                    data = f.read(min(remaining, 64 * 1024))
+                    self.wfile.write(data)
+                    type(self).bytes_sent += len(data)
+                    remaining -= len(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+
+async def run_steps(url: str, output_path: str, args) -> list:
+    """探测 → 切割 → 再次探测，返回每一步的 (名称, 耗时, 源站字节数)"""
+    steps = [
+        ("探测", lambda source: ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", source]),
+        ("切割", lambda source: [
+            "ffmpeg", "-hide_banner", "-nostats", "-ss", args.start, "-i", source,
+            "-t", args.duration, "-c", "copy", "-y", output_path
+        ]),
+        ("再次探测", lambda source: ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", source]),
+    ]
+    rows = []
+    for name, build in steps:
+        sent_before = RangeRequestHandler.bytes_sent
+        start = time.perf_counter()
+        result = await run_ffmpeg_command(build(await resolve_input(url)))
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+        rows.append((name, elapsed, RangeRequestHandler.bytes_sent - sent_before))
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("--start", default="00:00:05")
+    parser.add_argument("--duration", default="00:00:05")
+    parser.add_argument("--block-size", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    RangeRequestHandler.file_path = os.path.abspath(args.input)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(args.input)}"
+    file_mb = os.path.getsize(args.input) / (1024 * 1024)
+    print(f"源文件: {args.input}（{file_mb:.1f}MB），地址: {url}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        output_path = os.path.join(work_dir, f"cut{os.path.splitext(args.input)[1]}")
+        cache = RemoteInputCache(os.path.join(work_dir, "http"), block_size=args.block_size)
+        for name, configured in (("直接读取", None), ("经缓存读取", cache)):
+            configure_http_cache(configured)
+            rows = await run_steps(url, output_path, args)
+            total = sum(row[2] for row in rows) / (1024 * 1024)
+            print(f"\n{name}（源站共发送 {total:.2f}MB）:")
+            for step, elapsed, sent in rows:
+                print(f"  {step}: {elapsed:.3f}秒，源站发送 {sent / (1024 * 1024):.2f}MB")
+        stats = cache.stats()
+        print(f"\n缓存: {stats['cached_bytes'] / (1024 * 1024):.2f}MB 已缓存 / 文件 {file_mb:.1f}MB")
+        configure_http_cache(None)
+        await cache.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
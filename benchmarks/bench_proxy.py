@@ -0,0 +1,87 @@
+"""
+代理文件基准测试
+生成一次低分辨率代理文件，再分别从原文件和代理文件执行同样的预览任务（缩略图抽帧、GIF 片段、雪碧图），
+输出每个任务的耗时、加速比，以及代理文件在几次预览后收回生成成本
+
+用法：
+    uv run python benchmarks/bench_proxy.py input.mp4 [--short-side 480] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import ProxyCache, run_ffmpeg_command  # noqa: E402
+
+
+def preview_tasks(work_dir: str):
+    """(名称, 根据输入路径构建命令的函数)"""
+    return [
+        ("每10秒抽一帧（320px）", lambda src: [
+            "ffmpeg", "-i", src, "-vf", "fps=1/10,scale=320:-2", "-y", os.path.join(work_dir, "frame_%04d.jpg")
+        ]),
+        ("5秒GIF片段（320px）", lambda src: [
+            "ffmpeg", "-ss", "30", "-t", "5", "-i", src,
+            "-vf", "fps=10,scale=320:-1:flags=lanczos,split[a][b];[a]palettegen[p];[b][p]paletteuse",
+            "-y", os.path.join(work_dir, "clip.gif")
+        ]),
+        ("雪碧图（每2秒，160px）", lambda src: [
+            "ffmpeg", "-i", src, "-vf", "fps=1/2,scale=160:90:flags=fast_bilinear,tile=10x10",
+            "-q:v", "4", "-y", os.path.join(work_dir, "sprite_%03d.jpg")
+        ]),
+    ]
+
+
+async def timed(cmd) -> float:
+    start = time.perf_counter()
+    result = await run_ffmpeg_command(cmd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-500:])
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("--short-side", type=int, default=480)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="proxy_bench_")
+    try:
+        cache = ProxyCache(work_dir, short_side=args.short_side, min_source_short_side=0, build_mode="off")
+        proxy = await cache.build(args.input)
+        print(
+            f"输入: {args.input}（{proxy['source_width']}x{proxy['source_height']}）"
+            f"\n代理文件: {proxy['width']}x{proxy['height']}，{proxy['size'] / 1024 / 1024:.1f}MB，"
+            f"生成耗时 {proxy['build_seconds']:.2f}秒\n"
+        )
+
+        saved_total = 0.0
+        for name, build in preview_tasks(work_dir):
+            source_times = [await timed(build(args.input)) for _ in range(args.rounds)]
+            proxy_times = [await timed(build(proxy["proxy_path"])) for _ in range(args.rounds)]
+            source_median = statistics.median(source_times)
+            proxy_median = statistics.median(proxy_times)
+            saved_total += source_median - proxy_median
+            print(
+                f"  {name}: 原文件 {source_median:.2f}秒，代理文件 {proxy_median:.2f}秒，"
+                f"加速 {source_median / proxy_median:.1f}倍"
+            )
+
+        if saved_total > 0:
+            per_round = saved_total / len(preview_tasks(work_dir))
+            print(f"\n平均每次预览节省 {per_round:.2f}秒，约 {proxy['build_seconds'] / per_round:.1f} 次预览后收回生成成本")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+线程预算基准测试
+同时运行多个 libx264 编码，对比默认线程设置与线程预算分配下的总吞吐
+
+用法：
+    uv run python benchmarks/bench_thread_budget.py [--jobs 4] [--pin-cpus]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import ThreadBudget, configure_thread_budget, run_ffmpeg_command  # noqa: E402
+
+
+def encode_command(args) -> list:
+    """以 lavfi 测试源作为输入，避免磁盘 I/O 干扰"""
+    return [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-f", "lavfi", "-i", f"testsrc2=size={args.size}:rate=30:duration={args.duration}",
+        "-c:v", "libx264", "-preset", args.preset,
+        "-f", "null", "-"
+    ]
+
+
+async def run_batch(args) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_ffmpeg_command(encode_command(args)) for _ in range(args.jobs)))
+    elapsed = time.perf_counter() - start
+    for result in results:
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--duration", type=int, default=10)
+    parser.add_argument("--preset", default="veryfast")
+    parser.add_argument("--pin-cpus", action="store_true")
+    args = parser.parse_args()
+
+    frames = args.jobs * args.duration * 30
+    modes = (
+        ("默认线程", None),
+        ("线程预算", ThreadBudget(pin_cpus=args.pin_cpus)),
+    )
+    for name, budget in modes:
+        configure_thread_budget(budget)
+        elapsed = await run_batch(args)
+        print(f"{name}: {args.jobs} 个并发编码，耗时 {elapsed:.2f}秒，总吞吐 {frames / elapsed:.1f} 帧/秒")
+    configure_thread_budget(None)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
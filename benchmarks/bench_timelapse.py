@@ -0,0 +1,106 @@
+"""
+延时摄影基准测试
+对同一输入分别运行原来的逐帧变速命令（setpts + atempo 全部解码）和延时摄影的两条快速路径
+（跳过非参考帧并提前丢帧 / 只解码关键帧），输出耗时、相对加速比和输出帧数
+
+用法：
+    uv run python benchmarks/bench_timelapse.py input.mp4 [--speed 32] [--fps 30]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import (  # noqa: E402
+    estimate_keyframe_interval,
+    get_audio_stream,
+    get_frame_rate,
+    get_video_stream,
+    probe_media,
+    run_ffmpeg_command,
+)
+
+
+def atempo_chain(speed: float) -> str:
+    filters = []
+    while speed > 2.0:
+        filters.append("atempo=2.0")
+        speed /= 2.0
+    filters.append(f"atempo={speed}")
+    return ",".join(filters)
+
+
+async def count_frames(path: str) -> int:
+    info = await probe_media(path)
+    stream = get_video_stream(info) or {}
+    if stream.get("nb_frames"):
+        return int(stream["nb_frames"])
+    duration = float(stream.get("duration") or info.get("format", {}).get("duration") or 0)
+    return round(duration * (get_frame_rate(stream) or 0))
+
+
+async def run_case(name: str, cmd, output: str, baseline=None):
+    start = time.perf_counter()
+    result = await run_ffmpeg_command(cmd)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"  {name}: 失败\n{result.stderr[-500:]}")
+        return None
+    frames = await count_frames(output)
+    ratio = f"，加速 {baseline / elapsed:.1f}倍" if baseline else ""
+    print(f"  {name}: {elapsed:.2f}秒{ratio}，输出 {frames} 帧")
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("--speed", type=float, default=32.0)
+    parser.add_argument("--fps", type=float, default=None, help="延时摄影输出帧率（默认与输入相同，最高60）")
+    args = parser.parse_args()
+
+    info = await probe_media(args.input)
+    video_stream = get_video_stream(info)
+    has_audio = get_audio_stream(info) is not None
+    fps = args.fps or min(get_frame_rate(video_stream) or 30.0, 60.0)
+    keyframe_interval = await estimate_keyframe_interval(args.input)
+    print(
+        f"输入: {args.input}，速度 {args.speed:g}倍，输出 {fps:g}fps，"
+        f"每帧对应原视频 {args.speed / fps:.2f}秒，关键帧间隔约 {keyframe_interval}秒"
+    )
+
+    work_dir = tempfile.mkdtemp(prefix="timelapse_bench_")
+    try:
+        legacy_output = os.path.join(work_dir, "legacy.mp4")
+        legacy_filter = f"[0:v]setpts={1 / args.speed}*PTS[v]"
+        legacy_maps = ["-map", "[v]"]
+        if has_audio:
+            legacy_filter += f";[0:a]{atempo_chain(args.speed)}[a]"
+            legacy_maps += ["-map", "[a]"]
+        baseline = await run_case(
+            "逐帧处理（原命令）",
+            ["ffmpeg", "-i", args.input, "-filter_complex", legacy_filter, *legacy_maps, "-y", legacy_output],
+            legacy_output
+        )
+
+        timelapse_filter = f"setpts=PTS/{args.speed},fps={fps:g}"
+        for name, skip in (("跳过非参考帧并提前丢帧", "noref"), ("只解码关键帧", "nokey")):
+            output = os.path.join(work_dir, f"{skip}.mp4")
+            await run_case(
+                name,
+                ["ffmpeg", "-skip_frame", skip, "-i", args.input, "-vf", timelapse_filter, "-an", "-y", output],
+                output,
+                baseline
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+监视文件夹基准测试
+分别用 inotify 和轮询监视临时目录：先空闲一段时间测量监视进程自身的 CPU 占用，
+再模拟分块上传若干文件（直接复制封装），输出检测延迟、每文件额外开销和总耗时
+
+用法：
+    uv run python benchmarks/bench_watch_folder.py input.mp4 [--files 20] [--idle 5] [--settle 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import WatchFolder, configure_thread_budget, inotify_available  # noqa: E402
+
+
+def cpu_seconds() -> float:
+    """本进程（不含 FFmpeg 子进程）累计的 CPU 时间"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def upload(source: str, target: str, chunk_size: int, delay: float) -> None:
+    """分块写入并在块之间停顿，模拟网络上传；写入完成后才关闭文件"""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            dst.write(chunk)
+            dst.flush()
+            await asyncio.sleep(delay)
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+async def run_backend(backend: str, args) -> None:
+    work_dir = tempfile.mkdtemp(prefix="watch_bench_")
+    input_dir = os.path.join(work_dir, "in")
+    output_dir = os.path.join(work_dir, "out")
+    os.makedirs(input_dir)
+    try:
+        folder = WatchFolder(
+            f"bench-{backend}", input_dir, output_dir,
+            profile="remux_mp4", max_concurrent=args.concurrency,
+            settle_seconds=args.settle, backend=backend, poll_interval=args.poll_interval
+        )
+        await folder.start()
+
+        cpu_before = cpu_seconds()
+        await asyncio.sleep(args.idle)
+        idle_cpu = cpu_seconds() - cpu_before
+
+        start = time.perf_counter()
+        ext = os.path.splitext(args.input)[1]
+        await asyncio.gather(*(
+            upload(args.input, os.path.join(input_dir, f"clip_{i:03d}{ext}"), args.chunk_kb * 1024, args.chunk_delay)
+            for i in range(args.files)
+        ))
+        while True:
+            stats = folder.stats()
+            if stats["done"] + stats["failed"] >= args.files:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        await folder.stop()
+
+        print(f"\n{backend}:")
+        print(f"  空闲 {args.idle:.0f} 秒 CPU: {idle_cpu * 1000:.1f}毫秒（{idle_cpu / args.idle * 100:.3f}%）")
+        print(f"  完成 {stats['done']} 个，失败 {stats['failed']} 个，总耗时 {elapsed:.2f}秒")
+        print(
+            f"  检测延迟（最后一次写入 → 入队，含稳定等待 {args.settle}秒）p50/p99: "
+            f"{fmt(stats['latency_p50'])} / {fmt(stats['latency_p99'])} 毫秒"
+        )
+        print(f"  每文件额外开销 p50/p99: {fmt(stats['overhead_p50'])} / {fmt(stats['overhead_p99'])} 毫秒")
+        print(f"  处理的事件: {stats['events']} 个，轮询: {stats['polls']} 次")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--idle", type=float, default=5.0)
+    parser.add_argument("--settle", type=float, default=0.5)
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--chunk-kb", type=int, default=256)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    configure_thread_budget(None)
+    backends = (["inotify"] if inotify_available() else []) + ["polling"]
+    print(f"输入: {args.input}，文件数 {args.files}，并发 {args.concurrency}")
+    for backend in backends:
+        await run_backend(backend, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+波形峰值计算基准测试
+对比管道流式归约与“先解码为 WAV 再读取”两种方式的耗时
+
+用法：
+    uv run python benchmarks/bench_waveform.py <音频或视频文件> [--sample-rate 8000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.core import run_ffmpeg_command  # noqa: E402
+from src.tools.waveform_tools import compute_waveform_peaks  # noqa: E402
+
+
+async def wav_first(input_path: str, sample_rate: int, samples_per_peak: int) -> float:
+    """对照组：先完整解码为 WAV 文件，再整体读入内存计算峰值"""
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, "decoded.wav")
+        cmd = [
+            "ffmpeg", "-v", "error", "-i", input_path, "-map", "0:a:0",
+            "-ac", "1", "-ar", str(sample_rate), "-y", wav_path
+        ]
+        result = await run_ffmpeg_command(cmd)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+        samples = np.fromfile(wav_path, dtype="<i2", offset=44)
+        full = len(samples) // samples_per_peak * samples_per_peak
+        blocks = samples[:full].reshape(-1, samples_per_peak)
+        blocks.min(axis=1), blocks.max(axis=1)
+    return time.perf_counter() - start
+
+
+async def streamed(input_path: str, sample_rate: int, samples_per_peak: int) -> float:
+    """管道流式归约（compute_waveform 使用的实现）"""
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        await compute_waveform_peaks(
+            input_path, os.path.join(tmp, "out.peaks"), sample_rate,
+            [samples_per_peak, samples_per_peak * 4, samples_per_peak * 16]
+        )
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input_path")
+    parser.add_argument("--sample-rate", type=int, default=8000)
+    parser.add_argument("--samples-per-peak", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, func in (("WAV 中转", wav_first), ("管道流式", streamed)):
+        timings = [
+            await func(args.input_path, args.sample_rate, args.samples_per_peak)
+            for _ in range(args.repeat)
+        ]
+        print(f"{name}: 最快 {min(timings):.2f}秒，平均 {sum(timings) / len(timings):.2f}秒")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
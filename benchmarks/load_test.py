@@ -0,0 +1,416 @@
+"""
+MCP 服务器并发负载测试
+用替身 ffmpeg / ffprobe（benchmarks/stub_ffmpeg.py，按固定时长休眠并输出真实格式的日志）替换 PATH 中的 FFmpeg，
+只测量服务器自身的开销：事件循环、子进程管理、日志解析和结果格式化。支持进程内直接调用工具和通过 stdio
+启动服务器两种方式，输出吞吐量、p50/p95/p99 延迟、事件循环延迟，以及文件描述符、子进程和僵尸进程数量；
+测试结束后仍有残留子进程、僵尸进程或文件描述符增长时以退出码 1 结束
+
+用法：
+    uv run python benchmarks/load_test.py [--mode inprocess|stdio|both] [--concurrency 10,50,200]
+        [--requests 400] [--mix get_video_info=3,convert_video_format=1,detect_scenes=1,analyze_media=1]
+        [--stub-seconds 0.2] [--probe-seconds 0.02]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PATH = os.path.join(ROOT, "benchmarks", "stub_ffmpeg.py")
+MAIN_PATH = os.path.join(ROOT, "main.py")
+sys.path.insert(0, ROOT)
+
+INPUT_FILES = 16
+
+# 每个工具的调用参数（index 为调用序号，用于区分输出文件）；会产生缓存的工具强制刷新，保证每次都启动进程
+TOOL_ARGS: Dict[str, Callable[[str, str, int], dict]] = {
+    "get_video_info": lambda path, out, index: {"video_path": path},
+    "convert_video_format": lambda path, out, index: {
+        "input_path": path, "output_path": os.path.join(out, f"convert_{index}.mp4"), "video_codec": "libx265"
+    },
+    "detect_scenes": lambda path, out, index: {"input_path": path, "force_refresh": True},
+    "analyze_media": lambda path, out, index: {"input_path": path, "force_refresh": True},
+    "extract_audio_from_video": lambda path, out, index: {
+        "video_path": path, "output_path": os.path.join(out, f"audio_{index}.mp3")
+    },
+    "cut_video_segment": lambda path, out, index: {
+        "input_path": path, "start_time": "00:00:10", "duration": "00:00:20",
+        "output_path": os.path.join(out, f"cut_{index}.mp4")
+    },
+}
+ERROR_PREFIXES = ("错误", "发生错误")
+
+CallTool = Callable[[str, dict], Awaitable[Tuple[str, bool]]]
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in TOOL_ARGS:
+            raise SystemExit(f"不支持的工具: {name}（可选: {', '.join(TOOL_ARGS)}）")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def call_sequence(mix: Dict[str, int], count: int, seed: int = 0) -> List[str]:
+    """按权重生成固定顺序的调用序列（同样的参数每次运行相同）"""
+    pool = [name for name, weight in mix.items() for _ in range(weight)]
+    rng = random.Random(seed)
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def prepare_workspace(args) -> Tuple[str, dict]:
+    """创建替身 FFmpeg、输入文件和独立的缓存目录，返回 (工作目录, 环境变量)"""
+    work = tempfile.mkdtemp(prefix="ffmpeg_mcp_load_")
+    bin_dir = os.path.join(work, "bin")
+    os.makedirs(bin_dir)
+    for program in ("ffmpeg", "ffprobe"):
+        wrapper = os.path.join(bin_dir, program)
+        with open(wrapper, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" -S "{STUB_PATH}" {program} "$@"\n')
+        os.chmod(wrapper, 0o755)
+    os.makedirs(os.path.join(work, "inputs"))
+    os.makedirs(os.path.join(work, "out"))
+    for i in range(INPUT_FILES):
+        with open(os.path.join(work, "inputs", f"input_{i}.mp4"), "wb") as f:
+            f.write(os.urandom(1024))
+
+    env = dict(os.environ)
+    env.update({
+        "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+        "FFMPEG_MCP_CACHE_DIR": os.path.join(work, "cache"),
+        "FFMPEG_MCP_INPROCESS_ENGINE": "0",  # 替身只替换可执行文件，探测必须走子进程
+        "LOADTEST_STUB_SECONDS": str(args.stub_seconds),
+        "LOADTEST_PROBE_SECONDS": str(args.probe_seconds),
+    })
+    return work, env
+
+
+def fd_count(pid: int) -> int:
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return -1
+
+
+def fd_targets(pid: int) -> Counter:
+    """按类型统计打开的文件描述符（pipe、socket、anon_inode 或文件路径）"""
+    targets = Counter()
+    for fd in os.listdir(f"/proc/{pid}/fd"):
+        try:
+            target = os.readlink(f"/proc/{pid}/fd/{fd}")
+        except OSError:
+            continue
+        targets[target.split(":", 1)[0] if ":[" in target else target] += 1
+    return targets
+
+
+def child_states(pid: int) -> List[str]:
+    """直接子进程的状态字母（Z 为僵尸进程），读取 /proc/*/stat"""
+    states = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            states.append(fields[0])
+    return states
+
+
+def find_child(pid: int, marker: str) -> Optional[int]:
+    """找到命令行包含 marker 的子进程（stdio 模式下的服务器进程）"""
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().decode(errors="replace")
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid and marker in cmdline:
+            return int(entry)
+    return None
+
+
+@dataclass
+class ResourceSample:
+    fds: int
+    children: int
+    zombies: int
+
+
+def sample_resources(pid: int) -> ResourceSample:
+    states = child_states(pid)
+    return ResourceSample(fd_count(pid), len(states), states.count("Z"))
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """进程自身（不含子进程）的用户态加内核态 CPU 时间"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def system_cpu_times() -> Tuple[int, int]:
+    """全系统的 (忙碌, 总计) CPU 时间片"""
+    with open("/proc/stat") as f:
+        values = [int(value) for value in f.readline().split()[1:]]
+    idle = values[3] + values[4]
+    return sum(values) - idle, sum(values)
+
+
+@dataclass
+class RunResult:
+    concurrency: int
+    elapsed: float
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Counter = field(default_factory=Counter)
+    lag: List[float] = field(default_factory=list)
+    peak: ResourceSample = field(default_factory=lambda: ResourceSample(0, 0, 0))
+    server_cpu: float = 0.0  # 服务器进程的 CPU 时间（秒）
+    system_busy: float = 0.0  # 测试期间全系统 CPU 占用比例
+
+    @property
+    def calls(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+
+async def sample_peaks(pid: int, result: RunResult, stop: asyncio.Event, interval: float) -> None:
+    """定期采样服务器进程的文件描述符、子进程和僵尸进程数量，记录峰值（在线程中读取 /proc）"""
+    while not stop.is_set():
+        sample = await asyncio.to_thread(sample_resources, pid)
+        result.peak = ResourceSample(
+            max(result.peak.fds, sample.fds),
+            max(result.peak.children, sample.children),
+            max(result.peak.zombies, sample.zombies)
+        )
+        await asyncio.sleep(interval)
+
+
+async def measure_lag(result: RunResult, stop: asyncio.Event, interval: float,
+                      probe: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+    """
+    probe 为 None 时测量本进程事件循环的调度延迟（sleep 超出预期的时间），
+    否则测量探测调用（stdio 模式下的协议 ping）的往返时间
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        if probe is None:
+            await asyncio.sleep(interval)
+            result.lag.append(max(0.0, time.perf_counter() - start - interval))
+        else:
+            await probe()
+            result.lag.append(time.perf_counter() - start)
+            await asyncio.sleep(interval)
+
+
+async def run_level(call: CallTool, sequence: List[str], work: str, concurrency: int, pid: int,
+                    probe: Optional[Callable[[], Awaitable[None]]] = None) -> RunResult:
+    """以固定并发数执行整个调用序列：concurrency 个工作协程依次领取下一次调用"""
+    inputs = sorted(os.path.join(work, "inputs", name) for name in os.listdir(os.path.join(work, "inputs")))
+    out = os.path.join(work, "out")
+    pending = iter(enumerate(sequence))
+    result = RunResult(concurrency, 0.0)
+
+    async def worker():
+        for index, name in pending:
+            arguments = TOOL_ARGS[name](inputs[index % len(inputs)], out, index)
+            start = time.perf_counter()
+            try:
+                text, failed = await call(name, arguments)
+            except Exception as e:
+                text, failed = f"{type(e).__name__}: {e}", True
+            result.latencies[name].append(time.perf_counter() - start)
+            if failed:
+                result.errors[f"{name}: {text.strip().splitlines()[0][:120] if text.strip() else '空结果'}"] += 1
+
+    stop = asyncio.Event()
+    monitors = [
+        asyncio.create_task(sample_peaks(pid, result, stop, 0.02)),
+        asyncio.create_task(measure_lag(result, stop, 0.01, probe)),
+    ]
+    cpu_start, (busy_start, total_start) = process_cpu_seconds(pid), system_cpu_times()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    busy_end, total_end = system_cpu_times()
+    result.server_cpu = process_cpu_seconds(pid) - cpu_start
+    result.system_busy = (busy_end - busy_start) / max(1, total_end - total_start)
+    stop.set()
+    await asyncio.gather(*monitors)
+    return result
+
+
+def describe(label: str, result: RunResult, lag_label: str) -> str:
+    everything = [value for values in result.latencies.values() for value in values]
+    failed = sum(result.errors.values())
+    lines = [
+        f"[{label}] 并发 {result.concurrency}：{result.calls} 次调用，失败 {failed}，"
+        f"耗时 {result.elapsed:.2f}秒，吞吐量 {result.calls / result.elapsed:.1f} 次/秒",
+        f"  延迟: p50 {percentile(everything, 50) * 1000:.1f}ms  p95 {percentile(everything, 95) * 1000:.1f}ms  "
+        f"p99 {percentile(everything, 99) * 1000:.1f}ms  最大 {max(everything) * 1000:.1f}ms",
+    ]
+    for name, values in sorted(result.latencies.items()):
+        lines.append(
+            f"    {name:<26} {len(values):5d} 次  p50 {percentile(values, 50) * 1000:8.1f}ms  "
+            f"p99 {percentile(values, 99) * 1000:8.1f}ms"
+        )
+    if result.lag:
+        lines.append(
+            f"  {lag_label}: p50 {statistics.median(result.lag) * 1000:.2f}ms  "
+            f"p99 {percentile(result.lag, 99) * 1000:.2f}ms  最大 {max(result.lag) * 1000:.2f}ms"
+        )
+    lines.append(
+        f"  CPU: 服务器进程 {result.server_cpu:.2f}秒（每次调用 {result.server_cpu / result.calls * 1000:.1f}ms），"
+        f"全系统占用 {result.system_busy:.0%}（{os.cpu_count()} 核，接近 100% 时吞吐量受限于替身进程的启动开销）"
+    )
+    lines.append(
+        f"  峰值: 文件描述符 {result.peak.fds}，子进程 {result.peak.children}，僵尸进程 {result.peak.zombies}"
+    )
+    for message, count in result.errors.most_common(3):
+        lines.append(f"  失败 ×{count}: {message}")
+    return "\n".join(lines)
+
+
+async def check_leaks(label: str, pid: int, baseline: ResourceSample, settle: float = 1.0) -> List[str]:
+    """全部调用结束并等待 settle 秒后，检查残留子进程、僵尸进程和文件描述符增长"""
+    await asyncio.sleep(settle)
+    final = await asyncio.to_thread(sample_resources, pid)
+    print(f"[{label}] 结束后: 文件描述符 {final.fds}（基线 {baseline.fds}），子进程 {final.children}，僵尸进程 {final.zombies}")
+    leaks = []
+    if final.children > baseline.children:
+        leaks.append(f"{label}: 残留 {final.children - baseline.children} 个子进程")
+    if final.zombies:
+        leaks.append(f"{label}: {final.zombies} 个僵尸进程未回收")
+    if final.fds > baseline.fds + 4:  # 允许少量惰性打开的数据库和日志文件
+        kinds = ", ".join(f"{target} ×{count}" for target, count in fd_targets(pid).most_common(5))
+        leaks.append(f"{label}: 文件描述符增加 {final.fds - baseline.fds} 个（{kinds}）")
+    return leaks
+
+
+async def warm_up(call: CallTool, sequence: List[str], work: str) -> None:
+    """每个工具先调用一次（生成能力表缓存、建立数据库等只发生一次的开销不计入结果）"""
+    inputs = os.path.join(work, "inputs", "input_0.mp4")
+    for index, name in enumerate(dict.fromkeys(sequence)):
+        await call(name, TOOL_ARGS[name](inputs, os.path.join(work, "out"), -1 - index))
+
+
+def result_text(content) -> str:
+    return "\n".join(getattr(item, "text", "") for item in content)
+
+
+async def run_inprocess(args, sequence: List[str], work: str, env: dict) -> List[str]:
+    """在本进程中导入服务器并直接调用工具（不经过 JSON-RPC），事件循环延迟即服务器的延迟"""
+    os.environ.update(env)
+    import main  # noqa: E402  环境变量必须在导入前设置
+
+    async def call(name: str, arguments: dict) -> Tuple[str, bool]:
+        result = await main.mcp.call_tool(name, arguments)
+        content = result[0] if isinstance(result, tuple) else result
+        text = result_text(content)
+        return text, text.startswith(ERROR_PREFIXES)
+
+    await warm_up(call, sequence, work)
+    pid = os.getpid()
+    baseline = sample_resources(pid)
+    leaks = []
+    for concurrency in args.concurrency:
+        result = await run_level(call, sequence, work, concurrency, pid)
+        print(describe("进程内", result, "事件循环延迟"))
+        leaks += await check_leaks("进程内", pid, baseline)
+    return leaks
+
+
+async def run_stdio(args, sequence: List[str], work: str, env: dict) -> List[str]:
+    """启动独立的服务器进程并通过 stdio 调用工具；用协议 ping 的往返时间反映服务器事件循环的响应"""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=[MAIN_PATH], env=env, cwd=ROOT)
+    leaks = []
+    errlog = open(os.path.join(work, "server.log"), "w")  # 服务器的日志输出，不与测试结果混在一起
+    async with stdio_client(params, errlog=errlog) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            server_pid = find_child(os.getpid(), MAIN_PATH)
+            if server_pid is None:
+                raise SystemExit("找不到服务器进程")
+
+            async def call(name: str, arguments: dict) -> Tuple[str, bool]:
+                result = await session.call_tool(name, arguments)
+                text = result_text(result.content)
+                return text, result.isError or text.startswith(ERROR_PREFIXES)
+
+            async def ping() -> None:
+                await session.send_ping()
+
+            await warm_up(call, sequence, work)
+            baseline = sample_resources(server_pid)
+            for concurrency in args.concurrency:
+                result = await run_level(call, sequence, work, concurrency, server_pid, ping)
+                print(describe("stdio", result, "服务器响应延迟（ping）"))
+                leaks += await check_leaks("stdio", server_pid, baseline)
+    errlog.close()
+    return leaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "stdio", "both"], default="both")
+    parser.add_argument("--concurrency", default="10,50,200", help="并发数，逗号分隔时依次测试")
+    parser.add_argument("--requests", type=int, default=400, help="每个并发级别的调用次数")
+    parser.add_argument("--mix", default="get_video_info=3,convert_video_format=1,detect_scenes=1,analyze_media=1",
+                        help=f"工具及权重（可选: {', '.join(TOOL_ARGS)}）")
+    parser.add_argument("--stub-seconds", type=float, default=0.2, help="替身 ffmpeg 每个任务的耗时")
+    parser.add_argument("--probe-seconds", type=float, default=0.02, help="替身 ffprobe 每次的耗时")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    args = parser.parse_args()
+    if not sys.platform.startswith("linux"):
+        raise SystemExit("负载测试通过 /proc 统计文件描述符和子进程，仅支持 Linux")
+    args.concurrency = [int(value) for value in args.concurrency.split(",")]
+
+    sequence = call_sequence(parse_mix(args.mix), args.requests)
+    work, env = prepare_workspace(args)
+    print(f"工作目录: {work}\n调用组合: {dict(Counter(sequence))}，替身 ffmpeg {args.stub_seconds}秒/任务，"
+          f"ffprobe {args.probe_seconds}秒/次\n")
+    leaks = []
+    try:
+        # stdio 先运行：进程内模式会在本进程中导入服务器模块
+        if args.mode in ("stdio", "both"):
+            leaks += asyncio.run(run_stdio(args, sequence, work, env))
+        if args.mode in ("inprocess", "both"):
+            leaks += asyncio.run(run_inprocess(args, sequence, work, env))
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    if leaks:
+        print("\n发现资源泄漏:\n  " + "\n  ".join(leaks))
+        sys.exit(1)
+    print("\n未发现残留子进程、僵尸进程或文件描述符泄漏")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+负载测试用的 ffmpeg / ffprobe 替身
+不做任何编解码：按固定时长休眠，期间输出与真实 FFmpeg 格式一致的输入信息、进度行和检测滤镜日志，
+最后写入一个很小的输出文件，使服务器的进程管理、日志解析和结果格式化按正常路径执行
+
+由 load_test.py 在临时目录中生成的 ffmpeg / ffprobe 包装脚本调用：
+    python -S stub_ffmpeg.py ffmpeg|ffprobe 参数...
+
+环境变量：
+    LOADTEST_STUB_SECONDS  每个 ffmpeg 任务的耗时（秒，默认 0.5）
+    LOADTEST_PROBE_SECONDS 每次 ffprobe 的耗时（秒，默认 0.02）
+    LOADTEST_STUB_TICKS    任务期间输出的进度行数（默认 10）
+"""
+
+import json
+import os
+import sys
+import time
+
+DURATION = 120.0
+WIDTH, HEIGHT, FPS = 1920, 1080, 30
+
+ENCODERS = [
+    ("V....D", "libx264", "libx264 H.264 / AVC / MPEG-4 AVC (codec h264)"),
+    ("V....D", "libx265", "libx265 H.265 / HEVC (codec hevc)"),
+    ("V....D", "libvpx-vp9", "libvpx VP9 (codec vp9)"),
+    ("V....D", "gif", "GIF (Graphics Interchange Format)"),
+    ("V....D", "mjpeg", "MJPEG (Motion JPEG)"),
+    ("V....D", "png", "PNG (Portable Network Graphics) image"),
+    ("A....D", "aac", "AAC (Advanced Audio Coding)"),
+    ("A....D", "libmp3lame", "libmp3lame MP3 (MPEG audio layer 3) (codec mp3)"),
+    ("A....D", "libopus", "libopus Opus (codec opus)"),
+    ("A....D", "pcm_s16le", "PCM signed 16-bit little-endian"),
+    ("A....D", "flac", "FLAC (Free Lossless Audio Codec)"),
+]
+MUXERS = ["mp4", "mov", "matroska", "webm", "avi", "flv", "mpegts", "mp3", "adts", "wav", "flac", "ogg",
+          "gif", "image2", "segment", "hls", "null", "rawvideo", "s16le", "f32le"]
+FILTERS = ["scale", "fps", "select", "metadata", "split", "concat", "overlay", "setpts", "atempo", "crop",
+           "blackdetect", "freezedetect", "cropdetect", "silencedetect", "loudnorm", "volume", "pad",
+           "eq", "tile", "showwavespic", "drawtext", "aresample", "amix", "palettegen", "paletteuse"]
+
+
+def probe_json(path: str) -> dict:
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    return {
+        "streams": [
+            {
+                "index": 0, "codec_name": "h264", "codec_type": "video", "profile": "High", "pix_fmt": "yuv420p",
+                "width": WIDTH, "height": HEIGHT, "avg_frame_rate": f"{FPS}/1", "r_frame_rate": f"{FPS}/1",
+                "duration": f"{DURATION:.6f}", "bit_rate": "4000000", "disposition": {"attached_pic": 0}
+            },
+            {
+                "index": 1, "codec_name": "aac", "codec_type": "audio", "sample_rate": "48000", "channels": 2,
+                "duration": f"{DURATION:.6f}", "bit_rate": "128000", "disposition": {"attached_pic": 0}
+            }
+        ],
+        "format": {
+            "filename": path, "nb_streams": 2, "format_name": "mov,mp4,m4a,3gp,3g2,mj2",
+            "duration": f"{DURATION:.6f}", "size": str(size), "bit_rate": "4128000"
+        }
+    }
+
+
+def listing(option: str) -> str:
+    if option == "-encoders":
+        lines = ["Encoders:", " V..... = Video", " A..... = Audio", " ------"]
+        lines += [f" {flags} {name:<20} {description}" for flags, name, description in ENCODERS]
+    elif option == "-muxers":
+        lines = ["File formats:", " D. = Demuxing supported", " .E = Muxing supported", " --"]
+        lines += [f"  E {name:<15} {name}" for name in MUXERS]
+    elif option == "-filters":
+        lines = ["Filters:", "  T.. = Timeline support"]
+        lines += [f" ... {name:<15} V->V       {name}" for name in FILTERS]
+    else:
+        lines = ["Hardware acceleration methods:", "vaapi"]
+    return "\n".join(lines) + "\n"
+
+
+def output_path(args: list) -> str:
+    """最后一个参数是输出；-f null 和管道输出不写文件"""
+    if not args or args[-1] in ("-", "pipe:1") or "null" in args:
+        return ""
+    path = args[-1]
+    return path % 1 if "%" in path else path
+
+
+def detector_lines(args: list, tick: int, t: float) -> list:
+    """按命令中的滤镜输出与真实 FFmpeg 相同格式的检测日志"""
+    graph = " ".join(args)
+    lines = []
+    if "cropdetect" in graph:
+        lines.append(
+            f"[Parsed_cropdetect_4 @ 0x5555] x1:0 x2:{WIDTH - 1} y1:140 y2:939 w:{WIDTH} h:800 x:0 y:140 "
+            f"pts:{tick} t:{t:.6f} limit:24.000000 crop={WIDTH}:800:0:140"
+        )
+    if "scene" in graph and tick % 3 == 1:
+        lines.append(f"[Parsed_metadata_7 @ 0x5556] frame:{tick}    pts:{int(t * 1000)}   pts_time:{t:g}")
+        lines.append(f"[Parsed_metadata_7 @ 0x5556] lavfi.scene_score={0.35 + (tick % 5) * 0.1:.6f}")
+    if "blackdetect" in graph and tick == 2:
+        lines.append(f"[blackdetect @ 0x5557] black_start:{t:g} black_end:{t + 1:g} black_duration:1")
+    if "silencedetect" in graph and tick % 4 == 1:
+        lines.append(f"[silencedetect @ 0x5558] silence_start: {t:g}")
+    if "silencedetect" in graph and tick % 4 == 2:
+        lines.append(f"[silencedetect @ 0x5558] silence_end: {t:g} | silence_duration: {DURATION / 10:g}")
+    return lines
+
+
+def run_ffmpeg(args: list) -> int:
+    for option in ("-encoders", "-muxers", "-filters", "-hwaccels"):
+        if option in args:
+            sys.stdout.write(listing(option))
+            return 0
+    if "-version" in args:
+        sys.stdout.write("ffmpeg version 7.0-loadtest-stub Copyright (c) 2000-2024 the FFmpeg developers\n")
+        return 0
+
+    seconds = float(os.environ.get("LOADTEST_STUB_SECONDS", "0.5"))
+    ticks = max(1, int(os.environ.get("LOADTEST_STUB_TICKS", "10")))
+    stats = "-nostats" not in args
+    inputs = [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == "-i"]
+    err = sys.stderr
+    for index, path in enumerate(inputs):
+        err.write(f"Input #{index}, mov,mp4,m4a,3gp,3g2,mj2, from '{path}':\n")
+        err.write("  Duration: 00:02:00.00, start: 0.000000, bitrate: 4128 kb/s\n")
+        err.write(f"  Stream #{index}:0(und): Video: h264 (High), yuv420p, {WIDTH}x{HEIGHT}, {FPS} fps\n")
+        err.write(f"  Stream #{index}:1(und): Audio: aac (LC), 48000 Hz, stereo, fltp, 128 kb/s\n")
+    err.write("Stream mapping:\n  Stream #0:0 -> #0:0 (h264 (native) -> h264 (libx264))\nPress [q] to stop, [?] for help\n")
+    err.flush()
+
+    for tick in range(ticks):
+        time.sleep(seconds / ticks)
+        t = DURATION * (tick + 1) / ticks
+        for line in detector_lines(args, tick, t):
+            err.write(line + "\n")
+        if stats:
+            err.write(
+                f"frame={int(t * FPS):5d} fps=240 q=28.0 size={int(t * 500):8d}KiB "
+                f"time=00:{int(t // 60):02d}:{t % 60:05.2f} bitrate=4000.0kbits/s speed={DURATION / seconds:.1f}x\r"
+            )
+        err.flush()
+
+    path = output_path(args)
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"\0" * 4096)
+    elif args and args[-1] in ("-", "pipe:1"):
+        sys.stdout.buffer.write(b"\0" * 65536)
+    err.write("\n[out#0/mp4 @ 0x5559] video:6000KiB audio:1875KiB subtitle:0KiB other streams:0KiB\n")
+    return 0
+
+
+def run_ffprobe(args: list) -> int:
+    time.sleep(float(os.environ.get("LOADTEST_PROBE_SECONDS", "0.02")))
+    path = args[-1] if args else ""
+    if "json" in args:
+        sys.stdout.write(json.dumps(probe_json(path)))
+    elif "stream=width,height" in args:
+        sys.stdout.write(f"{WIDTH}x{HEIGHT}\n")
+    else:
+        sys.stdout.write(f"{DURATION:.6f}\n")
+    return 0
+
+
+def main() -> int:
+    program, args = sys.argv[1], sys.argv[2:]
+    return run_ffprobe(args) if program == "ffprobe" else run_ffmpeg(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,184 @@
 import httpx
+import json
+import math
 import os
 import subprocess
+import tempfile
+import time
 import asyncio
+import contextlib
 from pathlib import Path
-from typing import Optional, List
+from typing import Awaitable, Callable, Optional, List, Tuple
 from mcp.server.fastmcp import FastMCP
 
-mcp = FastMCP("视频音频处理器")
+from src.config import ServerConfig
+from src.core import (
+    COMPRESS_AUDIO_KBPS,
+    COMPRESS_QUALITY,
+    CONVERT_QUALITY,
+    DEFAULT_TARGET_I,
+    DEFAULT_TARGET_TP,
+    EncodeEstimate,
+    EncodeProfile,
+    EngineRouter,
+    JobJournal,
+    LoudnessCache,
+    Preflight,
+    ProxyCache,
+    PyAVEngine,
+    RemoteInputCache,
+    ThreadBudget,
+    ThroughputStore,
+    Tracer,
+    can_copy_stream,
+    compress_audio_args,
+    compress_video_args,
+    configure_engines,
+    configure_http_cache,
+    configure_proxy_cache,
+    configure_thread_budget,
+    configure_tracer,
+    convert_video_args,
+    describe_mp4_layout,
+    describe_stream_path,
+    format_seconds,
+    gain_to_target,
+    gather_bounded,
+    get_audio_stream,
+    get_duration,
+    estimate_keyframe_interval,
+    get_engine_router,
+    get_frame_rate,
+    get_video_stream,
+    inprocess_available,
+    instrument_tools,
+    is_remote_url,
+    job_temp_path,
+    output_muxer,
+    parse_bitrate_kbps,
+    parse_timecode,
+    peak_limiter_filter,
+    probe_media,
+    quality_value,
+    resolve_input,
+    resolve_preview_input,
+    run_ffmpeg_command,
+    span,
+    stream_bitrate_kbps,
+    streaming_output_args,
+)
+from src.tools import (
+    register_scene_tools,
+    register_preview_tools,
+    register_waveform_tools,
+    register_frame_tools,
+    register_silence_tools,
+    register_segment_tools,
+    register_stream_tools,
+    register_library_tools,
+    register_watch_tools,
+    register_job_tools,
+    register_proxy_tools,
+    register_loudness_tools,
+    register_fingerprint_tools,
+    register_video_hash_tools,
+    register_analysis_tools,
+)
 
+config = ServerConfig.get_default_config()
 
-async def run_ffmpeg_command(cmd: List[str]):
-    """运行FFmpeg命令的异步辅助函数"""
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
+# 任务日志：服务器启动时（lifespan）创建数据库，清理意外退出的实例留下的未完成任务，按策略重新排队或标记失败。
+# 任务日志和吞吐量历史创建对象时不访问磁盘，只导入 main 不会创建数据库文件
+job_journal = JobJournal(os.path.join(config.cache_dir, "jobs.db"))
+
+# 编码前预检：FFmpeg 能力表只在首次使用（或更换 FFmpeg 后）生成一次
+preflight = Preflight(
+    os.path.join(config.cache_dir, "capabilities.json"),
+    free_space_margin=config.preflight_free_space_margin_mb * 1024 * 1024
+)
+
+# 响度测量缓存：normalize_loudness 和 merge_audios（match_loudness）共用
+loudness_cache = LoudnessCache(config.cache_dir)
+
+# 编码吞吐量历史：压缩和格式转换完成后记录，用于预测后续任务的耗时和大小（服务器启动时创建数据库）
+throughput_store = ThroughputStore(os.path.join(config.cache_dir, "throughput.db"))
+
+
+resumed_tasks = set()
+
+
+async def resume_job(job_id: str) -> None:
+    record = await asyncio.to_thread(job_journal.get, job_id)
+    try:
+        await run_journaled_job(record["kind"], record["params"], job_id)
+    except Exception:
+        pass  # 错误已写入任务日志
+
+
+@contextlib.asynccontextmanager
+async def resume_interrupted_jobs(server: FastMCP):
+    """
+    服务器启动时恢复被中断的任务（只处理所属服务器进程已退出的任务），重新排队的任务在后台继续执行
+
+    只导入 main（基准测试、交互式环境）不会触发恢复，也不会影响其他正在运行的实例的任务。
+    """
+    await asyncio.gather(
+        asyncio.to_thread(job_journal.open),
+        asyncio.to_thread(throughput_store.open)
+    )
+    interrupted_jobs = await asyncio.to_thread(
+        job_journal.recover, config.job_recovery_policy, config.job_max_attempts
     )
-    stdout, stderr = await process.communicate()
-    return type('Result', (), {
-        'returncode': process.returncode,
-        'stdout': stdout.decode() if stdout else '',
-        'stderr': stderr.decode() if stderr else ''
-    })()
+    for job in interrupted_jobs:
+        if job["action"] == "requeue":
+            task = asyncio.create_task(resume_job(job["job_id"]))
+            resumed_tasks.add(task)
+            task.add_done_callback(resumed_tasks.discard)
+    yield {}
+
+
+mcp = FastMCP("视频音频处理器", lifespan=resume_interrupted_jobs)
+
+# 调用追踪：在注册任何工具之前包装，之后注册的每个工具调用都记录为一个 trace
+instrument_tools(mcp)
+if config.trace_sample_rate > 0:
+    configure_tracer(Tracer(
+        config.trace_path or os.path.join(config.cache_dir, "traces.jsonl"),
+        sample_rate=config.trace_sample_rate,
+        max_bytes=config.trace_max_mb * 1024 * 1024
+    ))
+
+if config.thread_budget:
+    configure_thread_budget(ThreadBudget(config.max_cpus, config.pin_cpus))
+
+if config.http_cache:
+    configure_http_cache(RemoteInputCache(
+        os.path.join(config.cache_dir, "http"),
+        max_bytes=config.http_cache_max_mb * 1024 * 1024,
+        block_size=config.http_cache_block_size
+    ))
+
+if config.inprocess_engine and inprocess_available():
+    configure_engines(EngineRouter(PyAVEngine(config.inprocess_workers)))
+
+if config.proxy_enabled:
+    configure_proxy_cache(ProxyCache(
+        config.cache_dir,
+        short_side=config.proxy_short_side,
+        gop_seconds=config.proxy_gop_seconds,
+        min_source_short_side=config.proxy_min_source_short_side,
+        max_bytes=config.proxy_max_mb * 1024 * 1024,
+        build_mode=config.proxy_build_mode
+    ))
 
 
 async def check_qsv_support():
-    """检查系统是否支持Intel QSV硬件加速"""
+    """检查系统是否支持Intel QSV硬件加速（读取缓存的 FFmpeg 能力表）"""
     try:
         # 检查FFmpeg是否编译了QSV支持
-        cmd = ["ffmpeg", "-hide_banner", "-encoders"]
-        result = await run_ffmpeg_command(cmd)
-        
-        if result.returncode == 0:
-            qsv_encoders = []
-            for line in result.stdout.split('\n'):
-                if 'qsv' in line.lower():
-                    qsv_encoders.append(line.strip())
-            
-            return len(qsv_encoders) > 0, qsv_encoders
-        return False, []
+        capabilities = await preflight.capabilities()
+        qsv_encoders = sorted(name for name in capabilities.encoders if "qsv" in name)
+        return len(qsv_encoders) > 0, qsv_encoders
     except Exception:
         return False, []
 
@@ -56,17 +196,13 @@ async def check_hardware_acceleration() -> str:
         qsv_supported, qsv_encoders = await check_qsv_support()
         
         # 检查其他硬件加速
-        cmd = ["ffmpeg", "-hide_banner", "-hwaccels"]
-        result = await run_ffmpeg_command(cmd)
+        capabilities = await preflight.capabilities()
         
         report = "硬件加速支持情况：\n\n"
         
-        if result.returncode == 0:
-            hwaccels = result.stdout.strip().split('\n')[1:]  # 跳过标题行
-            report += "可用的硬件加速器:\n"
-            for hwaccel in hwaccels:
-                if hwaccel.strip():
-                    report += f"  - {hwaccel.strip()}\n"
+        report += "可用的硬件加速器:\n"
+        for hwaccel in sorted(capabilities.hwaccels):
+            report += f"  - {hwaccel}\n"
         
         report += f"\nIntel QSV支持: {'✓ 支持' if qsv_supported else '✗ 不支持'}\n"
         
@@ -78,11 +214,7 @@ async def check_hardware_acceleration() -> str:
                 report += f"  ... 以及其他 {len(qsv_encoders) - 5} 个编码器\n"
         
         # 检查NVIDIA NVENC支持
-        cmd_nvenc = ["ffmpeg", "-hide_banner", "-encoders"]
-        result_nvenc = await run_ffmpeg_command(cmd_nvenc)
-        nvenc_supported = False
-        if result_nvenc.returncode == 0:
-            nvenc_supported = 'nvenc' in result_nvenc.stdout.lower()
+        nvenc_supported = any("nvenc" in name for name in capabilities.encoders)
         
         report += f"NVIDIA NVENC支持: {'✓ 支持' if nvenc_supported else '✗ 不支持'}\n"
         
@@ -128,13 +260,13 @@ async def convert_video_with_qsv(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_qsv.{output_format}")
         
-        # 质量设置映射
-        quality_map = {
-            "high": "18",
-            "medium": "23",
-            "low": "28"
-        }
-        global_quality = quality_map.get(quality, "23")
+        report = await preflight.check(
+            output_path, [input_path], video_encoder=qsv_encoder, audio_encoder="aac", hwaccel="qsv"
+        )
+        if not report.ok:
+            return report.message()
+        
+        global_quality = quality_value(CONVERT_QUALITY, quality)
         
         cmd = [
             "ffmpeg",
@@ -193,6 +325,15 @@ async def compress_video_with_qsv(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_qsv_compressed.{input_file.suffix[1:]}")
         
+        # 指定目标码率时按 视频码率 + 128k 音频 估计输出大小
+        video_kbps = parse_bitrate_kbps(target_bitrate)
+        report = await preflight.check(
+            output_path, [input_path], video_encoder=qsv_encoder, audio_encoder="aac", hwaccel="qsv",
+            output_bitrate_kbps=video_kbps + 128 if video_kbps else None
+        )
+        if not report.ok:
+            return report.message()
+        
         # 获取原文件大小
         original_size_mb = os.path.getsize(input_path) / (1024 * 1024)
         
@@ -208,17 +349,10 @@ async def compress_video_with_qsv(
             cmd.extend(["-b:v", target_bitrate])
         else:
             # 使用质量设置
-            quality_map = {
-                "high": "20",
-                "medium": "25", 
-                "low": "30"
-            }
-            global_quality = quality_map.get(quality, "25")
-            cmd.extend(["-global_quality", global_quality])
+            cmd.extend(["-global_quality", quality_value(COMPRESS_QUALITY, quality)])
         
         cmd.extend([
-            "-c:a", "aac",
-            "-b:a", "128k",
+            *compress_audio_args(),
             "-y",
             output_path
         ])
@@ -267,12 +401,21 @@ async def extract_audio_from_video(
             video_file = Path(video_path)
             output_path = str(video_file.parent / f"{video_file.stem}.{audio_format}")
         
+        audio_codec = "libmp3lame" if audio_format == "mp3" else "copy"
+        report = await preflight.check(
+            output_path, [video_path], audio_encoder=audio_codec,
+            output_bitrate_kbps=parse_bitrate_kbps(audio_quality) if audio_codec != "copy" else None,
+            size_ratio=None
+        )
+        if not report.ok:
+            return report.message()
+        
         # 构建FFmpeg命令
         cmd = [
             "ffmpeg",
             "-i", video_path,
             "-vn",  # 不处理视频流
-            "-acodec", "libmp3lame" if audio_format == "mp3" else "copy",
+            "-acodec", audio_codec,
             "-ab", audio_quality,
             "-y",  # 覆盖输出文件
             output_path
@@ -296,30 +439,21 @@ async def get_video_info(video_path: str) -> str:
     获取视频文件信息
     
     Args:
-        video_path: 视频文件路径
+        video_path: 视频文件路径或 HTTP(S) 地址（远程文件经本地缓存读取）
     
     Returns:
         视频文件详细信息
     """
     try:
-        if not os.path.exists(video_path):
+        if not is_remote_url(video_path) and not os.path.exists(video_path):
             return f"错误：视频文件不存在 - {video_path}"
         
-        cmd = [
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_format",
-            "-show_streams",
-            video_path
-        ]
-        
-        result = await run_ffmpeg_command(cmd)
+        try:
+            info, _ = await get_engine_router().probe(await resolve_input(video_path))
+        except RuntimeError as e:
+            return f"获取视频信息失败：{e}"
         
-        if result.returncode == 0:
-            return f"视频信息获取成功：\n{result.stdout}"
-        else:
-            return f"获取视频信息失败：{result.stderr}"
+        return f"视频信息获取成功：\n{json.dumps(info, indent=2, ensure_ascii=False)}"
             
     except Exception as e:
         return f"发生错误：{str(e)}"
@@ -354,13 +488,18 @@ async def extract_audio_segment(
             video_file = Path(video_path)
             output_path = str(video_file.parent / f"{video_file.stem}_segment.{audio_format}")
         
+        audio_codec = "libmp3lame" if audio_format == "mp3" else "copy"
+        report = await preflight.check(output_path, [video_path], audio_encoder=audio_codec, size_ratio=None)
+        if not report.ok:
+            return report.message()
+        
         cmd = [
             "ffmpeg",
             "-i", video_path,
             "-ss", start_time,
             "-t", duration,
             "-vn",
-            "-acodec", "libmp3lame" if audio_format == "mp3" else "copy",
+            "-acodec", audio_codec,
             "-y",
             output_path
         ]
@@ -376,6 +515,149 @@ async def extract_audio_segment(
         return f"发生错误：{str(e)}"
 
 
+# 压缩时硬件加速类型 → (编码器, -hwaccel 的值)
+COMPRESS_HW_ENCODERS = {
+    "qsv": ("h264_qsv", "qsv"),
+    "nvenc": ("h264_nvenc", "cuda"),
+}
+
+# 没有同编码方式的吞吐量历史时，按质量档位粗略估计的 H.264 每像素比特数
+COMPRESS_BITS_PER_PIXEL = {
+    "high": 0.13,
+    "medium": 0.08,
+    "low": 0.05
+}
+
+# 预计压缩后至少减小该比例时才重新编码
+COMPRESS_MIN_SAVING = 0.1
+
+
+def encode_profile(video_codec: str, video_args: List[str], hardware: str) -> EncodeProfile:
+    """从编码参数得到吞吐量历史的编码方式（预设、质量参数或按码率编码）"""
+    preset = video_args[video_args.index("-preset") + 1] if "-preset" in video_args else None
+    quality = "bitrate" if "-b:v" in video_args else None
+    for flag in ("-crf", "-global_quality", "-cq"):
+        if flag in video_args:
+            quality = f"{flag[1:]}={video_args[video_args.index(flag) + 1]}"
+    return EncodeProfile(video_codec, preset, quality, hardware)
+
+
+def plan_convert_video(
+    video_codec: str,
+    audio_codec: str,
+    quality: str,
+    use_hardware_acceleration: bool,
+    hwaccel_type: str
+) -> Tuple[List[str], List[str], List[str], EncodeProfile]:
+    """convert_video_format 的编码参数：返回 (输入参数, 视频参数, 音频参数, 编码方式)"""
+    input_args = []
+    if use_hardware_acceleration:
+        if hwaccel_type == "qsv":
+            input_args = ["-hwaccel", "qsv"]
+            # 如果使用软件编码器但启用了硬件加速，自动切换到QSV编码器
+            if video_codec == "libx264":
+                video_codec = "h264_qsv"
+            elif video_codec == "libx265":
+                video_codec = "hevc_qsv"
+        elif hwaccel_type == "nvenc":
+            input_args = ["-hwaccel", "cuda"]
+            if video_codec == "libx264":
+                video_codec = "h264_nvenc"
+            elif video_codec == "libx265":
+                video_codec = "hevc_nvenc"
+    
+    video_args = convert_video_args(video_codec, quality)
+    hardware = hwaccel_type if input_args else "software"
+    return input_args, video_args, ["-c:a", audio_codec], encode_profile(video_codec, video_args, hardware)
+
+
+def plan_compress_video(
+    quality: str,
+    target_size_mb: Optional[int],
+    duration: Optional[float],
+    use_hardware_acceleration: bool,
+    hwaccel_type: str
+) -> Tuple[List[str], List[str], List[str], EncodeProfile]:
+    """compress_video 的编码参数：返回 (输入参数, 视频参数, 音频参数, 编码方式)"""
+    input_args = []
+    video_codec = "libx264"
+    
+    # 添加硬件加速
+    if use_hardware_acceleration and hwaccel_type in COMPRESS_HW_ENCODERS:
+        video_codec, hwaccel = COMPRESS_HW_ENCODERS[hwaccel_type]
+        input_args = ["-hwaccel", hwaccel]
+    
+    target_bitrate = None
+    if target_size_mb:
+        # 根据目标大小计算比特率
+        if not duration:
+            raise ValueError("无法获取视频时长")
+        target_bitrate = int((target_size_mb * 8 * 1024) / duration)  # kbps
+    video_args = compress_video_args(video_codec, quality, target_bitrate)
+    audio_args = compress_audio_args()
+    hardware = hwaccel_type if input_args else "software"
+    return input_args, video_args, audio_args, encode_profile(video_codec, video_args, hardware)
+
+
+def compress_skip_reason(
+    info: dict,
+    source_bytes: int,
+    muxer: Optional[str],
+    quality: str,
+    target_size_mb: Optional[int],
+    estimate: Optional[EncodeEstimate]
+) -> Optional[str]:
+    """
+    压缩无法明显减小文件时返回原因（此时直接复制源文件的流），否则返回 None
+    
+    预计大小优先使用同编码方式的吞吐量历史，没有时按质量档位的每像素比特数估计。
+    """
+    video_stream, audio_stream = get_video_stream(info), get_audio_stream(info)
+    if video_stream is None:
+        return None
+    if not all(can_copy_stream(s, s.get("codec_name"), muxer) for s in (video_stream, audio_stream) if s is not None):
+        return None
+    
+    if target_size_mb:
+        if source_bytes <= target_size_mb * 1024 * 1024:
+            return f"源文件（{source_bytes / 1024 / 1024:.1f}MB）已不大于目标大小 {target_size_mb}MB"
+        return None
+    
+    if estimate is not None and estimate.basis == "history":
+        predicted_bytes, basis = estimate.output_bytes, "按历史记录"
+    else:
+        width, height, fps = video_geometry(info)
+        duration = get_duration(info)
+        if not (width and height and fps and duration):
+            return None
+        predicted_bytes = width * height * fps * duration * COMPRESS_BITS_PER_PIXEL.get(quality, 0.08) / 8
+        if audio_stream is not None:
+            predicted_bytes += COMPRESS_AUDIO_KBPS * 1000 / 8 * duration
+        basis = "按质量档位估计"
+    if predicted_bytes >= source_bytes * (1 - COMPRESS_MIN_SAVING):
+        return (
+            f"源文件码率已不高于 {quality} 档位（{basis}压缩后约 {predicted_bytes / 1024 / 1024:.1f}MB，"
+            f"源文件 {source_bytes / 1024 / 1024:.1f}MB）"
+        )
+    return None
+
+
+def video_geometry(info: dict) -> Tuple[int, int, float]:
+    """视频流的宽、高和帧率（没有视频流时为 0）"""
+    stream = get_video_stream(info) or {}
+    return int(stream.get("width") or 0), int(stream.get("height") or 0), get_frame_rate(stream) or 0.0
+
+
+def describe_estimate_result(estimate: Optional[EncodeEstimate], elapsed: float, output_bytes: int) -> str:
+    """任务结果中的预测与实际对比"""
+    if estimate is None:
+        return f"\n实际耗时: {format_seconds(elapsed)}（无历史记录，本次结果已记录供之后预测）"
+    return (
+        f"\n预计耗时: {format_seconds(estimate.seconds)}，实际: {format_seconds(elapsed)}"
+        f"\n预计大小: {estimate.output_bytes / 1024 / 1024:.1f}MB，实际: {output_bytes / 1024 / 1024:.1f}MB"
+    )
+
+
 @mcp.tool()
 async def convert_video_format(
     input_path: str,
@@ -385,11 +667,16 @@ async def convert_video_format(
     audio_codec: str = "aac",
     quality: str = "medium",
     use_hardware_acceleration: bool = False,
-    hwaccel_type: str = "qsv"
+    hwaccel_type: str = "qsv",
+    streaming_mode: str = "none",
+    reencode: bool = False
 ) -> str:
     """
     转换视频格式
     
+    输入的视频或音频已是目标编码格式且目标容器支持时直接复制该流（如 H.264/AAC 的 mkv 转 mp4 只更换容器），
+    只重新编码需要转换的流。
+    
     Args:
         input_path: 输入视频文件路径
         output_path: 输出视频文件路径（可选）
@@ -399,6 +686,8 @@ async def convert_video_format(
         quality: 质量设置（high, medium, low）
         use_hardware_acceleration: 是否使用硬件加速
         hwaccel_type: 硬件加速类型（qsv, nvenc, vaapi等）
+        streaming_mode: MP4封装方式（none, faststart：moov前置, fragmented：分片MP4）
+        reencode: 是否总是重新编码（默认编码格式已符合目标的流直接复制）
     
     Returns:
         转换结果信息
@@ -411,66 +700,70 @@ async def convert_video_format(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_converted.{output_format}")
         
-        cmd = ["ffmpeg"]
-        
-        # 添加硬件加速
-        if use_hardware_acceleration:
-            if hwaccel_type == "qsv":
-                # 检查QSV支持
-                qsv_supported, _ = await check_qsv_support()
-                if not qsv_supported:
-                    return "错误：系统不支持Intel QSV硬件加速"
-                cmd.extend(["-hwaccel", "qsv"])
-                # 如果使用软件编码器但启用了硬件加速，自动切换到QSV编码器
-                if video_codec == "libx264":
-                    video_codec = "h264_qsv"
-                elif video_codec == "libx265":
-                    video_codec = "hevc_qsv"
-            elif hwaccel_type == "nvenc":
-                cmd.extend(["-hwaccel", "cuda"])
-                if video_codec == "libx264":
-                    video_codec = "h264_nvenc"
-                elif video_codec == "libx265":
-                    video_codec = "hevc_nvenc"
-        
-        cmd.extend(["-i", input_path, "-c:v", video_codec])
-        
-        # 质量设置
-        if "qsv" in video_codec:
-            # QSV编码器使用global_quality
-            quality_map = {
-                "high": "18",
-                "medium": "23", 
-                "low": "28"
-            }
-            global_quality = quality_map.get(quality, "23")
-            cmd.extend(["-global_quality", global_quality])
-        elif "nvenc" in video_codec:
-            # NVENC编码器使用cq
-            quality_map = {
-                "high": "18",
-                "medium": "23", 
-                "low": "28"
-            }
-            cq_value = quality_map.get(quality, "23")
-            cmd.extend(["-cq", cq_value])
-        else:
-            # 软件编码器使用crf
-            quality_map = {
-                "high": "18",
-                "medium": "23", 
-                "low": "28"
-            }
-            crf_value = quality_map.get(quality, "23")
-            cmd.extend(["-crf", crf_value])
-        
-        cmd.extend(["-c:a", audio_codec, "-y", output_path])
-        
+        streaming_args = streaming_output_args(streaming_mode, output_path)
+        
+        if use_hardware_acceleration and hwaccel_type == "qsv":
+            # 检查QSV支持
+            qsv_supported, _ = await check_qsv_support()
+            if not qsv_supported:
+                return "错误：系统不支持Intel QSV硬件加速"
+        
+        input_args, video_args, audio_args, profile = plan_convert_video(
+            video_codec, audio_codec, quality, use_hardware_acceleration, hwaccel_type
+        )
+        video_codec = profile.codec
+        
+        # 已是目标编码格式的流直接复制
+        info = await probe_media(input_path)
+        capabilities = await preflight.capabilities()
+        muxer = output_muxer(output_path)
+        video_stream, audio_stream = get_video_stream(info), get_audio_stream(info)
+        video_copy = not reencode and can_copy_stream(video_stream, capabilities.encoders.get(video_codec), muxer)
+        audio_copy = None
+        if audio_stream is not None:
+            audio_copy = not reencode and can_copy_stream(audio_stream, capabilities.encoders.get(audio_codec), muxer)
+        if video_copy:
+            input_args, video_args = [], ["-c:v", "copy"]
+        if audio_copy:
+            audio_args = ["-c:a", "copy"]
+        
+        report = await preflight.check(
+            output_path, [input_path],
+            video_encoder="copy" if video_copy else video_codec,
+            audio_encoder="copy" if audio_copy else audio_codec,
+            hwaccel=input_args[1] if input_args else None, info=info
+        )
+        if not report.ok:
+            return report.message()
+        
+        # 重新编码视频时按历史吞吐量预测耗时和大小，完成后连同实际结果一起记录
+        width, height, fps = video_geometry(info)
+        duration = get_duration(info) or 0.0
+        estimate = None
+        if not video_copy:
+            estimate = await asyncio.to_thread(throughput_store.estimate, profile, width, height, fps, duration)
+        
+        cmd = ["ffmpeg", *input_args, "-i", input_path, *video_args, *audio_args, *streaming_args, "-y", output_path]
+        
+        start = time.perf_counter()
         result = await run_ffmpeg_command(cmd)
+        elapsed = time.perf_counter() - start
         
         if result.returncode == 0:
-            accel_info = f"\n硬件加速: {hwaccel_type.upper()}" if use_hardware_acceleration else ""
-            return f"成功转换视频格式！\n输入文件: {input_path}\n输出文件: {output_path}\n格式: {output_format}\n编码器: {video_codec}\n质量: {quality}{accel_info}"
+            estimate_info = ""
+            if not video_copy:
+                with span("postprocess"):
+                    output_bytes = os.path.getsize(output_path)
+                    await asyncio.to_thread(
+                        throughput_store.record,
+                        "convert_video_format", profile, width, height, fps, duration, elapsed, output_bytes, estimate
+                    )
+                estimate_info = describe_estimate_result(estimate, elapsed, output_bytes)
+            path_info = f"\n处理方式: {describe_stream_path(video_copy, audio_copy)}，耗时 {elapsed:.2f}秒"
+            codec_info = f"直接复制（{video_stream.get('codec_name')}）" if video_copy else video_codec
+            accel_info = f"\n硬件加速: {hwaccel_type.upper()}" if use_hardware_acceleration and not video_copy else ""
+            layout_info = f"\n{describe_mp4_layout(output_path)}" if streaming_args else ""
+            return f"成功转换视频格式！\n输入文件: {input_path}\n输出文件: {output_path}\n格式: {output_format}\n编码器: {codec_info}\n质量: {quality}{path_info}{accel_info}{layout_info}{estimate_info}"
         else:
             return f"转换失败：{result.stderr}"
             
@@ -507,6 +800,12 @@ async def convert_audio_format(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_converted.{output_format}")
         
+        report = await preflight.check(
+            output_path, [input_path], audio_encoder=audio_codec, output_bitrate_kbps=parse_bitrate_kbps(bitrate)
+        )
+        if not report.ok:
+            return report.message()
+        
         cmd = [
             "ffmpeg",
             "-i", input_path,
@@ -531,7 +830,8 @@ async def convert_audio_format(
 async def merge_m3u8_to_mp4(
     m3u8_url: str,
     output_path: str,
-    headers: Optional[str] = None
+    headers: Optional[str] = None,
+    streaming_mode: str = "none"
 ) -> str:
     """
     合并M3U8流为MP4文件
@@ -540,11 +840,18 @@ async def merge_m3u8_to_mp4(
         m3u8_url: M3U8播放列表URL
         output_path: 输出MP4文件路径
         headers: 可选的HTTP头部信息（格式：key1:value1,key2:value2）
+        streaming_mode: MP4封装方式（none, faststart：moov前置, fragmented：分片MP4）
     
     Returns:
         合并结果信息
     """
     try:
+        streaming_args = streaming_output_args(streaming_mode, output_path)
+        
+        report = await preflight.check(output_path, size_ratio=None)
+        if not report.ok:
+            return report.message()
+        
         cmd = ["ffmpeg", "-i", m3u8_url]
         
         # 如果提供了headers，添加到命令中
@@ -557,6 +864,7 @@ async def merge_m3u8_to_mp4(
         cmd.extend([
             "-c", "copy",
             "-bsf:a", "aac_adtstoasc",
+            *streaming_args,
             "-y",
             output_path
         ])
@@ -564,7 +872,8 @@ async def merge_m3u8_to_mp4(
         result = await run_ffmpeg_command(cmd)
         
         if result.returncode == 0:
-            return f"成功合并M3U8流！\nM3U8 URL: {m3u8_url}\n输出文件: {output_path}"
+            layout_info = f"\n{describe_mp4_layout(output_path)}" if streaming_args else ""
+            return f"成功合并M3U8流！\nM3U8 URL: {m3u8_url}\n输出文件: {output_path}{layout_info}"
         else:
             return f"合并失败：{result.stderr}"
             
@@ -587,58 +896,69 @@ async def cut_video_segment(
     切割视频片段
     
     Args:
-        input_path: 输入视频文件路径
+        input_path: 输入视频文件路径或 HTTP(S) 地址（远程文件经本地缓存读取）
         start_time: 开始时间（格式：HH:MM:SS）
         end_time: 结束时间（格式：HH:MM:SS，与duration二选一）
         duration: 持续时间（格式：HH:MM:SS，与end_time二选一）
-        output_path: 输出视频文件路径（可选）
+        output_path: 输出视频文件路径（可选，远程输入时必须提供）
         use_hardware_acceleration: 是否使用硬件加速（需要重新编码）
         hwaccel_type: 硬件加速类型（qsv, nvenc, vaapi等）
         precise_cut: 是否精确切割（重新编码，速度较慢但更精确）
     
+    直接复制切割时起点对齐到开始时间之前最近的关键帧（片段可能比要求的略早开始），
+    输出视频（不含封面图）、音频和字幕流；短片段使用进程内引擎时结果与 ffmpeg 相同。
+    
     Returns:
         切割结果信息
     """
     try:
-        if not os.path.exists(input_path):
+        remote = is_remote_url(input_path)
+        if not remote and not os.path.exists(input_path):
             return f"错误：输入文件不存在 - {input_path}"
         
         if not end_time and not duration:
             return "错误：必须提供end_time或duration中的一个"
         
         if output_path is None:
+            if remote:
+                return "错误：远程输入必须指定output_path"
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_cut.{input_file.suffix[1:]}")
         
-        cmd = [
-            "ffmpeg",
-            "-i", input_path,
-            "-ss", start_time
-        ]
-        
+        time_info = f"开始时间: {start_time}"
         if duration:
-            cmd.extend(["-t", duration])
+            time_info += f", 持续时间: {duration}"
         elif end_time:
-            cmd.extend(["-to", end_time])
-        
-        cmd.extend([
-            "-c", "copy",
-            "-y",
-            output_path
-        ])
-        
-        result = await run_ffmpeg_command(cmd)
-        
-        if result.returncode == 0:
-            time_info = f"开始时间: {start_time}"
-            if duration:
-                time_info += f", 持续时间: {duration}"
-            elif end_time:
-                time_info += f", 结束时间: {end_time}"
-            
-            return f"成功切割视频！\n输入文件: {input_path}\n输出文件: {output_path}\n{time_info}"
-        else:
-            return f"切割失败：{result.stderr}"
+            time_info += f", 结束时间: {end_time}"
+        
+        # 短片段直接复制时在进程内复用，省去启动进程的开销
+        router = get_engine_router()
+        start_seconds = parse_timecode(start_time)
+        length = parse_timecode(duration) if duration else parse_timecode(end_time) - start_seconds
+        report = await preflight.check(
+            output_path, [input_path], video_encoder="copy", audio_encoder="copy", output_duration=length
+        )
+        if not report.ok:
+            return report.message()
+        
+        if length <= 0:
+            return "错误：结束时间必须晚于开始时间"
+        
+        # 两个引擎的关键帧对齐和流选择规则相同，只按片段长度选择开销更小的一个
+        source = await resolve_input(input_path)
+        try:
+            if router.routes("remux") and length <= config.inprocess_max_remux_seconds:
+                engine = await router.remux(source, output_path, start_seconds, length)
+            else:
+                await router.subprocess.remux(source, output_path, start_seconds, length)
+                engine = router.subprocess.name
+        except RuntimeError as e:
+            return f"切割失败：{e}"
+        
+        return (
+            f"成功切割视频！\n输入文件: {input_path}\n输出文件: {output_path}\n{time_info}"
+            f"\n起点: 对齐到开始时间之前最近的关键帧（直接复制，不重新编码）\n引擎: {engine}"
+        )
             
     except Exception as e:
         return f"发生错误：{str(e)}"
@@ -676,6 +996,14 @@ async def cut_audio_segment(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_cut.{input_file.suffix[1:]}")
         
+        start_seconds = parse_timecode(start_time)
+        length = parse_timecode(duration) if duration else parse_timecode(end_time) - start_seconds
+        report = await preflight.check(
+            output_path, [input_path], video_encoder="copy", audio_encoder="copy", output_duration=length
+        )
+        if not report.ok:
+            return report.message()
+        
         cmd = [
             "ffmpeg",
             "-i", input_path,
@@ -714,15 +1042,17 @@ async def cut_audio_segment(
 async def merge_videos(
     video_paths: str,
     output_path: Optional[str] = None,
-    merge_method: str = "concat"
+    merge_method: str = "concat",
+    streaming_mode: str = "none"
 ) -> str:
     """
-    合并多个视频文件
+    合并多个视频文件（任务记录在任务日志中，服务器意外退出后重启时自动清理或重新执行）
     
     Args:
         video_paths: 视频文件路径列表，用逗号分隔
         output_path: 输出视频文件路径（可选）
         merge_method: 合并方式（concat：简单拼接，filter：滤镜合并）
+        streaming_mode: MP4封装方式（none, faststart：moov前置, fragmented：分片MP4）
     
     Returns:
         合并结果信息
@@ -742,65 +1072,97 @@ async def merge_videos(
             first_file = Path(paths[0])
             output_path = str(first_file.parent / f"merged_video.{first_file.suffix[1:]}")
         
-        if merge_method == "concat":
-            # 创建临时文件列表
-            list_file = Path(output_path).parent / "video_list.txt"
-            with open(list_file, "w") as f:
-                for path in paths:
-                    f.write(f"file '{path}'\n")
-            
-            cmd = [
-                "ffmpeg",
-                "-f", "concat",
-                "-safe", "0",
-                "-i", str(list_file),
-                "-c", "copy",
-                "-y",
-                output_path
-            ]
-            
-            result = await run_ffmpeg_command(cmd)
-            
-            # 清理临时文件
-            list_file.unlink()
-            
-        else:  # filter方法
-            # 构建复杂的filter命令
-            inputs = []
-            for path in paths:
-                inputs.extend(["-i", path])
-            
-            filter_complex = ""
-            for i in range(len(paths)):
-                filter_complex += f"[{i}:v][{i}:a]"
-            filter_complex += f"concat=n={len(paths)}:v=1:a=1[outv][outa]"
-            
-            cmd = [
-                "ffmpeg"
-            ] + inputs + [
-                "-filter_complex", filter_complex,
-                "-map", "[outv]",
-                "-map", "[outa]",
-                "-y",
-                output_path
-            ]
-            
-            result = await run_ffmpeg_command(cmd)
+        streaming_output_args(streaming_mode, output_path)
         
-        if result.returncode == 0:
-            return f"成功合并视频！\n输入文件: {', '.join(paths)}\n输出文件: {output_path}\n合并方式: {merge_method}"
+        if merge_method == "concat":
+            report = await preflight.check(output_path, paths, video_encoder="copy", audio_encoder="copy")
         else:
-            return f"合并失败：{result.stderr}"
+            report = await preflight.check(output_path, paths, filters=["concat"])
+        if not report.ok:
+            return report.message()
+        
+        params = {
+            "paths": paths,
+            "output_path": output_path,
+            "merge_method": merge_method,
+            "streaming_mode": streaming_mode
+        }
+        return await run_journaled_job("merge_videos", params)
             
     except Exception as e:
         return f"发生错误：{str(e)}"
 
 
+async def merge_videos_job(job_id: str, params: dict) -> Tuple[bool, str]:
+    """merge_videos 的执行部分：输出先写入临时文件，成功后再重命名"""
+    paths = params["paths"]
+    output_path = params["output_path"]
+    merge_method = params["merge_method"]
+    streaming_args = streaming_output_args(params["streaming_mode"], output_path)
+    temp_output = job_temp_path(output_path, job_id)
+    on_start = job_pid_recorder(job_id)
+    
+    if merge_method == "concat":
+        # 创建临时文件列表
+        list_file = job_temp_path(output_path, job_id, ".txt")
+        await asyncio.to_thread(job_journal.add_temp_paths, job_id, list_file, temp_output)
+        with open(list_file, "w") as f:
+            for path in paths:
+                f.write(f"file '{path}'\n")
+        
+        cmd = [
+            "ffmpeg",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_file,
+            "-c", "copy",
+            *streaming_args,
+            "-y",
+            temp_output
+        ]
+        
+        result = await run_ffmpeg_command(cmd, on_start=on_start)
+        
+    else:  # filter方法
+        await asyncio.to_thread(job_journal.add_temp_paths, job_id, temp_output)
+        # 构建复杂的filter命令
+        inputs = []
+        for path in paths:
+            inputs.extend(["-i", path])
+        
+        filter_complex = ""
+        for i in range(len(paths)):
+            filter_complex += f"[{i}:v][{i}:a]"
+        filter_complex += f"concat=n={len(paths)}:v=1:a=1[outv][outa]"
+        
+        cmd = [
+            "ffmpeg"
+        ] + inputs + [
+            "-filter_complex", filter_complex,
+            "-map", "[outv]",
+            "-map", "[outa]",
+            *streaming_args,
+            "-y",
+            temp_output
+        ]
+        
+        result = await run_ffmpeg_command(cmd, on_start=on_start)
+    
+    if result.returncode != 0:
+        return False, f"合并失败：{result.stderr}"
+    
+    os.replace(temp_output, output_path)
+    layout_info = f"\n{describe_mp4_layout(output_path)}" if streaming_args else ""
+    return True, f"成功合并视频！\n输入文件: {', '.join(paths)}\n输出文件: {output_path}\n合并方式: {merge_method}{layout_info}"
+
+
 @mcp.tool()
 async def merge_audios(
     audio_paths: str,
     output_path: Optional[str] = None,
-    merge_method: str = "concat"
+    merge_method: str = "concat",
+    match_loudness: bool = False,
+    target_lufs: float = DEFAULT_TARGET_I
 ) -> str:
     """
     合并多个音频文件
@@ -809,6 +1171,10 @@ async def merge_audios(
         audio_paths: 音频文件路径列表，用逗号分隔
         output_path: 输出音频文件路径（可选）
         merge_method: 合并方式（concat：拼接，mix：混音）
+        match_loudness: 是否先把各输入调整到相同的积分响度（使用缓存的响度测量结果，拼接时需要重新编码）。
+            拼接时每个输入的增益不超过真峰值余量（不会削波，峰值较高的安静素材会低于目标）；
+            混音时各输入按输入数下调后直接相加再经限幅器；结果中给出输出文件实测的响度
+        target_lufs: 响度匹配的目标积分响度（LUFS）
     
     Returns:
         合并结果信息
@@ -828,7 +1194,57 @@ async def merge_audios(
             first_file = Path(paths[0])
             output_path = str(first_file.parent / f"merged_audio.{first_file.suffix[1:]}")
         
-        if merge_method == "concat":
+        if match_loudness:
+            report = await preflight.check(
+                output_path, paths,
+                filters=["volume", "concat"] if merge_method == "concat" else ["volume", "amix", "alimiter"]
+            )
+        elif merge_method == "concat":
+            report = await preflight.check(output_path, paths, audio_encoder="copy")
+        else:
+            report = await preflight.check(output_path, paths, filters=["amix"])
+        if not report.ok:
+            return report.message()
+        
+        loudness_info = ""
+        if match_loudness:
+            # 已测量过的文件直接读取缓存，不再解码
+            measurements = await gather_bounded(paths, loudness_cache.measure, 4)
+            for item in measurements:
+                if isinstance(item, Exception):
+                    return f"错误：{item}"
+            if merge_method == "concat":
+                # 增益不超过真峰值余量，避免峰值较高的安静素材削波
+                gains = [gain_to_target(measurement, target_lufs, DEFAULT_TARGET_TP) for measurement, _ in measurements]
+            else:
+                # amix 不做 1/N 缩放，各输入下调 10·log10(N) dB，互不相关的信号相加后约为目标响度；峰值交给限幅器
+                mix_target = target_lufs - 10 * math.log10(len(paths))
+                gains = [gain_to_target(measurement, mix_target) for measurement, _ in measurements]
+            
+            graph = ";".join(f"[{i}:a:0]volume={gain:.2f}dB[a{i}]" for i, gain in enumerate(gains))
+            labels = "".join(f"[a{i}]" for i in range(len(paths)))
+            if merge_method == "concat":
+                graph += f";{labels}concat=n={len(paths)}:v=0:a=1"
+            else:
+                graph += f";{labels}amix=inputs={len(paths)}:duration=longest:normalize=0,{peak_limiter_filter()}"
+            
+            cmd = ["ffmpeg"]
+            for path in paths:
+                cmd.extend(["-i", path])
+            cmd.extend(["-filter_complex", graph, "-y", output_path])
+            result = await run_ffmpeg_command(cmd)
+            
+            cached = sum(1 for _, hit in measurements if hit)
+            loudness_info = f"\n响度匹配: 目标 {target_lufs:g} LUFS（{cached}/{len(paths)} 个文件使用缓存的测量结果）"
+            for path, (measurement, _), gain in zip(paths, measurements, gains):
+                limited = "（受真峰值限制）" if merge_method == "concat" and gain < gain_to_target(measurement, target_lufs) - 0.05 else ""
+                loudness_info += f"\n  {Path(path).name}: {measurement.describe()}，增益 {gain:+.1f}dB{limited}"
+            if result.returncode == 0:
+                # 报告输出文件实际的响度（拼接时受限的输入、混音时的叠加都会使其偏离目标）
+                output_measurement, _ = await loudness_cache.measure(output_path, force=True)
+                loudness_info += f"\n  输出: {output_measurement.describe()}"
+        
+        elif merge_method == "concat":
             # 创建临时文件列表
             list_file = Path(output_path).parent / "audio_list.txt"
             with open(list_file, "w") as f:
@@ -868,7 +1284,7 @@ async def merge_audios(
             result = await run_ffmpeg_command(cmd)
         
         if result.returncode == 0:
-            return f"成功合并音频！\n输入文件: {', '.join(paths)}\n输出文件: {output_path}\n合并方式: {merge_method}"
+            return f"成功合并音频！\n输入文件: {', '.join(paths)}\n输出文件: {output_path}\n合并方式: {merge_method}{loudness_info}"
         else:
             return f"合并失败：{result.stderr}"
             
@@ -887,7 +1303,7 @@ async def video_to_gif(
     quality: str = "medium"
 ) -> str:
     """
-    视频转GIF动图
+    视频转GIF动图（源视频有不小于GIF宽度的低分辨率代理文件时读取代理文件）
     
     Args:
         input_path: 输入视频文件路径
@@ -909,14 +1325,25 @@ async def video_to_gif(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}.gif")
         
-        # 构建基础命令
-        cmd = ["ffmpeg", "-i", input_path]
+        report = await preflight.check(
+            output_path, [input_path], video_encoder="gif",
+            filters=["fps", "scale", "palettegen", "paletteuse"], size_ratio=None
+        )
+        if not report.ok:
+            return report.message()
+        
+        # GIF 宽度不超过代理文件时读取代理文件
+        source_path, proxy = await resolve_preview_input(input_path, width=width)
+        
+        # 构建基础命令（时间参数作为输入选项：直接定位到开始时间，且调色板帧不会被输出端的 -ss 丢弃）
+        cmd = ["ffmpeg"]
         
         # 添加时间参数
         if start_time:
             cmd.extend(["-ss", start_time])
         if duration:
             cmd.extend(["-t", duration])
+        cmd.extend(["-i", source_path])
         
         # 质量设置映射
         quality_settings = {
@@ -961,7 +1388,9 @@ async def video_to_gif(
             if start_time or duration:
                 time_info = f"\n时间范围: {start_time or '开始'} - {duration or '结束'}"
             
-            return f"成功转换为GIF！\n输入文件: {input_path}\n输出文件: {output_path}\n尺寸: {width}px宽\n帧率: {fps}fps\n质量: {quality}{time_info}"
+            proxy_info = f"\n读取: 代理文件（{proxy['width']}x{proxy['height']}）" if proxy else ""
+            
+            return f"成功转换为GIF！\n输入文件: {input_path}\n输出文件: {output_path}\n尺寸: {width}px宽\n帧率: {fps}fps\n质量: {quality}{time_info}{proxy_info}"
         else:
             return f"GIF转换失败：{result.stderr}"
             
@@ -1004,6 +1433,10 @@ async def resize_video(
         else:
             scale_filter = f"scale={width}:{height}"
         
+        report = await preflight.check(output_path, [input_path], audio_encoder="copy", filters=["scale"])
+        if not report.ok:
+            return report.message()
+        
         cmd = [
             "ffmpeg",
             "-i", input_path,
@@ -1073,6 +1506,13 @@ async def add_watermark(
         # 构建滤镜
         filter_complex = f"[1:v]format=rgba,colorchannelmixer=aa={opacity}[watermark];[0:v][watermark]overlay={overlay_pos}"
         
+        report = await preflight.check(
+            output_path, [input_path, watermark_path], audio_encoder="copy",
+            filters=["format", "colorchannelmixer", "overlay"]
+        )
+        if not report.ok:
+            return report.message()
+        
         cmd = [
             "ffmpeg",
             "-i", input_path,
@@ -1101,7 +1541,8 @@ async def extract_frames(
     fps: Optional[float] = None,
     start_time: Optional[str] = None,
     duration: Optional[str] = None,
-    image_format: str = "jpg"
+    image_format: str = "jpg",
+    width: Optional[int] = None
 ) -> str:
     """
     从视频中提取帧图片
@@ -1113,6 +1554,7 @@ async def extract_frames(
         start_time: 开始时间（格式：HH:MM:SS）
         duration: 持续时间（格式：HH:MM:SS）
         image_format: 图片格式（jpg, png, bmp）
+        width: 图片宽度（可选，高度按比例计算，默认原始尺寸；不超过代理文件宽度时读取代理文件）
     
     Returns:
         提取结果信息
@@ -1125,19 +1567,36 @@ async def extract_frames(
             input_file = Path(input_path)
             output_dir = str(input_file.parent / f"{input_file.stem}_frames")
         
+        if width is not None and width <= 0:
+            return "错误：width必须大于0"
+        
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
         
+        report = await preflight.check(
+            os.path.join(output_dir, f"frame_0001.{image_format}"), [input_path],
+            filters=["fps", "scale"], size_ratio=None
+        )
+        if not report.ok:
+            return report.message()
+        
+        source_path, proxy = await resolve_preview_input(input_path, width=width)
+        
         # 构建命令
-        cmd = ["ffmpeg", "-i", input_path]
+        cmd = ["ffmpeg", "-i", source_path]
         
         if start_time:
             cmd.extend(["-ss", start_time])
         if duration:
             cmd.extend(["-t", duration])
         
+        filters = []
         if fps:
-            cmd.extend(["-vf", f"fps={fps}"])
+            filters.append(f"fps={fps}")
+        if width:
+            filters.append(f"scale={width}:-2")
+        if filters:
+            cmd.extend(["-vf", ",".join(filters)])
         
         output_pattern = os.path.join(output_dir, f"frame_%04d.{image_format}")
         cmd.extend(["-y", output_pattern])
@@ -1146,15 +1605,18 @@ async def extract_frames(
         
         if result.returncode == 0:
             # 统计生成的图片数量
-            frame_count = len([f for f in os.listdir(output_dir) if f.endswith(f".{image_format}")])
+            with span("postprocess"):
+                frame_count = len([f for f in os.listdir(output_dir) if f.endswith(f".{image_format}")])
             
             time_info = ""
             if start_time or duration:
                 time_info = f"\n时间范围: {start_time or '开始'} - {duration or '结束'}"
             
             fps_info = f"\n提取帧率: {fps}fps" if fps else ""
+            size_info = f"\n图片宽度: {width}px" if width else ""
+            proxy_info = f"\n读取: 代理文件（{proxy['width']}x{proxy['height']}）" if proxy else ""
             
-            return f"成功提取视频帧！\n输入文件: {input_path}\n输出目录: {output_dir}\n图片格式: {image_format}\n帧数量: {frame_count}{time_info}{fps_info}"
+            return f"成功提取视频帧！\n输入文件: {input_path}\n输出目录: {output_dir}\n图片格式: {image_format}\n帧数量: {frame_count}{time_info}{fps_info}{size_info}{proxy_info}"
         else:
             return f"帧提取失败：{result.stderr}"
             
@@ -1162,21 +1624,55 @@ async def extract_frames(
         return f"发生错误：{str(e)}"
 
 
+# 自动进入延时摄影模式的最低速度倍数
+TIMELAPSE_MIN_SPEED = 8.0
+
+# 音频摘要：每个采样窗口截取的音频秒数
+AUDIO_SUMMARY_SNIPPET = 0.5
+
+
+def build_atempo_chain(speed: float) -> str:
+    """atempo 单级只支持 0.5-2.0 的倍数，超出范围时串联多级"""
+    if 0.5 <= speed <= 2.0:
+        return f"atempo={speed}"
+    audio_filter = "atempo=2.0" if speed > 2.0 else "atempo=0.5"
+    remaining_speed = speed / 2.0 if speed > 2.0 else speed / 0.5
+    while remaining_speed > 2.0 or remaining_speed < 0.5:
+        if remaining_speed > 2.0:
+            audio_filter += ",atempo=2.0"
+            remaining_speed /= 2.0
+        else:
+            audio_filter += ",atempo=0.5"
+            remaining_speed /= 0.5
+    if remaining_speed != 1.0:
+        audio_filter += f",atempo={remaining_speed}"
+    return audio_filter
+
+
 @mcp.tool()
 async def change_video_speed(
     input_path: str,
     speed: float,
     output_path: Optional[str] = None,
-    keep_audio_pitch: bool = True
+    keep_audio_pitch: bool = True,
+    timelapse_mode: str = "auto",
+    audio_mode: str = "auto",
+    output_fps: Optional[float] = None
 ) -> str:
     """
     改变视频播放速度
     
+    高倍速（延时摄影）时大部分帧会被丢弃：关键帧间隔不超过输出帧的采样间隔时只解码关键帧，
+    否则在解码端跳过非参考帧，并在滤镜链开头按输出帧率丢帧，只编码需要的帧。
+    
     Args:
         input_path: 输入视频文件路径
-        speed: 播放速度倍数（0.5=半速，1.0=原速，2.0=两倍速）
+        speed: 播放速度倍数（0.5=半速，1.0=原速，2.0=两倍速，32=延时摄影）
         output_path: 输出视频文件路径（可选）
         keep_audio_pitch: 是否保持音频音调不变
+        timelapse_mode: 延时摄影模式（auto：速度≥8倍时启用，off：逐帧处理，keyframes：只解码关键帧，select：跳过非参考帧并提前丢帧）
+        audio_mode: 音频处理（auto：普通速度保留、延时摄影丢弃，keep：变速保留，drop：丢弃，summary：按间隔截取片段拼接成摘要）
+        output_fps: 延时摄影的输出帧率（可选，默认与输入相同，最高60）
     
     Returns:
         速度调整结果信息
@@ -1188,52 +1684,106 @@ async def change_video_speed(
         if speed <= 0:
             return "错误：速度倍数必须大于0"
         
+        if timelapse_mode not in ("auto", "off", "keyframes", "select"):
+            return f"错误：不支持的延时摄影模式 {timelapse_mode}"
+        
+        if audio_mode not in ("auto", "keep", "drop", "summary"):
+            return f"错误：不支持的音频处理方式 {audio_mode}"
+        
         if output_path is None:
             input_file = Path(input_path)
             speed_str = f"{speed:.1f}x".replace(".", "_")
             output_path = str(input_file.parent / f"{input_file.stem}_speed_{speed_str}.{input_file.suffix[1:]}")
         
-        # 构建滤镜
-        video_filter = f"setpts={1/speed}*PTS"
-        
-        if keep_audio_pitch:
-            # 使用atempo保持音调，但atempo只支持0.5-100的范围
-            if 0.5 <= speed <= 2.0:
-                audio_filter = f"atempo={speed}"
-            else:
-                # 对于极端速度，使用多个atempo串联
-                audio_filter = "atempo=2.0" if speed > 2.0 else "atempo=0.5"
-                remaining_speed = speed / 2.0 if speed > 2.0 else speed / 0.5
-                while remaining_speed > 2.0 or remaining_speed < 0.5:
-                    if remaining_speed > 2.0:
-                        audio_filter += ",atempo=2.0"
-                        remaining_speed /= 2.0
-                    else:
-                        audio_filter += ",atempo=0.5"
-                        remaining_speed /= 0.5
-                if remaining_speed != 1.0:
-                    audio_filter += f",atempo={remaining_speed}"
+        info = await probe_media(input_path)
+        video_stream = get_video_stream(info)
+        has_audio = get_audio_stream(info) is not None
+        if video_stream is None:
+            return f"错误：输入文件没有视频流 - {input_path}"
+        
+        timelapse = timelapse_mode in ("keyframes", "select") or (timelapse_mode == "auto" and speed >= TIMELAPSE_MIN_SPEED)
+        if audio_mode == "auto":
+            audio_mode = "drop" if timelapse else "keep"
+        if not has_audio:
+            audio_mode = "drop"
+        
+        filters = ["setpts"]
+        if timelapse:
+            filters.append("fps")
+        if audio_mode == "keep":
+            filters.append("atempo")
+        elif audio_mode == "summary":
+            filters.extend(["aselect", "asetpts"])
+        duration = get_duration(info)
+        report = await preflight.check(
+            output_path, [input_path], filters=filters, info=info,
+            output_duration=duration / speed if duration else None
+        )
+        if not report.ok:
+            return report.message()
+        
+        input_args = []
+        mode_info = ""
+        if timelapse:
+            fps = output_fps or min(get_frame_rate(video_stream) or 30.0, 60.0)
+            # 每个输出帧对应的原视频时长
+            sample_interval = speed / fps
+            if timelapse_mode == "auto":
+                keyframe_interval = await estimate_keyframe_interval(input_path)
+                timelapse_mode = "keyframes" if keyframe_interval and keyframe_interval <= sample_interval else "select"
+            # 解码端丢帧：只解码关键帧，或跳过不被其他帧参考的帧
+            input_args = ["-skip_frame", "nokey" if timelapse_mode == "keyframes" else "noref"]
+            # 先调整时间戳再按输出帧率丢帧，丢弃的帧不进入后续滤镜和编码器
+            video_filter = f"setpts=PTS/{speed},fps={fps:g}"
+            mode_info = (
+                f"\n延时摄影: {'只解码关键帧' if timelapse_mode == 'keyframes' else '跳过非参考帧并提前丢帧'}"
+                f"（输出 {fps:g}fps，每帧对应原视频 {sample_interval:.2f}秒）"
+            )
         else:
-            # 简单的音频速度调整
-            audio_filter = f"atempo={speed}"
+            video_filter = f"setpts={1/speed}*PTS"
+        
+        filter_complex = f"[0:v]{video_filter}[v]"
+        maps = ["-map", "[v]"]
+        if audio_mode == "keep":
+            if keep_audio_pitch:
+                # 使用atempo保持音调
+                audio_filter = build_atempo_chain(speed)
+            else:
+                # 简单的音频速度调整
+                audio_filter = f"atempo={speed}"
+            filter_complex += f";[0:a]{audio_filter}[a]"
+            maps.extend(["-map", "[a]"])
+        elif audio_mode == "summary":
+            # 每隔 speed×片段时长 截取一个片段，摘要时长与输出视频一致
+            period = speed * AUDIO_SUMMARY_SNIPPET
+            filter_complex += (
+                f";[0:a]aselect='lt(mod(t,{period:g}),{AUDIO_SUMMARY_SNIPPET:g})',asetpts=N/SR/TB[a]"
+            )
+            maps.extend(["-map", "[a]"])
         
         cmd = [
             "ffmpeg",
+            *input_args,
             "-i", input_path,
-            "-filter_complex", f"[0:v]{video_filter}[v];[0:a]{audio_filter}[a]",
-            "-map", "[v]",
-            "-map", "[a]",
+            "-filter_complex", filter_complex,
+            *maps,
             "-y",
             output_path
         ]
         
+        start = time.perf_counter()
         result = await run_ffmpeg_command(cmd)
+        elapsed = time.perf_counter() - start
         
         if result.returncode == 0:
             speed_desc = "加速" if speed > 1.0 else "减速" if speed < 1.0 else "原速"
-            pitch_info = "（保持音调）" if keep_audio_pitch else "（音调跟随变化）"
+            audio_info = {
+                "keep": "（保持音调）" if keep_audio_pitch else "（音调跟随变化）",
+                "drop": "（无音频）" if has_audio else "（输入无音频）",
+                "summary": "（音频摘要）"
+            }[audio_mode]
             
-            return f"成功调整视频速度！\n输入文件: {input_path}\n输出文件: {output_path}\n速度: {speed}倍 {speed_desc}{pitch_info}"
+            return f"成功调整视频速度！\n输入文件: {input_path}\n输出文件: {output_path}\n速度: {speed}倍 {speed_desc}{audio_info}{mode_info}\n处理耗时: {elapsed:.2f}秒"
         else:
             return f"速度调整失败：{result.stderr}"
             
@@ -1248,11 +1798,20 @@ async def compress_video(
     quality: str = "medium",
     target_size_mb: Optional[int] = None,
     use_hardware_acceleration: bool = False,
-    hwaccel_type: str = "qsv"
+    hwaccel_type: str = "qsv",
+    streaming_mode: str = "none",
+    reencode: bool = False
 ) -> str:
     """
     压缩视频文件
     
+    默认整段编码。配置中设置 job_chunk_seconds 后，长视频（未指定 target_size_mb 时）按该时长分块编码，
+    每完成一块记录到任务日志，服务器意外退出后重启时从最后完成的分块继续；分块时码率控制按块进行、
+    音频单独编码后再拼接，输出的质量和大小与整段编码略有不同。
+    
+    按探测结果选择处理方式：源文件码率已不高于所选质量档位（或已不大于目标大小）时直接复制，
+    音频已是不高于 128kbps 的 AAC 时只重新编码视频。
+    
     Args:
         input_path: 输入视频文件路径
         output_path: 输出视频文件路径（可选）
@@ -1260,6 +1819,8 @@ async def compress_video(
         target_size_mb: 目标文件大小（MB，可选）
         use_hardware_acceleration: 是否使用硬件加速
         hwaccel_type: 硬件加速类型（qsv, nvenc, vaapi等）
+        streaming_mode: MP4封装方式（none, faststart：moov前置, fragmented：分片MP4）
+        reencode: 是否总是重新编码（默认压缩无法明显减小文件时直接复制）
     
     Returns:
         压缩结果信息
@@ -1272,90 +1833,356 @@ async def compress_video(
             input_file = Path(input_path)
             output_path = str(input_file.parent / f"{input_file.stem}_compressed.{input_file.suffix[1:]}")
         
-        # 获取原文件大小
-        original_size_mb = os.path.getsize(input_path) / (1024 * 1024)
-        
-        cmd = ["ffmpeg"]
-        video_codec = "libx264"
-        
-        # 添加硬件加速
-        if use_hardware_acceleration:
-            if hwaccel_type == "qsv":
-                # 检查QSV支持
-                qsv_supported, _ = await check_qsv_support()
-                if not qsv_supported:
-                    return "错误：系统不支持Intel QSV硬件加速"
-                cmd.extend(["-hwaccel", "qsv"])
-                video_codec = "h264_qsv"
-            elif hwaccel_type == "nvenc":
-                cmd.extend(["-hwaccel", "cuda"])
-                video_codec = "h264_nvenc"
-        
-        cmd.extend(["-i", input_path, "-c:v", video_codec, "-preset", "medium"])
-        
-        if target_size_mb:
-            # 根据目标大小计算比特率
-            # 获取视频时长
-            duration_cmd = [
-                "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
-                "-of", "csv=p=0", input_path
-            ]
-            duration_result = await run_ffmpeg_command(duration_cmd)
-            
-            if duration_result.returncode == 0:
-                duration = float(duration_result.stdout.strip())
-                target_bitrate = int((target_size_mb * 8 * 1024) / duration)  # kbps
-                cmd.extend(["-b:v", f"{target_bitrate}k"])
-            else:
-                return f"无法获取视频时长：{duration_result.stderr}"
-        else:
-            # 使用质量设置
-            if "qsv" in video_codec:
-                # QSV编码器使用global_quality
-                quality_map = {
-                    "high": "20",
-                    "medium": "25",
-                    "low": "30"
-                }
-                global_quality = quality_map.get(quality, "25")
-                cmd.extend(["-global_quality", global_quality])
-            elif "nvenc" in video_codec:
-                # NVENC编码器使用cq
-                quality_map = {
-                    "high": "20",
-                    "medium": "25",
-                    "low": "30"
-                }
-                cq_value = quality_map.get(quality, "25")
-                cmd.extend(["-cq", cq_value])
-            else:
-                # 软件编码器使用crf
-                quality_map = {
-                    "high": "20",
-                    "medium": "25",
-                    "low": "30"
-                }
-                crf_value = quality_map.get(quality, "25")
-                cmd.extend(["-crf", crf_value])
-        
-        cmd.extend(["-c:a", "aac", "-b:a", "128k", "-y", output_path])
-        
-        result = await run_ffmpeg_command(cmd)
-        
-        if result.returncode == 0:
-            # 获取压缩后文件大小
-            compressed_size_mb = os.path.getsize(output_path) / (1024 * 1024)
-            compression_ratio = (1 - compressed_size_mb / original_size_mb) * 100
+        streaming_output_args(streaming_mode, output_path)
+        
+        if use_hardware_acceleration and hwaccel_type == "qsv":
+            # 检查QSV支持
+            qsv_supported, _ = await check_qsv_support()
+            if not qsv_supported:
+                return "错误：系统不支持Intel QSV硬件加速"
+        
+        input_args, _, _, profile = plan_compress_video(
+            quality, None, None, use_hardware_acceleration, hwaccel_type
+        )
+        video_codec, hwaccel = profile.codec, input_args[1] if input_args else None
+        report = await preflight.check(
+            output_path, [input_path], video_encoder=video_codec, audio_encoder="aac", hwaccel=hwaccel,
+            expected_bytes=target_size_mb * 1024 * 1024 if target_size_mb else None
+        )
+        if not report.ok:
+            return report.message()
+        
+        params = {
+            "input_path": input_path,
+            "output_path": output_path,
+            "quality": quality,
+            "target_size_mb": target_size_mb,
+            "use_hardware_acceleration": use_hardware_acceleration,
+            "hwaccel_type": hwaccel_type,
+            "streaming_mode": streaming_mode,
+            "reencode": reencode
+        }
+        return await run_journaled_job("compress_video", params)
             
-            accel_info = f"\n硬件加速: {hwaccel_type.upper()}" if use_hardware_acceleration else ""
-            return f"成功压缩视频！\n输入文件: {input_path}\n输出文件: {output_path}\n编码器: {video_codec}\n原始大小: {original_size_mb:.1f}MB\n压缩后大小: {compressed_size_mb:.1f}MB\n压缩率: {compression_ratio:.1f}%\n质量设置: {quality}{accel_info}"
+    except Exception as e:
+        return f"发生错误：{str(e)}"
+
+
+async def compress_video_job(job_id: str, params: dict) -> Tuple[bool, str]:
+    """compress_video 的执行部分：输出先写入临时文件，成功后再重命名"""
+    input_path = params["input_path"]
+    output_path = params["output_path"]
+    quality = params["quality"]
+    target_size_mb = params["target_size_mb"]
+    use_hardware_acceleration = params["use_hardware_acceleration"]
+    hwaccel_type = params["hwaccel_type"]
+    reencode = params.get("reencode", False)
+    streaming_args = streaming_output_args(params["streaming_mode"], output_path)
+    
+    # 获取原文件大小
+    source_bytes = os.path.getsize(input_path)
+    original_size_mb = source_bytes / (1024 * 1024)
+    
+    info = await probe_media(input_path)
+    duration = get_duration(info)
+    if target_size_mb and not duration:
+        return False, f"无法获取视频时长：{input_path}"
+    input_args, video_args, audio_args, profile = plan_compress_video(
+        quality, target_size_mb, duration, use_hardware_acceleration, hwaccel_type
+    )
+    video_codec = profile.codec
+    
+    # 按历史吞吐量预测耗时和大小；续传的任务只编码剩余部分，不记录
+    first_attempt = (await asyncio.to_thread(job_journal.get, job_id))["attempts"] <= 1
+    width, height, fps = video_geometry(info)
+    estimate = await asyncio.to_thread(
+        throughput_store.estimate, profile, width, height, fps, duration or 0.0,
+        target_bytes=target_size_mb * 1024 * 1024 if target_size_mb else None
+    )
+    
+    # 处理方式：压缩无法明显减小文件时直接复制；音频已是不高于目标码率的 AAC 时只重新编码视频
+    muxer = output_muxer(output_path)
+    audio_stream = get_audio_stream(info)
+    skip_reason = None
+    if not reencode:
+        skip_reason = compress_skip_reason(info, source_bytes, muxer, quality, target_size_mb, estimate)
+    audio_copy = None
+    if audio_stream is not None:
+        audio_kbps = stream_bitrate_kbps(audio_stream)
+        audio_copy = skip_reason is not None or (
+            not reencode and can_copy_stream(audio_stream, "aac", muxer)
+            and audio_kbps is not None and audio_kbps <= COMPRESS_AUDIO_KBPS * 1.1
+        )
+    if audio_copy:
+        audio_args = ["-c:a", "copy"]
+    
+    temp_output = job_temp_path(output_path, job_id)
+    await asyncio.to_thread(job_journal.add_temp_paths, job_id, temp_output)
+    
+    chunk_seconds = config.job_chunk_seconds
+    chunk_info = ""
+    start = time.perf_counter()
+    if skip_reason is not None:
+        cmd = ["ffmpeg", "-i", input_path, "-c", "copy", *streaming_args, "-y", temp_output]
+        result = await run_ffmpeg_command(cmd, on_start=job_pid_recorder(job_id))
+        ok, detail = result.returncode == 0, result.stderr
+    elif (
+        chunk_seconds > 0 and not target_size_mb and duration > chunk_seconds * 1.5
+        and get_video_stream(info) is not None
+    ):
+        ok, detail = await encode_video_in_chunks(
+            job_id, input_path, temp_output, duration, chunk_seconds,
+            input_args, video_args, audio_args if get_audio_stream(info) else None, streaming_args
+        )
+        chunk_info = f"\n{detail}" if ok else ""
+    else:
+        cmd = ["ffmpeg", *input_args, "-i", input_path, *video_args, *audio_args, *streaming_args, "-y", temp_output]
+        result = await run_ffmpeg_command(cmd, on_start=job_pid_recorder(job_id))
+        ok, detail = result.returncode == 0, result.stderr
+    
+    elapsed = time.perf_counter() - start
+    
+    if not ok:
+        return False, f"视频压缩失败：{detail}"
+    
+    with span("postprocess"):
+        os.replace(temp_output, output_path)
+        
+        # 获取压缩后文件大小
+        output_bytes = os.path.getsize(output_path)
+        compressed_size_mb = output_bytes / (1024 * 1024)
+        compression_ratio = (1 - compressed_size_mb / original_size_mb) * 100
+        
+        video_copy = skip_reason is not None
+        path_info = f"\n处理方式: {describe_stream_path(video_copy, audio_copy)}，耗时 {elapsed:.2f}秒"
+        if skip_reason is not None:
+            path_info += f"\n原因: {skip_reason}"
+        accel_info = f"\n硬件加速: {hwaccel_type.upper()}" if use_hardware_acceleration and not video_copy else ""
+        layout_info = f"\n{describe_mp4_layout(output_path)}" if streaming_args else ""
+        estimate_info = ""
+        if first_attempt and not video_copy:
+            await asyncio.to_thread(
+                throughput_store.record,
+                "compress_video", profile, width, height, fps, duration or 0.0, elapsed, output_bytes, estimate
+            )
+            estimate_info = describe_estimate_result(estimate, elapsed, output_bytes)
+    codec_info = "直接复制" if video_copy else video_codec
+    return True, f"成功压缩视频！\n输入文件: {input_path}\n输出文件: {output_path}\n编码器: {codec_info}\n原始大小: {original_size_mb:.1f}MB\n压缩后大小: {compressed_size_mb:.1f}MB\n压缩率: {compression_ratio:.1f}%\n质量设置: {quality}{path_info}{accel_info}{chunk_info}{layout_info}{estimate_info}"
+
+
+async def encode_video_in_chunks(
+    job_id: str,
+    input_path: str,
+    temp_output: str,
+    duration: float,
+    chunk_seconds: float,
+    input_args: List[str],
+    video_args: List[str],
+    audio_args: Optional[List[str]],
+    streaming_args: List[str]
+) -> Tuple[bool, str]:
+    """
+    分块编码视频：视频按时间分块编码，音频单独编码一次（避免块边界处的 AAC 前导静音），
+    最后直接复制拼接；已完成的分块记录在任务日志中，续传时跳过
+    
+    Returns:
+        (是否成功, 分块信息或错误信息)
+    """
+    chunk_dir = f"{os.path.splitext(temp_output)[0]}.chunks"
+    await asyncio.to_thread(job_journal.add_temp_paths, job_id, chunk_dir)
+    os.makedirs(chunk_dir, exist_ok=True)
+    completed = await asyncio.to_thread(job_journal.completed_chunks, job_id)
+    on_start = job_pid_recorder(job_id)
+    
+    steps = []
+    chunk_paths = []
+    for i in range(math.ceil(duration / chunk_seconds)):
+        path = os.path.join(chunk_dir, f"video_{i:04d}.mkv")
+        chunk_paths.append(path)
+        steps.append((f"video_{i:04d}", path, [
+            "ffmpeg", *input_args, "-ss", f"{i * chunk_seconds:.3f}", "-i", input_path,
+            "-t", f"{chunk_seconds:.3f}", "-map", "0:v:0", "-an", "-sn", *video_args
+        ]))
+    audio_path = os.path.join(chunk_dir, "audio.m4a")
+    if audio_args is not None:
+        steps.append(("audio", audio_path, ["ffmpeg", "-i", input_path, "-map", "0:a:0", "-vn", "-sn", *audio_args]))
+    
+    skipped = 0
+    for name, path, cmd in steps:
+        if completed.get(name) == path:
+            skipped += 1
+            continue
+        part_path = f"{path}.part{os.path.splitext(path)[1]}"
+        result = await run_ffmpeg_command([*cmd, "-y", part_path], on_start=on_start)
+        if result.returncode != 0:
+            return False, result.stderr
+        os.replace(part_path, path)
+        await asyncio.to_thread(job_journal.complete_chunk, job_id, name, path)
+    
+    list_file = os.path.join(chunk_dir, "chunks.txt")
+    with open(list_file, "w") as f:
+        for path in chunk_paths:
+            f.write(f"file '{path}'\n")
+    cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_file]
+    if audio_args is not None:
+        cmd.extend(["-i", audio_path, "-map", "0:v", "-map", "1:a"])
+    cmd.extend(["-c", "copy", *streaming_args, "-y", temp_output])
+    result = await run_ffmpeg_command(cmd, on_start=on_start)
+    if result.returncode != 0:
+        return False, result.stderr
+    
+    resume_info = f"，续传跳过 {skipped} 块" if skipped else ""
+    return True, f"分块编码: {len(chunk_paths)} 块 × {chunk_seconds:g}秒{resume_info}"
+
+
+JOB_HANDLERS = {
+    "compress_video": compress_video_job,
+    "merge_videos": merge_videos_job,
+}
+
+
+def job_pid_recorder(job_id: str) -> Callable[[int], Awaitable[None]]:
+    """把任务当前 FFmpeg 进程的 pid 写入任务日志，服务器意外退出后可据此结束残留进程"""
+    async def record_pid(pid: int) -> None:
+        await asyncio.to_thread(job_journal.set_pid, job_id, pid)
+    return record_pid
+
+
+async def run_journaled_job(kind: str, params: dict, job_id: Optional[str] = None) -> str:
+    """先把任务写入任务日志再执行；job_id 为已有任务时（重启后重新排队）继续执行该任务"""
+    if job_id is None:
+        job_id = await asyncio.to_thread(job_journal.begin, kind, params, params.get("output_path"))
+    message = await job_journal.run(job_id, lambda: JOB_HANDLERS[kind](job_id, params))
+    return f"{message}\n任务: {job_id}"
+
+
+@mcp.tool()
+async def estimate_job(
+    input_path: str,
+    kind: str = "compress_video",
+    quality: str = "medium",
+    target_size_mb: Optional[int] = None,
+    video_codec: str = "libx264",
+    audio_codec: str = "aac",
+    use_hardware_acceleration: bool = False,
+    hwaccel_type: str = "qsv",
+    method: str = "auto",
+    sample_seconds: float = 5.0
+) -> str:
+    """
+    预测压缩或格式转换任务的耗时和输出大小
+    
+    优先按本机的编码吞吐量历史预测；没有历史记录时从视频中间试编码几秒再线性外推，
+    试编码结果也会记入历史。参数与 compress_video / convert_video_format 相同。
+    
+    Args:
+        input_path: 输入视频文件路径
+        kind: 任务类型（compress_video, convert_video_format）
+        quality: 质量（high, medium, low）
+        target_size_mb: 目标文件大小（MB，仅 compress_video）
+        video_codec: 视频编码器（仅 convert_video_format）
+        audio_codec: 音频编码器（仅 convert_video_format）
+        use_hardware_acceleration: 是否使用硬件加速
+        hwaccel_type: 硬件加速类型（qsv, nvenc）
+        method: 预测方式（auto：有历史用历史否则试编码, history：只用历史, sample：总是试编码）
+        sample_seconds: 试编码时长（秒）
+    
+    Returns:
+        预测结果和历史预测误差
+    """
+    try:
+        if not os.path.exists(input_path):
+            return f"错误：输入文件不存在 - {input_path}"
+        if kind not in ("compress_video", "convert_video_format"):
+            return "错误：任务类型必须是 compress_video 或 convert_video_format"
+        if method not in ("auto", "history", "sample"):
+            return "错误：预测方式必须是 auto、history 或 sample"
+        
+        info = await probe_media(input_path)
+        duration = get_duration(info)
+        width, height, fps = video_geometry(info)
+        if not duration or not width:
+            return f"错误：无法获取视频时长或分辨率：{input_path}"
+        
+        target_bytes = None
+        if kind == "compress_video":
+            input_args, video_args, audio_args, profile = plan_compress_video(
+                quality, target_size_mb, duration, use_hardware_acceleration, hwaccel_type
+            )
+            target_bytes = target_size_mb * 1024 * 1024 if target_size_mb else None
         else:
-            return f"视频压缩失败：{result.stderr}"
+            input_args, video_args, audio_args, profile = plan_convert_video(
+                video_codec, audio_codec, quality, use_hardware_acceleration, hwaccel_type
+            )
+        
+        estimate = None
+        if method != "sample":
+            estimate = await asyncio.to_thread(
+                throughput_store.estimate, profile, width, height, fps, duration, target_bytes
+            )
+        if estimate is None and method == "history":
+            return f"没有 {profile.codec}（{profile.hardware}）的编码历史，可使用 method=sample 试编码"
+        
+        if estimate is None:
+            # 从中间取一段试编码，避开片头片尾的黑场
+            sample_duration = min(sample_seconds, duration)
+            sample_start = max(0.0, duration / 2 - sample_duration / 2)
+            if not get_audio_stream(info):
+                audio_args = ["-an"]
+            with tempfile.TemporaryDirectory(prefix="estimate_", dir=config.cache_dir) as work_dir:
+                sample_path = os.path.join(work_dir, "sample.mkv")
+                cmd = [
+                    "ffmpeg", *input_args, "-ss", f"{sample_start:.3f}", "-t", f"{sample_duration:.3f}",
+                    "-i", input_path, *video_args, *audio_args, "-y", sample_path
+                ]
+                start = time.perf_counter()
+                result = await run_ffmpeg_command(cmd)
+                sample_elapsed = time.perf_counter() - start
+                if result.returncode != 0:
+                    return f"试编码失败：{result.stderr}"
+                sample_bytes = os.path.getsize(sample_path)
+            await asyncio.to_thread(
+                throughput_store.record,
+                kind, profile, width, height, fps, sample_duration, sample_elapsed, sample_bytes, source="sample"
+            )
+            estimate = ThroughputStore.estimate_from_sample(
+                duration, sample_duration, sample_elapsed, sample_bytes, target_bytes
+            )
+        
+        report = (
+            f"任务预测: {kind}\n输入文件: {input_path}（{width}x{height}，{fps:g}fps，{format_seconds(duration)}）"
+            f"\n编码方式: {profile.codec}，预设 {profile.preset or '默认'}，{profile.quality}，{profile.hardware}"
+            f"\n{estimate.describe()}"
+        )
+        accuracy = await asyncio.to_thread(throughput_store.accuracy, profile)
+        if accuracy:
+            report += (
+                f"\n历史预测误差（最近 {accuracy['count']} 个任务的中位数）: "
+                f"耗时 {accuracy['seconds_error'] * 100:.0f}%，大小 {accuracy['bytes_error'] * 100:.0f}%"
+            )
+        return report
             
     except Exception as e:
         return f"发生错误：{str(e)}"
 
 
+register_scene_tools(mcp, config)
+register_preview_tools(mcp)
+register_waveform_tools(mcp, config)
+register_frame_tools(mcp)
+register_silence_tools(mcp, config)
+register_segment_tools(mcp)
+register_stream_tools(mcp, config)
+register_library_tools(mcp, config)
+register_watch_tools(mcp, config)
+register_job_tools(mcp, job_journal)
+register_proxy_tools(mcp)
+register_loudness_tools(mcp, loudness_cache)
+register_fingerprint_tools(mcp, config)
+register_video_hash_tools(mcp, config)
+register_analysis_tools(mcp, config)
+
+
 def main():
     mcp.run(transport="stdio")
 
@@ -2,7 +2,9 @@
 服务器配置类
 """
 
+import os
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Optional
 
 
@@ -27,6 +29,72 @@ class ServerConfig:
     host: str = "localhost"
     port: Optional[int] = None  # stdio 模式下不需要端口
     
+    # 缓存配置（场景索引等按文件标识缓存的分析结果）
+    cache_dir: str = os.environ.get(
+        "FFMPEG_MCP_CACHE_DIR", str(Path.home() / ".cache" / "ffmpeg_mcp")
+    )
+    
+    # 线程预算：在并发的 FFmpeg 进程间划分 CPU 核心
+    thread_budget: bool = True
+    max_cpus: Optional[int] = None  # 可用核心数上限，None 表示全部
+    pin_cpus: bool = False  # 是否把每个任务绑定到互不重叠的 CPU 集合（仅 Linux）
+    
+    # 管道流式处理：单个输出流的内存上限约为 块大小 × 缓冲块数 + 2 × 管道缓冲区
+    pipe_buffer_size: int = 1 << 20  # 标准输出管道缓冲区（字节）
+    stream_chunk_size: int = 256 * 1024  # 每块大小（字节）
+    stream_max_buffered_chunks: int = 8  # 每个流最多缓冲的块数
+    stream_read_timeout: float = 30.0  # 资源读取等待新数据的最长秒数
+    stream_idle_timeout: float = 300.0  # 超过该时间未访问的流会被关闭
+    
+    # 远程输入缓存：HTTP(S) 输入按块缓存到 cache_dir/http，只下载 FFmpeg 实际读取的范围
+    http_cache: bool = True
+    http_cache_max_mb: int = 2048  # 缓存总量上限，超过后按最近访问时间淘汰
+    http_cache_block_size: int = 1 << 20  # 缓存块大小（字节）
+    
+    # 进程内引擎：安装 PyAV 时探测、关键帧截图和短片段复用在线程池中调用 libav，省去进程启动开销
+    inprocess_engine: bool = os.environ.get("FFMPEG_MCP_INPROCESS_ENGINE", "1") != "0"  # 环境变量设为 0 时关闭
+    inprocess_workers: int = 4  # 线程池大小
+    inprocess_max_remux_seconds: float = 60.0  # 不超过该时长的直接复制切割使用进程内引擎
+    
+    # 媒体库目录：扫描结果保存在 cache_dir/library.db
+    catalog_workers: int = 8  # 扫描时的并发探测数
+    
+    # 监视文件夹：Linux 上使用 inotify，不可用时按间隔轮询
+    watch_max_concurrent: int = 2  # 每个监视任务同时处理的文件数
+    watch_settle_seconds: float = 1.0  # 最后一次写入后等待的秒数
+    watch_poll_interval: float = 2.0  # 轮询间隔（秒）
+    
+    # 任务日志：compress_video / merge_videos 记录在 cache_dir/jobs.db，服务器意外退出后重启时恢复
+    job_recovery_policy: str = "requeue"  # requeue：重新排队（分块任务从最后完成的分块继续），fail：标记失败
+    job_max_attempts: int = 3  # 同一任务最多执行的次数，超过后不再重新排队
+    # 长视频压缩的分块时长（秒），0 表示不分块（默认）；分块后码率控制按块进行、音频单独编码再拼接，
+    # 输出质量和大小会与整段编码不同，指定 target_size_mb 时总是整段编码
+    job_chunk_seconds: float = 0.0
+    
+    # 代理文件：大尺寸视频生成一次低分辨率副本（cache_dir/proxies），预览工具在输出尺寸允许时读取代理
+    proxy_enabled: bool = True
+    proxy_build_mode: str = "background"  # background：首次预览读原片并在后台生成，wait：首次预览等待生成，off：只用已有代理
+    proxy_short_side: int = 480  # 代理文件短边像素
+    proxy_gop_seconds: float = 0.5  # 代理文件关键帧间隔（秒）
+    proxy_min_source_short_side: int = 720  # 源视频短边不小于该值时才生成代理
+    proxy_max_mb: int = 10240  # 代理文件总量上限，超过后按最近使用时间淘汰
+    
+    # 编码前预检：FFmpeg 能力表缓存在 cache_dir/capabilities.json
+    preflight_free_space_margin_mb: int = 64  # 除预计输出大小外，输出磁盘还需保留的空间
+    
+    # 调用追踪：采样的工具调用按 OpenTelemetry OTLP/JSON 格式写入 JSONL（每行一个 trace）
+    trace_sample_rate: float = float(os.environ.get("FFMPEG_MCP_TRACE_SAMPLE_RATE", "0"))  # 采样比例（0-1），0 表示关闭
+    trace_path: Optional[str] = None  # 默认 cache_dir/traces.jsonl
+    trace_max_mb: int = 100  # 超过后轮转为 traces.jsonl.1
+
+    # 音频指纹：指纹保存在 cache_dir/fingerprints.db
+    fingerprint_workers: int = 4  # 同时解码计算指纹的文件数
+    fingerprint_seconds: float = 120.0  # 每个文件分析开头的时长（秒）
+
+    # 视频感知哈希：签名保存在 cache_dir/video_hashes.db
+    video_hash_workers: int = 4  # 同时解码关键帧的文件数
+    video_hash_max_keyframes: int = 300  # 每个文件最多保留的关键帧（超过时均匀抽取）
+    
     @classmethod
     def get_default_config(cls) -> "ServerConfig":
         """获取默认配置"""
@@ -0,0 +1,321 @@
+"""
+核心模块
+包含 FFmpeg 进程调用、管道流、文件标识和缓存等基础设施
+"""
+
+from .runner import run_ffmpeg_command, stream_ffmpeg_log, stream_ffmpeg_output, spawn_ffmpeg_process
+from .thread_budget import ThreadBudget, ThreadAllocation, configure_thread_budget, get_thread_budget
+from .file_identity import FileIdentity, get_file_identity
+from .index_cache import FileIndexCache
+from .engine import (
+    MediaEngine,
+    SubprocessEngine,
+    PyAVEngine,
+    EngineRouter,
+    configure_engines,
+    get_engine_router,
+    inprocess_available,
+)
+from .probe import (
+    probe_media,
+    get_streams,
+    get_video_stream,
+    get_audio_stream,
+    get_duration,
+    get_frame_rate,
+    get_rotation,
+    get_display_size,
+    estimate_keyframe_interval,
+)
+from .pool import gather_bounded
+from .frame_reader import RawFrameReader, probe_video_size
+from .segmenter import run_segment_muxer, parse_segment_list
+from .encoding import (
+    COMPRESS_AUDIO_KBPS,
+    COMPRESS_QUALITY,
+    CONVERT_QUALITY,
+    compress_audio_args,
+    compress_video_args,
+    convert_video_args,
+    quality_args,
+    quality_value,
+)
+from .mp4_layout import (
+    STREAMING_MODES,
+    is_mp4_output,
+    streaming_output_args,
+    inspect_mp4_layout,
+    describe_mp4_layout,
+)
+from .pipes import (
+    PIPE_FORMATS,
+    STREAM_URI_PREFIX,
+    MediaStream,
+    StreamRegistry,
+    pipe_output_args,
+    set_pipe_buffer_size,
+)
+from .http_cache import (
+    RemoteInputCache,
+    configure_http_cache,
+    get_http_cache,
+    is_remote_url,
+    resolve_input,
+)
+from .catalog import (
+    CODEC_ALIASES,
+    GROUP_COLUMNS,
+    MEDIA_EXTENSIONS,
+    MediaCatalog,
+    file_fingerprint,
+    path_prefix_range,
+    scan_directory,
+    walk_media_files,
+)
+from .watch_folder import (
+    WATCH_BACKENDS,
+    WATCH_PROFILES,
+    InotifyWatcher,
+    WatchFolder,
+    WatchJob,
+    inotify_available,
+)
+from .job_journal import (
+    JOB_STATES,
+    RECOVERY_POLICIES,
+    JobJournal,
+    job_temp_path,
+)
+from .proxy import (
+    PROXY_BUILD_MODES,
+    ProxyCache,
+    configure_proxy_cache,
+    get_proxy_cache,
+    resolve_preview_input,
+)
+from .preflight import (
+    EXTENSION_MUXERS,
+    MUXER_CODECS,
+    FFmpegCapabilities,
+    Preflight,
+    PreflightReport,
+    parse_bitrate_kbps,
+)
+from .throughput import (
+    EncodeEstimate,
+    EncodeProfile,
+    ThroughputStore,
+    format_seconds,
+)
+from .tracing import (
+    Tracer,
+    configure_tracer,
+    current_span,
+    get_tracer,
+    instrument_tools,
+    span,
+    traced,
+)
+from .loudness import (
+    DEFAULT_TARGET_I,
+    DEFAULT_TARGET_LRA,
+    DEFAULT_TARGET_TP,
+    TARGET_I_RANGE,
+    TARGET_LRA_RANGE,
+    TARGET_TP_RANGE,
+    LoudnessCache,
+    LoudnessMeasurement,
+    gain_to_target,
+    loudnorm_filter,
+    parse_loudnorm_json,
+    peak_limiter_filter,
+)
+from .remux import (
+    can_copy_stream,
+    describe_stream_path,
+    output_muxer,
+    stream_bitrate_kbps,
+)
+from .audio_fingerprint import (
+    DEFAULT_FINGERPRINT_SECONDS,
+    DEFAULT_MAX_BIT_ERROR,
+    DEFAULT_MIN_OVERLAP_SECONDS,
+    AudioFingerprint,
+    FingerprintMatch,
+    FingerprintStore,
+    compute_audio_fingerprint,
+    find_fingerprint_matches,
+    group_matches,
+    update_fingerprints,
+)
+from .video_hash import (
+    DEFAULT_MAX_DISTANCE,
+    DEFAULT_MIN_MATCH_RATIO,
+    VIDEO_EXTENSIONS,
+    MultiIndexHashTable,
+    VideoHashStore,
+    VideoMatch,
+    VideoSignature,
+    compute_video_signature,
+    find_video_matches,
+    hamming_distance,
+    perceptual_hashes,
+    update_video_hashes,
+)
+from .media_analysis import (
+    AUDIO_DETECTORS,
+    DETECTORS,
+    VIDEO_DETECTORS,
+    AnalysisOptions,
+    MediaAnalysisCache,
+    MediaTimeline,
+    TimelineEvent,
+)
+from .timecode import parse_timecode, format_timecode, parse_duration_from_log
+
+__all__ = [
+    "run_ffmpeg_command",
+    "stream_ffmpeg_log",
+    "stream_ffmpeg_output",
+    "spawn_ffmpeg_process",
+    "ThreadBudget",
+    "ThreadAllocation",
+    "configure_thread_budget",
+    "get_thread_budget",
+    "FileIdentity",
+    "get_file_identity",
+    "FileIndexCache",
+    "MediaEngine",
+    "SubprocessEngine",
+    "PyAVEngine",
+    "EngineRouter",
+    "configure_engines",
+    "get_engine_router",
+    "inprocess_available",
+    "probe_media",
+    "get_streams",
+    "get_video_stream",
+    "get_audio_stream",
+    "get_duration",
+    "get_frame_rate",
+    "get_rotation",
+    "get_display_size",
+    "estimate_keyframe_interval",
+    "gather_bounded",
+    "RawFrameReader",
+    "probe_video_size",
+    "run_segment_muxer",
+    "parse_segment_list",
+    "COMPRESS_AUDIO_KBPS",
+    "COMPRESS_QUALITY",
+    "CONVERT_QUALITY",
+    "compress_audio_args",
+    "compress_video_args",
+    "convert_video_args",
+    "quality_args",
+    "quality_value",
+    "STREAMING_MODES",
+    "is_mp4_output",
+    "streaming_output_args",
+    "inspect_mp4_layout",
+    "describe_mp4_layout",
+    "PIPE_FORMATS",
+    "STREAM_URI_PREFIX",
+    "MediaStream",
+    "StreamRegistry",
+    "pipe_output_args",
+    "set_pipe_buffer_size",
+    "RemoteInputCache",
+    "configure_http_cache",
+    "get_http_cache",
+    "is_remote_url",
+    "resolve_input",
+    "MEDIA_EXTENSIONS",
+    "CODEC_ALIASES",
+    "GROUP_COLUMNS",
+    "MediaCatalog",
+    "file_fingerprint",
+    "path_prefix_range",
+    "scan_directory",
+    "walk_media_files",
+    "WATCH_BACKENDS",
+    "WATCH_PROFILES",
+    "InotifyWatcher",
+    "WatchFolder",
+    "WatchJob",
+    "inotify_available",
+    "JOB_STATES",
+    "RECOVERY_POLICIES",
+    "JobJournal",
+    "job_temp_path",
+    "PROXY_BUILD_MODES",
+    "ProxyCache",
+    "configure_proxy_cache",
+    "get_proxy_cache",
+    "resolve_preview_input",
+    "EXTENSION_MUXERS",
+    "MUXER_CODECS",
+    "FFmpegCapabilities",
+    "Preflight",
+    "PreflightReport",
+    "parse_bitrate_kbps",
+    "EncodeEstimate",
+    "EncodeProfile",
+    "ThroughputStore",
+    "format_seconds",
+    "Tracer",
+    "configure_tracer",
+    "current_span",
+    "get_tracer",
+    "instrument_tools",
+    "span",
+    "traced",
+    "DEFAULT_TARGET_I",
+    "DEFAULT_TARGET_LRA",
+    "DEFAULT_TARGET_TP",
+    "TARGET_I_RANGE",
+    "TARGET_LRA_RANGE",
+    "TARGET_TP_RANGE",
+    "LoudnessCache",
+    "LoudnessMeasurement",
+    "gain_to_target",
+    "loudnorm_filter",
+    "parse_loudnorm_json",
+    "peak_limiter_filter",
+    "can_copy_stream",
+    "describe_stream_path",
+    "output_muxer",
+    "stream_bitrate_kbps",
+    "DEFAULT_FINGERPRINT_SECONDS",
+    "DEFAULT_MAX_BIT_ERROR",
+    "DEFAULT_MIN_OVERLAP_SECONDS",
+    "AudioFingerprint",
+    "FingerprintMatch",
+    "FingerprintStore",
+    "compute_audio_fingerprint",
+    "find_fingerprint_matches",
+    "group_matches",
+    "update_fingerprints",
+    "DEFAULT_MAX_DISTANCE",
+    "DEFAULT_MIN_MATCH_RATIO",
+    "VIDEO_EXTENSIONS",
+    "MultiIndexHashTable",
+    "VideoHashStore",
+    "VideoMatch",
+    "VideoSignature",
+    "compute_video_signature",
+    "find_video_matches",
+    "hamming_distance",
+    "perceptual_hashes",
+    "update_video_hashes",
+    "AUDIO_DETECTORS",
+    "DETECTORS",
+    "VIDEO_DETECTORS",
+    "AnalysisOptions",
+    "MediaAnalysisCache",
+    "MediaTimeline",
+    "TimelineEvent",
+    "parse_timecode",
+    "format_timecode",
+    "parse_duration_from_log",
+]
@@ -0,0 +1,449 @@
+"""
+音频指纹
+FFmpeg 把第一条音频流解码为 11025Hz 单声道 PCM 经管道分块读出，每块用 NumPy 批量加窗、FFT，
+按对数分布的 33 个频带计算能量并在时间上平滑，再由相邻频带、前后帧的能量差符号得到每帧一个 32 位子指纹
+（Philips/Haitsma 方案，与 chromaprint 同类）。内存占用与音频长度无关，重新编码、改变音量、
+降低码率后对齐的子指纹误码率通常低于 0.25，不同内容约为 0.5。
+
+指纹按路径存入 SQLite（cache_dir/fingerprints.db），大小和修改时间未变化的文件不再重新解码。
+查找重复时把全部子指纹与 (文件, 帧位置) 一起排序构成倒排索引：同一子指纹出现在两个文件中即为
+候选，候选按对齐偏移投票，票数足够的文件对再按对齐后的误码率确认。
+"""
+
+import asyncio
+import contextlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .pool import gather_bounded
+from .runner import stream_ffmpeg_output
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+# 分析参数：每帧约 0.37 秒，帧移约 0.093 秒
+FINGERPRINT_SAMPLE_RATE = 11025
+FRAME_SIZE = 4096
+HOP_SIZE = 1024
+BAND_COUNT = 33  # 33 个频带的能量差得到 32 位
+BAND_RANGE = (300.0, 2000.0)  # Hz
+SMOOTH_FRAMES = 4  # 频带能量按相邻 4 帧（约 0.65 秒）求和
+
+# 默认只分析开头的时长（秒），重复检测通常不需要整个文件
+DEFAULT_FINGERPRINT_SECONDS = 120.0
+
+# 每次从管道读取的字节数（16位单声道 PCM 即 128K 个采样，约 12 秒）
+PCM_CHUNK_BYTES = 1 << 18
+
+# 匹配参数
+DEFAULT_MAX_BIT_ERROR = 0.35  # 对齐后误码率不超过该值视为同一内容
+DEFAULT_MIN_OVERLAP_SECONDS = 10.0  # 至少需要的重叠时长
+MIN_OFFSET_VOTES = 2  # 同一对齐偏移上至少需要的相同子指纹数
+MAX_POSTINGS = 32  # 出现次数超过该值的子指纹（静音、常见音型）不参与候选
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audio_fingerprints (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    max_seconds REAL,
+    duration REAL,
+    frames INTEGER,
+    codes BLOB,
+    error TEXT,
+    created REAL
+);
+"""
+
+# SQLite 单条语句的参数个数上限以内的批量大小
+_QUERY_BATCH_SIZE = 500
+
+
+def frames_to_seconds(frames: float) -> float:
+    return frames * HOP_SIZE / FINGERPRINT_SAMPLE_RATE
+
+
+def seconds_to_frames(seconds: float) -> int:
+    return int(seconds * FINGERPRINT_SAMPLE_RATE / HOP_SIZE)
+
+
+class SpectralFingerprinter:
+    """流式计算子指纹：每次输入一块 PCM，返回这一块新产生的子指纹，跨块的帧由缓存的尾部采样和能量补齐"""
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("音频指纹需要安装 numpy（uv sync --extra analysis）")
+        self.window = np.hanning(FRAME_SIZE).astype(np.float32)
+        freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / FINGERPRINT_SAMPLE_RATE)
+        edges = np.searchsorted(freqs, np.geomspace(BAND_RANGE[0], BAND_RANGE[1], BAND_COUNT + 1))
+        self.first_bin = int(edges[0])
+        self.last_bin = int(edges[-1])
+        self.band_starts = edges[:-1] - self.first_bin
+        self.carry = np.empty(0, dtype=np.float32)
+        self.energy_tail = np.empty((0, BAND_COUNT))  # 最近 SMOOTH_FRAMES - 1 帧的频带能量
+        self.diff_tail = np.empty((0, BAND_COUNT - 1))  # 最近 SMOOTH_FRAMES 帧的相邻频带能量差
+
+    def feed(self, samples) -> "np.ndarray":
+        buffer = np.concatenate((self.carry, samples.astype(np.float32)))
+        count = (len(buffer) - FRAME_SIZE) // HOP_SIZE + 1
+        if count <= 0:
+            self.carry = buffer
+            return np.empty(0, dtype=np.uint32)
+
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, FRAME_SIZE)[::HOP_SIZE][:count] * self.window
+        spectrum = np.fft.rfft(frames, axis=1)[:, self.first_bin:self.last_bin]
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        energy = np.concatenate((self.energy_tail, np.add.reduceat(power, self.band_starts, axis=1)))
+        self.carry = buffer[count * HOP_SIZE:]
+        self.energy_tail = energy[-(SMOOTH_FRAMES - 1):]
+        if len(energy) < SMOOTH_FRAMES:
+            return np.empty(0, dtype=np.uint32)
+
+        # 能量在时间上取滑动和后再做差分，对帧边界不对齐（截取片段、起点不同）不敏感
+        smoothed = np.lib.stride_tricks.sliding_window_view(energy, SMOOTH_FRAMES, axis=0).sum(axis=-1)
+        diff = np.concatenate((self.diff_tail, smoothed[:, :-1] - smoothed[:, 1:]))
+        self.diff_tail = diff[-SMOOTH_FRAMES:]
+        bits = (diff[SMOOTH_FRAMES:] - diff[:-SMOOTH_FRAMES]) > 0
+        return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+
+
+@dataclass
+class AudioFingerprint:
+    """一个文件的指纹：codes 为每帧一个 uint32 子指纹"""
+
+    codes: "np.ndarray"
+    duration: float  # 实际分析的时长（秒）
+
+    @property
+    def frames(self) -> int:
+        return len(self.codes)
+
+
+async def compute_audio_fingerprint(path: str, max_seconds: float = DEFAULT_FINGERPRINT_SECONDS) -> AudioFingerprint:
+    """解码第一条音频流的前 max_seconds 秒并计算指纹（FFT 在线程池中执行，不阻塞事件循环）"""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-v", "error",
+        "-i", path,
+        "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-t", f"{max_seconds:g}",
+        "-ac", "1", "-ar", str(FINGERPRINT_SAMPLE_RATE),
+        "-f", "s16le", "-acodec", "pcm_s16le", "-"
+    ]
+    fingerprinter = SpectralFingerprinter()
+    parts = []
+    samples = 0
+    try:
+        async for chunk in stream_ffmpeg_output(cmd, PCM_CHUNK_BYTES):
+            pcm = np.frombuffer(chunk[:len(chunk) // 2 * 2], dtype="<i2")
+            samples += len(pcm)
+            parts.append(await asyncio.to_thread(fingerprinter.feed, pcm))
+    except RuntimeError as e:
+        if "matches no streams" in str(e):
+            raise RuntimeError("没有音频流") from e
+        raise
+    if samples == 0:
+        raise RuntimeError("没有解码出音频")
+    codes = np.concatenate(parts) if parts else np.empty(0, dtype=np.uint32)
+    return AudioFingerprint(codes=codes, duration=samples / FINGERPRINT_SAMPLE_RATE)
+
+
+def bit_error_rate(a, b, offset: int) -> Tuple[float, int]:
+    """
+    按偏移对齐后的误码率（a 的第 i 帧对应 b 的第 i - offset 帧），全零子指纹（数字静音）不计入
+
+    Returns:
+        (误码率, 参与比较的帧数)
+    """
+    start_a = max(0, offset)
+    start_b = max(0, -offset)
+    length = min(len(a) - start_a, len(b) - start_b)
+    if length <= 0:
+        return 1.0, 0
+    x = a[start_a:start_a + length]
+    y = b[start_b:start_b + length]
+    audible = (x != 0) & (y != 0)
+    overlap = int(audible.sum())
+    if overlap == 0:
+        return 1.0, 0
+    errors = np.unpackbits(np.bitwise_xor(x[audible], y[audible]).view(np.uint8)).sum()
+    return float(errors) / (32 * overlap), overlap
+
+
+@dataclass
+class FingerprintMatch:
+    """两个文件的匹配结果（offset 为 a 相对 b 的帧偏移，正数表示 b 的内容从 a 的 offset 帧处开始）"""
+
+    a: str
+    b: str
+    offset: int
+    bit_error: float
+    overlap: int  # 参与比较的帧数
+
+    @property
+    def similarity(self) -> float:
+        return 1.0 - self.bit_error
+
+    @property
+    def offset_seconds(self) -> float:
+        return frames_to_seconds(self.offset)
+
+    @property
+    def overlap_seconds(self) -> float:
+        return frames_to_seconds(self.overlap)
+
+
+def _candidate_pairs(fingerprints: Sequence) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    倒排索引：全部子指纹按值排序后，值相同的相邻条目来自不同文件即构成候选；
+    每个 (文件a, 文件b, 偏移) 统计相同子指纹的个数
+
+    Returns:
+        (文件a序号, 文件b序号, 偏移, 票数)，每个文件对只保留票数最多的偏移
+    """
+    lengths = np.array([len(codes) for codes in fingerprints], dtype=np.int64)
+    empty = np.empty(0, dtype=np.int64)
+    if lengths.sum() == 0:
+        return empty, empty, empty, empty
+    starts = np.cumsum(lengths) - lengths
+    codes = np.concatenate(fingerprints)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    files = (np.searchsorted(starts, order, side="right") - 1).astype(np.int32)
+    positions = (order - starts[files]).astype(np.int32)
+    del order
+
+    # 去掉全零（数字静音）和出现过于频繁的子指纹
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    group_sizes = np.diff(np.concatenate(([0], boundaries, [len(codes)])))
+    keep = np.repeat(group_sizes <= MAX_POSTINGS, group_sizes) & (codes != 0)
+    codes, files, positions = codes[keep], files[keep], positions[keep]
+
+    pair_a, pair_b, offsets = [], [], []
+    for distance in range(1, MAX_POSTINGS):
+        same = (codes[:-distance] == codes[distance:]) & (files[:-distance] != files[distance:])
+        if not same.any():
+            if not (codes[:-distance] == codes[distance:]).any():
+                break
+            continue
+        index = np.flatnonzero(same)
+        a, b = files[index].astype(np.int64), files[index + distance].astype(np.int64)
+        offset = positions[index].astype(np.int64) - positions[index + distance]
+        swap = a > b
+        pair_a.append(np.where(swap, b, a))
+        pair_b.append(np.where(swap, a, b))
+        offsets.append(np.where(swap, -offset, offset))
+    if not pair_a:
+        return empty, empty, empty, empty
+
+    span = int(lengths.max())
+    pair_key = np.concatenate(pair_a) * len(fingerprints) + np.concatenate(pair_b)
+    combined, votes = np.unique(pair_key * (2 * span + 1) + np.concatenate(offsets) + span, return_counts=True)
+    pair_key, offset = np.divmod(combined, 2 * span + 1)
+    offset -= span
+
+    # 每个文件对取票数最多的偏移
+    order = np.lexsort((votes, pair_key))
+    pair_key, offset, votes = pair_key[order], offset[order], votes[order]
+    last = np.append(pair_key[1:] != pair_key[:-1], True)
+    pair_key, offset, votes = pair_key[last], offset[last], votes[last]
+    a, b = np.divmod(pair_key, len(fingerprints))
+    return a, b, offset, votes
+
+
+def find_fingerprint_matches(
+    fingerprints: Dict[str, "np.ndarray"],
+    max_bit_error: float = DEFAULT_MAX_BIT_ERROR,
+    min_overlap_seconds: float = DEFAULT_MIN_OVERLAP_SECONDS,
+    query: Optional[Iterable[str]] = None
+) -> List[FingerprintMatch]:
+    """
+    在一组指纹中查找内容相同或包含关系的文件对
+
+    Args:
+        fingerprints: 路径 -> 子指纹数组
+        max_bit_error: 对齐后允许的最大误码率
+        min_overlap_seconds: 至少需要的重叠时长（较短文件不足该时长时要求完整重叠）
+        query: 只返回至少一方属于该集合的文件对（用于新增文件与已有指纹库比较）
+    """
+    if np is None:
+        raise RuntimeError("音频指纹需要安装 numpy（uv sync --extra analysis）")
+    paths = list(fingerprints)
+    arrays = [np.asarray(fingerprints[path], dtype=np.uint32) for path in paths]
+    a, b, offsets, votes = _candidate_pairs(arrays)
+
+    candidates = votes >= MIN_OFFSET_VOTES
+    if query is not None:
+        query = set(query)
+        wanted = np.array([path in query for path in paths], dtype=bool)
+        candidates &= wanted[a] | wanted[b]
+
+    min_overlap = seconds_to_frames(min_overlap_seconds)
+    matches = []
+    for i, j, offset in zip(a[candidates], b[candidates], offsets[candidates]):
+        # 相邻帧位置的子指纹也可能偶然相同，在票数最多的偏移附近取误码率最低者
+        best = min(bit_error_rate(arrays[i], arrays[j], int(offset) + delta) + (int(offset) + delta,)
+                   for delta in (-1, 0, 1))
+        bit_error, overlap, offset = best
+        required = min(min_overlap, int(0.8 * min(len(arrays[i]), len(arrays[j]))))
+        if bit_error <= max_bit_error and overlap >= max(required, 1):
+            matches.append(FingerprintMatch(paths[i], paths[j], offset, bit_error, overlap))
+    matches.sort(key=lambda m: m.bit_error)
+    return matches
+
+
+def group_matches(matches: Iterable) -> List[List[str]]:
+    """把匹配的文件对（带 a、b 两个路径属性）合并为重复组（并查集），每组按路径排序，组按大小降序"""
+    parent: Dict[str, str] = {}
+
+    def find(item: str) -> str:
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for match in matches:
+        root_a, root_b = find(match.a), find(match.b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[str, List[str]] = {}
+    for item in parent:
+        groups.setdefault(find(item), []).append(item)
+    return sorted((sorted(group) for group in groups.values()), key=lambda g: (-len(g), g[0]))
+
+
+class FingerprintStore:
+    """SQLite 指纹库（每次操作使用独立连接，可在线程池中调用）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，退出时提交（异常时回滚）并关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _select(self, columns: str, paths: Sequence[str]) -> List[tuple]:
+        rows = []
+        with self._connect() as conn:
+            for start in range(0, len(paths), _QUERY_BATCH_SIZE):
+                batch = paths[start:start + _QUERY_BATCH_SIZE]
+                placeholders = ", ".join("?" for _ in batch)
+                rows.extend(conn.execute(
+                    f"SELECT {columns} FROM audio_fingerprints WHERE path IN ({placeholders})", batch
+                ))
+        return rows
+
+    def stale_paths(self, paths: Sequence[str], max_seconds: float) -> List[str]:
+        """
+        需要（重新）计算指纹的文件：没有记录、大小或修改时间变化，或记录的分析时长不足
+        （文件本身比记录的分析时长短时不需要重新计算）；没有音频的文件也有记录，不会反复解码
+        """
+        known = {
+            path: (size, mtime_ns, stored_seconds, duration)
+            for path, size, mtime_ns, stored_seconds, duration
+            in self._select("path, size, mtime_ns, max_seconds, duration", list(paths))
+        }
+        stale = []
+        for path in paths:
+            record = known.get(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if record is None or record[:2] != (stat.st_size, stat.st_mtime_ns):
+                stale.append(path)
+            elif record[2] < max_seconds and record[3] is not None and record[3] >= record[2] - 1:
+                stale.append(path)
+        return stale
+
+    def save(self, path: str, stat: os.stat_result, max_seconds: float, fingerprint: AudioFingerprint) -> None:
+        self._write(path, stat, max_seconds, fingerprint.duration, fingerprint.frames,
+                    fingerprint.codes.astype("<u4").tobytes(), None)
+
+    def save_error(self, path: str, stat: os.stat_result, max_seconds: float, error: str) -> None:
+        """记录无法计算指纹的文件（没有音频流、解码失败）"""
+        self._write(path, stat, max_seconds, None, 0, None, error[:500])
+
+    def _write(self, path: str, stat: os.stat_result, max_seconds: float, duration: Optional[float],
+               frames: int, codes: Optional[bytes], error: Optional[str]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO audio_fingerprints"
+                " (path, size, mtime_ns, max_seconds, duration, frames, codes, error, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, max_seconds, duration, frames, codes, error, time.time())
+            )
+
+    def load(self, paths: Sequence[str], max_seconds: Optional[float] = None) -> Dict[str, AudioFingerprint]:
+        """读取指纹，max_seconds 给定时截取开头对应的帧数（与以该时长计算的指纹可直接比较）"""
+        limit = seconds_to_frames(max_seconds) if max_seconds else None
+        result = {}
+        for path, duration, codes, error in self._select("path, duration, codes, error", list(paths)):
+            if error is not None:
+                continue
+            array = np.frombuffer(codes, dtype="<u4")[:limit]
+            result[path] = AudioFingerprint(codes=array, duration=min(duration, max_seconds or duration))
+        return result
+
+    def remove(self, paths: Sequence[str]) -> None:
+        if not paths:
+            return
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM audio_fingerprints WHERE path = ?", [(p,) for p in paths])
+
+    def errors(self, paths: Sequence[str]) -> Dict[str, str]:
+        """读取无法计算指纹的文件及原因"""
+        return {path: error for path, error in self._select("path, error", list(paths)) if error is not None}
+
+
+async def update_fingerprints(
+    store: FingerprintStore,
+    paths: Sequence[str],
+    max_seconds: float = DEFAULT_FINGERPRINT_SECONDS,
+    max_workers: int = 4,
+    force: bool = False
+) -> dict:
+    """
+    为没有指纹或已变化的文件计算指纹并写入指纹库（大小、修改时间未变化的文件直接跳过）
+
+    Returns:
+        统计信息：total, computed, unchanged, failed, elapsed
+    """
+    start = time.perf_counter()
+    pending = list(paths) if force else await asyncio.to_thread(store.stale_paths, paths, max_seconds)
+
+    async def worker(path: str) -> bool:
+        stat = os.stat(path)
+        try:
+            fingerprint = await compute_audio_fingerprint(path, max_seconds)
+        except RuntimeError as e:
+            await asyncio.to_thread(store.save_error, path, stat, max_seconds, str(e).strip() or "解码失败")
+            return False
+        await asyncio.to_thread(store.save, path, stat, max_seconds, fingerprint)
+        return True
+
+    results = await gather_bounded(pending, worker, max_workers)
+    return {
+        "total": len(paths),
+        "computed": sum(1 for item in results if item is True),
+        "unchanged": len(paths) - len(pending),
+        "failed": sum(1 for item in results if item is not True),
+        "elapsed": time.perf_counter() - start
+    }
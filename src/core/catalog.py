@@ -0,0 +1,342 @@
+"""
+媒体库目录
+批量探测目录树中的媒体文件并写入 SQLite，重复扫描时跳过 stat 未变化的文件；
+查询和统计只读数据库，不再访问媒体文件
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .probe import get_audio_stream, get_duration, get_streams, get_video_stream, probe_media
+
+MEDIA_EXTENSIONS = {
+    ".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi", ".wmv", ".flv", ".ts", ".m2ts", ".mts",
+    ".mpg", ".mpeg", ".3gp", ".ogv", ".mxf",
+    ".mp3", ".m4a", ".aac", ".wav", ".flac", ".ogg", ".opus", ".wma", ".aiff", ".ac3",
+}
+
+# 内容指纹读取的头尾字节数
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+
+# 每批写入数据库的记录数
+WRITE_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    device INTEGER,
+    inode INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    fingerprint TEXT,
+    container TEXT,
+    duration REAL,
+    bit_rate INTEGER,
+    video_codec TEXT,
+    width INTEGER,
+    height INTEGER,
+    fps REAL,
+    audio_codec TEXT,
+    audio_tracks INTEGER,
+    audio_languages TEXT,
+    subtitle_tracks INTEGER,
+    probe_error TEXT,
+    scanned_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_media_root ON media(root);
+CREATE INDEX IF NOT EXISTS idx_media_video_codec ON media(video_codec);
+CREATE INDEX IF NOT EXISTS idx_media_duration ON media(duration);
+CREATE INDEX IF NOT EXISTS idx_media_height ON media(height);
+CREATE INDEX IF NOT EXISTS idx_media_fingerprint ON media(fingerprint);
+"""
+
+_COLUMNS = (
+    "path", "root", "device", "inode", "size", "mtime_ns", "fingerprint", "container", "duration",
+    "bit_rate", "video_codec", "width", "height", "fps", "audio_codec", "audio_tracks",
+    "audio_languages", "subtitle_tracks", "probe_error", "scanned_at"
+)
+
+# 可分组统计的字段
+GROUP_COLUMNS = {
+    "video_codec": "COALESCE(video_codec, '(无视频)')",
+    "audio_codec": "COALESCE(audio_codec, '(无音频)')",
+    "container": "container",
+    "resolution": "COALESCE(width || 'x' || height, '(无视频)')",
+    "height": "height",
+    "root": "root",
+    "fingerprint": "fingerprint",
+}
+
+# 编码器常用别名
+CODEC_ALIASES = {
+    "h265": "hevc",
+    "x265": "hevc",
+    "h264": "h264",
+    "avc": "h264",
+    "x264": "h264",
+    "vp09": "vp9",
+    "av01": "av1",
+}
+
+
+def file_fingerprint(path: str, size: int) -> str:
+    """由大小和头尾各 64KB 计算的内容指纹（用于识别重复或移动过的文件）"""
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if size > 2 * FINGERPRINT_SAMPLE_BYTES:
+            f.seek(-FINGERPRINT_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def _frame_rate(value: Optional[str]) -> Optional[float]:
+    try:
+        numerator, denominator = (value or "").split("/")
+        return round(int(numerator) / int(denominator), 3) if int(denominator) else None
+    except ValueError:
+        return None
+
+
+def media_row(path: str, root: str, stat: os.stat_result, info: dict, fingerprint: Optional[str]) -> dict:
+    """把探测结果整理为目录记录"""
+    video = get_video_stream(info)
+    audio_streams = get_streams(info, "audio")
+    audio = get_audio_stream(info)
+    fmt = info.get("format", {})
+    languages = sorted({s.get("tags", {}).get("language") for s in audio_streams} - {None, "und"})
+    try:
+        bit_rate = int(fmt["bit_rate"]) if fmt.get("bit_rate") else None
+    except ValueError:
+        bit_rate = None
+    return {
+        "path": path,
+        "root": root,
+        "device": stat.st_dev,
+        "inode": stat.st_ino,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "fingerprint": fingerprint,
+        "container": (fmt.get("format_name") or "").split(",")[0] or None,
+        "duration": get_duration(info),
+        "bit_rate": bit_rate,
+        "video_codec": video.get("codec_name") if video else None,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+        "fps": _frame_rate(video.get("avg_frame_rate") or video.get("r_frame_rate")) if video else None,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "audio_tracks": len(audio_streams),
+        "audio_languages": ",".join(languages) or None,
+        "subtitle_tracks": len(get_streams(info, "subtitle")),
+        "probe_error": None,
+        "scanned_at": time.time()
+    }
+
+
+def walk_media_files(root: str, extensions: Iterable[str] = MEDIA_EXTENSIONS) -> List[Tuple[str, os.stat_result]]:
+    """遍历目录树，返回媒体文件路径及其 stat（不跟随目录符号链接，跳过隐藏目录）"""
+    extensions = {e.lower() for e in extensions}
+    files = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in extensions:
+                    files.append((entry.path, entry.stat()))
+            except OSError:
+                continue
+    return files
+
+
+def path_prefix_range(root: str) -> Tuple[str, str]:
+    """
+    目录树下路径的字典序范围 [low, high)
+
+    用 path >= low AND path < high 选出该目录下的全部记录（走主键索引），
+    与记录是在哪个根目录下扫描得到的无关；"0" 是 "/" 之后的下一个字符。
+    """
+    base = root.rstrip(os.sep)
+    return base + os.sep, base + chr(ord(os.sep) + 1)
+
+
+class MediaCatalog:
+    """SQLite 媒体库目录（每次操作使用独立连接，可在线程池中调用）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，退出时提交（异常时回滚）并关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load_stats(self, root: str) -> Dict[str, Tuple[int, int, int]]:
+        """读取某个目录下（含之前单独扫描过的子目录）已收录文件的 (size, mtime_ns, inode)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, size, mtime_ns, inode FROM media WHERE path >= ? AND path < ?",
+                path_prefix_range(root)
+            )
+            return {path: (size, mtime_ns, inode) for path, size, mtime_ns, inode in rows}
+
+    def upsert(self, rows: Sequence[dict]) -> None:
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO media ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row.get(column) for column in _COLUMNS) for row in rows]
+            )
+
+    def remove(self, paths: Sequence[str]) -> None:
+        if not paths:
+            return
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM media WHERE path = ?", [(p,) for p in paths])
+
+    def query(
+        self,
+        where: Sequence[str] = (),
+        params: Sequence = (),
+        group_by: Optional[str] = None,
+        order_by: str = "path",
+        limit: int = 50
+    ) -> Tuple[List[str], List[tuple], tuple]:
+        """
+        查询目录
+
+        Returns:
+            (列名, 结果行, 匹配总体的 (文件数, 总时长秒, 总字节))
+        """
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._connect() as conn:
+            summary = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(size), 0) FROM media {clause}", params
+            ).fetchone()
+            if group_by:
+                expression = GROUP_COLUMNS[group_by]
+                cursor = conn.execute(
+                    f"SELECT {expression} AS grp, COUNT(*) AS files, COALESCE(SUM(duration), 0) AS seconds,"
+                    f" COALESCE(SUM(size), 0) AS bytes FROM media {clause}"
+                    f" GROUP BY grp ORDER BY {order_by} LIMIT ?",
+                    (*params, limit)
+                )
+            else:
+                cursor = conn.execute(
+                    f"SELECT path, video_codec, width, height, duration, bit_rate, audio_codec, audio_tracks, size, probe_error"
+                    f" FROM media {clause} ORDER BY {order_by} LIMIT ?",
+                    (*params, limit)
+                )
+            columns = [d[0] for d in cursor.description]
+            return columns, cursor.fetchall(), summary
+
+
+async def scan_directory(
+    catalog: MediaCatalog,
+    root: str,
+    max_workers: int = 8,
+    extensions: Iterable[str] = MEDIA_EXTENSIONS,
+    compute_fingerprint: bool = True,
+    force: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> dict:
+    """
+    扫描一个目录树并更新目录
+
+    stat（大小、修改时间、inode）未变化的文件直接跳过；该目录下已删除的文件从目录移除，
+    包括之前作为子目录单独扫描时收录的文件。记录中的 root 只用于按扫描目录统计。
+    探测以 max_workers 个并发进行，结果分批写入数据库。
+
+    Returns:
+        统计信息：total, probed, unchanged, removed, failed, elapsed
+    """
+    start = time.perf_counter()
+    root = os.path.realpath(root)
+    files, known = await asyncio.gather(
+        asyncio.to_thread(walk_media_files, root, extensions),
+        asyncio.to_thread(catalog.load_stats, root)
+    )
+
+    seen = set()
+    pending = []
+    for path, stat in files:
+        seen.add(path)
+        if not force and known.get(path) == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            continue
+        pending.append((path, stat))
+    removed = [path for path in known if path not in seen]
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    batch: List[dict] = []
+    counters = {"done": 0, "failed": 0}
+
+    async def flush():
+        rows = batch[:]
+        batch.clear()
+        await asyncio.to_thread(catalog.upsert, rows)
+
+    async def worker():
+        while True:
+            try:
+                path, stat = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                info = await probe_media(path)
+                fingerprint = await asyncio.to_thread(file_fingerprint, path, stat.st_size) if compute_fingerprint else None
+                row = media_row(path, root, stat, info, fingerprint)
+            except Exception as e:
+                counters["failed"] += 1
+                row = {
+                    "path": path, "root": root, "device": stat.st_dev, "inode": stat.st_ino,
+                    "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                    "probe_error": str(e).strip()[:500] or "探测失败", "scanned_at": time.time()
+                }
+            batch.append(row)
+            counters["done"] += 1
+            if len(batch) >= WRITE_BATCH_SIZE:
+                await flush()
+            if progress is not None:
+                progress(counters["done"], len(pending))
+
+    await asyncio.gather(*(worker() for _ in range(max(1, max_workers))))
+    await flush()
+    await asyncio.to_thread(catalog.remove, removed)
+
+    return {
+        "root": root,
+        "total": len(files),
+        "probed": len(pending),
+        "unchanged": len(files) - len(pending),
+        "removed": len(removed),
+        "failed": counters["failed"],
+        "elapsed": time.perf_counter() - start
+    }
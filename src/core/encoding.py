@@ -0,0 +1,57 @@
+"""
+编码质量参数
+格式转换、压缩、分段重新编码等工具共用的质量档位和质量参数，保证同一档位在各工具中含义一致
+"""
+
+from typing import Dict, List, Optional
+
+# 格式转换（以及分段重新编码）的质量档位 → CRF / global_quality / cq 值
+CONVERT_QUALITY = {
+    "high": "18",
+    "medium": "23",
+    "low": "28"
+}
+
+# 压缩视频的质量档位，比格式转换更偏向较小的文件
+COMPRESS_QUALITY = {
+    "high": "20",
+    "medium": "25",
+    "low": "30"
+}
+
+# 压缩输出的音频码率（kbps）
+COMPRESS_AUDIO_KBPS = 128
+
+
+def quality_value(table: Dict[str, str], quality: str) -> str:
+    """取质量档位对应的值，未知档位按 medium 处理"""
+    return table.get(quality, table["medium"])
+
+
+def quality_args(video_codec: str, value: str) -> List[str]:
+    """按编码器类型选择质量参数：QSV 使用 global_quality，NVENC 使用 cq，软件编码器使用 crf"""
+    if "qsv" in video_codec:
+        return ["-global_quality", value]
+    if "nvenc" in video_codec:
+        return ["-cq", value]
+    return ["-crf", value]
+
+
+def convert_video_args(video_codec: str, quality: str) -> List[str]:
+    """convert_video_format 的视频编码参数"""
+    return ["-c:v", video_codec, *quality_args(video_codec, quality_value(CONVERT_QUALITY, quality))]
+
+
+def compress_video_args(video_codec: str, quality: str, target_bitrate_kbps: Optional[int] = None) -> List[str]:
+    """compress_video 的视频编码参数：指定目标码率时按码率编码，否则按质量档位"""
+    args = ["-c:v", video_codec, "-preset", "medium"]
+    if target_bitrate_kbps:
+        args.extend(["-b:v", f"{target_bitrate_kbps}k"])
+    else:
+        args.extend(quality_args(video_codec, quality_value(COMPRESS_QUALITY, quality)))
+    return args
+
+
+def compress_audio_args() -> List[str]:
+    """compress_video 的音频编码参数"""
+    return ["-c:a", "aac", "-b:a", f"{COMPRESS_AUDIO_KBPS}k"]
@@ -0,0 +1,331 @@
+"""
+媒体处理引擎
+探测、关键帧截图、短片段复用等小操作的耗时主要是启动 ffmpeg/ffprobe 进程的固定开销；
+安装 PyAV 时这些操作在进程内的线程池中直接调用 libav，其余操作仍使用子进程
+"""
+
+import asyncio
+import json
+import math
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import Optional, Sequence
+
+from .runner import run_ffmpeg_command
+
+try:
+    import av
+except ImportError:  # PyAV 为可选依赖（uv sync --extra inprocess）
+    av = None
+
+# 可以路由到进程内引擎的操作
+INPROCESS_OPERATIONS = ("probe", "keyframe", "remux")
+
+
+def _display_rotation(matrix: bytes) -> float:
+    """显示矩阵（9 个 16.16 定点数）对应的旋转角度，与 av_display_rotation_get 相同"""
+    values = struct.unpack("<9i", matrix[:36])
+    a, b, c, d = (value / 65536 for value in (values[0], values[1], values[3], values[4]))
+    rotation = math.degrees(math.atan2(b / (math.hypot(b, d) or 1), a / (math.hypot(a, c) or 1)))
+    return -rotation + 0.0
+
+
+def _rate(value) -> str:
+    """把帧率转换为 ffprobe 的 分子/分母 格式"""
+    if not value:
+        return "0/0"
+    value = Fraction(value)
+    return f"{value.numerator}/{value.denominator}"
+
+
+class MediaEngine:
+    """引擎接口：三个操作的输入输出与 ffprobe / ffmpeg 命令行保持一致"""
+
+    name = ""
+
+    async def probe(self, path: str) -> dict:
+        """返回 ffprobe -show_format -show_streams 格式的 JSON"""
+        raise NotImplementedError
+
+    async def extract_keyframe(self, path: str, output_path: str, timestamp: float = 0.0, width: Optional[int] = None) -> None:
+        """把时间点之前最近的关键帧保存为图片（不逐帧解码到精确时间点）"""
+        raise NotImplementedError
+
+    async def remux(self, path: str, output_path: str, start: float, duration: float) -> None:
+        """
+        直接复制视频（不含封面图）、音频和字幕流输出一个片段，其他流（数据流、附件）不输出
+
+        起点对齐到 start 之前最近的关键帧，终点为 start + duration，输出时间戳从 0 开始；两个引擎的输出一致
+        """
+        raise NotImplementedError
+
+
+class SubprocessEngine(MediaEngine):
+    """通过 ffmpeg / ffprobe 子进程处理"""
+
+    name = "subprocess"
+
+    async def probe(self, path: str) -> dict:
+        cmd = [
+            "ffprobe",
+            "-v", "quiet",
+            "-print_format", "json",
+            "-show_format",
+            "-show_streams",
+            path
+        ]
+        result = await run_ffmpeg_command(cmd)
+        if result.returncode != 0:
+            raise RuntimeError(f"无法探测媒体信息：{result.stderr or path}")
+        return json.loads(result.stdout or "{}")
+
+    async def extract_keyframe(self, path: str, output_path: str, timestamp: float = 0.0, width: Optional[int] = None) -> None:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostats",
+            "-skip_frame", "nokey", "-noaccurate_seek", "-ss", f"{timestamp:.3f}",
+            "-i", path,
+            "-frames:v", "1"
+        ]
+        if width:
+            cmd.extend(["-vf", f"scale={width}:-2"])
+        cmd.extend(["-update", "1", "-y", output_path])
+        result = await run_ffmpeg_command(cmd)
+        if result.returncode != 0 or not os.path.exists(output_path):
+            raise RuntimeError(f"截图失败：{result.stderr}")
+
+    async def remux(self, path: str, output_path: str, start: float, duration: float) -> None:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostats",
+            "-ss", f"{start:.3f}", "-i", path,
+            "-t", f"{duration:.3f}",
+            "-map", "0:V?", "-map", "0:a?", "-map", "0:s?",
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            "-y", output_path
+        ]
+        result = await run_ffmpeg_command(cmd)
+        if result.returncode != 0:
+            raise RuntimeError(f"复用失败：{result.stderr}")
+
+
+class PyAVEngine(MediaEngine):
+    """通过 PyAV 在线程池中调用 libav，省去进程启动开销（libav 解码期间释放 GIL）"""
+
+    name = "pyav"
+
+    def __init__(self, max_workers: int = 4):
+        if av is None:
+            raise RuntimeError("进程内引擎需要安装 PyAV（uv sync --extra inprocess）")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pyav")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def probe(self, path: str) -> dict:
+        return await self._run(self._probe, path)
+
+    async def extract_keyframe(self, path: str, output_path: str, timestamp: float = 0.0, width: Optional[int] = None) -> None:
+        await self._run(self._extract_keyframe, path, output_path, timestamp, width)
+
+    async def remux(self, path: str, output_path: str, start: float, duration: float) -> None:
+        await self._run(self._remux, path, output_path, start, duration)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _probe(path: str) -> dict:
+        attached_pic = getattr(getattr(av.stream, "Disposition", None), "attached_pic", None)
+        with av.open(path) as container:
+            fmt = {
+                "filename": path,
+                "nb_streams": len(container.streams),
+                "format_name": container.format.name,
+                "format_long_name": container.format.long_name,
+                "tags": dict(container.metadata)
+            }
+            if container.start_time is not None:
+                fmt["start_time"] = f"{container.start_time / av.time_base:.6f}"
+            if container.duration is not None:
+                fmt["duration"] = f"{container.duration / av.time_base:.6f}"
+            if os.path.exists(path):
+                fmt["size"] = str(os.path.getsize(path))
+            if container.bit_rate:
+                fmt["bit_rate"] = str(container.bit_rate)
+
+            streams = []
+            for stream in container.streams:
+                info = {
+                    "index": stream.index,
+                    "codec_type": stream.type,
+                    "time_base": _rate(stream.time_base),
+                    "disposition": {
+                        "attached_pic": int(bool(attached_pic is not None and stream.disposition & attached_pic))
+                    },
+                    "tags": dict(stream.metadata)
+                }
+                codec = stream.codec_context
+                if codec is not None:
+                    # 解码器名（如 mp3float）与 ffprobe 的编码名（mp3）不同，使用规范名称
+                    info["codec_name"] = getattr(codec.codec, "canonical_name", codec.name)
+                    info["codec_long_name"] = codec.codec.long_name
+                    if stream.profile:
+                        info["profile"] = stream.profile
+                if stream.start_time is not None and stream.time_base:
+                    info["start_time"] = f"{float(stream.start_time * stream.time_base):.6f}"
+                if stream.duration is not None and stream.time_base:
+                    info["duration"] = f"{float(stream.duration * stream.time_base):.6f}"
+                if stream.bit_rate:
+                    info["bit_rate"] = str(stream.bit_rate)
+                if stream.frames:
+                    info["nb_frames"] = str(stream.frames)
+                if stream.type == "video":
+                    info.update({
+                        "width": codec.width,
+                        "height": codec.height,
+                        "pix_fmt": codec.pix_fmt,
+                        "r_frame_rate": _rate(stream.base_rate or stream.guessed_rate),
+                        "avg_frame_rate": _rate(stream.average_rate)
+                    })
+                    matrix = (getattr(codec, "coded_side_data", None) or {}).get("display_matrix")
+                    if matrix:
+                        info["side_data_list"] = [
+                            {"side_data_type": "Display Matrix", "rotation": round(_display_rotation(matrix))}
+                        ]
+                elif stream.type == "audio":
+                    info.update({
+                        "sample_fmt": codec.format.name if codec.format else None,
+                        "sample_rate": str(codec.sample_rate),
+                        "channels": codec.channels,
+                        "channel_layout": codec.layout.name if codec.layout else None
+                    })
+                streams.append(info)
+        return {"streams": streams, "format": fmt}
+
+    @staticmethod
+    def _extract_keyframe(path: str, output_path: str, timestamp: float, width: Optional[int]) -> None:
+        with av.open(path) as container:
+            if not container.streams.video:
+                raise RuntimeError(f"没有视频流 - {path}")
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
+            if timestamp > 0:
+                container.seek(int(timestamp * av.time_base), backward=True, any_frame=False)
+            frame = next(container.decode(stream), None)
+            if frame is None:
+                raise RuntimeError(f"无法解码关键帧 - {path}")
+
+        if width:
+            height = max(2, round(frame.height * width / frame.width / 2) * 2)
+            frame = frame.reformat(width=width, height=height)
+
+        extension = os.path.splitext(output_path)[1].lower()
+        codec_name, pix_fmt = ("png", "rgb24") if extension == ".png" else ("mjpeg", "yuvj420p")
+        with av.open(output_path, "w", format="image2") as output:
+            out_stream = output.add_stream(codec_name, rate=1)
+            out_stream.width = frame.width
+            out_stream.height = frame.height
+            out_stream.pix_fmt = pix_fmt
+            frame = frame.reformat(format=pix_fmt)
+            frame.pts = 0
+            for packet in out_stream.encode(frame):
+                output.mux(packet)
+            for packet in out_stream.encode(None):
+                output.mux(packet)
+
+    @staticmethod
+    def _remux(path: str, output_path: str, start: float, duration: float) -> None:
+        attached_pic = getattr(getattr(av.stream, "Disposition", None), "attached_pic", None)
+        with av.open(path) as container:
+            # 与 -map 0:V? -map 0:a? -map 0:s? 相同的流选择
+            in_streams: Sequence = [
+                s for s in container.streams
+                if s.type in ("video", "audio", "subtitle")
+                and not (attached_pic is not None and s.disposition & attached_pic)
+            ]
+            if not any(s.type in ("video", "audio") for s in in_streams):
+                raise RuntimeError(f"没有可复用的音视频流 - {path}")
+            if start > 0:
+                container.seek(int(start * av.time_base), backward=True, any_frame=False)
+
+            has_video = any(s.type == "video" for s in in_streams)
+            end = start + duration
+            with av.open(output_path, "w") as output:
+                mapping = {s.index: output.add_stream_from_template(s) for s in in_streams}
+                # 第一个包（seek 后即关键帧附近）的 dts 作为新的零点，与 -avoid_negative_ts make_zero 一致
+                origin = None
+                for packet in container.demux(*in_streams):
+                    if packet.dts is None:
+                        continue
+                    if origin is None:
+                        origin = float(packet.dts * packet.time_base)
+                    if float(packet.dts * packet.time_base) >= end:
+                        if packet.stream.type == "video" or not has_video:
+                            break
+                        continue
+                    offset = int(round(origin / packet.time_base))
+                    if packet.dts - offset < 0:
+                        continue
+                    packet.dts -= offset
+                    if packet.pts is not None:
+                        packet.pts -= offset
+                    packet.stream = mapping[packet.stream.index]
+                    output.mux(packet)
+
+
+class EngineRouter:
+    """按操作类型选择引擎；进程内引擎失败时回退到子进程"""
+
+    def __init__(self, inprocess: Optional[MediaEngine] = None, operations: Sequence[str] = INPROCESS_OPERATIONS):
+        self.subprocess = SubprocessEngine()
+        self.inprocess = inprocess
+        self.operations = set(operations)
+
+    def routes(self, operation: str) -> bool:
+        """该操作是否会使用进程内引擎"""
+        return self.inprocess is not None and operation in self.operations
+
+    def engine_for(self, operation: str) -> MediaEngine:
+        return self.inprocess if self.routes(operation) else self.subprocess
+
+    async def _call(self, operation: str, method: str, *args):
+        engine = self.engine_for(operation)
+        if engine is self.subprocess:
+            return await getattr(engine, method)(*args), engine.name
+        try:
+            return await getattr(engine, method)(*args), engine.name
+        except Exception:
+            return await getattr(self.subprocess, method)(*args), self.subprocess.name
+
+    async def probe(self, path: str):
+        """返回 (ffprobe 格式 JSON, 使用的引擎名)"""
+        return await self._call("probe", "probe", path)
+
+    async def extract_keyframe(self, path: str, output_path: str, timestamp: float = 0.0, width: Optional[int] = None) -> str:
+        """返回使用的引擎名"""
+        return (await self._call("keyframe", "extract_keyframe", path, output_path, timestamp, width))[1]
+
+    async def remux(self, path: str, output_path: str, start: float, duration: float) -> str:
+        """返回使用的引擎名"""
+        return (await self._call("remux", "remux", path, output_path, start, duration))[1]
+
+
+_router = EngineRouter()
+
+
+def configure_engines(router: EngineRouter) -> None:
+    """设置全局引擎路由"""
+    global _router
+    _router = router
+
+
+def get_engine_router() -> EngineRouter:
+    """获取全局引擎路由"""
+    return _router
+
+
+def inprocess_available() -> bool:
+    """是否安装了 PyAV"""
+    return av is not None
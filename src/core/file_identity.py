@@ -0,0 +1,38 @@
+"""
+媒体文件标识
+用设备号、inode、大小和修改时间标识文件，作为各类缓存的键
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class FileIdentity:
+    """媒体文件标识"""
+
+    path: str
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @property
+    def key(self) -> str:
+        """缓存键：文件被改写或替换后键随之变化，重命名则不变"""
+        raw = f"{self.device}:{self.inode}:{self.size}:{self.mtime_ns}"
+        return hashlib.sha1(raw.encode("ascii")).hexdigest()
+
+
+def get_file_identity(path: str) -> FileIdentity:
+    """获取文件标识（文件不存在时抛出 OSError）"""
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return FileIdentity(
+        path=real_path,
+        device=stat.st_dev,
+        inode=stat.st_ino,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns
+    )
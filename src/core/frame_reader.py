@@ -0,0 +1,258 @@
+"""
+原始帧读取
+通过 rawvideo 管道把 FFmpeg 解码出的帧直接读入预分配的 NumPy 缓冲区，
+避免先编码成图片文件再解码，也不为每一帧分配新内存
+"""
+
+import asyncio
+import json
+import subprocess
+import tempfile
+from typing import List, Optional, Tuple
+
+from .pipes import set_pipe_buffer_size
+from .probe import get_display_size, get_video_stream, probe_media
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+# 支持的像素格式及其通道数
+PIXEL_CHANNELS = {
+    "rgb24": 3,
+    "bgr24": 3,
+    "gray": 1,
+}
+
+
+def probe_video_size(input_path: str) -> Tuple[int, int]:
+    """同步获取第一个视频流显示时的宽高（旋转 ±90° 时交换宽高），只用于不在事件循环中的同步读取"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:stream_side_data=rotation:stream_tags=rotate",
+        "-of", "json",
+        input_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    streams = json.loads(result.stdout or "{}").get("streams") if result.returncode == 0 else None
+    size = get_display_size(streams[0] if streams else None)
+    if size is None:
+        raise RuntimeError(f"无法获取视频尺寸：{result.stderr.strip() or input_path}")
+    return size
+
+
+class RawFrameReader:
+    """
+    以 NumPy 数组逐帧读取视频
+
+    产出的数组来自大小为 pool_size 的缓冲池并循环复用：读取第 n+pool_size 帧时
+    第 n 帧的数组会被覆盖，需要长期保留的帧请自行 copy()。
+
+    只给出一边（或都不给）时需要探测源尺寸：async with 在事件循环中异步探测，同步用法在 open() 时探测。
+    FFmpeg 解码时按旋转信息自动旋转，源尺寸按显示方向计算。
+
+    用法：
+        with RawFrameReader("in.mp4", width=320, fps=2, pix_fmt="gray") as reader:
+            for frame in reader:
+                ...
+
+        async with RawFrameReader("in.mp4", width=320) as reader:
+            async for frame in reader:
+                ...
+    """
+
+    def __init__(
+        self,
+        input_path: str,
+        pix_fmt: str = "rgb24",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        fps: Optional[float] = None,
+        start_time: Optional[str] = None,
+        duration: Optional[str] = None,
+        keyframes_only: bool = False,
+        pool_size: int = 4
+    ):
+        if np is None:
+            raise ImportError("读取原始帧需要安装 numpy（uv sync --extra analysis）")
+        if pix_fmt not in PIXEL_CHANNELS:
+            raise ValueError(f"不支持的像素格式: {pix_fmt}（可选: {', '.join(PIXEL_CHANNELS)}）")
+
+        self.input_path = input_path
+        self.pix_fmt = pix_fmt
+        self.fps = fps
+        self.start_time = start_time
+        self.duration = duration
+        self.keyframes_only = keyframes_only
+        self.channels = PIXEL_CHANNELS[pix_fmt]
+        self.pool_size = max(1, pool_size)
+        self._requested_size = (width, height)
+        self.width = self.height = None
+        self.scaled = False
+        self._process = None
+        self._stderr = None
+        self.frames_read = 0
+        if width and height:
+            self._set_size(width, height, True)
+
+    def _set_size(self, width: int, height: int, scaled: bool):
+        """确定输出尺寸并分配缓冲池"""
+        self.width, self.height, self.scaled = width, height, scaled
+        if self.channels == 1:
+            self.frame_shape = (self.height, self.width)
+        else:
+            self.frame_shape = (self.height, self.width, self.channels)
+        self.frame_bytes = self.width * self.height * self.channels
+        self._pool = [np.empty(self.frame_shape, dtype=np.uint8) for _ in range(self.pool_size)]
+        self._views = [memoryview(buffer).cast("B") for buffer in self._pool]
+
+    def _apply_source_size(self, source_width: int, source_height: int):
+        """按源尺寸确定输出尺寸；只给出一边时按源宽高比计算另一边（取偶数）"""
+        width, height = self._requested_size
+        if width:
+            self._set_size(width, max(2, round(width * source_height / source_width / 2) * 2), True)
+        elif height:
+            self._set_size(max(2, round(height * source_width / source_height / 2) * 2), height, True)
+        else:
+            self._set_size(source_width, source_height, False)
+
+    def resolve_size(self):
+        """同步探测源尺寸（已确定时不探测）"""
+        if self.width is None:
+            self._apply_source_size(*probe_video_size(self.input_path))
+
+    async def resolve_size_async(self):
+        """在事件循环中异步探测源尺寸（已确定时不探测）"""
+        if self.width is None:
+            size = get_display_size(get_video_stream(await probe_media(self.input_path)))
+            if size is None:
+                raise RuntimeError(f"无法获取视频尺寸：{self.input_path}")
+            self._apply_source_size(*size)
+
+    def build_command(self) -> List[str]:
+        """构建解码到 rawvideo 管道的命令（抽帧和缩放在解码端完成）"""
+        self.resolve_size()
+        cmd = ["ffmpeg", "-hide_banner", "-nostats", "-v", "error"]
+        if self.keyframes_only:
+            cmd.extend(["-skip_frame", "nokey"])
+        if self.start_time:
+            cmd.extend(["-ss", str(self.start_time)])
+        cmd.extend(["-i", self.input_path])
+        if self.duration:
+            cmd.extend(["-t", str(self.duration)])
+        cmd.extend(["-map", "0:v:0", "-an", "-sn", "-dn"])
+
+        filters = []
+        if self.fps:
+            filters.append(f"fps={self.fps}")
+        if self.scaled:
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+        if filters:
+            cmd.extend(["-vf", ",".join(filters)])
+        if self.keyframes_only and not self.fps:
+            # rawvideo 默认按恒定帧率输出，会重复关键帧填满其间的时间
+            cmd.extend(["-fps_mode", "passthrough"])
+
+        cmd.extend(["-f", "rawvideo", "-pix_fmt", self.pix_fmt, "-"])
+        return cmd
+
+    def frame_time(self, index: int) -> Optional[float]:
+        """指定 fps 时返回第 index 帧相对起点的时间（秒），否则无法确定返回 None"""
+        if not self.fps:
+            return None
+        return index / self.fps
+
+    def open(self) -> "RawFrameReader":
+        """启动解码进程"""
+        if self._process is None:
+            # 标准错误写入临时文件，避免管道写满导致进程阻塞
+            self._stderr = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(
+                self.build_command(),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+                bufsize=0
+            )
+            self._grow_pipe_buffer()
+        return self
+
+    def _grow_pipe_buffer(self):
+        """尽量把管道缓冲区扩大到至少一帧，减少每帧的系统调用次数（仅 Linux）"""
+        set_pipe_buffer_size(self._process.stdout.fileno(), self.frame_bytes)
+
+    def read(self):
+        """读取下一帧到缓冲池，返回数组；读完返回 None"""
+        if self._process is None:
+            self.open()
+
+        view = self._views[self.frames_read % len(self._views)]
+        stdout = self._process.stdout
+        filled = 0
+        while filled < self.frame_bytes:
+            count = stdout.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+
+        if filled < self.frame_bytes:
+            self._finish()
+            return None
+
+        frame = self._pool[self.frames_read % len(self._pool)]
+        self.frames_read += 1
+        return frame
+
+    def _finish(self):
+        """等待进程结束，失败时抛出带日志的异常"""
+        returncode = self._process.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode(errors="replace").strip()
+            self.close()
+            raise RuntimeError(message or f"FFmpeg 退出码 {returncode}")
+
+    def close(self):
+        """终止解码进程并释放资源"""
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+    def __iter__(self):
+        self.open()
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self) -> "RawFrameReader":
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """在线程中读取管道，避免阻塞事件循环"""
+        frame = await asyncio.to_thread(self.read)
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    async def __aenter__(self) -> "RawFrameReader":
+        await self.resolve_size_async()
+        return await asyncio.to_thread(self.open)
+
+    async def __aexit__(self, *exc):
+        await asyncio.to_thread(self.close)
@@ -0,0 +1,521 @@
+"""
+远程输入读穿缓存
+FFmpeg 通过本机回环地址上的代理读取 HTTP(S) 输入，代理按块从源站拉取 FFmpeg 实际读取的字节范围，
+写入本地稀疏文件并用位图记录已下载的块；同一 URL 的后续探测和处理直接读本地缓存，按 LRU 淘汰
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import httpx
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+# 单次向源站请求的最多块数，以及代理每次向 FFmpeg 发送前预取的块数
+MAX_BLOCKS_PER_REQUEST = 8
+SERVE_WINDOW_BLOCKS = 2
+
+
+class RemoteFileChanged(RuntimeError):
+    """读取过程中发现源站文件已变化，条目已按新版本重建"""
+
+
+def is_remote_url(path: str) -> bool:
+    """是否为 HTTP(S) 地址"""
+    return path.startswith(("http://", "https://"))
+
+
+class CachedRemoteFile:
+    """单个 URL 的缓存条目：稀疏数据文件 + 块位图"""
+
+    def __init__(self, cache: "RemoteInputCache", url: str, key: str):
+        self.cache = cache
+        self.url = url
+        self.key = key
+        self.size = 0
+        self.block_size = cache.block_size
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.content_type = "application/octet-stream"
+        self.validated = 0.0
+        self.last_access = 0.0
+        self.bitmap = bytearray()
+        self.active = 0
+        self.generation = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.cache.cache_dir, f"{self.key}.data")
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.cache.cache_dir, f"{self.key}.json")
+
+    @property
+    def block_count(self) -> int:
+        return (self.size + self.block_size - 1) // self.block_size
+
+    @property
+    def cached_blocks(self) -> int:
+        return sum(bin(b).count("1") for b in self.bitmap)
+
+    @property
+    def cached_bytes(self) -> int:
+        return min(self.cached_blocks * self.block_size, self.size)
+
+    def has_block(self, index: int) -> bool:
+        return bool(self.bitmap[index >> 3] & (1 << (index & 7)))
+
+    def _mark_block(self, index: int) -> None:
+        self.bitmap[index >> 3] |= 1 << (index & 7)
+
+    def is_stale(self, size: Optional[int], headers: httpx.Headers) -> bool:
+        """源站返回的文件大小或校验头（ETag、Last-Modified）与缓存的版本不一致"""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        return bool(
+            (size is not None and size != self.size)
+            or (etag and self.etag and etag != self.etag)
+            or (last_modified and self.last_modified and last_modified != self.last_modified)
+        )
+
+    def reset(self, size: int) -> None:
+        """源站文件变化或首次缓存时重建稀疏文件和位图"""
+        self.generation += 1
+        self.size = size
+        self.block_size = self.cache.block_size
+        self.bitmap = bytearray((self.block_count + 7) // 8)
+        with open(self.data_path, "wb") as f:
+            f.truncate(size)
+
+    def load_meta(self) -> bool:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if meta.get("url") != self.url or not os.path.exists(self.data_path):
+            return False
+        self.size = meta["size"]
+        self.block_size = meta["block_size"]
+        self.etag = meta.get("etag")
+        self.last_modified = meta.get("last_modified")
+        self.content_type = meta.get("content_type") or self.content_type
+        self.validated = meta.get("validated", 0.0)
+        self.last_access = meta.get("last_access", 0.0)
+        self.bitmap = bytearray.fromhex(meta["bitmap"])
+        return len(self.bitmap) == (self.block_count + 7) // 8
+
+    def save_meta(self) -> None:
+        meta = {
+            "url": self.url,
+            "size": self.size,
+            "block_size": self.block_size,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "content_type": self.content_type,
+            "validated": self.validated,
+            "last_access": self.last_access,
+            "bitmap": self.bitmap.hex()
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self.meta_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def remove_files(self) -> None:
+        for path in (self.data_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def ensure_range(self, start: int, end: int) -> None:
+        """确保 [start, end] 字节所在的块都已下载；并发读取同一块时只请求一次"""
+        while True:
+            # 源站文件变化时条目会被重建（大小和块大小可能改变），每轮按当前版本重新规划
+            if start >= self.size:
+                return
+            first, last = start // self.block_size, min(end, self.size - 1) // self.block_size
+            runs: List[List[int]] = []
+            waits = []
+            for index in range(first, last + 1):
+                if self.has_block(index):
+                    continue
+                if index in self._pending:
+                    if self._pending[index] not in waits:
+                        waits.append(self._pending[index])
+                    continue
+                if runs and runs[-1][-1] == index - 1 and len(runs[-1]) < MAX_BLOCKS_PER_REQUEST:
+                    runs[-1].append(index)
+                else:
+                    runs.append([index])
+            if not runs and not waits:
+                return
+
+            loop = asyncio.get_running_loop()
+            fetches = []
+            for run in runs:
+                future = loop.create_future()
+                for index in run:
+                    self._pending[index] = future
+                fetches.append(self._fetch_run(run, future))
+
+            results = await asyncio.gather(*fetches, *waits, return_exceptions=True)
+            for result in results:
+                # 其他读取方的下载被取消、或源站文件已变化时重新规划，由本次调用补齐
+                if isinstance(result, BaseException) and not isinstance(
+                    result, (asyncio.CancelledError, RemoteFileChanged)
+                ):
+                    raise result
+
+    async def _fetch_run(self, run: List[int], future: asyncio.Future) -> None:
+        """向源站请求连续的若干块并写入稀疏文件"""
+        start = run[0] * self.block_size
+        end = min((run[-1] + 1) * self.block_size, self.size) - 1
+        generation = self.generation
+        try:
+            fetched = await self.cache.fetch_range(self, start, end)
+            if self.generation != generation:
+                # 下载期间条目已按新版本重建，这批旧数据不能记为已缓存
+                raise RemoteFileChanged(self.url)
+            for index in run:
+                self._mark_block(index)
+            self.cache.bytes_from_origin += fetched
+            self.save_meta()
+            future.set_result(None)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 已由当前调用方抛出，避免重复告警
+            raise
+        finally:
+            for index in run:
+                self._pending.pop(index, None)
+
+    def read(self, start: int, length: int) -> bytes:
+        fd = os.open(self.data_path, os.O_RDONLY)
+        try:
+            return os.pread(fd, length, start)
+        finally:
+            os.close(fd)
+
+
+class RemoteInputCache:
+    """
+    远程输入读穿缓存
+
+    open() 返回本机代理地址，FFmpeg/ffprobe 像读取普通 HTTP 地址一样读取它；
+    代理只向源站请求尚未缓存的块，缓存总量超过上限时按最近访问时间淘汰整个条目。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 2 << 30,
+        block_size: int = 1 << 20,
+        revalidate_after: float = 300.0,
+        max_connections: int = 8
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.revalidate_after = revalidate_after
+        self.max_connections = max_connections
+        self.bytes_from_origin = 0
+        self.bytes_served = 0
+        self._entries: Dict[str, CachedRemoteFile] = {}
+        self._open_lock: Optional[asyncio.Lock] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._port: Optional[int] = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """启动时读取已有条目，用于容量统计和 LRU 淘汰"""
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, name), "r", encoding="utf-8") as f:
+                    url = json.load(f)["url"]
+            except (OSError, ValueError, KeyError):
+                continue
+            entry = CachedRemoteFile(self, url, name[:-5])
+            if entry.load_meta():
+                self._entries[entry.key] = entry
+            else:
+                entry.remove_files()
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(entry.cached_bytes for entry in self._entries.values())
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共享的连接池客户端（在事件循环中首次使用时创建）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    async def fetch_range(self, entry: CachedRemoteFile, start: int, end: int) -> int:
+        """
+        请求源站字节范围并写入条目数据文件，返回实际下载的字节数
+
+        响应的文件大小或校验头与缓存不一致时（If-Range 校验失败返回 200 也属于这种情况），
+        重建条目并抛出 RemoteFileChanged，由调用方按新的位图重新规划，不会把新旧版本的数据混在一起。
+        """
+        headers = {"Range": f"bytes={start}-{end}"}
+        # 弱 ETag 不能用于 If-Range，此时退回使用 Last-Modified
+        if entry.etag and not entry.etag.startswith("W/"):
+            headers["If-Range"] = entry.etag
+        elif entry.last_modified:
+            headers["If-Range"] = entry.last_modified
+        async with self.client.stream("GET", entry.url, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code == 206:
+                match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+                size = int(match.group(1)) if match else None
+            else:
+                length = response.headers.get("Content-Length")
+                size = int(length) if length is not None else None
+            if entry.is_stale(size, response.headers):
+                if size is None:
+                    # 无法得知新版本的大小，下次打开时重新向源站确认
+                    entry.validated = 0.0
+                    entry.save_meta()
+                    raise RuntimeError(f"远程文件已变化 - {entry.url}")
+                entry.reset(size)
+                entry.etag = response.headers.get("ETag")
+                entry.last_modified = response.headers.get("Last-Modified")
+                entry.save_meta()
+                raise RemoteFileChanged(entry.url)
+            if response.status_code != 206:
+                # 源站不支持范围请求，只能从头读取到所需位置
+                start = 0
+            fetched = 0
+            with open(entry.data_path, "r+b") as f:
+                f.seek(start)
+                async for chunk in response.aiter_bytes():
+                    remaining = end + 1 - (start + fetched)
+                    if remaining <= 0:
+                        break
+                    chunk = chunk[:remaining]
+                    f.write(chunk)
+                    fetched += len(chunk)
+        if start + fetched < end + 1:
+            raise RuntimeError(f"远程文件读取不完整 - {entry.url}（{start + fetched}/{end + 1}）")
+        return fetched
+
+    async def _head(self, url: str) -> Tuple[Optional[int], httpx.Headers]:
+        """获取源站文件大小和校验头；不支持 HEAD 时用 1 字节的范围请求代替"""
+        response = await self.client.head(url)
+        size = response.headers.get("Content-Length")
+        if response.status_code >= 400 or size is None or response.headers.get("Accept-Ranges") != "bytes":
+            async with self.client.stream("GET", url, headers={"Range": "bytes=0-0"}) as ranged:
+                ranged.raise_for_status()
+                match = _CONTENT_RANGE_RE.match(ranged.headers.get("Content-Range", ""))
+                if ranged.status_code != 206 or not match:
+                    return None, ranged.headers
+                return int(match.group(1)), ranged.headers
+        return int(size), response.headers
+
+    async def open(self, url: str) -> str:
+        """
+        登记远程输入并返回本机代理地址
+
+        源站不提供文件大小或不支持范围请求时返回原地址（不经过缓存）。
+        """
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+        async with self._open_lock:
+            key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is None or now - entry.validated > self.revalidate_after:
+                size, headers = await self._head(url)
+                if size is None:
+                    return url
+                if entry is None:
+                    entry = CachedRemoteFile(self, url, key)
+                    if not entry.load_meta():
+                        entry.reset(size)
+                if entry.is_stale(size, headers):
+                    entry.reset(size)
+                entry.etag = headers.get("ETag")
+                entry.last_modified = headers.get("Last-Modified")
+                entry.content_type = headers.get("Content-Type") or entry.content_type
+                entry.validated = now
+                self._entries[key] = entry
+            entry.last_access = now
+            entry.save_meta()
+            await self._ensure_server()
+
+        name = os.path.basename(unquote(urlparse(url).path)) or "input"
+        return f"http://127.0.0.1:{self._port}/{key}/{name}"
+
+    def evict(self) -> int:
+        """
+        缓存超过上限时按最近访问时间淘汰条目，返回淘汰数量
+
+        正在读取的条目和最近访问的条目（刚登记、FFmpeg 可能尚未连接）不会被淘汰。
+        """
+        entries = sorted(self._entries.values(), key=lambda e: e.last_access)[:-1]
+        evicted = 0
+        total = self.cached_bytes
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry.active or entry._pending:
+                continue
+            total -= entry.cached_bytes
+            entry.remove_files()
+            del self._entries[entry.key]
+            evicted += 1
+        return evicted
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "cached_bytes": self.cached_bytes,
+            "max_bytes": self.max_bytes,
+            "bytes_from_origin": self.bytes_from_origin,
+            "bytes_served": self.bytes_served
+        }
+
+    async def _ensure_server(self) -> None:
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+            self._port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理代理请求（GET/HEAD，支持单个 Range），每个连接处理一个请求"""
+        entry = None
+        counted = False
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            method, path, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            entry = self._entries.get(path.lstrip("/").split("/", 1)[0])
+            if entry is None or method not in ("GET", "HEAD"):
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+
+            entry.active += 1
+            counted = True
+            entry.last_access = time.time()
+            start, end = 0, entry.size - 1
+            status = "200 OK"
+            match = _RANGE_RE.match(headers.get("range", ""))
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    if match.group(2):
+                        end = min(int(match.group(2)), entry.size - 1)
+                else:
+                    start = max(0, entry.size - int(match.group(2)))
+                if start >= entry.size:
+                    writer.write(
+                        f"HTTP/1.1 416 Range Not Satisfiable\r\nContent-Range: bytes */{entry.size}\r\n"
+                        f"Content-Length: 0\r\nConnection: close\r\n\r\n".encode("latin-1")
+                    )
+                    return
+                status = "206 Partial Content"
+
+            head = [
+                f"HTTP/1.1 {status}",
+                f"Content-Type: {entry.content_type}",
+                f"Content-Length: {end - start + 1}",
+                "Accept-Ranges: bytes",
+                "Connection: close"
+            ]
+            if status.startswith("206"):
+                head.append(f"Content-Range: bytes {start}-{end}/{entry.size}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            if method == "HEAD":
+                return
+
+            # 按小窗口预取并发送，FFmpeg 中途断开（如跳转）时不会继续下载剩余部分
+            window = SERVE_WINDOW_BLOCKS * entry.block_size
+            generation = entry.generation
+            position = start
+            while position <= end:
+                window_end = min(end, (position // entry.block_size) * entry.block_size + window - 1)
+                await entry.ensure_range(position, window_end)
+                if entry.generation != generation:
+                    # 源站文件已变化，响应头中的长度已不成立，断开连接让 FFmpeg 报告读取错误
+                    raise RemoteFileChanged(entry.url)
+                data = await asyncio.to_thread(entry.read, position, window_end - position + 1)
+                writer.write(data)
+                await writer.drain()
+                self.bytes_served += len(data)
+                position = window_end + 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            # 源站读取失败：响应头已发出，只能断开连接，FFmpeg 会报告读取错误
+            pass
+        finally:
+            if counted:
+                entry.active -= 1
+                self.evict()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+_cache: Optional[RemoteInputCache] = None
+
+
+def configure_http_cache(cache: Optional[RemoteInputCache]) -> None:
+    """设置全局远程输入缓存（None 表示 FFmpeg 直接读取远程地址）"""
+    global _cache
+    _cache = cache
+
+
+def get_http_cache() -> Optional[RemoteInputCache]:
+    """获取全局远程输入缓存"""
+    return _cache
+
+
+async def resolve_input(path: str) -> str:
+    """远程地址经缓存代理读取，本地路径原样返回"""
+    if _cache is None or not is_remote_url(path):
+        return path
+    return await _cache.open(path)
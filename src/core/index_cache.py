@@ -0,0 +1,83 @@
+"""
+按文件标识存储的索引缓存
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from .file_identity import FileIdentity
+
+
+class KeyedLocks:
+    """
+    按键（文件标识）分配的 asyncio.Lock
+
+    没有持有者和等待者时立即移除，长时间运行时映射大小只取决于同时处理的文件数。
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+
+class FileIndexCache:
+    """每个媒体文件对应一个 JSON 索引文件的磁盘缓存"""
+
+    def __init__(self, cache_dir: str, namespace: str):
+        self.directory = Path(cache_dir) / namespace
+
+    def index_path(self, identity: FileIdentity, suffix: str = ".json") -> Path:
+        """索引文件路径（按键前两位分桶，避免单目录文件过多）"""
+        return self.directory / identity.key[:2] / f"{identity.key}{suffix}"
+
+    def load(self, identity: FileIdentity) -> Optional[dict]:
+        """读取索引，不存在或已损坏时返回 None"""
+        try:
+            with open(self.index_path(identity), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, identity: FileIdentity, data: dict) -> None:
+        """原子写入索引（先写临时文件再替换）"""
+        path = self.index_path(identity)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def remove(self, identity: FileIdentity) -> None:
+        """删除索引"""
+        try:
+            self.index_path(identity).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,406 @@
+"""
+任务日志
+长时间任务在启动 FFmpeg 之前先把参数、临时文件和输出路径写入 SQLite（预写），每次状态变化和
+每个完成的分块都同步落盘；服务器意外退出后，启动时据此清理半成品，并按策略重新排队或标记失败
+
+多个服务器实例（每个 stdio 客户端各启动一个）共用同一个任务日志：每个任务记录所属服务器进程的标识
+（启动 id、pid 和进程启动时间），恢复时只处理所属进程已经退出的任务
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# 启动时视为被中断的状态
+UNFINISHED_STATES = ("queued", "running")
+
+RECOVERY_POLICIES = ("requeue", "fail")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    output_path TEXT,
+    temp_paths TEXT NOT NULL DEFAULT '[]',
+    pid INTEGER,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    at REAL NOT NULL,
+    state TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events(job_id);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+
+def job_temp_path(output_path: str, job_id: str, suffix: Optional[str] = None) -> str:
+    """
+    任务临时文件路径：与输出文件同目录的隐藏文件，完成后再重命名为输出文件
+
+    Args:
+        suffix: 临时文件后缀（默认与输出文件相同，FFmpeg 依此判断封装格式）
+    """
+    directory, name = os.path.split(output_path)
+    stem, extension = os.path.splitext(name)
+    return os.path.join(directory, f".{stem}.{job_id}.part{extension if suffix is None else suffix}")
+
+
+def _remove_path(path: str) -> bool:
+    """删除文件或目录，返回是否删除了内容"""
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _process_start_time(pid: int) -> Optional[str]:
+    """进程启动时间（开机后的时钟节拍数，/proc/<pid>/stat 第 22 项），进程不存在时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _process_identity(pid: Optional[int] = None) -> str:
+    """
+    进程标识 "启动 id:pid:启动时间"
+
+    pid 会被复用，加上启动时间和本次开机的启动 id 才能唯一确定一个进程；没有 /proc 的系统上只有 pid。
+    """
+    pid = os.getpid() if pid is None else pid
+    return f"{_boot_id()}:{pid}:{_process_start_time(pid) or ''}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """任务所属的服务器进程是否仍在运行（没有记录所属进程的旧任务视为已退出）"""
+    if not owner:
+        return False
+    boot_id, pid, start_time = owner.split(":")
+    if boot_id != _boot_id():
+        return False
+    if start_time:
+        return _process_start_time(int(pid)) == start_time
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+
+
+def _kill_orphan(pid: Optional[int], markers: Sequence[str]) -> bool:
+    """
+    结束服务器退出后仍在运行的 FFmpeg 进程
+
+    只在 /proc/<pid>/cmdline 包含本任务的临时文件路径时才发送信号，避免误杀复用了该 pid 的其他进程。
+    """
+    if not pid or not markers:
+        return False
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read().decode(errors="replace")
+    except OSError:
+        return False
+    if not any(marker in cmdline for marker in markers):
+        return False
+    try:
+        os.kill(pid, signal.SIGKILL)
+        return True
+    except OSError:
+        return False
+
+
+class JobJournal:
+    """
+    SQLite 预写任务日志（WAL + synchronous=FULL，每次写入提交后即持久化）
+
+    每次写入都会等待 fsync，方法均为同步调用，在事件循环中须经 asyncio.to_thread 调用。
+    创建对象不访问磁盘：数据库在 open()（服务器启动时）或第一次读写时创建。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.owner = _process_identity()
+        self._opened = False
+        self._open_lock = threading.Lock()
+
+    def open(self) -> None:
+        """创建数据库文件和表结构（重复调用无开销）"""
+        with self._open_lock:
+            if self._opened:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = self._open_connection()
+            try:
+                with conn:
+                    conn.executescript(_SCHEMA)
+                    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+                    if "owner" not in columns:
+                        conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            finally:
+                conn.close()
+            self._opened = True
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，退出时提交（异常时回滚）并关闭"""
+        if not self._opened:
+            self.open()
+        conn = self._open_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _event(self, conn: sqlite3.Connection, job_id: str, state: str, detail: Optional[str] = None) -> None:
+        conn.execute("INSERT INTO job_events VALUES (?, ?, ?, ?)", (job_id, time.time(), state, detail))
+
+    # ---- 写入 ----
+
+    def begin(self, kind: str, params: dict, output_path: Optional[str] = None, temp_paths: Sequence[str] = ()) -> str:
+        """登记新任务（状态 queued），返回任务 id"""
+        job_id = f"{kind}-{uuid.uuid4().hex[:12]}"
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, params, state, output_path, temp_paths, owner, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (
+                    job_id, kind, json.dumps(params, ensure_ascii=False), output_path, json.dumps(list(temp_paths)),
+                    self.owner, now, now
+                )
+            )
+            self._event(conn, job_id, "queued")
+        return job_id
+
+    def transition(self, job_id: str, state: str, detail: Optional[str] = None) -> None:
+        if state not in JOB_STATES:
+            raise ValueError(f"未知的任务状态 {state}")
+        with self._connect() as conn:
+            extra = ", attempts = attempts + 1" if state == "running" else ""
+            conn.execute(f"UPDATE jobs SET state = ?, updated_at = ?{extra} WHERE job_id = ?", (state, time.time(), job_id))
+            self._event(conn, job_id, state, detail)
+
+    def add_temp_paths(self, job_id: str, *paths: str) -> None:
+        """登记临时文件（在 FFmpeg 写入之前调用），中断后这些文件会被清理"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT temp_paths FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            existing = json.loads(row["temp_paths"]) if row else []
+            merged = existing + [p for p in paths if p not in existing]
+            conn.execute("UPDATE jobs SET temp_paths = ?, updated_at = ? WHERE job_id = ?", (json.dumps(merged), time.time(), job_id))
+
+    def set_pid(self, job_id: str, pid: Optional[int]) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET pid = ? WHERE job_id = ?", (pid, job_id))
+
+    def complete_chunk(self, job_id: str, name: str, path: str) -> None:
+        """记录一个已完成的分块（文件已写完并重命名到最终位置）"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_chunks VALUES (?, ?, ?, ?, ?)",
+                (job_id, name, path, os.path.getsize(path), time.time())
+            )
+            self._event(conn, job_id, "chunk", name)
+
+    def finish(self, job_id: str, ok: bool, message: str) -> None:
+        state = "done" if ok else "failed"
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET state = ?, pid = NULL, {'result' if ok else 'error'} = ?, updated_at = ? WHERE job_id = ?",
+                (state, message, time.time(), job_id)
+            )
+            self._event(conn, job_id, state)
+
+    # ---- 读取 ----
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, state: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """最近的任务（新的在前）"""
+        with self._connect() as conn:
+            if state:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE state = ? ORDER BY created_at DESC LIMIT ?", (state, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def events(self, job_id: str) -> List[Tuple[float, str, Optional[str]]]:
+        with self._connect() as conn:
+            return [
+                (row["at"], row["state"], row["detail"])
+                for row in conn.execute("SELECT * FROM job_events WHERE job_id = ? ORDER BY at", (job_id,))
+            ]
+
+    def completed_chunks(self, job_id: str) -> Dict[str, str]:
+        """已完成且文件完好（大小与记录一致）的分块 {名称: 路径}"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, path, size FROM job_chunks WHERE job_id = ?", (job_id,)).fetchall()
+        chunks = {}
+        for row in rows:
+            try:
+                if os.path.getsize(row["path"]) == row["size"]:
+                    chunks[row["name"]] = row["path"]
+            except OSError:
+                continue
+        return chunks
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["temp_paths"] = json.loads(job["temp_paths"])
+        return job
+
+    # ---- 执行与恢复 ----
+
+    async def run(self, job_id: str, work: Callable[[], Awaitable[Tuple[bool, str]]]) -> str:
+        """
+        执行任务并记录结果（日志写入和临时文件清理都在线程中进行，不阻塞事件循环）
+
+        Args:
+            work: 返回 (是否成功, 结果信息) 的协程函数
+
+        Returns:
+            结果信息
+        """
+        await asyncio.to_thread(self.transition, job_id, "running")
+        try:
+            ok, message = await work()
+        except Exception as e:
+            await asyncio.to_thread(self._settle, job_id, False, str(e))
+            raise
+        # 正常结束（成功或 FFmpeg 报错）都清理临时文件；任务被取消（服务器关闭）时保留状态，下次启动时恢复
+        await asyncio.to_thread(self._settle, job_id, ok, message)
+        return message
+
+    def _settle(self, job_id: str, ok: bool, message: str) -> None:
+        """清理临时文件并记录结果"""
+        self.cleanup(job_id)
+        self.finish(job_id, ok, message)
+
+    def cleanup(self, job_id: str, keep_chunks: bool = False) -> List[str]:
+        """删除任务登记的临时文件，返回实际删除的路径；keep_chunks 为 True 时保留已完成的分块"""
+        job = self.get(job_id)
+        if job is None:
+            return []
+        keep = set(self.completed_chunks(job_id).values()) if keep_chunks else set()
+        removed = []
+        for path in reversed(job["temp_paths"]):
+            if path in keep:
+                continue
+            if os.path.isdir(path) and keep_chunks:
+                # 分块目录保留已完成的分块，只删除其中写了一半的文件
+                for name in os.listdir(path):
+                    child = os.path.join(path, name)
+                    if child not in keep and _remove_path(child):
+                        removed.append(child)
+                continue
+            if _remove_path(path):
+                removed.append(path)
+        return removed
+
+    def recover(self, policy: str = "requeue", max_attempts: int = 3) -> List[dict]:
+        """
+        启动时处理所属服务器进程已退出的未完成任务：结束残留的 FFmpeg 进程并清理半成品，
+        按策略重新排队（保留已完成的分块）或标记失败
+
+        查询和认领在同一个写事务中完成（BEGIN IMMEDIATE 持有任务日志的写锁），同时启动的多个实例
+        不会重复处理同一个任务；仍在运行的其他实例的任务不受影响。
+
+        Returns:
+            每个被中断任务的处理结果：job_id, kind, action（requeue / fail）, removed
+        """
+        if policy not in RECOVERY_POLICIES:
+            raise ValueError(f"不支持的恢复策略 {policy}，可选：{', '.join(RECOVERY_POLICIES)}")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = [
+                row for row in conn.execute(
+                    f"SELECT * FROM jobs WHERE state IN ({', '.join('?' for _ in UNFINISHED_STATES)}) ORDER BY created_at",
+                    UNFINISHED_STATES
+                ).fetchall()
+                if not _owner_alive(row["owner"])
+            ]
+            conn.executemany(
+                "UPDATE jobs SET owner = ? WHERE job_id = ?", [(self.owner, row["job_id"]) for row in rows]
+            )
+
+        recovered = []
+        for job in (self._row(row) for row in rows):
+            _kill_orphan(job["pid"], job["temp_paths"])
+            requeue = policy == "requeue" and job["attempts"] < max_attempts
+            removed = self.cleanup(job["job_id"], keep_chunks=requeue)
+            if requeue:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET state = 'queued', pid = NULL, updated_at = ? WHERE job_id = ?",
+                        (time.time(), job["job_id"])
+                    )
+                    self._event(conn, job["job_id"], "queued", "服务器重启后重新排队")
+            else:
+                reason = "服务器重启时任务被中断" if policy == "fail" else f"已中断 {job['attempts']} 次，不再重试"
+                self.finish(job["job_id"], False, reason)
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM job_chunks WHERE job_id = ?", (job["job_id"],))
+            recovered.append({
+                "job_id": job["job_id"],
+                "kind": job["kind"],
+                "action": "requeue" if requeue else "fail",
+                "removed": removed
+            })
+        return recovered
@@ -0,0 +1,155 @@
+"""
+响度测量（EBU R128）
+loudnorm 第一遍测得的积分响度、真峰值、响度范围和门限只取决于输入，与归一化目标无关，
+因此按文件标识缓存；之后以任意目标归一化只需执行第二遍，混音时也可直接按缓存的响度计算增益
+"""
+
+import json
+import math
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+from .file_identity import get_file_identity
+from .index_cache import FileIndexCache, KeyedLocks
+from .runner import run_ffmpeg_command
+
+# 默认归一化目标（流媒体平台常用值）
+DEFAULT_TARGET_I = -16.0  # 积分响度（LUFS）
+DEFAULT_TARGET_TP = -1.5  # 真峰值上限（dBTP）
+DEFAULT_TARGET_LRA = 11.0  # 响度范围（LU）
+
+# loudnorm 参数的取值范围
+TARGET_I_RANGE = (-70.0, -5.0)
+TARGET_TP_RANGE = (-9.0, 0.0)
+TARGET_LRA_RANGE = (1.0, 50.0)
+
+# 积分响度低于该值视为静音，不做增益
+SILENCE_LUFS = -70.0
+
+
+@dataclass
+class LoudnessMeasurement:
+    """loudnorm 第一遍测量结果"""
+
+    integrated: float  # 积分响度（LUFS）
+    true_peak: float  # 真峰值（dBTP）
+    lra: float  # 响度范围（LU）
+    threshold: float  # 门限（LUFS）
+
+    @property
+    def silent(self) -> bool:
+        return not math.isfinite(self.integrated) or self.integrated < SILENCE_LUFS
+
+    def describe(self) -> str:
+        if self.silent:
+            return "静音"
+        return f"{self.integrated:.1f} LUFS，真峰值 {self.true_peak:.1f} dBTP，响度范围 {self.lra:.1f} LU"
+
+
+def parse_loudnorm_json(stderr: str) -> dict:
+    """解析 loudnorm print_format=json 输出在日志末尾的 JSON 块"""
+    start = stderr.rfind("{")
+    end = stderr.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("日志中没有 loudnorm 测量结果")
+    return json.loads(stderr[start:end + 1])
+
+
+def measurement_from_log(stderr: str) -> LoudnessMeasurement:
+    data = parse_loudnorm_json(stderr)
+    return LoudnessMeasurement(
+        integrated=float(data["input_i"]),
+        true_peak=float(data["input_tp"]),
+        lra=float(data["input_lra"]),
+        threshold=float(data["input_thresh"])
+    )
+
+
+def loudnorm_filter(
+    measurement: Optional[LoudnessMeasurement],
+    target_i: float = DEFAULT_TARGET_I,
+    target_tp: float = DEFAULT_TARGET_TP,
+    target_lra: float = DEFAULT_TARGET_LRA
+) -> str:
+    """
+    loudnorm 第二遍滤镜：带入测量值并使用线性模式（测得的响度范围超过目标时 loudnorm 自动改用动态模式）；
+    没有测量值或输入为静音时退化为单遍动态归一化
+    """
+    base = f"loudnorm=I={target_i:g}:TP={target_tp:g}:LRA={target_lra:g}"
+    if measurement is None or measurement.silent:
+        return f"{base}:print_format=json"
+    return (
+        f"{base}:measured_I={measurement.integrated:.2f}:measured_TP={measurement.true_peak:.2f}"
+        f":measured_LRA={measurement.lra:.2f}:measured_thresh={measurement.threshold:.2f}"
+        ":linear=true:print_format=json"
+    )
+
+
+def gain_to_target(measurement: LoudnessMeasurement, target_i: float, target_tp: Optional[float] = None) -> float:
+    """
+    把积分响度调整到目标所需的增益（dB），静音输入不调整
+
+    给出 target_tp 时增益不超过真峰值余量（target_tp - 测得的真峰值），峰值较高的安静素材不会削波，
+    调整后的响度会低于目标
+    """
+    if measurement.silent:
+        return 0.0
+    gain = target_i - measurement.integrated
+    if target_tp is not None:
+        gain = min(gain, target_tp - measurement.true_peak)
+    return gain
+
+
+def peak_limiter_filter(target_tp: float = DEFAULT_TARGET_TP) -> str:
+    """把样本峰值限制在 target_tp（dBFS）以下的前视限幅器（关闭自动电平，不改变整体响度）"""
+    return f"alimiter=limit={10 ** (target_tp / 20):.4f}:level=0:latency=1"
+
+
+class LoudnessCache:
+    """loudnorm 第一遍测量结果的缓存（cache_dir/loudness，按文件标识）"""
+
+    def __init__(self, cache_dir: str):
+        self.index = FileIndexCache(cache_dir, "loudness")
+        self._locks = KeyedLocks()
+
+    def get(self, path: str) -> Optional[LoudnessMeasurement]:
+        """读取缓存的测量结果，没有时返回 None"""
+        data = self.index.load(get_file_identity(path))
+        if data is None:
+            return None
+        return LoudnessMeasurement(data["integrated"], data["true_peak"], data["lra"], data["threshold"])
+
+    async def measure(self, path: str, force: bool = False) -> Tuple[LoudnessMeasurement, bool]:
+        """
+        测量第一条音频流的响度，优先读取缓存（同一文件的并发调用共享一次测量）
+
+        Returns:
+            (测量结果, 是否命中缓存)
+        """
+        identity = get_file_identity(path)
+        async with self._locks.hold(identity.key):
+            if not force:
+                cached = self.get(path)
+                if cached is not None:
+                    return cached, True
+
+            cmd = [
+                "ffmpeg", "-hide_banner", "-nostats",
+                "-i", path,
+                "-map", "0:a:0",
+                "-af", "loudnorm=print_format=json",
+                "-f", "null", "-"
+            ]
+            start = time.perf_counter()
+            result = await run_ffmpeg_command(cmd)
+            if result.returncode != 0:
+                raise RuntimeError(f"响度测量失败：{result.stderr[-500:]}")
+            measurement = measurement_from_log(result.stderr)
+            self.index.save(identity, {
+                "path": identity.path,
+                "created": time.time(),
+                "measure_seconds": time.perf_counter() - start,
+                **asdict(measurement)
+            })
+            return measurement, False
@@ -0,0 +1,366 @@
+"""
+单次解码的内容分析
+把 blackdetect、freezedetect、cropdetect、场景分数和 silencedetect 挂在同一次解码的滤镜图上，
+逐行解析流式日志得到全部事件；结果按文件标识缓存（cache_dir/analysis），之后查询任意检测器都不再解码。
+场景分数按最低阈值保存，更换切换阈值也无需重新分析
+"""
+
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .file_identity import get_file_identity
+from .index_cache import FileIndexCache, KeyedLocks
+from .probe import get_audio_stream, get_duration, get_video_stream, probe_media
+from .runner import stream_ffmpeg_log
+from .timecode import parse_duration_from_log
+
+# 检测器名称；除 silence 外都作用于第一条视频流
+VIDEO_DETECTORS = ("black", "freeze", "crop", "scene")
+AUDIO_DETECTORS = ("silence",)
+DETECTORS = VIDEO_DETECTORS + AUDIO_DETECTORS
+
+SCENE_SCORE_FLOOR = 0.1  # 保存的最低场景分数
+SCENE_ANALYSIS_WIDTH = 320  # 计算场景分数时缩放到的宽度
+CROP_MIN_SECONDS = 2.0  # 持续时间短于该值的裁剪区域视为噪声（暗场、字幕闪现）
+
+# 滤镜日志行：[blackdetect @ 0x...] 或 [Parsed_blackdetect_0 @ 0x...]
+_FILTER_LINE_RE = re.compile(r"^\[(?:Parsed_)?([a-z]+?)(?:_\d+)? @ 0x[0-9a-f]+\]\s*(.*)$")
+_BLACK_RE = re.compile(r"black_start:\s*(-?[0-9.]+)\s+black_end:\s*(-?[0-9.]+)")
+_FREEZE_START_RE = re.compile(r"freeze_start:\s*(-?[0-9.]+)")
+_FREEZE_END_RE = re.compile(r"freeze_end:\s*(-?[0-9.]+)")
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[0-9.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[0-9.]+)")
+_CROP_RE = re.compile(r"\bt:\s*(-?[0-9.]+).*crop=(-?\d+):(-?\d+):(-?\d+):(-?\d+)")
+_PTS_TIME_RE = re.compile(r"pts_time:(-?[0-9.]+)")
+_SCENE_SCORE_RE = re.compile(r"lavfi\.scene_score=([0-9.]+)")
+
+Interval = Tuple[float, float]
+CropBox = Tuple[int, int, int, int]  # (宽, 高, x, y)
+
+
+@dataclass
+class AnalysisOptions:
+    """影响检测结果的解码参数（每组参数单独缓存）"""
+
+    black_min_duration: float = 0.5  # 黑场最短持续时间（秒）
+    black_pixel_threshold: float = 0.10  # 像素亮度低于该比例视为黑色
+    freeze_noise_db: float = -60.0  # 帧间差异低于该值视为静止
+    freeze_min_duration: float = 2.0  # 静止画面最短持续时间（秒）
+    silence_noise_db: float = -30.0  # 静音电平（dB）
+    silence_min_duration: float = 0.5  # 静音最短持续时间（秒）
+    crop_limit: int = 24  # 黑边亮度上限（0-255）
+    crop_fps: float = 1.0  # 检测黑边的采样帧率
+
+    def key(self) -> str:
+        return (
+            f"b{self.black_min_duration:g}_{self.black_pixel_threshold:g}"
+            f"_f{self.freeze_noise_db:g}_{self.freeze_min_duration:g}"
+            f"_s{self.silence_noise_db:g}_{self.silence_min_duration:g}"
+            f"_c{self.crop_limit}_{self.crop_fps:g}"
+        )
+
+
+@dataclass
+class TimelineEvent:
+    """时间线上的一个事件（场景切换没有结束时间）"""
+
+    start: float
+    end: Optional[float]
+    kind: str
+    detail: str = ""
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+@dataclass
+class MediaTimeline:
+    """一次分析得到的全部检测结果"""
+
+    duration: Optional[float]
+    detectors: List[str]  # 实际运行的检测器（没有对应流的不运行）
+    width: Optional[int] = None
+    height: Optional[int] = None
+    black: List[Interval] = field(default_factory=list)
+    freeze: List[Interval] = field(default_factory=list)
+    silence: List[Interval] = field(default_factory=list)
+    scenes: List[Tuple[float, float]] = field(default_factory=list)  # (时间, 分数)，分数不低于 scene_floor
+    crops: List[Tuple[float, float, int, int, int, int]] = field(default_factory=list)  # (开始, 结束, 宽, 高, x, y)
+    scene_floor: float = SCENE_SCORE_FLOOR
+
+    def scene_cuts(self, threshold: float) -> List[Tuple[float, float]]:
+        return [(t, score) for t, score in self.scenes if score >= threshold]
+
+    def dominant_crop(self) -> Optional[CropBox]:
+        """持续时间最长的裁剪区域"""
+        totals: Dict[CropBox, float] = {}
+        for start, end, *box in self.crops:
+            totals[tuple(box)] = totals.get(tuple(box), 0.0) + end - start
+        return max(totals, key=totals.get) if totals else None
+
+    def events(self, detectors: Sequence[str] = DETECTORS, scene_threshold: float = 0.4) -> List[TimelineEvent]:
+        """按时间排序的事件列表；裁剪区域只在与画面尺寸不同时作为事件"""
+        events = []
+        for kind in ("black", "freeze", "silence"):
+            if kind in detectors:
+                events.extend(TimelineEvent(start, end, kind) for start, end in getattr(self, kind))
+        if "scene" in detectors:
+            events.extend(TimelineEvent(t, None, "scene", f"{score:.3f}") for t, score in self.scene_cuts(scene_threshold))
+        if "crop" in detectors:
+            for start, end, w, h, x, y in self.crops:
+                if (w, h) != (self.width, self.height):
+                    events.append(TimelineEvent(start, end, "crop", f"crop={w}:{h}:{x}:{y}"))
+        events.sort(key=lambda event: (event.start, event.kind))
+        return events
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MediaTimeline":
+        return cls(
+            duration=data["duration"],
+            detectors=list(data["detectors"]),
+            width=data.get("width"),
+            height=data.get("height"),
+            black=[tuple(item) for item in data["black"]],
+            freeze=[tuple(item) for item in data["freeze"]],
+            silence=[tuple(item) for item in data["silence"]],
+            scenes=[tuple(item) for item in data["scenes"]],
+            crops=[tuple(item) for item in data["crops"]],
+            scene_floor=data.get("scene_floor", SCENE_SCORE_FLOOR)
+        )
+
+
+def build_analysis_command(
+    input_path: str,
+    video_index: Optional[int],
+    audio_index: Optional[int],
+    options: AnalysisOptions
+) -> List[str]:
+    """
+    构建单次解码的分析命令：视频经 split 分为三路（黑场和静止检测后直接丢弃、按 crop_fps 抽帧检测黑边、
+    缩小后计算场景分数），音频一路检测静音，每路输出到 null
+    """
+    graphs = []
+    outputs = []
+    if video_index is not None:
+        graphs.append(
+            f"[0:{video_index}]"
+            f"blackdetect=d={options.black_min_duration:g}:pix_th={options.black_pixel_threshold:g},"
+            f"freezedetect=n={options.freeze_noise_db:g}dB:d={options.freeze_min_duration:g},"
+            "split=3[vblack][vcrop][vscene]"
+        )
+        graphs.append(
+            f"[vcrop]fps={options.crop_fps:g},"
+            f"cropdetect=limit={options.crop_limit}:round=2:reset=1:skip=0[cropout]"
+        )
+        graphs.append(
+            f"[vscene]scale={SCENE_ANALYSIS_WIDTH}:-2:flags=fast_bilinear,"
+            # 总是保留第一帧，否则没有切换的视频会因该路输出为空而失败
+            f"select='gte(scene,{SCENE_SCORE_FLOOR})+eq(n,0)',metadata=print:key=lavfi.scene_score[sceneout]"
+        )
+        outputs.extend(["[vblack]", "[cropout]", "[sceneout]"])
+    if audio_index is not None:
+        graphs.append(
+            f"[0:{audio_index}]silencedetect=noise={options.silence_noise_db:g}dB:"
+            f"d={options.silence_min_duration:g}[silenceout]"
+        )
+        outputs.append("[silenceout]")
+
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-i", input_path, "-filter_complex", ";".join(graphs)]
+    for label in outputs:
+        cmd.extend(["-map", label, "-f", "null", "-"])
+    return cmd
+
+
+class AnalysisLogParser:
+    """逐行解析分析命令的日志，按滤镜名称分派给各检测器"""
+
+    def __init__(self):
+        self.duration: Optional[float] = None
+        self.black: List[Interval] = []
+        self.freeze: List[Interval] = []
+        self.silence: List[Interval] = []
+        self.scenes: List[Tuple[float, float]] = []
+        self.crop_samples: List[Tuple[float, CropBox]] = []
+        self._freeze_start: Optional[float] = None
+        self._silence_start: Optional[float] = None
+        self._scene_time: Optional[float] = None
+
+    def feed(self, line: str) -> None:
+        match = _FILTER_LINE_RE.match(line)
+        if match is None:
+            if self.duration is None and "Duration:" in line:
+                self.duration = parse_duration_from_log(line)
+            return
+        name, message = match.groups()
+        handler = getattr(self, f"_on_{name}", None)
+        if handler is not None:
+            handler(message)
+
+    def _on_blackdetect(self, message: str) -> None:
+        match = _BLACK_RE.search(message)
+        if match:
+            self.black.append((_round(match.group(1)), _round(match.group(2))))
+
+    def _on_freezedetect(self, message: str) -> None:
+        start = _FREEZE_START_RE.search(message)
+        if start:
+            self._freeze_start = _round(start.group(1))
+            return
+        end = _FREEZE_END_RE.search(message)
+        if end and self._freeze_start is not None:
+            self.freeze.append((self._freeze_start, _round(end.group(1))))
+            self._freeze_start = None
+
+    def _on_silencedetect(self, message: str) -> None:
+        start = _SILENCE_START_RE.search(message)
+        if start:
+            self._silence_start = _round(start.group(1))
+            return
+        end = _SILENCE_END_RE.search(message)
+        if end and self._silence_start is not None:
+            self.silence.append((self._silence_start, _round(end.group(1))))
+            self._silence_start = None
+
+    def _on_cropdetect(self, message: str) -> None:
+        match = _CROP_RE.search(message)
+        if match:
+            w, h, x, y = (int(value) for value in match.groups()[1:])
+            if w > 0 and h > 0:  # 全黑的帧没有有效区域
+                self.crop_samples.append((float(match.group(1)), (w, h, x, y)))
+
+    def _on_metadata(self, message: str) -> None:
+        time_match = _PTS_TIME_RE.search(message)
+        if time_match:
+            self._scene_time = _round(time_match.group(1))
+            return
+        score_match = _SCENE_SCORE_RE.search(message)
+        if score_match and self._scene_time is not None:
+            score = round(float(score_match.group(1)), 4)
+            if score >= SCENE_SCORE_FLOOR:
+                self.scenes.append((self._scene_time, score))
+            self._scene_time = None
+
+    def finish(self, duration: Optional[float], crop_interval: float) -> dict:
+        """结束解析：未闭合的静止和静音延伸到文件末尾，黑边采样合并为区间"""
+        duration = duration or self.duration
+        if duration is not None:
+            if self._freeze_start is not None:
+                self.freeze.append((self._freeze_start, round(duration, 3)))
+            if self._silence_start is not None:
+                self.silence.append((self._silence_start, round(duration, 3)))
+        return {
+            "duration": duration,
+            "black": self.black,
+            "freeze": self.freeze,
+            "silence": self.silence,
+            "scenes": self.scenes,
+            "crops": crop_segments(self.crop_samples, crop_interval, duration)
+        }
+
+
+def _round(value: str) -> float:
+    return round(max(0.0, float(value)), 3)
+
+
+def crop_segments(
+    samples: Sequence[Tuple[float, CropBox]],
+    interval: float,
+    duration: Optional[float] = None,
+    min_seconds: float = CROP_MIN_SECONDS
+) -> List[Tuple[float, float, int, int, int, int]]:
+    """
+    把逐帧的裁剪采样合并为区间：相同区域的连续采样合为一段，短于 min_seconds 的段视为噪声丢弃后
+    再合并相邻的相同区域（每个采样覆盖 interval 秒）
+    """
+    runs: List[list] = []
+    for t, box in samples:
+        if runs and runs[-1][2] == box and t - runs[-1][1] <= interval * 0.5:
+            runs[-1][1] = t + interval
+        else:
+            runs.append([t, t + interval, box])
+
+    kept = [run for run in runs if run[1] - run[0] >= min_seconds] or runs
+    merged: List[list] = []
+    for start, end, box in kept:
+        if merged and merged[-1][2] == box:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end, box])
+
+    segments = []
+    for start, end, box in merged:
+        if duration is not None:
+            end = min(end, duration)
+        segments.append((round(start, 3), round(end, 3), *box))
+    return segments
+
+
+class MediaAnalysisCache:
+    """单次解码分析结果的缓存（cache_dir/analysis，按文件标识和分析参数）"""
+
+    def __init__(self, cache_dir: str):
+        self.index = FileIndexCache(cache_dir, "analysis")
+        self._locks = KeyedLocks()
+
+    async def analyze(
+        self,
+        path: str,
+        options: Optional[AnalysisOptions] = None,
+        force: bool = False
+    ) -> Tuple[MediaTimeline, bool]:
+        """
+        分析媒体文件，优先读取缓存（同一文件的并发调用共享一次解码）
+
+        始终运行文件中有对应流的全部检测器，之后查询其中任意一部分都直接读取缓存。
+
+        Returns:
+            (时间线, 是否命中缓存)
+        """
+        options = options or AnalysisOptions()
+        identity = get_file_identity(path)
+        async with self._locks.hold(identity.key):
+            index = self.index.load(identity) or {"version": 1, "variants": {}}
+            entry = index["variants"].get(options.key())
+            if entry is not None and not force:
+                return MediaTimeline.from_dict(entry["timeline"]), True
+
+            info = await probe_media(path)
+            video = get_video_stream(info)
+            audio = get_audio_stream(info)
+            if video is None and audio is None:
+                raise RuntimeError(f"没有可分析的音视频流 - {path}")
+
+            start = time.perf_counter()
+            parser = AnalysisLogParser()
+            cmd = build_analysis_command(
+                path,
+                video["index"] if video is not None else None,
+                audio["index"] if audio is not None else None,
+                options
+            )
+            async for line in stream_ffmpeg_log(cmd):
+                parser.feed(line)
+
+            detectors = (list(VIDEO_DETECTORS) if video is not None else []) + \
+                (list(AUDIO_DETECTORS) if audio is not None else [])
+            timeline = MediaTimeline(
+                detectors=detectors,
+                width=video.get("width") if video is not None else None,
+                height=video.get("height") if video is not None else None,
+                **parser.finish(get_duration(info), 1.0 / options.crop_fps)
+            )
+
+            index["path"] = identity.path
+            index["variants"][options.key()] = {
+                "created": time.time(),
+                "analysis_seconds": time.perf_counter() - start,
+                "timeline": timeline.to_dict()
+            }
+            self.index.save(identity, index)
+            return timeline, False
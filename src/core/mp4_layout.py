@@ -0,0 +1,84 @@
+"""
+MP4 流式封装
+在同一次 FFmpeg 调用中输出 moov 前置（faststart）或分片（fragmented）的 MP4，
+并通过读取顶层 box 结构确认输出布局
+"""
+
+import os
+import struct
+from typing import List
+
+# 输出封装方式对应的 movflags
+STREAMING_MODES = {
+    "none": [],
+    "faststart": ["-movflags", "+faststart"],
+    "fragmented": ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"],
+}
+
+# 使用 mov/mp4 复用器的扩展名
+MP4_EXTENSIONS = {".mp4", ".m4v", ".m4a", ".mov", ".3gp"}
+
+
+def is_mp4_output(output_path: str) -> bool:
+    """输出文件是否使用 mov/mp4 复用器"""
+    return os.path.splitext(output_path)[1].lower() in MP4_EXTENSIONS
+
+
+def streaming_output_args(streaming_mode: str, output_path: str) -> List[str]:
+    """返回对应封装方式的输出参数，非 MP4 输出或未知方式时抛出 ValueError"""
+    if streaming_mode not in STREAMING_MODES:
+        raise ValueError(f"未知的封装方式: {streaming_mode}（可选: {', '.join(STREAMING_MODES)}）")
+    if streaming_mode != "none" and not is_mp4_output(output_path):
+        raise ValueError(f"{streaming_mode} 仅适用于 MP4/MOV 输出 - {output_path}")
+    return list(STREAMING_MODES[streaming_mode])
+
+
+def inspect_mp4_layout(path: str, max_boxes: int = 10000) -> dict:
+    """
+    读取 MP4 顶层 box 顺序（只读取 box 头，不读取媒体数据）
+
+    Returns:
+        boxes: [(类型, 偏移, 大小)]，moov_offset / mdat_offset: 首次出现的偏移（无则为 None），
+        faststart: moov 是否在 mdat 之前，fragmented: 是否包含 moof
+    """
+    boxes = []
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset + 8 <= file_size and len(boxes) < max_boxes:
+            f.seek(offset)
+            size, box_type = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+            elif size == 0:
+                size = file_size - offset
+            if size < 8:
+                break
+            boxes.append((box_type.decode("latin-1"), offset, size))
+            offset += size
+
+    def first_offset(box_type):
+        return next((o for t, o, _ in boxes if t == box_type), None)
+
+    moov_offset = first_offset("moov")
+    mdat_offset = first_offset("mdat")
+    return {
+        "boxes": boxes,
+        "moov_offset": moov_offset,
+        "mdat_offset": mdat_offset,
+        "faststart": moov_offset is not None and (mdat_offset is None or moov_offset < mdat_offset),
+        "fragmented": any(t == "moof" for t, _, _ in boxes)
+    }
+
+
+def describe_mp4_layout(path: str) -> str:
+    """生成输出布局说明，用于工具返回结果"""
+    layout = inspect_mp4_layout(path)
+    if layout["moov_offset"] is None:
+        return "moov 位置: 未找到 ✗"
+    position = "文件开头 ✓" if layout["faststart"] else "文件末尾（需下载完整文件才能播放）"
+    info = f"moov 位置: {position}（偏移 {layout['moov_offset']}）"
+    if layout["fragmented"]:
+        fragments = sum(1 for t, _, _ in layout["boxes"] if t == "moof")
+        info += f"\n分片 MP4: {fragments} 个分片"
+    return info
@@ -0,0 +1,201 @@
+"""
+管道输入输出
+FFmpeg 从标准输入读取、向标准输出写入的格式定义，以及在内存中按块传递数据的有界字节流，
+使生产者和消费者可以同时进行而不需要先在磁盘上生成完整文件
+"""
+
+import asyncio
+import itertools
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl
+    fcntl = None
+
+from .mp4_layout import STREAMING_MODES
+
+# 管道缓冲区上限（Linux 默认允许非特权进程设置到 1MB）
+PIPE_BUFFER_MAX = 1 << 20
+
+# 可写入管道的输出格式（不需要回写文件头的容器）
+PIPE_FORMATS = {
+    "mpegts": {"args": ["-f", "mpegts"], "mime_type": "video/mp2t"},
+    "matroska": {"args": ["-f", "matroska"], "mime_type": "video/x-matroska"},
+    "webm": {"args": ["-f", "webm"], "mime_type": "video/webm"},
+    "fmp4": {"args": ["-f", "mp4", *STREAMING_MODES["fragmented"]], "mime_type": "video/mp4"},
+    "adts": {"args": ["-f", "adts"], "mime_type": "audio/aac"},
+    "mp3": {"args": ["-f", "mp3"], "mime_type": "audio/mpeg"},
+    "s16le": {"args": ["-f", "s16le"], "mime_type": "audio/L16"},
+    "f32le": {"args": ["-f", "f32le"], "mime_type": "application/octet-stream"},
+}
+
+STREAM_URI_PREFIX = "stream://"
+
+
+def pipe_output_args(output_format: str) -> List[str]:
+    """返回向标准输出写入指定格式的参数，不支持管道输出的格式抛出 ValueError"""
+    if output_format not in PIPE_FORMATS:
+        raise ValueError(f"不支持管道输出的格式: {output_format}（可选: {', '.join(PIPE_FORMATS)}）")
+    return list(PIPE_FORMATS[output_format]["args"])
+
+
+def set_pipe_buffer_size(fd: int, size: int) -> bool:
+    """尽量设置管道的内核缓冲区大小（仅 Linux），返回是否成功"""
+    set_pipe_size = getattr(fcntl, "F_SETPIPE_SZ", None) if fcntl else None
+    if set_pipe_size is None:
+        return False
+    try:
+        fcntl.fcntl(fd, set_pipe_size, min(size, PIPE_BUFFER_MAX))
+        return True
+    except OSError:
+        return False
+
+
+class MediaStream:
+    """
+    按块传递的有界字节流
+
+    写入方在缓冲块数达到上限时等待（背压），读取方按序号依次读取；
+    最近读取的一块会保留，以便同一序号重复读取。也可以作为异步迭代器直接送入 FFmpeg 标准输入。
+    """
+
+    def __init__(self, stream_id: str, kind: str, mime_type: str, max_buffered_chunks: int = 8):
+        self.stream_id = stream_id
+        self.kind = kind
+        self.mime_type = mime_type
+        self.description = ""
+        self.error: Optional[str] = None
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.next_index = 0
+        self.finished = False
+        self.eof = False
+        self.created = time.time()
+        self.last_access = self.created
+        self.task: Optional[asyncio.Task] = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_buffered_chunks))
+        self._last_chunk: Optional[Tuple[int, bytes]] = None
+
+    @property
+    def uri(self) -> str:
+        return f"{STREAM_URI_PREFIX}{self.stream_id}"
+
+    @property
+    def buffered_chunks(self) -> int:
+        return self._queue.qsize()
+
+    async def write(self, data: bytes) -> None:
+        """写入一块数据，缓冲区满时等待读取方"""
+        if self.finished:
+            raise RuntimeError(f"流已结束写入 - {self.stream_id}")
+        if not data:
+            return
+        self.last_access = time.time()
+        await self._queue.put(bytes(data))
+        self.bytes_written += len(data)
+
+    async def finish(self, error: Optional[str] = None) -> None:
+        """结束写入；error 不为空时读取方在读完已有数据后收到错误"""
+        if self.finished:
+            return
+        self.finished = True
+        self.error = error
+        await self._queue.put(None)
+
+    async def read_chunk(self, index: Optional[int] = None, timeout: Optional[float] = None) -> Tuple[int, bytes, bool]:
+        """
+        读取下一块数据
+
+        Args:
+            index: 期望的序号（可选）；等于上一块的序号时返回缓存的上一块
+            timeout: 等待写入方的最长秒数
+
+        Returns:
+            (序号, 数据, 是否已到结尾)
+        """
+        self.last_access = time.time()
+        if index is not None and self._last_chunk is not None and index == self._last_chunk[0]:
+            return self._last_chunk[0], self._last_chunk[1], False
+        if index is not None and index != self.next_index:
+            raise ValueError(f"只能按顺序读取，下一块序号为 {self.next_index}")
+        if self.eof:
+            return self.next_index, b"", True
+
+        data = await asyncio.wait_for(self._queue.get(), timeout)
+        if data is None:
+            self.eof = True
+            if self.error:
+                raise RuntimeError(self.error)
+            return self.next_index, b"", True
+
+        chunk_index = self.next_index
+        self.next_index += 1
+        self.bytes_read += len(data)
+        self._last_chunk = (chunk_index, data)
+        return chunk_index, data, False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            _, data, eof = await self.read_chunk()
+            if eof:
+                return
+            yield data
+
+    async def close(self) -> None:
+        """取消生产任务并丢弃缓冲数据"""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.finished = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:  # 被唤醒的写入方已抢先填入
+            pass
+
+
+class StreamRegistry:
+    """管理进行中的字节流，超过空闲时间未访问的流会被关闭"""
+
+    def __init__(self, idle_timeout: float = 300.0):
+        self.idle_timeout = idle_timeout
+        self._streams: Dict[str, MediaStream] = {}
+        self._counter = itertools.count(1)
+
+    def create(self, kind: str, mime_type: str, max_buffered_chunks: int = 8) -> MediaStream:
+        stream_id = f"{kind}-{next(self._counter)}-{uuid.uuid4().hex[:8]}"
+        stream = MediaStream(stream_id, kind, mime_type, max_buffered_chunks)
+        self._streams[stream_id] = stream
+        return stream
+
+    def get(self, stream_id: str) -> MediaStream:
+        """按 id 或 stream:// 地址查找，不存在时抛出 ValueError"""
+        if stream_id.startswith(STREAM_URI_PREFIX):
+            stream_id = stream_id[len(STREAM_URI_PREFIX):].split("/", 1)[0]
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            raise ValueError(f"流不存在或已过期 - {stream_id}")
+        return stream
+
+    def list(self) -> List[MediaStream]:
+        return list(self._streams.values())
+
+    async def close(self, stream_id: str) -> None:
+        stream = self.get(stream_id)
+        del self._streams[stream.stream_id]
+        await stream.close()
+
+    async def expire_idle(self) -> int:
+        """关闭空闲超时的流，返回关闭数量"""
+        now = time.time()
+        expired = [s.stream_id for s in self._streams.values() if now - s.last_access > self.idle_timeout]
+        for stream_id in expired:
+            await self.close(stream_id)
+        return len(expired)
@@ -0,0 +1,30 @@
+"""
+有界并发执行
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Iterable, List, TypeVar
+
+from .tracing import span
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def gather_bounded(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    max_workers: int = 4
+) -> List[R]:
+    """以最多 max_workers 个并发执行 worker，按输入顺序返回结果（异常作为结果返回）"""
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def run(item: T):
+        with span("queue.wait", **{"queue.max_workers": max_workers}):
+            await semaphore.acquire()
+        try:
+            return await worker(item)
+        finally:
+            semaphore.release()
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
@@ -0,0 +1,405 @@
+"""
+编码前预检
+启动 FFmpeg 之前检查编码器 / 封装器 / 滤镜 / 硬件加速是否可用（能力表按 FFmpeg 可执行文件缓存）、
+编码格式与容器是否兼容、输出目录是否可写、剩余磁盘空间是否足够，让注定失败的任务在毫秒级被拒绝
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set
+
+from .probe import get_audio_stream, get_duration, get_video_stream, probe_media
+from .runner import run_ffmpeg_command
+from .tracing import current_span, traced
+
+# 输出扩展名 → FFmpeg 默认选择的封装器
+EXTENSION_MUXERS = {
+    "mp4": "mp4", "m4v": "ipod", "m4a": "ipod", "mov": "mov", "3gp": "3gp",
+    "mkv": "matroska", "mka": "matroska", "webm": "webm",
+    "avi": "avi", "flv": "flv", "ts": "mpegts", "mpg": "mpeg", "mpeg": "mpeg",
+    "mp3": "mp3", "aac": "adts", "wav": "wav", "flac": "flac", "ogg": "ogg", "oga": "oga", "opus": "opus",
+    "ac3": "ac3", "gif": "gif", "jpg": "image2", "jpeg": "image2", "png": "image2", "bmp": "image2", "webp": "image2",
+}
+
+# 封装器允许的编码格式（video / audio；None 表示不限制，空集合表示不能包含该类型的流）。
+# 只列出限制明确、FFmpeg 会直接报错的容器，其余容器不做兼容性检查
+MUXER_CODECS: Dict[str, Dict[str, Optional[Set[str]]]] = {
+    "mp4": {
+        "video": {"h264", "hevc", "av1", "vp9", "mpeg4", "mpeg2video", "mjpeg", "png"},
+        "audio": {"aac", "mp3", "ac3", "eac3", "alac", "opus", "flac", "mp2"},
+    },
+    "ipod": {"video": {"h264", "mpeg4"}, "audio": {"aac", "alac", "ac3"}},
+    "webm": {"video": {"vp8", "vp9", "av1"}, "audio": {"vorbis", "opus"}},
+    "flv": {
+        "video": {"h264", "flv1", "vp6f", "mpeg4", "hevc", "av1"},
+        "audio": {"aac", "mp3", "pcm_s16le", "pcm_u8", "nellymoser", "speex", "adpcm_swf"},
+    },
+    "mp3": {"video": {"mjpeg", "png"}, "audio": {"mp3"}},
+    "adts": {"video": set(), "audio": {"aac"}},
+    "wav": {"video": set(), "audio": None},
+    "flac": {"video": {"mjpeg", "png"}, "audio": {"flac"}},
+    "ogg": {"video": {"theora", "vp8"}, "audio": {"vorbis", "opus", "flac", "speex"}},
+    "oga": {"video": set(), "audio": {"vorbis", "opus", "flac", "speex"}},
+    "opus": {"video": set(), "audio": {"opus"}},
+    "ac3": {"video": set(), "audio": {"ac3"}},
+    "gif": {"video": {"gif"}, "audio": set()},
+}
+
+# 可容纳的编码格式很多、上表只列出常见格式的封装器：不在表中的编码格式只给出提示，交给 FFmpeg 判断
+ADVISORY_MUXERS = {"mp4"}
+
+# -c copy 时音频只能是 PCM 的封装器
+PCM_ONLY_MUXERS = {"wav"}
+
+STREAM_LABELS = {"video": "视频", "audio": "音频"}
+
+
+@dataclass
+class FFmpegCapabilities:
+    """FFmpeg 能力表：编码器（名称 → 编码格式）、封装器、滤镜和硬件加速方式"""
+
+    encoders: Dict[str, str] = field(default_factory=dict)
+    muxers: Set[str] = field(default_factory=set)
+    filters: Set[str] = field(default_factory=set)
+    hwaccels: Set[str] = field(default_factory=set)
+
+    def to_dict(self) -> dict:
+        return {
+            "encoders": self.encoders,
+            "muxers": sorted(self.muxers),
+            "filters": sorted(self.filters),
+            "hwaccels": sorted(self.hwaccels)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FFmpegCapabilities":
+        return cls(
+            encoders=dict(data["encoders"]),
+            muxers=set(data["muxers"]),
+            filters=set(data["filters"]),
+            hwaccels=set(data["hwaccels"])
+        )
+
+
+def _listing_lines(output: str) -> List[str]:
+    """跳过 -encoders / -muxers 输出开头的图例（以一行短横线结束，不同 FFmpeg 版本长度不同）"""
+    lines = output.splitlines()
+    for i, line in enumerate(lines):
+        if re.fullmatch(r"-{2,}", line.strip()):
+            return lines[i + 1:]
+    return lines
+
+
+def parse_encoders(output: str) -> Dict[str, str]:
+    """解析 ffmpeg -encoders：名称与编码格式不同时描述末尾带有 (codec xxx)"""
+    encoders = {}
+    for line in _listing_lines(output):
+        parts = line.split(None, 2)
+        if len(parts) < 2 or parts[1] == "=":
+            continue
+        match = re.search(r"\(codec (\S+)\)\s*$", line)
+        encoders[parts[1]] = match.group(1) if match else parts[1]
+    return encoders
+
+
+def parse_muxers(output: str) -> Set[str]:
+    """解析 ffmpeg -muxers（一行可能是逗号分隔的多个名称）"""
+    muxers = set()
+    for line in _listing_lines(output):
+        parts = line.split(None, 2)
+        if len(parts) >= 2 and "E" in parts[0] and parts[1] != "=":
+            muxers.update(parts[1].split(","))
+    return muxers
+
+
+def parse_filters(output: str) -> Set[str]:
+    """解析 ffmpeg -filters：标记列、名称、输入->输出类型"""
+    filters = set()
+    for line in output.splitlines():
+        parts = line.split(None, 3)
+        if len(parts) >= 3 and "->" in parts[2]:
+            filters.add(parts[1])
+    return filters
+
+
+def parse_hwaccels(output: str) -> Set[str]:
+    lines = output.splitlines()
+    return {line.strip() for line in lines[1:] if line.strip()}
+
+
+def parse_bitrate_kbps(value: Optional[str]) -> Optional[float]:
+    """解析 FFmpeg 码率写法（192k、2M、128000），无法解析时返回 None"""
+    if not value:
+        return None
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kKmM]?)\s*", str(value))
+    if not match:
+        return None
+    number = float(match.group(1))
+    unit = match.group(2).lower()
+    return number * 1000 if unit == "m" else number if unit == "k" else number / 1000
+
+
+def _ffmpeg_identity() -> Optional[str]:
+    """FFmpeg 可执行文件的路径、大小和修改时间：更换或升级 FFmpeg 后能力表自动失效"""
+    path = shutil.which("ffmpeg")
+    if path is None:
+        return None
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return f"{real_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _format_mb(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f}MB"
+
+
+@dataclass
+class PreflightReport:
+    """预检结果"""
+
+    problems: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    estimated_bytes: Optional[int] = None
+    free_bytes: Optional[int] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def message(self) -> str:
+        """工具返回的错误信息"""
+        lines = [f"错误：预检未通过（{self.elapsed * 1000:.1f}毫秒），未启动 FFmpeg"]
+        lines.extend(f"  - {problem}" for problem in self.problems)
+        lines.extend(f"  提示：{warning}" for warning in self.warnings)
+        return "\n".join(lines)
+
+
+class Preflight:
+    """
+    编码前预检
+
+    能力表在首次使用时并发运行 ffmpeg -encoders / -muxers / -filters / -hwaccels 生成，
+    保存在 cache_path 中并以 FFmpeg 可执行文件的标识校验，之后的检查不再启动任何进程。
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, free_space_margin: int = 64 << 20):
+        self.cache_path = cache_path
+        self.free_space_margin = free_space_margin
+        self._capabilities: Optional[FFmpegCapabilities] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def capabilities(self) -> FFmpegCapabilities:
+        if self._capabilities is not None:
+            return self._capabilities
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._capabilities is None:
+                self._capabilities = await self._load()
+        return self._capabilities
+
+    async def _load(self) -> FFmpegCapabilities:
+        identity = _ffmpeg_identity()
+        if self.cache_path and identity:
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("ffmpeg") == identity:
+                    return FFmpegCapabilities.from_dict(cached["capabilities"])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        results = await asyncio.gather(*(
+            run_ffmpeg_command(["ffmpeg", "-hide_banner", option])
+            for option in ("-encoders", "-muxers", "-filters", "-hwaccels")
+        ))
+        if any(result.returncode != 0 for result in results):
+            raise RuntimeError(f"无法读取 FFmpeg 能力表：{next(r.stderr for r in results if r.returncode != 0)}")
+        capabilities = FFmpegCapabilities(
+            encoders=parse_encoders(results[0].stdout),
+            muxers=parse_muxers(results[1].stdout),
+            filters=parse_filters(results[2].stdout),
+            hwaccels=parse_hwaccels(results[3].stdout)
+        )
+
+        if self.cache_path and identity:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path) or ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"ffmpeg": identity, "capabilities": capabilities.to_dict()}, f)
+            os.replace(tmp_path, self.cache_path)
+        return capabilities
+
+    def invalidate(self) -> None:
+        """丢弃内存中的能力表（下次检查时重新校验缓存文件）"""
+        self._capabilities = None
+
+    @traced("preflight")
+    async def check(
+        self,
+        output_path: Optional[str],
+        input_paths: Sequence[str] = (),
+        video_encoder: Optional[str] = None,
+        audio_encoder: Optional[str] = None,
+        filters: Sequence[str] = (),
+        hwaccel: Optional[str] = None,
+        muxer: Optional[str] = None,
+        info: Optional[dict] = None,
+        output_duration: Optional[float] = None,
+        output_bitrate_kbps: Optional[float] = None,
+        size_ratio: Optional[float] = 1.0,
+        expected_bytes: Optional[int] = None
+    ) -> PreflightReport:
+        """
+        检查一个即将启动的 FFmpeg 任务
+
+        Args:
+            output_path: 输出文件路径（输出到目录时传入目录中的任意文件名；None 表示不检查输出）
+            input_paths: 本地输入文件（远程地址不做检查）
+            video_encoder / audio_encoder: 视频 / 音频编码器名称，"copy" 表示直接复制（None 表示不输出该类型的流）
+            filters: 用到的滤镜名称
+            hwaccel: -hwaccel 的值
+            muxer: 封装器名称（默认按输出扩展名推断）
+            info: 第一个输入的探测结果（可选，未提供时按需探测）
+            output_duration: 输出时长（秒，默认与第一个输入相同）
+            output_bitrate_kbps: 输出总码率（已知时用于估计输出大小）
+            size_ratio: 未知码率时，输出大小与对应时长的输入大小之比（None 表示不估计大小、不检查磁盘空间）
+            expected_bytes: 已知的输出大小（如目标文件大小），优先于按码率或输入大小的估计
+
+        Returns:
+            预检结果
+        """
+        start = time.perf_counter()
+        report = PreflightReport()
+        problems = report.problems
+        capabilities = await self.capabilities()
+        local_inputs = [path for path in input_paths if "://" not in path]
+
+        for path in local_inputs:
+            if not os.access(path, os.R_OK):
+                problems.append(f"输入文件不可读 - {path}")
+
+        # 编码器、滤镜、硬件加速
+        codecs = {}
+        for kind, encoder in (("video", video_encoder), ("audio", audio_encoder)):
+            if encoder is None or encoder == "copy":
+                continue
+            if encoder not in capabilities.encoders:
+                problems.append(f"FFmpeg 不支持{STREAM_LABELS[kind]}编码器 {encoder}")
+            else:
+                codecs[kind] = capabilities.encoders[encoder]
+        for name in filters:
+            if name not in capabilities.filters:
+                problems.append(f"FFmpeg 不支持滤镜 {name}")
+        if hwaccel and hwaccel not in capabilities.hwaccels:
+            available = ", ".join(sorted(capabilities.hwaccels)) or "无"
+            problems.append(f"FFmpeg 不支持硬件加速 {hwaccel}（可用：{available}）")
+
+        # 直接复制的流需要知道输入的编码格式
+        needs_probe = "copy" in (video_encoder, audio_encoder) or (
+            expected_bytes is None and (output_bitrate_kbps is not None or size_ratio is not None)
+        )
+        if info is None and needs_probe and local_inputs and not problems:
+            try:
+                info = await probe_media(local_inputs[0])
+            except RuntimeError as e:
+                problems.append(f"无法探测输入文件：{e}")
+        if info is not None:
+            for kind, encoder, stream in (
+                ("video", video_encoder, get_video_stream(info)),
+                ("audio", audio_encoder, get_audio_stream(info))
+            ):
+                if encoder == "copy" and stream is not None:
+                    codecs[kind] = stream.get("codec_name")
+
+        if output_path is None:
+            report.elapsed = time.perf_counter() - start
+            return report
+
+        # 封装器与编码格式兼容性
+        extension = os.path.splitext(output_path)[1].lower().lstrip(".")
+        muxer = muxer or EXTENSION_MUXERS.get(extension)
+        if muxer is None and not extension:
+            problems.append(f"输出文件没有扩展名，无法确定封装格式 - {output_path}")
+        elif muxer is not None:
+            if muxer not in capabilities.muxers:
+                problems.append(f"FFmpeg 不支持封装格式 {muxer}")
+            allowed = MUXER_CODECS.get(muxer, {})
+            for kind, codec in codecs.items():
+                accepted = allowed.get(kind)
+                if muxer in PCM_ONLY_MUXERS and kind == "audio":
+                    accepted = {codec} if codec and codec.startswith("pcm_") else set()
+                if accepted is not None and codec and codec not in accepted:
+                    encoder = video_encoder if kind == "video" else audio_encoder
+                    via = "直接复制" if encoder == "copy" else f"编码器 {encoder}"
+                    if muxer in ADVISORY_MUXERS:
+                        report.warnings.append(
+                            f"{extension or muxer} 容器可能不支持 {codec} {STREAM_LABELS[kind]}（{via}），由 FFmpeg 判断"
+                        )
+                    else:
+                        problems.append(
+                            f"{extension or muxer} 容器不支持 {codec} {STREAM_LABELS[kind]}（{via}）"
+                        )
+
+        # 输出位置
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        if any(os.path.abspath(path) == os.path.abspath(output_path) for path in local_inputs):
+            problems.append(f"输出文件与输入文件相同 - {output_path}")
+        if not os.path.isdir(output_dir):
+            problems.append(f"输出目录不存在 - {output_dir}")
+        elif not os.access(output_dir, os.W_OK | os.X_OK):
+            problems.append(f"输出目录不可写 - {output_dir}")
+        elif os.path.exists(output_path) and not os.access(output_path, os.W_OK):
+            problems.append(f"输出文件已存在且不可覆盖 - {output_path}")
+        else:
+            report.free_bytes = shutil.disk_usage(output_dir).free
+            report.estimated_bytes = expected_bytes or self.estimate_output_bytes(
+                local_inputs, info, output_duration, output_bitrate_kbps, size_ratio
+            )
+            if report.estimated_bytes is not None:
+                # 覆盖已有输出时其空间最终会被释放，但写入期间两者同时存在
+                required = report.estimated_bytes + self.free_space_margin
+                if required > report.free_bytes:
+                    problems.append(
+                        f"磁盘空间不足：预计输出 {_format_mb(report.estimated_bytes)}（另需保留 "
+                        f"{_format_mb(self.free_space_margin)}），{output_dir} 剩余 {_format_mb(report.free_bytes)}"
+                    )
+
+        report.elapsed = time.perf_counter() - start
+        current_span().set_attribute("preflight.problems", len(problems))
+        current_span().set_attribute("preflight.warnings", len(report.warnings))
+        return report
+
+    @staticmethod
+    def estimate_output_bytes(
+        input_paths: Sequence[str],
+        info: Optional[dict],
+        output_duration: Optional[float],
+        output_bitrate_kbps: Optional[float],
+        size_ratio: Optional[float]
+    ) -> Optional[int]:
+        """按探测数据估计输出大小：已知码率时为 码率 × 时长，否则按输入码率折算到输出时长再乘以 size_ratio"""
+        input_duration = get_duration(info) if info else None
+        duration = output_duration or input_duration
+        if output_bitrate_kbps and duration:
+            return int(output_bitrate_kbps * 1000 / 8 * duration)
+        if size_ratio is None:
+            return None
+        total_size = 0
+        for path in input_paths:
+            try:
+                total_size += os.path.getsize(path)
+            except OSError:
+                continue
+        if not total_size:
+            return None
+        if output_duration and input_duration and len(input_paths) == 1:
+            total_size = total_size * output_duration / input_duration
+        return int(total_size * size_ratio)
@@ -0,0 +1,121 @@
+"""
+媒体信息探测
+"""
+
+from typing import List, Optional, Tuple
+
+from .engine import get_engine_router
+from .runner import run_ffmpeg_command
+from .tracing import span
+
+
+async def probe_media(path: str) -> dict:
+    """探测媒体文件的格式与流信息（ffprobe JSON 格式），失败时抛出 RuntimeError"""
+    with span("probe", **{"file.path": path}) as probe_span:
+        info, engine = await get_engine_router().probe(path)
+        probe_span.set_attribute("engine", engine)
+    return info
+
+
+def get_streams(info: dict, codec_type: str) -> List[dict]:
+    """获取指定类型（video, audio, subtitle）的所有流"""
+    return [s for s in info.get("streams", []) if s.get("codec_type") == codec_type]
+
+
+def get_video_stream(info: dict) -> Optional[dict]:
+    """获取第一个视频流（忽略封面图片）"""
+    for stream in get_streams(info, "video"):
+        if stream.get("disposition", {}).get("attached_pic"):
+            continue
+        return stream
+    return None
+
+
+def get_audio_stream(info: dict) -> Optional[dict]:
+    """获取第一个音频流"""
+    streams = get_streams(info, "audio")
+    return streams[0] if streams else None
+
+
+def get_duration(info: dict) -> Optional[float]:
+    """获取媒体时长（秒），优先使用容器时长"""
+    duration = info.get("format", {}).get("duration")
+    if duration is None:
+        stream = get_video_stream(info) or get_audio_stream(info)
+        duration = stream.get("duration") if stream else None
+    try:
+        return float(duration) if duration is not None else None
+    except ValueError:
+        return None
+
+
+def get_frame_rate(stream: Optional[dict]) -> Optional[float]:
+    """视频流的平均帧率（avg_frame_rate，缺失时使用 r_frame_rate）"""
+    if not stream:
+        return None
+    for key in ("avg_frame_rate", "r_frame_rate"):
+        try:
+            numerator, denominator = str(stream.get(key) or "").split("/")
+            if float(denominator) > 0 and float(numerator) > 0:
+                return float(numerator) / float(denominator)
+        except ValueError:
+            continue
+    return None
+
+
+def get_rotation(stream: Optional[dict]) -> float:
+    """视频流的显示旋转角度（显示矩阵侧数据，旧文件的 rotate 标签），没有时为 0"""
+    if not stream:
+        return 0.0
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return float(side_data["rotation"])
+    try:
+        return float(stream.get("tags", {}).get("rotate", 0))
+    except ValueError:
+        return 0.0
+
+
+def get_display_size(stream: Optional[dict]) -> Optional[Tuple[int, int]]:
+    """视频流显示时的宽高：旋转 ±90° 时交换宽高（FFmpeg 解码时默认按旋转信息自动旋转）"""
+    if not stream or not stream.get("width") or not stream.get("height"):
+        return None
+    width, height = int(stream["width"]), int(stream["height"])
+    if round(get_rotation(stream)) % 180 == 90:
+        return height, width
+    return width, height
+
+
+async def estimate_keyframe_interval(path: str, window: float = 60.0) -> Optional[float]:
+    """
+    估计视频关键帧间隔（秒）
+
+    只读取开头 window 秒的视频包标记，不解码；窗口内只有一个关键帧时返回 window，
+    无法读取时返回 None。
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-read_intervals", f"%+{window:g}",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        path
+    ]
+    result = await run_ffmpeg_command(cmd)
+    if result.returncode != 0:
+        return None
+    keyframes = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) >= 2 and "K" in fields[1]:
+            try:
+                keyframes.append(float(fields[0]))
+            except ValueError:
+                continue
+    keyframes.sort()
+    if not keyframes:
+        return None
+    if len(keyframes) == 1:
+        return window
+    gaps = sorted(b - a for a, b in zip(keyframes, keyframes[1:]))
+    return gaps[len(gaps) // 2]
@@ -0,0 +1,289 @@
+"""
+低分辨率代理文件
+为大尺寸视频生成一次短关键帧间隔、无 B 帧的低分辨率副本（按文件标识缓存），
+预览类工具（GIF、抽帧、雪碧图、缩略图）在输出尺寸允许时改为读取代理文件，避免反复解码 4K 原片
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from .file_identity import FileIdentity, get_file_identity
+from .http_cache import is_remote_url
+from .index_cache import FileIndexCache, KeyedLocks
+from .probe import get_frame_rate, get_video_stream, probe_media
+from .runner import run_ffmpeg_command
+
+# 代理文件的生成方式：background：首次预览读取原片并在后台生成，wait：首次预览先等待生成，off：不自动生成
+PROXY_BUILD_MODES = ("background", "wait", "off")
+
+
+class ProxyCache:
+    """
+    代理文件缓存
+
+    代理文件与元数据（源文件路径、尺寸、生成耗时）按源文件标识存放在 cache_dir/proxies，
+    源文件被改写后标识变化，旧代理不再命中并最终按最近使用时间淘汰。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        short_side: int = 480,
+        gop_seconds: float = 0.5,
+        crf: int = 23,
+        min_source_short_side: int = 720,
+        max_bytes: int = 10 << 30,
+        build_mode: str = "background"
+    ):
+        if build_mode not in PROXY_BUILD_MODES:
+            raise ValueError(f"不支持的代理生成方式 {build_mode}，可选：{', '.join(PROXY_BUILD_MODES)}")
+        self.index = FileIndexCache(cache_dir, "proxies")
+        self.short_side = short_side
+        self.gop_seconds = gop_seconds
+        self.crf = crf
+        self.min_source_short_side = min_source_short_side
+        self.max_bytes = max_bytes
+        self.build_mode = build_mode
+        self._locks = KeyedLocks()
+        self._building: Set[str] = set()
+        self._background: Dict[str, asyncio.Task] = {}
+        # 尺寸不足、不值得生成代理的源文件（标识键）
+        self._ineligible: Set[str] = set()
+
+    def proxy_path(self, identity: FileIdentity) -> str:
+        return str(self.index.index_path(identity, ".mp4"))
+
+    def get(self, path: str) -> Optional[dict]:
+        """已生成的代理文件元数据（含 proxy_path），不存在时返回 None；命中时更新最近使用时间"""
+        if is_remote_url(path):
+            return None
+        try:
+            identity = get_file_identity(path)
+        except OSError:
+            return None
+        meta = self.index.load(identity)
+        proxy_path = self.proxy_path(identity)
+        if meta is None or not os.path.exists(proxy_path):
+            return None
+        try:
+            os.utime(proxy_path)
+        except OSError:
+            pass
+        return {**meta, "proxy_path": proxy_path}
+
+    def build_command(self, input_path: str, output_path: str, frame_rate: Optional[float]) -> list:
+        """短边缩放到 short_side，固定关键帧间隔、不使用 B 帧，方便预览工具快速定位和只解码关键帧"""
+        gop = max(1, round((frame_rate or 30.0) * self.gop_seconds))
+        side = self.short_side
+        return [
+            "ffmpeg", "-hide_banner", "-nostats",
+            "-i", input_path,
+            "-map", "0:v:0",
+            "-vf", f"scale='if(gt(iw,ih),-2,{side})':'if(gt(iw,ih),{side},-2)'",
+            "-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode", "-crf", str(self.crf),
+            "-g", str(gop), "-keyint_min", str(gop), "-bf", "0",
+            "-pix_fmt", "yuv420p",
+            "-an", "-sn", "-dn",
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            "-y", output_path
+        ]
+
+    async def build(self, path: str, force: bool = False) -> Optional[dict]:
+        """
+        生成代理文件（同一源文件的并发调用共享一次生成）
+
+        Returns:
+            代理文件元数据；源文件短边小于 min_source_short_side 时返回 None
+        """
+        identity = get_file_identity(path)
+        async with self._locks.hold(identity.key):
+            if not force:
+                existing = self.get(path)
+                if existing is not None:
+                    return {**existing, "built": False}
+                if identity.key in self._ineligible:
+                    return None
+
+            info = await probe_media(path)
+            stream = get_video_stream(info)
+            if stream is None:
+                raise ValueError(f"输入文件没有视频流 - {path}")
+            width, height = int(stream.get("width") or 0), int(stream.get("height") or 0)
+            if min(width, height) < self.min_source_short_side:
+                self._ineligible.add(identity.key)
+                return None
+
+            proxy_path = self.proxy_path(identity)
+            os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+            temp_path = f"{proxy_path}.part"
+            self._building.add(identity.key)
+            start = time.perf_counter()
+            try:
+                result = await run_ffmpeg_command(self.build_command(path, temp_path, get_frame_rate(stream)))
+                if result.returncode != 0:
+                    raise RuntimeError(f"代理文件生成失败：{result.stderr}")
+                proxy_info = get_video_stream(await probe_media(temp_path)) or {}
+                os.replace(temp_path, proxy_path)
+            finally:
+                self._building.discard(identity.key)
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            meta = {
+                "source_path": identity.path,
+                "source_width": width,
+                "source_height": height,
+                "width": int(proxy_info.get("width") or 0),
+                "height": int(proxy_info.get("height") or 0),
+                "size": os.path.getsize(proxy_path),
+                "build_seconds": time.perf_counter() - start,
+                "created_at": time.time()
+            }
+            self.index.save(identity, meta)
+        self.evict()
+        return {**meta, "proxy_path": proxy_path, "built": True}
+
+    def schedule(self, path: str) -> None:
+        """在后台生成代理文件（已在生成中时忽略）"""
+        try:
+            key = get_file_identity(path).key
+        except OSError:
+            return
+        if key in self._background or key in self._ineligible:
+            return
+        task = asyncio.create_task(self.build(path))
+        self._background[key] = task
+
+        def done(finished: asyncio.Task) -> None:
+            self._background.pop(key, None)
+            if not finished.cancelled():
+                finished.exception()  # 后台生成失败时下次预览会重新尝试
+
+        task.add_done_callback(done)
+
+    async def resolve(self, path: str, width: Optional[int] = None, height: Optional[int] = None) -> Tuple[str, Optional[dict]]:
+        """
+        预览工具的输入选择：输出尺寸不超过代理文件尺寸时返回代理文件，否则返回原文件
+
+        Args:
+            width / height: 预览输出需要的宽 / 高（None 表示不限制该方向；两者都为 None 时表示需要原始尺寸）
+
+        Returns:
+            (实际读取的路径, 代理文件元数据或 None)
+        """
+        if (width is None and height is None) or is_remote_url(path):
+            return path, None
+        meta = self.get(path)
+        if meta is None:
+            if self.build_mode == "wait":
+                meta = await self.build(path)
+            elif self.build_mode == "background":
+                self.schedule(path)
+        if meta is None:
+            return path, None
+        if (width is not None and width > meta["width"]) or (height is not None and height > meta["height"]):
+            return path, None
+        return meta["proxy_path"], meta
+
+    def remove(self, path: str) -> bool:
+        """删除源文件当前版本的代理文件"""
+        identity = get_file_identity(path)
+        proxy_path = self.proxy_path(identity)
+        self.index.remove(identity)
+        try:
+            os.remove(proxy_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def entries(self) -> list:
+        """所有代理文件及其元数据（最近使用的在前）"""
+        entries = []
+        if not self.index.directory.exists():
+            return entries
+        for proxy in self.index.directory.glob("*/*.mp4"):
+            try:
+                stat = proxy.stat()
+            except OSError:
+                continue
+            try:
+                with open(proxy.with_suffix(".json"), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+            entries.append({
+                **meta,
+                "key": proxy.stem,
+                "proxy_path": str(proxy),
+                "size": stat.st_size,
+                "last_used": stat.st_mtime
+            })
+        return sorted(entries, key=lambda e: e["last_used"], reverse=True)
+
+    def evict(self) -> int:
+        """代理文件总量超过上限时按最近使用时间淘汰，返回淘汰数量（正在生成的不会被淘汰）"""
+        entries = self.entries()
+        total = sum(entry["size"] for entry in entries)
+        evicted = 0
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry["key"] in self._building:
+                continue
+            for suffix in (".mp4", ".json"):
+                try:
+                    os.remove(os.path.splitext(entry["proxy_path"])[0] + suffix)
+                except FileNotFoundError:
+                    pass
+            total -= entry["size"]
+            evicted += 1
+        return evicted
+
+    def clear(self) -> int:
+        """删除全部代理文件，返回删除数量"""
+        entries = self.entries()
+        for entry in entries:
+            for suffix in (".mp4", ".json"):
+                try:
+                    os.remove(os.path.splitext(entry["proxy_path"])[0] + suffix)
+                except FileNotFoundError:
+                    pass
+        return len(entries)
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "cached_bytes": sum(entry["size"] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "building": len(self._building)
+        }
+
+
+_cache: Optional[ProxyCache] = None
+
+
+def configure_proxy_cache(cache: Optional[ProxyCache]) -> None:
+    """设置全局代理文件缓存（None 表示预览工具始终读取原文件）"""
+    global _cache
+    _cache = cache
+
+
+def get_proxy_cache() -> Optional[ProxyCache]:
+    """获取全局代理文件缓存"""
+    return _cache
+
+
+async def resolve_preview_input(path: str, width: Optional[int] = None, height: Optional[int] = None) -> Tuple[str, Optional[dict]]:
+    """预览工具读取的输入：有可用的代理文件时返回代理文件路径，否则返回原路径"""
+    if _cache is None:
+        return path, None
+    try:
+        return await _cache.resolve(path, width, height)
+    except Exception:
+        # 代理不可用（生成失败、源文件无法读取）时退回原文件，由工具自身报告错误
+        return path, None
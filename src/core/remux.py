@@ -0,0 +1,59 @@
+"""
+直接复制（remux）判断
+按探测结果决定每条流能否不经重新编码直接复制：编码格式已符合目标、目标容器支持该格式时直接复制
+"""
+
+import os
+from typing import Optional
+
+from .preflight import EXTENSION_MUXERS, MUXER_CODECS, PCM_ONLY_MUXERS
+
+# 各处理方式的说明（视频是否复制, 音频是否复制）
+STREAM_PATHS = {
+    (True, True): "直接复制（不重新编码）",
+    (True, False): "视频直接复制，音频重新编码",
+    (False, True): "视频重新编码，音频直接复制",
+    (False, False): "重新编码",
+}
+
+
+def output_muxer(output_path: str) -> Optional[str]:
+    """按输出扩展名推断 FFmpeg 选择的封装器"""
+    return EXTENSION_MUXERS.get(os.path.splitext(output_path)[1].lower().lstrip("."))
+
+
+def can_copy_stream(stream: Optional[dict], codec: Optional[str], muxer: Optional[str]) -> bool:
+    """
+    流能否直接复制
+
+    Args:
+        stream: 探测得到的流（None 表示输入没有该类型的流）
+        codec: 目标编码格式（如 h264、aac；None 表示未知）
+        muxer: 输出封装器（None 表示未知，不检查容器兼容性）
+    """
+    if stream is None or codec is None or stream.get("codec_name") != codec:
+        return False
+    if muxer is None:
+        return True
+    kind = stream.get("codec_type")
+    if muxer in PCM_ONLY_MUXERS and kind == "audio":
+        return codec.startswith("pcm_")
+    accepted = MUXER_CODECS.get(muxer, {}).get(kind)
+    return accepted is None or codec in accepted
+
+
+def stream_bitrate_kbps(stream: Optional[dict]) -> Optional[float]:
+    """流码率（kbps），容器未记录时返回 None"""
+    if stream is None:
+        return None
+    try:
+        return float(stream["bit_rate"]) / 1000
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def describe_stream_path(video_copy: bool, audio_copy: Optional[bool]) -> str:
+    """处理方式说明（audio_copy 为 None 表示没有音频流）"""
+    if audio_copy is None:
+        audio_copy = video_copy
+    return STREAM_PATHS[(video_copy, audio_copy)]
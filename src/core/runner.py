@@ -0,0 +1,192 @@
+"""
+FFmpeg 进程调用
+"""
+
+import asyncio
+import contextlib
+import os
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, List, Optional, Union
+
+from .pipes import set_pipe_buffer_size
+from .thread_budget import get_thread_budget
+from .tracing import SPAN_KIND_CLIENT, span
+
+
+@contextlib.asynccontextmanager
+async def spawn_ffmpeg_process(cmd: List[str], **kwargs):
+    """启动子进程；配置了线程预算时注入线程参数，并在进程存活期间占用预算"""
+    budget = get_thread_budget()
+    if budget is None or not budget.manages(cmd):
+        with span("process.spawn", **{"process.executable.name": cmd[0]}):
+            process = await asyncio.create_subprocess_exec(*cmd, **kwargs)
+        yield process
+        return
+
+    with budget.job() as allocation:
+        with span("process.spawn", **{"process.executable.name": cmd[0], "thread_budget.threads": allocation.threads}):
+            process = await asyncio.create_subprocess_exec(
+                *budget.apply_to_command(cmd, allocation.threads),
+                preexec_fn=budget.preexec(allocation),
+                **kwargs
+            )
+        budget.attach(allocation, process.pid)
+        yield process
+
+
+async def run_ffmpeg_command(cmd: List[str], on_start: Optional[Callable[[int], Awaitable[None]]] = None):
+    """运行FFmpeg命令的异步辅助函数（进程启动后以 pid 等待 on_start 协程，如写入任务日志）"""
+    async with spawn_ffmpeg_process(
+        cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    ) as process:
+        if on_start is not None:
+            await on_start(process.pid)
+        with span(
+            "process.run", SPAN_KIND_CLIENT,
+            **{"process.executable.name": cmd[0], "process.pid": process.pid, "process.command_line": " ".join(cmd)}
+        ) as run_span:
+            stdout, stderr = await process.communicate()
+            run_span.set_attribute("process.exit_code", process.returncode)
+            if process.returncode != 0:
+                run_span.set_error(stderr.decode(errors="replace")[-500:] if stderr else f"退出码 {process.returncode}")
+    return type('Result', (), {
+        'returncode': process.returncode,
+        'stdout': stdout.decode() if stdout else '',
+        'stderr': stderr.decode() if stderr else ''
+    })()
+
+
+async def _feed_stdin(stdin: asyncio.StreamWriter, source: Union[bytes, AsyncIterable[bytes]]) -> None:
+    """把字节或异步字节流写入进程标准输入；drain 使写入速度受管道容量约束"""
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            stdin.write(source)
+            await stdin.drain()
+        else:
+            async for chunk in source:
+                stdin.write(chunk)
+                await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # FFmpeg 提前结束读取（如 -t 截断）
+    finally:
+        stdin.close()
+
+
+async def _open_stdout_pipe(buffer_size: int):
+    """创建指定缓冲区大小的标准输出管道，返回 (写端 fd, 读端 StreamReader, 读端 transport)"""
+    read_fd, write_fd = os.pipe()
+    set_pipe_buffer_size(write_fd, buffer_size)
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=buffer_size, loop=loop)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader, loop=loop), os.fdopen(read_fd, "rb", 0)
+    )
+    return write_fd, reader, transport
+
+
+async def stream_ffmpeg_output(
+    cmd: List[str],
+    chunk_size: int = 1 << 20,
+    stdin_source: Optional[Union[bytes, AsyncIterable[bytes]]] = None,
+    pipe_buffer_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    运行FFmpeg命令并按固定大小分块读取标准输出（最后一块可能较短）
+
+    标准错误在后台持续读取以免管道写满阻塞进程；进程失败时抛出 RuntimeError。
+    提前退出迭代时会终止进程。
+
+    Args:
+        cmd: FFmpeg 命令（输入为 pipe:0 时需要提供 stdin_source）
+        chunk_size: 每次产出的块大小
+        stdin_source: 写入标准输入的字节或异步字节流，与读取输出同时进行
+        pipe_buffer_size: 标准输出管道的内核缓冲区和读取端缓冲上限（字节），未读取的数据
+            超过该值时 FFmpeg 会阻塞等待，从而限制内存占用
+    """
+    stdout = asyncio.subprocess.PIPE
+    reader = transport = None
+    if pipe_buffer_size:
+        stdout, reader, transport = await _open_stdout_pipe(pipe_buffer_size)
+
+    try:
+        async with spawn_ffmpeg_process(
+            cmd,
+            stdin=asyncio.subprocess.PIPE if stdin_source is not None else asyncio.subprocess.DEVNULL,
+            stdout=stdout,
+            stderr=asyncio.subprocess.PIPE
+        ) as process:
+            if transport is not None:
+                os.close(stdout)
+                stdout = None
+            else:
+                reader = process.stdout
+            stderr_task = asyncio.create_task(process.stderr.read())
+            stdin_task = None
+            if stdin_source is not None:
+                stdin_task = asyncio.create_task(_feed_stdin(process.stdin, stdin_source))
+            try:
+                while True:
+                    try:
+                        chunk = await reader.readexactly(chunk_size)
+                    except asyncio.IncompleteReadError as e:
+                        if e.partial:
+                            yield e.partial
+                        break
+                    yield chunk
+                await process.wait()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                if stdin_task is not None:
+                    stdin_task.cancel()
+                    await asyncio.gather(stdin_task, return_exceptions=True)
+                stderr = await stderr_task
+    finally:
+        if transport is not None:
+            transport.close()
+            if stdout is not None:
+                os.close(stdout)
+
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode(errors="replace") or f"FFmpeg 退出码 {process.returncode}")
+
+
+async def stream_ffmpeg_log(cmd: List[str], tail_lines: int = 30) -> AsyncIterator[str]:
+    """
+    运行FFmpeg命令并逐行产出标准错误日志（不含换行符），不在内存中保留完整日志
+
+    适合检测类滤镜在长文件上输出大量事件的场景；进程失败时抛出带最后 tail_lines 行日志的 RuntimeError，
+    提前退出迭代时会终止进程。
+    """
+    tail: Deque[str] = deque(maxlen=tail_lines)
+    async with spawn_ffmpeg_process(
+        cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    ) as process:
+        try:
+            while True:
+                try:
+                    raw = await process.stderr.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    raw = e.partial
+                except asyncio.LimitOverrunError as e:
+                    # 超长的行分段产出
+                    raw = await process.stderr.read(e.consumed)
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                tail.append(line)
+                yield line
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError("\n".join(tail) or f"FFmpeg 退出码 {process.returncode}")
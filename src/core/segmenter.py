@@ -0,0 +1,101 @@
+"""
+segment 分段复用器
+一个 FFmpeg 进程输出全部分段，并从 segment_list 读取每段的实际起止时间
+"""
+
+import csv
+import os
+import re
+import tempfile
+from typing import List, Optional, Sequence
+
+from .runner import run_ffmpeg_command
+
+
+def parse_segment_list(list_path: str, output_dir: str) -> List[dict]:
+    """解析 CSV 格式的 segment_list（文件名,开始,结束）"""
+    segments = []
+    with open(list_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            start, end = float(row[1]), float(row[2])
+            segments.append({
+                "path": os.path.join(output_dir, row[0]),
+                "start": start,
+                "end": end,
+                "duration": end - start
+            })
+    return segments
+
+
+def remove_stale_segments(output_pattern: str) -> None:
+    """删除与输出模板匹配的旧分段，避免本次分段较少时残留上次的文件"""
+    output_dir = os.path.dirname(output_pattern) or "."
+    name_re = re.compile(
+        re.sub(r"%\d*d", r"\\d+", re.escape(os.path.basename(output_pattern))) + "$"
+    )
+    if not os.path.isdir(output_dir):
+        return
+    for name in os.listdir(output_dir):
+        if name_re.match(name):
+            os.remove(os.path.join(output_dir, name))
+
+
+async def run_segment_muxer(
+    input_path: str,
+    output_pattern: str,
+    segment_times: Optional[Sequence[float]] = None,
+    segment_time: Optional[float] = None,
+    input_args: Sequence[str] = (),
+    output_args: Sequence[str] = ("-map", "0", "-c", "copy"),
+    segment_args: Sequence[str] = ()
+) -> List[dict]:
+    """
+    用 segment 复用器一次输出所有分段
+
+    Args:
+        input_path: 输入文件路径
+        output_pattern: 输出文件名模板（如 /out/part_%03d.mp4）
+        segment_times: 分段时间点列表（秒），与 segment_time 二选一
+        segment_time: 固定分段时长（秒）
+        input_args: 放在 -i 之前的参数
+        output_args: 映射与编码参数（默认全部流直接复制）
+        segment_args: 额外的 segment 复用器参数
+
+    Returns:
+        分段清单，每项包含 path, start, end, duration
+    """
+    output_dir = os.path.dirname(output_pattern) or "."
+    os.makedirs(output_dir, exist_ok=True)
+    remove_stale_segments(output_pattern)
+
+    fd, list_path = tempfile.mkstemp(prefix="segments_", suffix=".csv", dir=output_dir)
+    os.close(fd)
+    try:
+        cmd = ["ffmpeg", "-hide_banner", "-nostats", *input_args, "-i", input_path, *output_args]
+        cmd.extend(["-f", "segment", "-reset_timestamps", "1"])
+        if segment_times is not None:
+            if segment_times:
+                cmd.extend(["-segment_times", ",".join(f"{t:.3f}" for t in segment_times)])
+            else:
+                # 没有切分点时输出单个完整分段
+                cmd.extend(["-segment_time", "1e9"])
+        elif segment_time:
+            cmd.extend(["-segment_time", f"{segment_time:.3f}"])
+        cmd.extend([
+            *segment_args,
+            "-segment_list", list_path,
+            "-segment_list_type", "csv",
+            "-y",
+            output_pattern
+        ])
+
+        result = await run_ffmpeg_command(cmd)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+
+        return parse_segment_list(list_path, output_dir)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
@@ -0,0 +1,164 @@
+"""
+CPU 线程预算分配
+在并发运行的 FFmpeg 进程之间划分 CPU 核心，避免每个进程都按全部核心开线程导致过度订阅
+"""
+
+import contextlib
+import itertools
+import os
+from typing import Dict, Iterator, List, Optional
+
+_CAN_PIN = hasattr(os, "sched_setaffinity") and hasattr(os, "sched_getaffinity")
+
+
+def _available_cpus() -> List[int]:
+    """当前进程可用的 CPU 编号"""
+    if _CAN_PIN:
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _set_process_affinity(pid: int, cpus: List[int]) -> None:
+    """设置进程所有线程的 CPU 亲和性（sched_setaffinity 只作用于单个线程）"""
+    try:
+        thread_ids = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        thread_ids = [pid]
+    for tid in thread_ids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass
+
+
+class ThreadAllocation:
+    """单个任务分到的线程数与 CPU 集合"""
+
+    def __init__(self, job_id: int, threads: int, cpus: List[int]):
+        self.job_id = job_id
+        self.threads = threads
+        self.cpus = cpus
+        self.pid: Optional[int] = None
+
+
+class ThreadBudget:
+    """
+    线程预算分配器
+
+    新任务启动时按当前并发数平分核心得到线程数（-threads / -filter_threads /
+    x264 threads），启动后线程数不再改变；开启 pin_cpus 时每个任务绑定到互不重叠的
+    CPU 集合，任务开始和结束时对运行中的进程重新划分亲和性。
+    """
+
+    def __init__(self, max_cpus: Optional[int] = None, pin_cpus: bool = False):
+        cpus = _available_cpus()
+        if max_cpus:
+            cpus = cpus[:max_cpus]
+        self.cpus = cpus
+        self.pin_cpus = pin_cpus and _CAN_PIN
+        self._jobs: Dict[int, ThreadAllocation] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def active_jobs(self) -> int:
+        return len(self._jobs)
+
+    def _partition(self, count: int) -> List[List[int]]:
+        """把 CPU 划分为 count 份连续区间；任务多于核心时按轮转共享"""
+        if count <= 0:
+            return []
+        total = len(self.cpus)
+        if count >= total:
+            return [[self.cpus[i % total]] for i in range(count)]
+        base, extra = divmod(total, count)
+        slices = []
+        start = 0
+        for i in range(count):
+            size = base + (1 if i < extra else 0)
+            slices.append(self.cpus[start:start + size])
+            start += size
+        return slices
+
+    def _rebalance(self) -> None:
+        """重新划分所有运行中任务的 CPU 集合"""
+        jobs = list(self._jobs.values())
+        for allocation, cpus in zip(jobs, self._partition(len(jobs))):
+            allocation.cpus = cpus
+            if self.pin_cpus and allocation.pid is not None:
+                _set_process_affinity(allocation.pid, cpus)
+
+    @contextlib.contextmanager
+    def job(self) -> Iterator[ThreadAllocation]:
+        """登记一个任务，退出时释放其核心并重新平衡其他任务"""
+        job_id = next(self._ids)
+        threads = max(1, len(self.cpus) // (len(self._jobs) + 1))
+        allocation = ThreadAllocation(job_id, threads, list(self.cpus))
+        self._jobs[job_id] = allocation
+        self._rebalance()
+        try:
+            yield allocation
+        finally:
+            del self._jobs[job_id]
+            self._rebalance()
+
+    def attach(self, allocation: ThreadAllocation, pid: int) -> None:
+        """记录任务进程并应用亲和性"""
+        allocation.pid = pid
+        if self.pin_cpus:
+            _set_process_affinity(pid, allocation.cpus)
+
+    def preexec(self, allocation: ThreadAllocation):
+        """返回子进程 exec 前设置亲和性的函数，确保 FFmpeg 创建的所有线程继承绑定"""
+        if not self.pin_cpus:
+            return None
+        cpus = list(allocation.cpus)
+        return lambda: os.sched_setaffinity(0, cpus)
+
+    @staticmethod
+    def manages(cmd: List[str]) -> bool:
+        """只管理带输入的 FFmpeg 处理命令（ffprobe 和能力查询不占用预算）"""
+        return bool(cmd) and os.path.basename(cmd[0]) == "ffmpeg" and "-i" in cmd
+
+    @staticmethod
+    def apply_to_command(cmd: List[str], threads: int) -> List[str]:
+        """
+        向 FFmpeg 命令注入线程参数
+
+        -filter_threads / -filter_complex_threads 作为全局参数，-threads 同时作用于
+        解码（第一个 -i 之前）和编码（输出文件之前），libx264 另外设置 threads=。
+        命令中已显式指定 -threads 时保持原样。
+        """
+        if not ThreadBudget.manages(cmd) or "-threads" in cmd:
+            return cmd
+
+        new_cmd = [cmd[0], "-filter_threads", str(threads)]
+        if "-filter_complex" in cmd:
+            new_cmd.extend(["-filter_complex_threads", str(threads)])
+
+        body = list(cmd[1:-1])
+        first_input = body.index("-i")
+        body[first_input:first_input] = ["-threads", str(threads)]
+
+        if "libx264" in body:
+            if "-x264-params" in body:
+                index = body.index("-x264-params") + 1
+                if "threads=" not in body[index]:
+                    body[index] = f"{body[index]}:threads={threads}"
+            else:
+                body.extend(["-x264-params", f"threads={threads}"])
+
+        return new_cmd + body + ["-threads", str(threads), cmd[-1]]
+
+
+_budget: Optional[ThreadBudget] = None
+
+
+def configure_thread_budget(budget: Optional[ThreadBudget]) -> None:
+    """设置全局线程预算（None 表示不管理，FFmpeg 使用默认线程数）"""
+    global _budget
+    _budget = budget
+
+
+def get_thread_budget() -> Optional[ThreadBudget]:
+    """获取全局线程预算"""
+    return _budget
@@ -0,0 +1,275 @@
+"""
+编码吞吐量历史
+每次完成的编码记录 (编码器, 预设, 质量, 分辨率, 帧率, 时长, 硬件路径) → (编码速度, 每像素比特数)，
+据此预测新任务的耗时和输出大小；同时保存当时的预测值，用于统计预测误差
+"""
+
+import contextlib
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS encodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    preset TEXT,
+    quality TEXT,
+    hardware TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    fps REAL NOT NULL,
+    duration REAL NOT NULL,
+    wall_seconds REAL NOT NULL,
+    output_bytes INTEGER NOT NULL,
+    speed REAL NOT NULL,
+    bits_per_pixel REAL NOT NULL,
+    predicted_seconds REAL,
+    predicted_bytes INTEGER,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_encodes_profile ON encodes(codec, hardware, preset, quality);
+"""
+
+# 每次预测最多参考的最近记录数
+HISTORY_WINDOW = 50
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    """编码方式：编码器、预设、质量（crf 等数值或 bitrate 表示按码率编码）和硬件路径（software, qsv, nvenc）"""
+
+    codec: str
+    preset: Optional[str]
+    quality: Optional[str]
+    hardware: str = "software"
+
+
+@dataclass
+class EncodeEstimate:
+    """耗时和输出大小预测"""
+
+    seconds: float
+    output_bytes: int
+    speed: float  # 编码速度（媒体时长 / 实际耗时）
+    basis: str  # history：同编码方式的历史记录，similar：同编码器不同预设或质量，sample：试编码
+    samples: int  # 参考的记录数
+    seconds_range: Optional[tuple] = None  # (p25, p75)，记录不少于3条时提供
+    bytes_range: Optional[tuple] = None
+
+    def describe(self) -> str:
+        basis = {
+            "history": f"同编码方式的 {self.samples} 条历史记录",
+            "similar": f"同编码器的 {self.samples} 条历史记录（预设或质量不同，误差较大）",
+            "sample": "试编码",
+        }[self.basis]
+        text = (
+            f"预计耗时: {format_seconds(self.seconds)}（{self.speed:.2f}倍速）"
+            f"\n预计大小: {self.output_bytes / 1024 / 1024:.1f}MB\n依据: {basis}"
+        )
+        if self.seconds_range and self.bytes_range:
+            text += (
+                f"\n范围（p25-p75）: {format_seconds(self.seconds_range[0])} - {format_seconds(self.seconds_range[1])}，"
+                f"{self.bytes_range[0] / 1024 / 1024:.1f} - {self.bytes_range[1] / 1024 / 1024:.1f}MB"
+            )
+        return text
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}小时"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}分钟"
+    return f"{seconds:.1f}秒"
+
+
+def _quartiles(values: List[float]) -> tuple:
+    q1, _, q3 = statistics.quantiles(values, n=4)
+    return q1, q3
+
+
+class ThroughputStore:
+    """
+    编码吞吐量历史（SQLite）
+
+    方法均为同步调用，在事件循环中须经 asyncio.to_thread 调用；
+    创建对象不访问磁盘，数据库在 open()（服务器启动时）或第一次读写时创建。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._opened = False
+        self._open_lock = threading.Lock()
+
+    def open(self) -> None:
+        """创建数据库文件和表结构（重复调用无开销）"""
+        with self._open_lock:
+            if self._opened:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._opened = True
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，退出时提交（异常时回滚）并关闭：sqlite3 连接自身的 with 只提交不关闭，
+        连接与语句缓存之间的循环引用使文件描述符要等到循环垃圾回收才释放"""
+        if not self._opened:
+            self.open()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(
+        self,
+        kind: str,
+        profile: EncodeProfile,
+        width: int,
+        height: int,
+        fps: float,
+        duration: float,
+        wall_seconds: float,
+        output_bytes: int,
+        estimate: Optional[EncodeEstimate] = None,
+        source: str = "job"
+    ) -> None:
+        """
+        记录一次完成的编码
+
+        Args:
+            source: job（实际任务）或 sample（试编码）
+            estimate: 任务开始前给出的预测（用于统计预测误差）
+        """
+        if wall_seconds <= 0 or duration <= 0 or not (width and height and fps):
+            return
+        pixels = width * height * fps * duration
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO encodes (kind, source, codec, preset, quality, hardware, width, height, fps, duration,"
+                " wall_seconds, output_bytes, speed, bits_per_pixel, predicted_seconds, predicted_bytes, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind, source, profile.codec, profile.preset, profile.quality, profile.hardware,
+                    width, height, fps, duration, wall_seconds, output_bytes,
+                    duration / wall_seconds, output_bytes * 8 / pixels,
+                    estimate.seconds if estimate else None,
+                    estimate.output_bytes if estimate else None,
+                    time.time()
+                )
+            )
+
+    def _history(self, profile: EncodeProfile, exact: bool) -> List[sqlite3.Row]:
+        sql = "SELECT * FROM encodes WHERE codec = ? AND hardware = ?"
+        params: list = [profile.codec, profile.hardware]
+        if exact:
+            sql += " AND preset IS ? AND quality IS ?"
+            params += [profile.preset, profile.quality]
+        sql += " ORDER BY recorded_at DESC LIMIT ?"
+        params.append(HISTORY_WINDOW)
+        with self._connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def estimate(
+        self,
+        profile: EncodeProfile,
+        width: int,
+        height: int,
+        fps: float,
+        duration: float,
+        target_bytes: Optional[int] = None
+    ) -> Optional[EncodeEstimate]:
+        """
+        按历史记录预测：编码吞吐量以每秒处理的像素数（宽 × 高 × 帧率 × 速度）折算到新分辨率，
+        输出大小按每像素比特数计算；target_bytes 为按目标大小编码时的已知输出大小
+
+        Returns:
+            预测结果，没有同编码器、同硬件路径的记录时返回 None
+        """
+        rows = self._history(profile, exact=True)
+        basis = "history"
+        if not rows:
+            rows = self._history(profile, exact=False)
+            basis = "similar"
+        if not rows or not (width and height and fps and duration):
+            return None
+        return self._from_rows(rows, basis, width, height, fps, duration, target_bytes)
+
+    @staticmethod
+    def _from_rows(rows, basis: str, width: int, height: int, fps: float, duration: float,
+                   target_bytes: Optional[int]) -> EncodeEstimate:
+        pixels = width * height * fps * duration
+        seconds = [pixels / (row["width"] * row["height"] * row["fps"] * row["speed"]) for row in rows]
+        sizes = [target_bytes or int(row["bits_per_pixel"] * pixels / 8) for row in rows]
+        predicted_seconds = statistics.median(seconds)
+        estimate = EncodeEstimate(
+            seconds=predicted_seconds,
+            output_bytes=int(statistics.median(sizes)),
+            speed=duration / predicted_seconds,
+            basis=basis,
+            samples=len(rows)
+        )
+        if len(rows) >= 3:
+            estimate.seconds_range = _quartiles(seconds)
+            estimate.bytes_range = _quartiles(sizes)
+        return estimate
+
+    @staticmethod
+    def estimate_from_sample(
+        duration: float,
+        sample_duration: float,
+        sample_seconds: float,
+        sample_bytes: int,
+        target_bytes: Optional[int] = None
+    ) -> EncodeEstimate:
+        """按试编码结果（sample_duration 秒的片段用时 sample_seconds 秒、输出 sample_bytes 字节）线性外推"""
+        speed = sample_duration / sample_seconds
+        return EncodeEstimate(
+            seconds=duration / speed,
+            output_bytes=target_bytes or int(sample_bytes * duration / sample_duration),
+            speed=speed,
+            basis="sample",
+            samples=1
+        )
+
+    def accuracy(self, profile: Optional[EncodeProfile] = None) -> Optional[dict]:
+        """
+        预测误差统计（只统计实际任务）
+
+        Returns:
+            count, seconds_error, bytes_error（绝对百分比误差的中位数）；没有带预测的记录时返回 None
+        """
+        sql = "SELECT * FROM encodes WHERE source = 'job' AND predicted_seconds IS NOT NULL"
+        params: list = []
+        if profile is not None:
+            sql += " AND codec = ? AND hardware = ?"
+            params += [profile.codec, profile.hardware]
+        sql += " ORDER BY recorded_at DESC LIMIT ?"
+        params.append(HISTORY_WINDOW)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return None
+        return {
+            "count": len(rows),
+            "seconds_error": statistics.median(
+                abs(row["predicted_seconds"] - row["wall_seconds"]) / row["wall_seconds"] for row in rows
+            ),
+            "bytes_error": statistics.median(
+                abs(row["predicted_bytes"] - row["output_bytes"]) / max(1, row["output_bytes"]) for row in rows
+            )
+        }
@@ -0,0 +1,37 @@
+"""
+时间码解析与格式化
+"""
+
+import re
+from typing import Optional
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def parse_timecode(value: str) -> float:
+    """将 HH:MM:SS(.ms)、MM:SS 或纯秒数字符串转换为秒"""
+    parts = value.strip().split(":")
+    if len(parts) > 3:
+        raise ValueError(f"无效的时间格式: {value}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_timecode(seconds: float) -> str:
+    """将秒数格式化为 HH:MM:SS.mmm（先取整到毫秒再进位，不会出现 60.000 这样的无效秒数）"""
+    millis = round(max(seconds, 0.0) * 1000)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def parse_duration_from_log(stderr: str) -> Optional[float]:
+    """从 FFmpeg 日志的输入信息中解析时长（秒）"""
+    match = _DURATION_RE.search(stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
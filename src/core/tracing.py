@@ -0,0 +1,300 @@
+"""
+调用追踪
+每次工具调用记录为一个 trace：根 span 对应工具调用，子 span 对应探测、预检、排队等待、进程启动、
+FFmpeg 运行和后处理等阶段。trace 在根 span 结束时按 OpenTelemetry OTLP/JSON 格式写入本地 JSONL 文件
+（每行一个 ExportTraceServiceRequest，可直接交给 OpenTelemetry Collector 的 otlpjsonfile 接收器）。
+
+未配置追踪或本次调用未被采样时，span() 只读取一次上下文变量即返回空操作对象。
+"""
+
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# OTLP span kind
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP status code
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# 字符串属性的最大长度（命令行、参数等）
+MAX_ATTRIBUTE_LENGTH = 1000
+
+
+class _Trace:
+    """一次采样的调用：收集所有 span，根 span 结束时一起导出"""
+
+    __slots__ = ("tracer", "trace_id", "spans", "closed")
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List["Span"] = []
+        self.closed = False
+
+
+class Span:
+    """一个计时阶段；作为上下文管理器使用时成为当前 span，根 span 退出时导出整个 trace"""
+
+    __slots__ = ("name", "kind", "trace", "span_id", "parent_id", "start_ns", "end_ns", "_start_perf",
+                 "attributes", "status", "message", "_token")
+
+    def __init__(self, name: str, trace: _Trace, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = STATUS_OK
+        self.message = ""
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.message = message[:MAX_ATTRIBUTE_LENGTH]
+
+    def end(self) -> None:
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._start_perf)
+        if not self.trace.closed:
+            self.trace.spans.append(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        self.end()
+        if self.parent_id is None:
+            self.trace.closed = True  # 调用结束后仍在运行的后台任务不再追加 span
+            self.trace.tracer.export(self.trace.spans)
+        return False
+
+
+class _NoopSpan:
+    """未采样时使用的 span，所有操作都不做任何事"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+
+class _NoopContext:
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+_NOOP_CONTEXT = _NoopContext()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("ffmpeg_mcp_current_span", default=None)
+
+
+def _attribute_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON 中 64 位整数编码为字符串
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)[:MAX_ATTRIBUTE_LENGTH]}
+
+
+def _encode_span(span: Span) -> dict:
+    encoded = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": span.status, "message": span.message} if span.message else {"code": span.status},
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+class Tracer:
+    """按采样比例记录调用，并把结束的 trace 追加到 JSONL 文件"""
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        service_name: str = "ffmpeg-mcp"
+    ):
+        """
+        Args:
+            path: JSONL 文件路径
+            sample_rate: 采样比例（0-1）
+            max_bytes: 文件超过该大小时轮转为 path.1（只保留一份旧文件）
+            service_name: 写入 resource 的 service.name
+        """
+        self.path = path
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.max_bytes = max_bytes
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def export(self, spans: List[Span]) -> None:
+        """写入一个 trace 的全部 span（一行）"""
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "ffmpeg_mcp"},
+                    "spans": [_encode_span(span) for span in spans],
+                }],
+            }]
+        }, ensure_ascii=False)
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+            except OSError:
+                pass
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_tracer: Optional[Tracer] = None
+
+
+def configure_tracer(tracer: Optional[Tracer]) -> None:
+    """设置全局追踪器（None 表示关闭追踪）"""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def current_span() -> Any:
+    """当前 span（未采样时为空操作对象），用于给所在阶段补充属性"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any):
+    """
+    在当前 trace 中记录一个子阶段（用于 with 语句）；当前调用未被采样时返回空操作对象
+
+    with 块内抛出的异常会记录在 span 上并继续抛出。
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_CONTEXT
+    return Span(name, parent.trace, parent.span_id, kind, attributes)
+
+
+def start_trace(name: str, **attributes: Any):
+    """开始一个 trace（用于 with 语句，已在 trace 中时作为子 span），根 span 结束时导出"""
+    if _current_span.get() is not None:
+        return span(name, **attributes)
+    tracer = _tracer
+    if tracer is None or not tracer.sampled():
+        return _NOOP_CONTEXT
+    return Span(name, _Trace(tracer), None, SPAN_KIND_SERVER, attributes)
+
+
+def traced(name: str):
+    """装饰异步函数：每次调用记录为当前 trace 中的一个 span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record_result(root: Any, result: Any) -> None:
+    """工具以返回 “错误：...” 之类的字符串表示失败，按首行标记 span 状态"""
+    if isinstance(result, str):
+        first_line = result.split("\n", 1)[0]
+        if first_line.startswith(("错误", "发生错误")) or "失败" in first_line:
+            root.set_error(first_line)
+
+
+def traced_tool(fn, name: str):
+    """包装工具函数：每次调用在一个新 trace 中执行，参数记为根 span 的属性"""
+    signature = inspect.signature(fn)
+
+    def attributes(args, kwargs) -> dict:
+        attrs = {"mcp.tool.name": name}
+        try:
+            bound = signature.bind_partial(*args, **kwargs)
+        except TypeError:
+            return attrs
+        for key, value in bound.arguments.items():
+            if isinstance(value, (str, int, float, bool)):
+                attrs[f"mcp.tool.arg.{key}"] = value
+        return attrs
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if _tracer is None:
+                return await fn(*args, **kwargs)
+            with start_trace(f"tool {name}", **attributes(args, kwargs)) as root:
+                result = await fn(*args, **kwargs)
+                _record_result(root, result)
+                return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _tracer is None:
+            return fn(*args, **kwargs)
+        with start_trace(f"tool {name}", **attributes(args, kwargs)) as root:
+            result = fn(*args, **kwargs)
+            _record_result(root, result)
+            return result
+    return wrapper
+
+
+def instrument_tools(mcp) -> None:
+    """让之后注册到 mcp 的每个工具都在 trace 中执行（包装 add_tool，@mcp.tool() 也经由它注册）"""
+    add_tool = mcp.add_tool
+
+    def traced_add_tool(fn, name: Optional[str] = None, **kwargs):
+        return add_tool(traced_tool(fn, name or fn.__name__), name=name, **kwargs)
+
+    mcp.add_tool = traced_add_tool
@@ -0,0 +1,427 @@
+"""
+视频感知哈希
+FFmpeg 只解码关键帧（-skip_frame nokey）并在解码端缩小为 32x32 灰度图，经 rawvideo 管道读入 NumPy，
+对全部关键帧批量计算 64 位 pHash（二维 DCT 低频系数与中位数比较）和 dHash（8x9 缩略图的水平梯度符号）。
+不同码率、分辨率、容器的同一视频，对应关键帧的 pHash 汉明距离通常不超过 8，不同内容约为 32。
+
+每个文件的签名（关键帧哈希列表）存入 SQLite（cache_dir/video_hashes.db），大小和修改时间未变化的文件
+不再解码。近似查找使用多索引哈希表：把 64 位哈希分成 m 段，每段一张按值排序的表；距离不超过 r 的哈希
+至少有一段的差异不超过 r // m 位，因此只需在各表中查找这些取值，不必与所有哈希比较。
+"""
+
+import asyncio
+import contextlib
+import math
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .catalog import MEDIA_EXTENSIONS
+from .frame_reader import RawFrameReader
+from .pool import gather_bounded
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+# 只含音频的扩展名，目录查找时跳过
+AUDIO_EXTENSIONS = {".mp3", ".m4a", ".aac", ".wav", ".flac", ".ogg", ".opus", ".wma", ".aiff", ".ac3"}
+VIDEO_EXTENSIONS = MEDIA_EXTENSIONS - AUDIO_EXTENSIONS
+
+HASH_SIZE = 32  # 解码输出的边长
+DEFAULT_MAX_KEYFRAMES = 300  # 每个文件最多保留的关键帧（超过时均匀抽取）
+MIN_FRAME_STD = 4.0  # 灰度标准差低于该值的关键帧（黑场、纯色）不参与匹配
+
+# 匹配参数
+DEFAULT_MAX_DISTANCE = 8  # 关键帧 pHash 的最大汉明距离（dHash 允许两倍）
+DEFAULT_MIN_MATCH_RATIO = 0.15  # 至少有该比例的关键帧找到近似帧
+MIN_MATCHED_KEYFRAMES = 3
+MAX_BUCKET = 256  # 多索引表中条目超过该值的段取值（片头、常见画面）不参与查找
+QUERY_BATCH_SIZE = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    keyframes INTEGER,
+    phashes BLOB,
+    dhashes BLOB,
+    error TEXT,
+    created REAL
+);
+"""
+
+_QUERY_BATCH_SIZE = 500
+
+
+def _dct_matrix(n: int):
+    k = np.arange(n)
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+def _area_matrix(size_out: int, size_in: int):
+    """按面积平均的缩放矩阵（size_out x size_in）"""
+    edges = np.arange(size_out + 1) * size_in / size_out
+    pixels = np.arange(size_in)
+    overlap = np.clip(
+        np.minimum(edges[1:, None], pixels[None, :] + 1) - np.maximum(edges[:-1, None], pixels[None, :]), 0, None
+    )
+    return (overlap / overlap.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _pack_bits(bits) -> "np.ndarray":
+    """(n, 64) 布尔数组打包为 n 个 uint64"""
+    return np.packbits(bits, axis=1, bitorder="little").view("<u8").ravel()
+
+
+def perceptual_hashes(frames) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    批量计算 pHash 和 dHash
+
+    Args:
+        frames: (n, 32, 32) uint8 灰度帧
+
+    Returns:
+        (pHash, dHash)，各为 n 个 uint64
+    """
+    pixels = frames.astype(np.float32)
+    dct = _dct_matrix(HASH_SIZE)
+    low = (dct @ pixels @ dct.T)[:, :8, :8].reshape(len(frames), 64)
+    # 直流分量不参与中位数，避免整体亮度影响
+    phash = _pack_bits(low > np.median(low[:, 1:], axis=1, keepdims=True))
+
+    small = _area_matrix(8, HASH_SIZE) @ pixels @ _area_matrix(9, HASH_SIZE).T
+    dhash = _pack_bits((small[:, :, 1:] > small[:, :, :-1]).reshape(len(frames), 64))
+    return phash, dhash
+
+
+_POPCOUNT8 = None
+
+
+def hamming_distance(a, b) -> "np.ndarray":
+    """逐元素计算两个 uint64 数组的汉明距离"""
+    global _POPCOUNT8
+    x = np.ascontiguousarray(np.bitwise_xor(a, b), dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int32)
+    if _POPCOUNT8 is None:
+        _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+@dataclass
+class VideoSignature:
+    """一个文件的签名：参与匹配的关键帧哈希"""
+
+    phash: "np.ndarray"
+    dhash: "np.ndarray"
+    keyframes: int  # 解码出的关键帧总数（含被抽样或过滤掉的）
+
+    @property
+    def frames(self) -> int:
+        return len(self.phash)
+
+
+def _read_keyframes(path: str):
+    with RawFrameReader(path, pix_fmt="gray", width=HASH_SIZE, height=HASH_SIZE, keyframes_only=True) as reader:
+        frames = [frame.copy() for frame in reader]
+    return np.stack(frames) if frames else np.empty((0, HASH_SIZE, HASH_SIZE), dtype=np.uint8)
+
+
+async def compute_video_signature(path: str, max_keyframes: int = DEFAULT_MAX_KEYFRAMES) -> VideoSignature:
+    """只解码关键帧计算签名（解码读取和哈希计算在线程池中执行）"""
+    try:
+        frames = await asyncio.to_thread(_read_keyframes, path)
+    except RuntimeError as e:
+        if "matches no streams" in str(e):
+            raise RuntimeError("没有视频流") from e
+        raise
+    if len(frames) == 0:
+        raise RuntimeError("没有解码出关键帧")
+
+    keyframes = len(frames)
+    if keyframes > max_keyframes:
+        frames = frames[np.linspace(0, keyframes - 1, max_keyframes).round().astype(int)]
+    frames = frames[frames.reshape(len(frames), -1).std(axis=1) >= MIN_FRAME_STD]
+    phash, dhash = await asyncio.to_thread(perceptual_hashes, frames)
+    return VideoSignature(phash=phash, dhash=dhash, keyframes=keyframes)
+
+
+class MultiIndexHashTable:
+    """
+    64 位哈希的多索引哈希表（Norouzi 等的 multi-index hashing）
+
+    哈希分成 chunks 段，每段建一张按段取值排序的表。查询距离不超过 r 的条目时，在每张表中查找与查询
+    该段相差不超过 r // chunks 位的所有取值，再对命中的条目计算完整距离。段长取 log2(条目数) 左右时
+    每次查找命中的无关条目最少。
+    """
+
+    def __init__(self, hashes, chunks: Optional[int] = None):
+        if np is None:
+            raise RuntimeError("视频哈希需要安装 numpy（uv sync --extra analysis）")
+        self.hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+        if chunks is None:
+            chunks = round(64 / min(32, max(8, math.log2(max(len(self.hashes), 2)))))
+        self.chunks = max(2, min(8, chunks))
+        widths = [64 // self.chunks + (1 if i < 64 % self.chunks else 0) for i in range(self.chunks)]
+        self.shifts = [sum(widths[:i]) for i in range(self.chunks)]
+        self.widths = widths
+        self.tables = []
+        for shift, width in zip(self.shifts, widths):
+            values = self._chunk(self.hashes, shift, width)
+            order = np.argsort(values, kind="stable")
+            self.tables.append((values[order], order))
+        self._masks: Dict[Tuple[int, int], "np.ndarray"] = {}
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @staticmethod
+    def _chunk(hashes, shift: int, width: int):
+        return (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+
+    def _flip_masks(self, width: int, radius: int):
+        """段内不超过 radius 位的所有翻转掩码"""
+        key = (width, radius)
+        if key not in self._masks:
+            masks = [0]
+            for count in range(1, radius + 1):
+                masks.extend(sum(1 << bit for bit in bits) for bits in combinations(range(width), count))
+            self._masks[key] = np.array(masks, dtype=np.uint64)
+        return self._masks[key]
+
+    def query(self, queries, max_distance: int) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        查找与每个查询哈希距离不超过 max_distance 的条目
+
+        Returns:
+            (查询序号, 条目序号, 距离)
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.uint64)
+        radius = max_distance // self.chunks
+        found_q, found_e = [], []
+        for batch_start in range(0, len(queries), QUERY_BATCH_SIZE):
+            batch = queries[batch_start:batch_start + QUERY_BATCH_SIZE]
+            hits_q, hits_e = [], []
+            for (values, order), shift, width in zip(self.tables, self.shifts, self.widths):
+                probes = self._chunk(batch, shift, width)[:, None] ^ self._flip_masks(width, radius)[None, :]
+                low = np.searchsorted(values, probes.ravel(), side="left")
+                counts = np.searchsorted(values, probes.ravel(), side="right") - low
+                counts[counts > MAX_BUCKET] = 0
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                starts = np.repeat(low - (np.cumsum(counts) - counts), counts)
+                hits_e.append(order[starts + np.arange(total)])
+                hits_q.append(np.repeat(np.arange(len(batch)).repeat(probes.shape[1]), counts) + batch_start)
+            if not hits_q:
+                continue
+            q, e = np.concatenate(hits_q), np.concatenate(hits_e)
+            keep = hamming_distance(queries[q], self.hashes[e]) <= max_distance
+            found_q.append(q[keep])
+            found_e.append(e[keep])
+        if not found_q:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.int32)
+        # 同一条目可能在多张表中命中，只保留一次
+        pairs = np.unique(np.concatenate(found_q).astype(np.int64) * len(self.hashes) + np.concatenate(found_e))
+        q, e = np.divmod(pairs, len(self.hashes))
+        return q, e, hamming_distance(queries[q], self.hashes[e])
+
+
+@dataclass
+class VideoMatch:
+    """两个文件的匹配结果"""
+
+    a: str
+    b: str
+    matched_a: int  # a 中找到近似帧的关键帧数
+    matched_b: int
+    frames_a: int
+    frames_b: int
+    mean_distance: float  # 匹配关键帧的平均 pHash 距离
+
+    @property
+    def coverage(self) -> float:
+        """覆盖比例：取两个文件中较高者（片段相对完整视频时接近 1）"""
+        return max(self.matched_a / max(self.frames_a, 1), self.matched_b / max(self.frames_b, 1))
+
+
+def find_video_matches(
+    signatures: Dict[str, VideoSignature],
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+    min_match_ratio: float = DEFAULT_MIN_MATCH_RATIO,
+    query: Optional[Iterable[str]] = None
+) -> List[VideoMatch]:
+    """
+    在一组签名中查找近似重复的文件对
+
+    Args:
+        signatures: 路径 -> 签名
+        max_distance: 关键帧 pHash 的最大汉明距离（dHash 需同时不超过两倍该值）
+        min_match_ratio: 至少有该比例的关键帧（按两个文件中较高者）找到近似帧
+        query: 只查找至少一方属于该集合的文件对（新文件与已有签名库比较时只查询新文件的哈希）
+    """
+    if np is None:
+        raise RuntimeError("视频哈希需要安装 numpy（uv sync --extra analysis）")
+    paths = [path for path in signatures if signatures[path].frames]
+    if len(paths) < 2:
+        return []
+    lengths = np.array([signatures[path].frames for path in paths])
+    owners = np.repeat(np.arange(len(paths)), lengths)
+    phash = np.concatenate([signatures[path].phash for path in paths])
+    dhash = np.concatenate([signatures[path].dhash for path in paths])
+
+    if query is None:
+        query_index = np.arange(len(phash))
+    else:
+        query = set(query)
+        query_index = np.flatnonzero(np.isin(owners, [i for i, path in enumerate(paths) if path in query]))
+
+    table = MultiIndexHashTable(phash)
+    q, e, distance = table.query(phash[query_index], max_distance)
+    q = query_index[q]
+    keep = (owners[q] != owners[e]) & (hamming_distance(dhash[q], dhash[e]) <= 2 * max_distance)
+    q, e, distance = q[keep], e[keep], distance[keep]
+
+    # 文件对按序号小的一方为 a
+    swap = owners[q] > owners[e]
+    frame_a, frame_b = np.where(swap, e, q), np.where(swap, q, e)
+    file_a, file_b = owners[frame_a], owners[frame_b]
+    pair = file_a.astype(np.int64) * len(paths) + file_b
+
+    pair_ids, inverse = np.unique(pair, return_inverse=True)
+    matched_a = np.bincount(np.unique(np.stack((inverse, frame_a)), axis=1)[0], minlength=len(pair_ids))
+    matched_b = np.bincount(np.unique(np.stack((inverse, frame_b)), axis=1)[0], minlength=len(pair_ids))
+    distance_sum = np.bincount(inverse, weights=distance, minlength=len(pair_ids))
+    hit_count = np.bincount(inverse, minlength=len(pair_ids))
+
+    matches = []
+    for index, pair_id in enumerate(pair_ids):
+        i, j = divmod(int(pair_id), len(paths))
+        match = VideoMatch(
+            paths[i], paths[j], int(matched_a[index]), int(matched_b[index]),
+            int(lengths[i]), int(lengths[j]), float(distance_sum[index] / hit_count[index])
+        )
+        if min(match.matched_a, match.matched_b) >= min(MIN_MATCHED_KEYFRAMES, lengths[i], lengths[j]) \
+                and match.coverage >= min_match_ratio:
+            matches.append(match)
+    matches.sort(key=lambda m: (-m.coverage, m.mean_distance))
+    return matches
+
+
+class VideoHashStore:
+    """SQLite 视频签名库（每次操作使用独立连接，可在线程池中调用）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开连接，退出时提交（异常时回滚）并关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _select(self, columns: str, paths: Sequence[str]) -> List[tuple]:
+        rows = []
+        with self._connect() as conn:
+            for start in range(0, len(paths), _QUERY_BATCH_SIZE):
+                batch = paths[start:start + _QUERY_BATCH_SIZE]
+                placeholders = ", ".join("?" for _ in batch)
+                rows.extend(conn.execute(f"SELECT {columns} FROM video_hashes WHERE path IN ({placeholders})", batch))
+        return rows
+
+    def stale_paths(self, paths: Sequence[str]) -> List[str]:
+        """没有记录或大小、修改时间变化的文件（无法计算签名的文件也有记录，不会反复解码）"""
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in self._select("path, size, mtime_ns", list(paths))}
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                stale.append(path)
+        return stale
+
+    def save(self, path: str, stat: os.stat_result, signature: VideoSignature) -> None:
+        self._write(path, stat, signature.keyframes, signature.phash.astype("<u8").tobytes(),
+                    signature.dhash.astype("<u8").tobytes(), None)
+
+    def save_error(self, path: str, stat: os.stat_result, error: str) -> None:
+        self._write(path, stat, 0, None, None, error[:500])
+
+    def _write(self, path: str, stat: os.stat_result, keyframes: int, phashes: Optional[bytes],
+               dhashes: Optional[bytes], error: Optional[str]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO video_hashes (path, size, mtime_ns, keyframes, phashes, dhashes, error, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, keyframes, phashes, dhashes, error, time.time())
+            )
+
+    def load(self, paths: Sequence[str]) -> Dict[str, VideoSignature]:
+        result = {}
+        for path, keyframes, phashes, dhashes, error in self._select(
+            "path, keyframes, phashes, dhashes, error", list(paths)
+        ):
+            if error is None:
+                result[path] = VideoSignature(
+                    np.frombuffer(phashes, dtype="<u8"), np.frombuffer(dhashes, dtype="<u8"), keyframes
+                )
+        return result
+
+    def errors(self, paths: Sequence[str]) -> Dict[str, str]:
+        return {path: error for path, error in self._select("path, error", list(paths)) if error is not None}
+
+
+async def update_video_hashes(
+    store: VideoHashStore,
+    paths: Sequence[str],
+    max_keyframes: int = DEFAULT_MAX_KEYFRAMES,
+    max_workers: int = 4,
+    force: bool = False
+) -> dict:
+    """
+    为没有签名或已变化的文件计算签名并写入签名库
+
+    Returns:
+        统计信息：total, computed, unchanged, failed, elapsed
+    """
+    start = time.perf_counter()
+    pending = list(paths) if force else await asyncio.to_thread(store.stale_paths, paths)
+
+    async def worker(path: str) -> bool:
+        stat = os.stat(path)
+        try:
+            signature = await compute_video_signature(path, max_keyframes)
+        except RuntimeError as e:
+            await asyncio.to_thread(store.save_error, path, stat, str(e).strip() or "解码失败")
+            return False
+        await asyncio.to_thread(store.save, path, stat, signature)
+        return True
+
+    results = await gather_bounded(pending, worker, max_workers)
+    return {
+        "total": len(paths),
+        "computed": sum(1 for item in results if item is True),
+        "unchanged": len(paths) - len(pending),
+        "failed": sum(1 for item in results if item is not True),
+        "elapsed": time.perf_counter() - start
+    }
@@ -0,0 +1,528 @@
+"""
+监视文件夹
+Linux 上通过 inotify 接收文件写入完成事件（无事件时不占用 CPU），其他平台按间隔比较目录快照；
+文件写入稳定后按处理方案排队，以有限并发调用 FFmpeg
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from .catalog import MEDIA_EXTENSIONS, walk_media_files
+from .encoding import compress_audio_args, compress_video_args, convert_video_args
+from .mp4_layout import streaming_output_args
+from .runner import spawn_ffmpeg_process
+
+# 处理方案：输出扩展名（None 表示与输入相同）和 FFmpeg 输出参数；编码参数与对应工具共用同一套生成函数
+WATCH_PROFILES = {
+    "compress": {
+        "description": "H.264 压缩（与 compress_video 的 medium 质量相同）",
+        "extension": None,
+        "args": [*compress_video_args("libx264", "medium"), *compress_audio_args()],
+    },
+    "convert_mp4": {
+        "description": "转换为 H.264/AAC 的 MP4（与 convert_video_format 的默认设置相同）",
+        "extension": "mp4",
+        "args": [*convert_video_args("libx264", "medium"), "-c:a", "aac"],
+    },
+    "hevc_mp4": {
+        "description": "转换为 H.265/AAC 的 MP4（视频质量与 convert_video_format 的 low 档位相同）",
+        "extension": "mp4",
+        "args": [*convert_video_args("libx265", "low"), "-tag:v", "hvc1", *compress_audio_args()],
+    },
+    "remux_mp4": {
+        "description": "不重新编码，直接封装为 MP4",
+        "extension": "mp4",
+        "args": ["-map", "0:v?", "-map", "0:a?", "-c", "copy"],
+    },
+    "audio_mp3": {
+        "description": "提取音频为 MP3",
+        "extension": "mp3",
+        "args": ["-vn", "-c:a", "libmp3lame", "-q:a", "2"],
+    },
+}
+
+WATCH_BACKENDS = ("auto", "inotify", "polling")
+
+# inotify 事件掩码（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    """当前平台是否支持 inotify"""
+    return _libc is not None
+
+
+class InotifyWatcher:
+    """inotify 文件描述符的封装；描述符为非阻塞，由事件循环的 add_reader 在有事件时回调读取"""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self):
+        if _libc is None:
+            raise OSError("当前平台不支持 inotify")
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 失败：{os.strerror(errno)}")
+        self.fd = fd
+        self._directories: Dict[int, str] = {}
+
+    def add_watch(self, directory: str) -> None:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"无法监视目录：{os.strerror(errno)}（目录过多时可调大 fs.inotify.max_user_watches）", directory)
+        self._directories[wd] = directory
+
+    def read_events(self) -> List[Tuple[int, str]]:
+        """读取当前可读的事件，返回 (事件掩码, 完整路径) 列表；队列溢出事件的路径为空字符串"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((mask, ""))
+                continue
+            if mask & IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            directory = self._directories.get(wd)
+            if directory is not None:
+                events.append((mask, os.path.join(directory, os.fsdecode(name)) if name else directory))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+@dataclass
+class WatchJob:
+    """监视文件夹中的一个待处理文件"""
+
+    path: str
+    size: int
+    mtime_ns: int
+    detected_at: float  # 首次收到该文件事件的时间
+    queued_at: float  # 判定写入完成并进入队列的时间
+    status: str = "pending"  # pending / running / done / failed / cancelled
+    output_path: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    process_seconds: float = 0.0  # FFmpeg 进程运行时间
+    error: Optional[str] = None
+
+    @property
+    def detection_latency(self) -> float:
+        """从最后一次写入（文件修改时间）到进入队列的秒数"""
+        return max(0.0, self.queued_at - self.mtime_ns / 1e9)
+
+    @property
+    def overhead(self) -> Optional[float]:
+        """处理耗时中 FFmpeg 进程之外的部分（建目录、构建命令、启动进程、重命名输出）"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return max(0.0, self.finished_at - self.started_at - self.process_seconds)
+
+
+@dataclass
+class _SettleState:
+    first_seen: float
+    last_event: float
+    closed: bool
+    signature: Optional[Tuple[int, int]] = None
+    handle: Optional[asyncio.TimerHandle] = None
+
+
+class WatchFolder:
+    """
+    监视一个输入目录，把写入完成的媒体文件按处理方案输出到输出目录
+
+    写入完成的判定：最后一个事件之后 settle_seconds 内没有新的写入，并且最后一个事件是
+    写入关闭 / 移入（inotify）；没有关闭事件时（轮询、其他进程多次打开写入）要求相隔
+    settle_seconds 的两次检查中大小和修改时间不变。
+    """
+
+    def __init__(
+        self,
+        watch_id: str,
+        input_dir: str,
+        output_dir: str,
+        profile: str = "compress",
+        max_concurrent: int = 2,
+        settle_seconds: float = 1.0,
+        recursive: bool = False,
+        extensions: Iterable[str] = MEDIA_EXTENSIONS,
+        streaming_mode: str = "none",
+        backend: str = "auto",
+        poll_interval: float = 2.0,
+        history_size: int = 500
+    ):
+        if profile not in WATCH_PROFILES:
+            raise ValueError(f"不支持的处理方案 {profile}，可选：{', '.join(WATCH_PROFILES)}")
+        if backend not in WATCH_BACKENDS:
+            raise ValueError(f"不支持的监视方式 {backend}，可选：{', '.join(WATCH_BACKENDS)}")
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent必须大于0")
+        if settle_seconds < 0 or poll_interval <= 0:
+            raise ValueError("settle_seconds不能为负数，poll_interval必须大于0")
+        input_dir = os.path.realpath(input_dir)
+        output_dir = os.path.realpath(output_dir)
+        if not os.path.isdir(input_dir):
+            raise ValueError(f"输入目录不存在 - {input_dir}")
+        if output_dir == input_dir or (recursive and output_dir.startswith(input_dir + os.sep)):
+            raise ValueError("输出目录不能位于监视目录中，否则输出文件会被再次处理")
+        extension = WATCH_PROFILES[profile]["extension"]
+        if extension is not None:
+            # 提前校验封装方式与输出格式是否匹配
+            streaming_output_args(streaming_mode, f"output.{extension}")
+
+        self.watch_id = watch_id
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.profile = profile
+        self.max_concurrent = max_concurrent
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        self.extensions = {e.lower() for e in extensions}
+        self.streaming_mode = streaming_mode
+        self.requested_backend = backend
+        self.poll_interval = poll_interval
+        self.backend = ""
+        self.created_at = time.time()
+        self.error: Optional[str] = None
+        self.events = 0
+        self.polls = 0
+
+        self._jobs: Deque[WatchJob] = deque(maxlen=history_size)
+        self._active: Dict[str, WatchJob] = {}
+        self._processed: Dict[str, Tuple[int, int]] = {}
+        self._settling: Dict[str, _SettleState] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._known: Dict[str, Tuple[int, int]] = {}
+        self._inotify: Optional[InotifyWatcher] = None
+        self._tasks: List[asyncio.Task] = []
+        self.counters = {"queued": 0, "done": 0, "failed": 0, "cancelled": 0}
+
+    async def start(self, process_existing: bool = False) -> None:
+        """开始监视；process_existing 为 True 时目录中已有的文件也会排队处理"""
+        loop = asyncio.get_running_loop()
+        existing = await asyncio.to_thread(self._snapshot)
+        if self.requested_backend != "polling" and inotify_available():
+            self._inotify = InotifyWatcher()
+            try:
+                for directory in self._directories():
+                    self._inotify.add_watch(directory)
+            except OSError:
+                self._inotify.close()
+                self._inotify = None
+                if self.requested_backend == "inotify":
+                    raise
+        elif self.requested_backend == "inotify":
+            raise OSError("当前平台不支持 inotify")
+
+        if self._inotify is not None:
+            loop.add_reader(self._inotify.fd, self._on_inotify)
+            self.backend = "inotify"
+        else:
+            self._known = existing
+            self._tasks.append(asyncio.create_task(self._poll_loop()))
+            self.backend = "polling"
+
+        self._tasks.extend(asyncio.create_task(self._worker()) for _ in range(self.max_concurrent))
+        if process_existing:
+            for path in existing:
+                self._touch(path, closed=False)
+
+    async def stop(self, wait: bool = False) -> None:
+        """
+        停止监视
+
+        Args:
+            wait: 为 True 时等待已排队和正在处理的文件完成；否则取消排队的文件并终止正在运行的 FFmpeg
+        """
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        for state in self._settling.values():
+            if state.handle is not None:
+                state.handle.cancel()
+        self._settling.clear()
+
+        if wait:
+            await self._queue.join()
+        else:
+            for job in list(self._active.values()):
+                if job.status == "pending":
+                    job.status = "cancelled"
+                    job.finished_at = time.time()
+                    self.counters["cancelled"] += 1
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._active.clear()
+
+    # ---- 事件与写入完成判定 ----
+
+    def _directories(self) -> List[str]:
+        if not self.recursive:
+            return [self.input_dir]
+        directories = [self.input_dir]
+        for current, subdirs, _ in os.walk(self.input_dir):
+            subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+            directories.extend(os.path.join(current, d) for d in subdirs)
+        return directories
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        if self.recursive:
+            files = walk_media_files(self.input_dir, self.extensions)
+        else:
+            files = []
+            try:
+                entries = list(os.scandir(self.input_dir))
+            except OSError:
+                entries = []
+            for entry in entries:
+                try:
+                    if self._accepts(entry.path) and entry.is_file():
+                        files.append((entry.path, entry.stat()))
+                except OSError:
+                    continue
+        return {path: (stat.st_size, stat.st_mtime_ns) for path, stat in files}
+
+    def _accepts(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return not name.startswith(".") and os.path.splitext(name)[1].lower() in self.extensions
+
+    def _on_inotify(self) -> None:
+        if self._inotify is None:
+            return
+        for mask, path in self._inotify.read_events():
+            self.events += 1
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出时丢失的事件无法恢复，重新检查目录中的全部文件
+                for existing in self._snapshot():
+                    self._touch(existing, closed=False)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF) and path == self.input_dir:
+                self.error = "监视目录已被删除或移动"
+            elif mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not os.path.basename(path).startswith("."):
+                    self._watch_new_directory(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._touch(path, closed=True)
+            elif mask & (IN_CREATE | IN_MODIFY):
+                self._touch(path, closed=False)
+
+    def _watch_new_directory(self, directory: str) -> None:
+        # 添加监视之前在新目录中创建的子目录和文件不会产生事件，需要补充监视并逐个检查
+        for current, subdirs, files in os.walk(directory):
+            subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+            try:
+                self._inotify.add_watch(current)
+            except OSError as e:
+                self.error = str(e)
+                return
+            for name in files:
+                self._touch(os.path.join(current, name), closed=False)
+
+    def _touch(self, path: str, closed: bool) -> None:
+        if not self._accepts(path):
+            return
+        now = time.monotonic()
+        state = self._settling.get(path)
+        if state is None:
+            state = self._settling[path] = _SettleState(first_seen=time.time(), last_event=now, closed=closed)
+            state.handle = asyncio.get_running_loop().call_later(self.settle_seconds, self._check, path)
+        else:
+            # 只更新时间戳，由已有的定时器在到期时顺延，避免写入期间频繁重建定时器
+            state.last_event = now
+            state.closed = closed
+
+    def _check(self, path: str) -> None:
+        state = self._settling.get(path)
+        if state is None:
+            return
+        loop = asyncio.get_running_loop()
+        remaining = state.last_event + self.settle_seconds - time.monotonic()
+        if remaining > 0:
+            state.handle = loop.call_later(remaining, self._check, path)
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            del self._settling[path]
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if not state.closed and signature != state.signature:
+            state.signature = signature
+            state.handle = loop.call_later(max(self.settle_seconds, 0.05), self._check, path)
+            return
+        del self._settling[path]
+        if stat.st_size > 0:
+            self._enqueue(path, stat, state.first_seen)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            self.polls += 1
+            if not os.path.isdir(self.input_dir):
+                self.error = "监视目录已被删除或移动"
+                continue
+            snapshot = await asyncio.to_thread(self._snapshot)
+            for path, signature in snapshot.items():
+                if self._known.get(path) != signature:
+                    self._touch(path, closed=False)
+            self._known = snapshot
+
+    # ---- 队列与处理 ----
+
+    def _enqueue(self, path: str, stat: os.stat_result, detected_at: float) -> None:
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if path in self._active or self._processed.get(path) == signature:
+            return
+        job = WatchJob(
+            path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+            detected_at=detected_at, queued_at=time.time()
+        )
+        self._jobs.append(job)
+        self._active[path] = job
+        self.counters["queued"] += 1
+        self._queue.put_nowait(job)
+
+    def output_path_for(self, path: str) -> str:
+        """输出文件路径：保持相对输入目录的子目录结构"""
+        relative = os.path.relpath(path, self.input_dir)
+        stem, suffix = os.path.splitext(relative)
+        extension = WATCH_PROFILES[self.profile]["extension"] or suffix[1:]
+        return os.path.join(self.output_dir, f"{stem}.{extension}")
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == "cancelled":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                try:
+                    await self._process(job)
+                    job.status = "done"
+                    self.counters["done"] += 1
+                    self._processed[job.path] = (job.size, job.mtime_ns)
+                except asyncio.CancelledError:
+                    job.status = "cancelled"
+                    self.counters["cancelled"] += 1
+                    raise
+                except Exception as e:
+                    job.status = "failed"
+                    job.error = str(e).strip()[-500:] or "处理失败"
+                    self.counters["failed"] += 1
+                finally:
+                    job.finished_at = time.time()
+            finally:
+                self._active.pop(job.path, None)
+                self._queue.task_done()
+
+    async def _process(self, job: WatchJob) -> None:
+        output_path = self.output_path_for(job.path)
+        directory, name = os.path.split(output_path)
+        os.makedirs(directory, exist_ok=True)
+        # 先写入隐藏的临时文件，完成后再重命名，下游不会读到写了一半的输出
+        temp_path = os.path.join(directory, f".{name}.part{os.path.splitext(name)[1]}")
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostats", "-i", job.path,
+            *WATCH_PROFILES[self.profile]["args"],
+            *streaming_output_args(self.streaming_mode, output_path),
+            "-y", temp_path
+        ]
+        try:
+            start = time.perf_counter()
+            async with spawn_ffmpeg_process(
+                cmd, stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            ) as process:
+                try:
+                    _, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    process.kill()
+                    await process.wait()
+                    raise
+            job.process_seconds = time.perf_counter() - start
+            if process.returncode != 0:
+                raise RuntimeError(stderr.decode(errors="replace"))
+            os.replace(temp_path, output_path)
+            job.output_path = output_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # ---- 状态 ----
+
+    def jobs(self, status: Optional[str] = None) -> List[WatchJob]:
+        """最近的文件记录（新的在前）"""
+        return [job for job in reversed(self._jobs) if status is None or job.status == status]
+
+    def stats(self) -> dict:
+        finished = [job for job in self._jobs if job.status in ("done", "failed")]
+        latencies = sorted(job.detection_latency for job in self._jobs)
+        overheads = sorted(job.overhead for job in finished if job.overhead is not None)
+        return {
+            "backend": self.backend,
+            "pending": sum(1 for job in self._active.values() if job.status == "pending"),
+            "running": sum(1 for job in self._active.values() if job.status == "running"),
+            "settling": len(self._settling),
+            "events": self.events,
+            "polls": self.polls,
+            **self.counters,
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p99": _percentile(latencies, 99),
+            "overhead_p50": _percentile(overheads, 50),
+            "overhead_p99": _percentile(overheads, 99),
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
@@ -4,5 +4,37 @@
 """
 
 from .math_tools import register_math_tools
+from .scene_tools import register_scene_tools
+from .preview_tools import register_preview_tools
+from .waveform_tools import register_waveform_tools
+from .frame_tools import register_frame_tools
+from .silence_tools import register_silence_tools
+from .segment_tools import register_segment_tools
+from .stream_tools import register_stream_tools
+from .library_tools import register_library_tools
+from .watch_tools import register_watch_tools
+from .job_tools import register_job_tools
+from .proxy_tools import register_proxy_tools
+from .loudness_tools import register_loudness_tools
+from .fingerprint_tools import register_fingerprint_tools
+from .video_hash_tools import register_video_hash_tools
+from .analysis_tools import register_analysis_tools
 
-__all__ = ["register_math_tools"] 
\ No newline at end of file
+__all__ = [
+    "register_math_tools",
+    "register_scene_tools",
+    "register_preview_tools",
+    "register_waveform_tools",
+    "register_frame_tools",
+    "register_silence_tools",
+    "register_segment_tools",
+    "register_stream_tools",
+    "register_library_tools",
+    "register_watch_tools",
+    "register_job_tools",
+    "register_proxy_tools",
+    "register_loudness_tools",
+    "register_fingerprint_tools",
+    "register_video_hash_tools",
+    "register_analysis_tools",
+]
@@ -0,0 +1,161 @@
+"""
+媒体内容分析（质检）工具
+黑场、静止画面、静音、黑边和场景切换在一次解码中同时检测，时间线按文件缓存，之后查询任意检测器直接读取缓存
+"""
+
+import os
+import time
+from typing import List
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    DETECTORS,
+    AnalysisOptions,
+    MediaAnalysisCache,
+    MediaTimeline,
+    format_timecode,
+)
+
+DETECTOR_NAMES = {
+    "black": "黑场",
+    "freeze": "静止画面",
+    "silence": "静音",
+    "crop": "黑边",
+    "scene": "场景切换",
+}
+
+
+def _parse_detectors(value: str) -> List[str]:
+    names = [item.strip().lower() for item in value.split(",") if item.strip()]
+    if not names or "all" in names:
+        return list(DETECTORS)
+    unknown = [name for name in names if name not in DETECTORS]
+    if unknown:
+        raise ValueError(f"不支持的检测器: {', '.join(unknown)}（可选: {', '.join(DETECTORS)}, all）")
+    return names
+
+
+def _describe_intervals(intervals: list) -> str:
+    total = sum(end - start for start, end in intervals)
+    return f"{len(intervals)} 段，共 {total:.1f}秒"
+
+
+def _describe_crop(timeline: MediaTimeline) -> str:
+    box = timeline.dominant_crop()
+    if box is None:
+        return "没有有效画面"
+    w, h, x, y = box
+    if (w, h) == (timeline.width, timeline.height):
+        return f"无黑边（画面 {w}x{h}）"
+    return f"主要画面区域 {w}x{h}（原始 {timeline.width}x{timeline.height}），建议裁剪 crop={w}:{h}:{x}:{y}"
+
+
+def _summary(timeline: MediaTimeline, detector: str, scene_threshold: float) -> str:
+    if detector not in timeline.detectors:
+        return "跳过（没有音频流）" if detector == "silence" else "跳过（没有视频流）"
+    if detector == "scene":
+        cuts = timeline.scene_cuts(scene_threshold)
+        return f"{len(cuts)} 个切换点（阈值 {scene_threshold}）"
+    if detector == "crop":
+        return _describe_crop(timeline)
+    return _describe_intervals(getattr(timeline, detector))
+
+
+def register_analysis_tools(mcp: FastMCP, config: ServerConfig):
+    """注册媒体内容分析相关的工具到 MCP 服务器"""
+
+    cache = MediaAnalysisCache(config.cache_dir)
+
+    @mcp.tool()
+    async def analyze_media(
+        input_path: str,
+        detectors: str = "all",
+        scene_threshold: float = 0.4,
+        black_min_duration: float = 0.5,
+        black_pixel_threshold: float = 0.10,
+        freeze_noise_db: float = -60.0,
+        freeze_min_duration: float = 2.0,
+        silence_noise_db: float = -30.0,
+        silence_min_duration: float = 0.5,
+        crop_limit: int = 24,
+        force_refresh: bool = False,
+        max_events: int = 200
+    ) -> str:
+        """
+        一次解码同时检测黑场、静止画面、静音、黑边和场景切换，返回按时间排序的事件时间线
+
+        首次分析总是运行文件中有对应流的全部检测器并按文件缓存；之后查询任意检测器、更换场景切换阈值
+        都直接读取缓存。修改其他检测参数会重新分析。
+
+        Args:
+            input_path: 输入媒体文件路径
+            detectors: 要列出的检测器，逗号分隔（black, freeze, silence, crop, scene 或 all）
+            scene_threshold: 场景切换阈值（0.1-1，越大越严格）
+            black_min_duration: 黑场最短持续时间（秒）
+            black_pixel_threshold: 像素亮度低于该比例视为黑色（0-1）
+            freeze_noise_db: 帧间差异低于该值视为静止（dB）
+            freeze_min_duration: 静止画面最短持续时间（秒）
+            silence_noise_db: 静音电平（dB）
+            silence_min_duration: 静音最短持续时间（秒）
+            crop_limit: 黑边亮度上限（0-255）
+            force_refresh: 是否忽略缓存重新分析
+            max_events: 时间线最多列出的事件数
+
+        Returns:
+            各检测器的汇总和事件时间线
+        """
+        try:
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+            try:
+                selected = _parse_detectors(detectors)
+            except ValueError as e:
+                return f"错误：{e}"
+            if not 0.1 <= scene_threshold <= 1:
+                return "错误：scene_threshold 必须在 0.1 到 1 之间"
+            if not 0 <= black_pixel_threshold <= 1:
+                return "错误：black_pixel_threshold 必须在 0 到 1 之间"
+            if not 0 <= crop_limit <= 255:
+                return "错误：crop_limit 必须在 0 到 255 之间"
+            if min(black_min_duration, freeze_min_duration, silence_min_duration) <= 0:
+                return "错误：最短持续时间必须大于0"
+
+            options = AnalysisOptions(
+                black_min_duration=black_min_duration,
+                black_pixel_threshold=black_pixel_threshold,
+                freeze_noise_db=freeze_noise_db,
+                freeze_min_duration=freeze_min_duration,
+                silence_noise_db=silence_noise_db,
+                silence_min_duration=silence_min_duration,
+                crop_limit=crop_limit
+            )
+            start = time.perf_counter()
+            timeline, cached = await cache.analyze(input_path, options, force_refresh)
+            elapsed = time.perf_counter() - start
+
+            duration_info = f"\n时长: {format_timecode(timeline.duration)}" if timeline.duration else ""
+            report = (
+                f"内容分析完成！\n输入文件: {input_path}{duration_info}"
+                f"\n数据来源: {'缓存时间线' if cached else '单次解码'}\n耗时: {elapsed:.2f}秒\n\n汇总:\n"
+            )
+            for detector in selected:
+                report += f"  {DETECTOR_NAMES[detector]}: {_summary(timeline, detector, scene_threshold)}\n"
+
+            events = timeline.events(selected, scene_threshold)
+            if not events:
+                return report + "\n时间线: 没有检测到事件"
+            report += f"\n时间线（{len(events)} 个事件）:\n"
+            for event in events[:max_events]:
+                span_info = format_timecode(event.start)
+                if event.end is not None:
+                    span_info += f" - {format_timecode(event.end)}（{event.duration:.2f}秒）"
+                detail = f" {event.detail}" if event.detail else ""
+                report += f"  {span_info} {DETECTOR_NAMES[event.kind]}{detail}\n"
+            if len(events) > max_events:
+                report += f"  ... 以及其他 {len(events) - max_events} 个事件\n"
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,248 @@
+"""
+音频指纹工具
+fingerprint_audio 计算音频指纹并可与媒体目录中已有的指纹比较；find_duplicates 在整个目录中查找
+内容相同的音频（重新编码、改变码率或音量、截取片段）。指纹保存在 SQLite 中，重复运行只解码新增或修改过的文件
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    DEFAULT_MAX_BIT_ERROR,
+    DEFAULT_MIN_OVERLAP_SECONDS,
+    MEDIA_EXTENSIONS,
+    FingerprintMatch,
+    FingerprintStore,
+    find_fingerprint_matches,
+    group_matches,
+    update_fingerprints,
+    walk_media_files,
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+
+def _split(value: Optional[str]) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _describe_update(stats: dict) -> str:
+    return (
+        f"指纹: 新计算 {stats['computed']} 个，未变化跳过 {stats['unchanged']} 个，"
+        f"无音频或解码失败 {stats['failed']} 个（{stats['elapsed']:.2f}秒）"
+    )
+
+
+def _relative_start(match: FingerprintMatch, reference: str) -> float:
+    """匹配文件的内容在参考文件中的起始位置（秒，负数表示匹配文件比参考文件多出开头部分）"""
+    seconds = match.offset_seconds if match.a == reference else -match.offset_seconds
+    return round(seconds, 1) + 0.0  # 避免显示 -0.0
+
+
+def _describe_match(match: FingerprintMatch, reference: str) -> str:
+    return (
+        f"相似度 {match.similarity:.0%}，位于 {reference} 的 {_relative_start(match, reference):+.1f}秒处，"
+        f"重叠 {match.overlap_seconds:.1f}秒"
+    )
+
+
+def register_fingerprint_tools(mcp: FastMCP, config: ServerConfig):
+    """注册音频指纹相关的工具到 MCP 服务器"""
+
+    store = FingerprintStore(os.path.join(config.cache_dir, "fingerprints.db"))
+
+    async def collect(directory: Optional[str], extensions: Optional[str]) -> List[str]:
+        suffixes = {f".{e.lower().lstrip('.')}" for e in _split(extensions)} or MEDIA_EXTENSIONS
+        files = await asyncio.to_thread(walk_media_files, os.path.realpath(directory), suffixes)
+        return sorted(path for path, _ in files)
+
+    @mcp.tool()
+    async def fingerprint_audio(
+        input_paths: str,
+        library_dir: Optional[str] = None,
+        extensions: Optional[str] = None,
+        max_seconds: Optional[float] = None,
+        max_bit_error: float = DEFAULT_MAX_BIT_ERROR,
+        min_overlap_seconds: float = DEFAULT_MIN_OVERLAP_SECONDS,
+        max_workers: Optional[int] = None,
+        force: bool = False
+    ) -> str:
+        """
+        计算音频指纹（第一条音频流开头一段的频谱子指纹），并可查找媒体目录中内容相同的文件
+
+        指纹保存在指纹库中，大小和修改时间未变化的文件不会重新解码；新增文件只需与已有指纹比较。
+
+        Args:
+            input_paths: 输入文件路径列表，用逗号分隔
+            library_dir: 要比较的媒体目录（可选，目录中尚无指纹的文件会先计算指纹）
+            extensions: 媒体目录中要收录的扩展名，逗号分隔（可选，默认常见音视频格式）
+            max_seconds: 每个文件分析开头的时长（秒，可选，默认使用服务器配置）
+            max_bit_error: 判定为相同内容的最大误码率（0-0.5，越小越严格）
+            min_overlap_seconds: 至少需要的重叠时长（秒，较短的文件不足该时长时要求几乎完整重叠）
+            max_workers: 同时计算指纹的文件数（可选，默认使用服务器配置）
+            force: 是否忽略已有指纹重新计算
+
+        Returns:
+            指纹信息和匹配结果
+        """
+        try:
+            if np is None:
+                return "错误：音频指纹需要安装 numpy（uv sync --extra analysis）"
+            paths = [os.path.realpath(path) for path in _split(input_paths)]
+            if not paths:
+                return "错误：至少需要一个输入文件"
+            for path in paths:
+                if not os.path.isfile(path):
+                    return f"错误：输入文件不存在 - {path}"
+            if library_dir is not None and not os.path.isdir(library_dir):
+                return f"错误：目录不存在 - {library_dir}"
+            if not 0 < max_bit_error < 0.5:
+                return "错误：max_bit_error 必须在 0 到 0.5 之间"
+            seconds = max_seconds or config.fingerprint_seconds
+            workers = max_workers or config.fingerprint_workers
+            if seconds <= 0 or workers < 1:
+                return "错误：max_seconds 和 max_workers 必须大于0"
+
+            start = time.perf_counter()
+            library = await collect(library_dir, extensions) if library_dir is not None else []
+            everything = sorted(set(paths) | set(library))
+            stats = await update_fingerprints(store, everything, seconds, workers, force)
+            fingerprints = await asyncio.to_thread(store.load, everything, seconds)
+            errors = await asyncio.to_thread(store.errors, paths)
+
+            matches: Dict[str, List[FingerprintMatch]] = {path: [] for path in paths}
+            if library_dir is not None:
+                found = await asyncio.to_thread(
+                    find_fingerprint_matches,
+                    {path: fp.codes for path, fp in fingerprints.items()},
+                    max_bit_error, min_overlap_seconds, paths
+                )
+                for match in found:
+                    for path in (match.a, match.b):
+                        if path in matches:
+                            matches[path].append(match)
+
+            report = (
+                f"音频指纹完成！共 {len(paths)} 个文件，总耗时: {time.perf_counter() - start:.2f}秒\n"
+                f"{_describe_update(stats)}\n"
+            )
+            if library_dir is not None:
+                report += f"比较目录: {os.path.realpath(library_dir)}（{len(library)} 个媒体文件）\n"
+            for path in paths:
+                fingerprint = fingerprints.get(path)
+                if fingerprint is None:
+                    report += f"\n✗ {path}\n  失败: {errors.get(path, '没有指纹')}\n"
+                    continue
+                report += f"\n✓ {path}\n  分析时长: {fingerprint.duration:.1f}秒，{fingerprint.frames} 个子指纹\n"
+                if library_dir is None:
+                    continue
+                if not matches[path]:
+                    report += "  没有找到内容相同的文件\n"
+                for match in matches[path]:
+                    other = match.b if match.a == path else match.a
+                    report += f"  匹配: {other}\n    {_describe_match(match, path)}\n"
+            return report + f"\n指纹库: {store.db_path}"
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def find_duplicates(
+        directory: Optional[str] = None,
+        input_paths: Optional[str] = None,
+        extensions: Optional[str] = None,
+        max_seconds: Optional[float] = None,
+        max_bit_error: float = DEFAULT_MAX_BIT_ERROR,
+        min_overlap_seconds: float = DEFAULT_MIN_OVERLAP_SECONDS,
+        max_workers: Optional[int] = None,
+        force: bool = False,
+        limit: int = 50
+    ) -> str:
+        """
+        按音频内容查找重复文件：重新编码、改变码率或音量、前后多出或被截取一段的文件也会被识别
+
+        指纹保存在指纹库中，重复运行只解码新增或修改过的文件；比较使用子指纹倒排索引，
+        不对所有文件两两比较。
+
+        Args:
+            directory: 要查找的媒体目录（与 input_paths 至少指定一个）
+            input_paths: 文件路径列表，用逗号分隔（可选，与目录中的文件一起比较）
+            extensions: 目录中要收录的扩展名，逗号分隔（可选，默认常见音视频格式）
+            max_seconds: 每个文件分析开头的时长（秒，可选，默认使用服务器配置）
+            max_bit_error: 判定为相同内容的最大误码率（0-0.5，越小越严格）
+            min_overlap_seconds: 至少需要的重叠时长（秒，较短的文件不足该时长时要求几乎完整重叠）
+            max_workers: 同时计算指纹的文件数（可选，默认使用服务器配置）
+            force: 是否忽略已有指纹重新计算
+            limit: 最多列出的重复组数
+
+        Returns:
+            重复文件分组
+        """
+        try:
+            if np is None:
+                return "错误：音频指纹需要安装 numpy（uv sync --extra analysis）"
+            if directory is None and not input_paths:
+                return "错误：请指定 directory 或 input_paths"
+            if directory is not None and not os.path.isdir(directory):
+                return f"错误：目录不存在 - {directory}"
+            paths = [os.path.realpath(path) for path in _split(input_paths)]
+            for path in paths:
+                if not os.path.isfile(path):
+                    return f"错误：输入文件不存在 - {path}"
+            if not 0 < max_bit_error < 0.5:
+                return "错误：max_bit_error 必须在 0 到 0.5 之间"
+            seconds = max_seconds or config.fingerprint_seconds
+            workers = max_workers or config.fingerprint_workers
+            if seconds <= 0 or workers < 1 or limit < 1:
+                return "错误：max_seconds、max_workers 和 limit 必须大于0"
+
+            start = time.perf_counter()
+            if directory is not None:
+                paths = sorted(set(paths) | set(await collect(directory, extensions)))
+            stats = await update_fingerprints(store, paths, seconds, workers, force)
+            fingerprints = await asyncio.to_thread(store.load, paths, seconds)
+
+            match_start = time.perf_counter()
+            matches = await asyncio.to_thread(
+                find_fingerprint_matches,
+                {path: fp.codes for path, fp in fingerprints.items()},
+                max_bit_error, min_overlap_seconds
+            )
+            groups = group_matches(matches)
+            match_elapsed = time.perf_counter() - match_start
+
+            report = (
+                f"重复查找完成！共 {len(paths)} 个文件，总耗时: {time.perf_counter() - start:.2f}秒\n"
+                f"{_describe_update(stats)}\n"
+                f"比较: {len(fingerprints)} 个指纹，{len(matches)} 对匹配（{match_elapsed:.2f}秒）\n"
+            )
+            if not groups:
+                return report + "\n没有找到内容相同的文件"
+
+            by_pair = {frozenset((m.a, m.b)): m for m in matches}
+            duplicates = sum(len(group) - 1 for group in groups)
+            report += f"\n重复组: {len(groups)} 个，可去除的重复文件: {duplicates} 个\n"
+            if len(groups) > limit:
+                report += f"（仅显示前 {limit} 组）\n"
+            for index, group in enumerate(groups[:limit], 1):
+                # 以分析时长最长的文件为参考（截取的片段相对它给出位置）
+                reference = max(group, key=lambda path: (fingerprints[path].duration, path))
+                report += f"\n组 {index}（{len(group)} 个文件）\n  参考: {reference}\n"
+                for path in group:
+                    if path == reference:
+                        continue
+                    match = by_pair.get(frozenset((path, reference)))
+                    detail = _describe_match(match, reference) if match else "通过组内其他文件匹配"
+                    report += f"  {path}\n    {detail}\n"
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,95 @@
+"""
+原始帧分析工具
+基于 RawFrameReader 直接在内存中分析解码帧，不落地图片文件
+"""
+
+import os
+import time
+from typing import Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..core import RawFrameReader, format_timecode, parse_timecode
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+
+def register_frame_tools(mcp: FastMCP):
+    """注册原始帧分析相关的工具到 MCP 服务器"""
+
+    @mcp.tool()
+    async def analyze_frames(
+        input_path: str,
+        fps: float = 1.0,
+        width: int = 160,
+        start_time: Optional[str] = None,
+        duration: Optional[str] = None,
+        max_rows: int = 60
+    ) -> str:
+        """
+        按固定帧率抽取视频帧并统计亮度与画面变化（帧直接读入内存，不生成图片）
+
+        Args:
+            input_path: 输入视频文件路径
+            fps: 抽帧帧率（如1表示每秒1帧）
+            width: 分析时缩放到的宽度（越小越快）
+            start_time: 开始时间（格式：HH:MM:SS，可选）
+            duration: 持续时间（格式：HH:MM:SS，可选）
+            max_rows: 最多列出的帧数量
+
+        Returns:
+            逐帧亮度（0-255）和相邻帧差异（画面变化程度）统计
+        """
+        try:
+            if np is None:
+                return "错误：帧分析需要安装 numpy（uv sync --extra analysis）"
+
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+
+            if fps <= 0:
+                return "错误：fps必须大于0"
+
+            offset = parse_timecode(start_time) if start_time else 0.0
+            rows = []
+            previous = None
+
+            start = time.perf_counter()
+            async with RawFrameReader(
+                input_path, pix_fmt="gray", width=width, fps=fps,
+                start_time=start_time, duration=duration, pool_size=2
+            ) as reader:
+                async for frame in reader:
+                    brightness = float(frame.mean())
+                    if previous is None:
+                        previous = np.empty_like(frame, dtype=np.int16)
+                        motion = 0.0
+                    else:
+                        motion = float(np.abs(frame.astype(np.int16) - previous).mean())
+                    np.copyto(previous, frame)
+                    rows.append((offset + reader.frame_time(reader.frames_read - 1), brightness, motion))
+            elapsed = time.perf_counter() - start
+
+            if not rows:
+                return f"未读取到任何帧：{input_path}"
+
+            brightness_values = [r[1] for r in rows]
+            motion_values = [r[2] for r in rows[1:]] or [0.0]
+            report = (
+                f"帧分析完成！\n输入文件: {input_path}\n分析帧数: {len(rows)}（{fps}fps，宽度 {width}px）"
+                f"\n平均亮度: {sum(brightness_values) / len(brightness_values):.1f}"
+                f"\n平均画面变化: {sum(motion_values) / len(motion_values):.2f}"
+                f"\n最大画面变化: {max(motion_values):.2f}"
+                f"\n耗时: {elapsed:.2f}秒（{len(rows) / elapsed if elapsed else 0:.0f} 帧/秒）\n"
+            )
+            step = max(1, -(-len(rows) // max_rows))
+            for t, brightness, motion in rows[::step]:
+                report += f"  {format_timecode(t)}  亮度: {brightness:6.1f}  变化: {motion:6.2f}\n"
+
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
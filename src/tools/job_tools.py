@@ -0,0 +1,100 @@
+"""
+任务日志工具
+查看 compress_video / merge_videos 等长时间任务的状态、状态变化历史和已完成的分块
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..core import JOB_STATES, JobJournal
+
+STATE_LABELS = {
+    "queued": "排队中",
+    "running": "运行中",
+    "done": "完成",
+    "failed": "失败",
+    "chunk": "完成分块",
+}
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def register_job_tools(mcp: FastMCP, journal: JobJournal):
+    """注册任务日志相关的工具到 MCP 服务器"""
+
+    @mcp.tool()
+    async def list_jobs(state: Optional[str] = None, limit: int = 20) -> str:
+        """
+        列出最近的长时间任务（compress_video、merge_videos）
+
+        Args:
+            state: 只显示该状态的任务（可选：queued, running, done, failed）
+            limit: 最多显示的任务数
+
+        Returns:
+            任务列表
+        """
+        try:
+            if state is not None and state not in JOB_STATES:
+                return f"错误：不支持的状态 {state}，可选：{', '.join(JOB_STATES)}"
+
+            jobs = await asyncio.to_thread(journal.list, state, limit)
+            if not jobs:
+                return "没有匹配的任务"
+            report = f"任务（显示 {len(jobs)} 个）:\n"
+            for job in jobs:
+                report += (
+                    f"  [{STATE_LABELS[job['state']]}] {job['job_id']}\n"
+                    f"    输出: {job['output_path']}\n"
+                    f"    创建: {_format_time(job['created_at'])}，更新: {_format_time(job['updated_at'])}，"
+                    f"执行次数: {job['attempts']}\n"
+                )
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def get_job(job_id: str) -> str:
+        """
+        查看任务的参数、状态变化历史、已完成的分块和结果
+
+        Args:
+            job_id: 任务 id
+
+        Returns:
+            任务详情
+        """
+        try:
+            job = await asyncio.to_thread(journal.get, job_id)
+            if job is None:
+                return f"错误：任务不存在 - {job_id}"
+
+            report = (
+                f"任务: {job['job_id']}\n类型: {job['kind']}\n状态: {STATE_LABELS[job['state']]}"
+                f"\n执行次数: {job['attempts']}\n输出: {job['output_path']}\n参数:\n"
+            )
+            for key, value in job["params"].items():
+                report += f"  {key}: {value}\n"
+
+            chunks = await asyncio.to_thread(journal.completed_chunks, job_id)
+            if chunks:
+                report += f"已完成分块: {len(chunks)} 个\n"
+
+            report += "状态变化:\n"
+            for at, state, detail in await asyncio.to_thread(journal.events, job_id):
+                report += f"  {_format_time(at)} {STATE_LABELS.get(state, state)}{f'（{detail}）' if detail else ''}\n"
+
+            if job["result"]:
+                report += f"\n结果:\n{job['result']}"
+            elif job["error"]:
+                report += f"\n错误:\n{job['error']}"
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,236 @@
+"""
+媒体库目录工具
+scan_library 并发探测目录树并写入 SQLite 目录，重复扫描只处理新增或修改过的文件；
+query_library 直接查询目录进行筛选和分组统计，不访问媒体文件
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    CODEC_ALIASES,
+    GROUP_COLUMNS,
+    MEDIA_EXTENSIONS,
+    MediaCatalog,
+    format_timecode,
+    parse_timecode,
+    path_prefix_range,
+    scan_directory,
+)
+
+# 明细查询可用的排序方式
+ORDER_BY = {
+    "path": "path",
+    "duration": "duration DESC",
+    "size": "size DESC",
+    "bitrate": "bit_rate DESC",
+    "height": "height DESC",
+    "scanned": "scanned_at DESC",
+}
+
+
+def _split(value: Optional[str]) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.2f}TB"
+
+
+def register_library_tools(mcp: FastMCP, config: ServerConfig):
+    """注册媒体库目录相关的工具到 MCP 服务器"""
+
+    catalog = MediaCatalog(os.path.join(config.cache_dir, "library.db"))
+
+    @mcp.tool()
+    async def scan_library(
+        paths: str,
+        max_workers: Optional[int] = None,
+        extensions: Optional[str] = None,
+        compute_fingerprint: bool = True,
+        force: bool = False
+    ) -> str:
+        """
+        扫描媒体目录并写入媒体库目录（编码、分辨率、时长、码率、音轨、内容指纹）
+
+        重复扫描时大小、修改时间和 inode 未变化的文件会被跳过，已删除的文件会从目录移除。
+
+        Args:
+            paths: 要扫描的目录，多个目录用逗号分隔
+            max_workers: 并发探测数（可选，默认使用服务器配置）
+            extensions: 要收录的扩展名，逗号分隔（可选，如 "mp4,mkv"，默认常见音视频格式）
+            compute_fingerprint: 是否计算内容指纹（读取每个文件头尾各 64KB，用于查找重复文件）
+            force: 是否忽略已有记录重新探测全部文件
+
+        Returns:
+            扫描结果信息
+        """
+        try:
+            roots = _split(paths)
+            if not roots:
+                return "错误：请至少指定一个目录"
+            for root in roots:
+                if not os.path.isdir(root):
+                    return f"错误：目录不存在 - {root}"
+
+            workers = max_workers or config.catalog_workers
+            if workers < 1:
+                return "错误：max_workers必须大于0"
+            suffixes = {f".{e.lower().lstrip('.')}" for e in _split(extensions)} or MEDIA_EXTENSIONS
+
+            report = "媒体库扫描完成！\n"
+            for root in roots:
+                stats = await scan_directory(
+                    catalog, root, max_workers=workers, extensions=suffixes,
+                    compute_fingerprint=compute_fingerprint, force=force
+                )
+                rate = stats["probed"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+                report += (
+                    f"\n目录: {stats['root']}\n  媒体文件: {stats['total']} 个"
+                    f"\n  新探测: {stats['probed']} 个（{rate:.1f} 个/秒，并发 {workers}）"
+                    f"\n  未变化跳过: {stats['unchanged']} 个\n  已移除: {stats['removed']} 个"
+                    f"\n  探测失败: {stats['failed']} 个\n  耗时: {stats['elapsed']:.2f}秒\n"
+                )
+            return report + f"\n目录数据库: {catalog.db_path}"
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def query_library(
+        video_codec: Optional[str] = None,
+        audio_codec: Optional[str] = None,
+        container: Optional[str] = None,
+        min_duration: Optional[str] = None,
+        max_duration: Optional[str] = None,
+        min_height: Optional[int] = None,
+        max_height: Optional[int] = None,
+        min_bitrate_kbps: Optional[int] = None,
+        path_contains: Optional[str] = None,
+        root: Optional[str] = None,
+        errors_only: bool = False,
+        group_by: Optional[str] = None,
+        order_by: str = "path",
+        limit: int = 50
+    ) -> str:
+        """
+        查询媒体库目录（需先运行 scan_library）
+
+        Args:
+            video_codec: 视频编码，逗号分隔（可选，如 "hevc,h264"，"none" 表示无视频）
+            audio_codec: 音频编码，逗号分隔（可选，"none" 表示无音频）
+            container: 容器格式，逗号分隔（可选，如 "matroska,mov"）
+            min_duration: 最短时长（可选，秒数或 HH:MM:SS）
+            max_duration: 最长时长（可选，秒数或 HH:MM:SS）
+            min_height: 最小高度（可选，如 1080）
+            max_height: 最大高度（可选）
+            min_bitrate_kbps: 最低总码率（可选，kbps）
+            path_contains: 路径包含的文本（可选）
+            root: 只查询该目录下的文件（可选，含子目录）
+            errors_only: 只列出探测失败的文件（默认不包含探测失败的文件）
+            group_by: 分组统计字段（可选）：video_codec、audio_codec、container、resolution、height、root、fingerprint
+            order_by: 明细排序：path、duration、size、bitrate、height、scanned（分组时按文件数排序）
+            limit: 最多返回的行数
+
+        Returns:
+            匹配的文件或分组统计
+        """
+        try:
+            if group_by is not None and group_by not in GROUP_COLUMNS:
+                return f"错误：不支持的分组字段 {group_by}，可选：{', '.join(GROUP_COLUMNS)}"
+            if order_by not in ORDER_BY:
+                return f"错误：不支持的排序方式 {order_by}，可选：{', '.join(ORDER_BY)}"
+            if limit < 1:
+                return "错误：limit必须大于0"
+
+            where, params = [], []
+            for column, value in (("video_codec", video_codec), ("audio_codec", audio_codec), ("container", container)):
+                values = [v.lower() for v in _split(value)]
+                if not values:
+                    continue
+                names = [CODEC_ALIASES.get(v, v) for v in values if v != "none"]
+                terms = [f"{column} IS NULL"] if "none" in values else []
+                if names:
+                    terms.append(f"{column} IN ({', '.join('?' for _ in names)})")
+                    params.extend(names)
+                where.append(f"({' OR '.join(terms)})")
+            if min_duration is not None:
+                where.append("duration >= ?")
+                params.append(parse_timecode(min_duration))
+            if max_duration is not None:
+                where.append("duration <= ?")
+                params.append(parse_timecode(max_duration))
+            if min_height is not None:
+                where.append("height >= ?")
+                params.append(min_height)
+            if max_height is not None:
+                where.append("height <= ?")
+                params.append(max_height)
+            if min_bitrate_kbps is not None:
+                where.append("bit_rate >= ?")
+                params.append(min_bitrate_kbps * 1000)
+            if path_contains:
+                where.append("instr(path, ?) > 0")
+                params.append(path_contains)
+            if root:
+                where.append("path >= ? AND path < ?")
+                params.extend(path_prefix_range(os.path.realpath(root)))
+            where.append("probe_error IS NOT NULL" if errors_only else "probe_error IS NULL")
+
+            start = time.perf_counter()
+            if group_by == "fingerprint":
+                where.append("fingerprint IS NOT NULL")
+            order = "files DESC, grp" if group_by else ORDER_BY[order_by]
+            columns, rows, (count, seconds, size) = await asyncio.to_thread(
+                catalog.query, where, params, group_by, order, limit
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            report = (
+                f"查询完成（{elapsed_ms:.1f}毫秒）\n匹配文件: {count} 个，总时长 {seconds / 3600:.2f} 小时，"
+                f"总大小 {_format_size(size)}\n"
+            )
+            if group_by:
+                if group_by == "fingerprint":
+                    rows = [row for row in rows if row[1] > 1]
+                    report += "\n重复文件（相同内容指纹）:\n" if rows else "\n没有重复文件\n"
+                else:
+                    report += f"\n按 {group_by} 分组:\n"
+                for value, files, group_seconds, group_bytes in rows:
+                    report += (
+                        f"  {value}: {files} 个，{group_seconds / 3600:.2f} 小时，{_format_size(group_bytes)}\n"
+                    )
+                    if group_by == "fingerprint":
+                        _, duplicates, _ = await asyncio.to_thread(
+                            catalog.query, ["fingerprint = ?"], [value], None, "path", files
+                        )
+                        report += "".join(f"    {row[0]}\n" for row in duplicates)
+                return report
+
+            if count > len(rows):
+                report += f"（仅显示前 {len(rows)} 个）\n"
+            report += "\n"
+            for path, vcodec, width, height, duration, bit_rate, acodec, tracks, file_size, error in rows:
+                if error:
+                    report += f"  {path}\n    探测失败: {error}\n"
+                    continue
+                video = f"{vcodec} {width}x{height}" if vcodec else "无视频"
+                audio = f"{acodec}×{tracks}" if acodec else "无音频"
+                bitrate = f"{bit_rate / 1000:.0f}kbps" if bit_rate else "-"
+                length = format_timecode(duration) if duration else "-"
+                report += f"  {path}\n    {video} | {audio} | {length} | {bitrate} | {_format_size(file_size or 0)}\n"
+            return report
+
+        except ValueError as e:
+            return f"错误：{str(e)}"
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,196 @@
+"""
+响度归一化工具
+EBU R128 两遍 loudnorm：第一遍测量结果按文件缓存，之后以不同目标重新归一化只需执行第二遍
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..core import (
+    DEFAULT_TARGET_I,
+    DEFAULT_TARGET_LRA,
+    DEFAULT_TARGET_TP,
+    TARGET_I_RANGE,
+    TARGET_LRA_RANGE,
+    TARGET_TP_RANGE,
+    LoudnessCache,
+    gather_bounded,
+    get_audio_stream,
+    get_video_stream,
+    loudnorm_filter,
+    parse_loudnorm_json,
+    probe_media,
+    run_ffmpeg_command,
+)
+
+NORMALIZATION_TYPES = {
+    "linear": "线性（整体增益，保留动态）",
+    "dynamic": "动态（响度范围超过目标或真峰值受限）",
+}
+
+
+def _split_paths(input_paths: str):
+    return [path.strip() for path in input_paths.split(",") if path.strip()]
+
+
+def _check_targets(target_i: float, target_tp: float, target_lra: float) -> Optional[str]:
+    for name, value, (low, high) in (
+        ("target_i", target_i, TARGET_I_RANGE),
+        ("target_tp", target_tp, TARGET_TP_RANGE),
+        ("target_lra", target_lra, TARGET_LRA_RANGE),
+    ):
+        if not low <= value <= high:
+            return f"错误：{name} 必须在 {low:g} 到 {high:g} 之间"
+    return None
+
+
+def register_loudness_tools(mcp: FastMCP, cache: LoudnessCache):
+    """注册响度相关的工具到 MCP 服务器"""
+
+    @mcp.tool()
+    async def measure_loudness(input_paths: str, max_workers: int = 4, force_refresh: bool = False) -> str:
+        """
+        测量音频或视频文件的响度（EBU R128 积分响度、真峰值、响度范围），结果按文件缓存
+
+        Args:
+            input_paths: 输入文件路径列表，用逗号分隔
+            max_workers: 同时测量的文件数
+            force_refresh: 是否忽略缓存重新测量
+
+        Returns:
+            测量结果
+        """
+        try:
+            paths = _split_paths(input_paths)
+            if not paths:
+                return "错误：至少需要一个输入文件"
+            for path in paths:
+                if not os.path.exists(path):
+                    return f"错误：输入文件不存在 - {path}"
+
+            start = time.perf_counter()
+            results = await gather_bounded(paths, lambda path: cache.measure(path, force_refresh), max_workers)
+            total_elapsed = time.perf_counter() - start
+
+            report = f"响度测量完成！共 {len(paths)} 个文件，总耗时: {total_elapsed:.2f}秒\n"
+            for path, item in zip(paths, results):
+                if isinstance(item, Exception):
+                    report += f"\n✗ {path}\n  失败: {item}\n"
+                else:
+                    measurement, cached = item
+                    report += f"\n✓ {path}\n  {measurement.describe()}（{'缓存' if cached else '新测量'}）\n"
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def normalize_loudness(
+        input_paths: str,
+        output_dir: Optional[str] = None,
+        target_i: float = DEFAULT_TARGET_I,
+        target_tp: float = DEFAULT_TARGET_TP,
+        target_lra: float = DEFAULT_TARGET_LRA,
+        audio_codec: Optional[str] = None,
+        bitrate: Optional[str] = None,
+        max_workers: int = 2,
+        force_measure: bool = False
+    ) -> str:
+        """
+        批量响度归一化（EBU R128 两遍 loudnorm）：第一遍测量结果按文件缓存，再次以不同目标处理时只执行第二遍。
+        视频文件只处理第一条音频流，视频流直接复制。
+
+        Args:
+            input_paths: 输入文件路径列表，用逗号分隔
+            output_dir: 输出目录（可选，默认与输入文件相同，文件名追加 _normalized）
+            target_i: 目标积分响度（LUFS，-70 到 -5）
+            target_tp: 真峰值上限（dBTP，-9 到 0）
+            target_lra: 目标响度范围（LU，1 到 50）
+            audio_codec: 音频编码器（可选，默认按输出格式选择）
+            bitrate: 音频码率（可选，如 192k）
+            max_workers: 同时处理的文件数
+            force_measure: 是否忽略缓存重新测量
+
+        Returns:
+            归一化结果信息
+        """
+        try:
+            paths = _split_paths(input_paths)
+            if not paths:
+                return "错误：至少需要一个输入文件"
+            for path in paths:
+                if not os.path.exists(path):
+                    return f"错误：输入文件不存在 - {path}"
+            error = _check_targets(target_i, target_tp, target_lra)
+            if error:
+                return error
+            if output_dir is not None:
+                os.makedirs(output_dir, exist_ok=True)
+
+            async def worker(path: str) -> dict:
+                measurement, cached = await cache.measure(path, force_measure)
+                info = await probe_media(path)
+                audio = get_audio_stream(info)
+                if audio is None:
+                    raise ValueError("没有音频流")
+
+                input_file = Path(path)
+                output_path = os.path.join(
+                    output_dir or str(input_file.parent), f"{input_file.stem}_normalized{input_file.suffix}"
+                )
+                cmd = ["ffmpeg", "-hide_banner", "-nostats", "-i", path]
+                if get_video_stream(info) is not None:
+                    cmd.extend(["-map", "0:v:0", "-c:v", "copy"])
+                # loudnorm 内部以 192kHz 处理，输出时恢复原采样率
+                cmd.extend([
+                    "-map", "0:a:0",
+                    "-af", loudnorm_filter(measurement, target_i, target_tp, target_lra),
+                    "-ar", str(audio.get("sample_rate") or 48000)
+                ])
+                if audio_codec:
+                    cmd.extend(["-c:a", audio_codec])
+                if bitrate:
+                    cmd.extend(["-b:a", bitrate])
+                cmd.extend(["-y", output_path])
+
+                start = time.perf_counter()
+                result = await run_ffmpeg_command(cmd)
+                if result.returncode != 0:
+                    raise RuntimeError(result.stderr[-500:])
+                return {
+                    "output_path": output_path,
+                    "measurement": measurement,
+                    "cached": cached,
+                    "output": parse_loudnorm_json(result.stderr),
+                    "elapsed": time.perf_counter() - start
+                }
+
+            start = time.perf_counter()
+            results = await gather_bounded(paths, worker, max_workers)
+            total_elapsed = time.perf_counter() - start
+
+            succeeded = sum(1 for item in results if not isinstance(item, Exception))
+            report = (
+                f"响度归一化完成！成功 {succeeded}/{len(paths)} 个文件，总耗时: {total_elapsed:.2f}秒"
+                f"\n目标: {target_i:g} LUFS，真峰值 {target_tp:g} dBTP，响度范围 {target_lra:g} LU\n"
+            )
+            for path, item in zip(paths, results):
+                if isinstance(item, Exception):
+                    report += f"\n✗ {path}\n  失败: {item}\n"
+                    continue
+                output = item["output"]
+                mode = NORMALIZATION_TYPES.get(output.get("normalization_type"), output.get("normalization_type", "未知"))
+                report += (
+                    f"\n✓ {path}\n  输出文件: {item['output_path']}"
+                    f"\n  输入: {item['measurement'].describe()}（{'缓存的测量结果，只执行第二遍' if item['cached'] else '新测量'}）"
+                    f"\n  输出: {float(output['output_i']):.1f} LUFS，真峰值 {float(output['output_tp']):.1f} dBTP"
+                    f"\n  方式: {mode}，耗时 {item['elapsed']:.2f}秒\n"
+                )
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
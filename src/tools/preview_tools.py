@@ -0,0 +1,348 @@
+"""
+预览图工具
+单个 FFmpeg 进程内完成抽帧、缩放和拼图，直接输出雪碧图（可附带 WebVTT 缩略图轨）
+"""
+
+import hashlib
+import math
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..core import (
+    format_timecode,
+    gather_bounded,
+    get_duration,
+    get_engine_router,
+    get_video_stream,
+    parse_timecode,
+    probe_media,
+    resolve_preview_input,
+    run_ffmpeg_command,
+)
+
+# 抽帧间隔不小于该值（秒）时只解码关键帧，间隔更小时关键帧不够密集
+KEYFRAME_ONLY_MIN_INTERVAL = 4.0
+
+
+def build_sprite_command(
+    input_path: str,
+    output_pattern: str,
+    interval: float,
+    thumb_width: int,
+    thumb_height: int,
+    columns: int,
+    rows: int,
+    keyframes_only: bool,
+    smart_select: bool
+) -> List[str]:
+    """构建一次性生成雪碧图的命令（fps/thumbnail + scale + tile）"""
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    if keyframes_only:
+        cmd.extend(["-skip_frame", "nokey"])
+    cmd.extend(["-i", input_path, "-map", "0:v:0"])
+
+    if smart_select:
+        # 先降到每秒2帧，再从每个间隔内挑选最具代表性的一帧
+        select_filter = f"fps=2,thumbnail={max(1, round(interval * 2))}"
+    else:
+        select_filter = f"fps=1/{interval}"
+
+    filters = [
+        select_filter,
+        f"scale={thumb_width}:{thumb_height}:flags=fast_bilinear",
+        f"tile={columns}x{rows}"
+    ]
+    cmd.extend([
+        "-vf", ",".join(filters),
+        "-q:v", "4",
+        "-y",
+        output_pattern
+    ])
+    return cmd
+
+
+def build_webvtt(
+    sprite_names: List[str],
+    thumb_count: int,
+    interval: float,
+    duration: float,
+    thumb_width: int,
+    thumb_height: int,
+    columns: int,
+    rows: int
+) -> str:
+    """生成指向雪碧图区域（#xywh）的 WebVTT 缩略图轨"""
+    per_page = columns * rows
+    lines = ["WEBVTT", ""]
+    for i in range(thumb_count):
+        page, position = divmod(i, per_page)
+        if page >= len(sprite_names):
+            break
+        x = (position % columns) * thumb_width
+        y = (position // columns) * thumb_height
+        start = i * interval
+        end = min((i + 1) * interval, duration)
+        lines.append(f"{format_timecode(start)} --> {format_timecode(end)}")
+        lines.append(f"{sprite_names[page]}#xywh={x},{y},{thumb_width},{thumb_height}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def sprite_file_stems(paths: List[str], output_dir: Optional[str]) -> List[str]:
+    """
+    每个输入的输出文件名前缀（默认为源文件名）
+
+    多个输入写入同一目录且文件名相同（如共用 output_dir 的 a/clip.mp4 和 b/clip.mp4）时，
+    加上源路径的短哈希区分，避免并发处理时互相删除、覆盖雪碧图和 VTT
+    """
+    def target(path: str):
+        input_file = Path(path)
+        directory = output_dir or str(input_file.parent / f"{input_file.stem}_sprites")
+        return os.path.abspath(directory), input_file.stem
+
+    counts = Counter(target(path) for path in paths)
+    stems = []
+    for path in paths:
+        stem = Path(path).stem
+        if counts[target(path)] > 1:
+            stem += "_" + hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:6]
+        stems.append(stem)
+    return stems
+
+
+async def generate_sprite_for_file(
+    input_path: str,
+    output_dir: Optional[str],
+    interval: Optional[float],
+    thumbnail_count: Optional[int],
+    thumb_width: int,
+    columns: int,
+    max_rows: int,
+    image_format: str,
+    keyframes_only: Optional[bool],
+    smart_select: bool,
+    generate_vtt: bool,
+    file_stem: Optional[str] = None
+) -> dict:
+    """为单个视频生成雪碧图，返回生成结果统计；file_stem 为输出文件名前缀（默认为源文件名）"""
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"输入文件不存在 - {input_path}")
+
+    start = time.perf_counter()
+    info = await probe_media(input_path)
+    stream = get_video_stream(info)
+    duration = get_duration(info)
+    if stream is None or not duration:
+        raise ValueError(f"无法获取视频流或时长 - {input_path}")
+
+    if interval is None:
+        interval = duration / max(1, thumbnail_count or 100)
+    interval = max(interval, 0.1)
+    thumb_count = max(1, math.ceil(duration / interval))
+
+    # 按源宽高比计算缩略图高度（取偶数），保证 VTT 坐标与实际拼图一致
+    source_width = int(stream.get("width") or 16)
+    source_height = int(stream.get("height") or 9)
+    thumb_height = max(2, round(thumb_width * source_height / source_width / 2) * 2)
+
+    rows = max(1, min(max_rows, math.ceil(thumb_count / columns)))
+    if keyframes_only is None:
+        keyframes_only = interval >= KEYFRAME_ONLY_MIN_INTERVAL and not smart_select
+
+    input_file = Path(input_path)
+    file_stem = file_stem or input_file.stem
+    if output_dir is None:
+        output_dir = str(input_file.parent / f"{input_file.stem}_sprites")
+    os.makedirs(output_dir, exist_ok=True)
+    output_pattern = os.path.join(output_dir, f"{file_stem}_sprite_%03d.{image_format}")
+
+    # 清理上次生成的雪碧图，避免页数减少时残留旧文件
+    sprite_prefix = f"{file_stem}_sprite_"
+    for name in os.listdir(output_dir):
+        if name.startswith(sprite_prefix) and name.endswith(f".{image_format}"):
+            os.remove(os.path.join(output_dir, name))
+
+    # 缩略图不超过代理文件尺寸时从代理文件抽帧
+    source_path, proxy = await resolve_preview_input(input_path, thumb_width, thumb_height)
+    cmd = build_sprite_command(
+        source_path, output_pattern, interval, thumb_width, thumb_height,
+        columns, rows, keyframes_only, smart_select
+    )
+    result = await run_ffmpeg_command(cmd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    sprite_names = sorted(
+        f for f in os.listdir(output_dir)
+        if f.startswith(sprite_prefix) and f.endswith(f".{image_format}")
+    )
+
+    vtt_path = None
+    if generate_vtt:
+        vtt_path = os.path.join(output_dir, f"{file_stem}_thumbnails.vtt")
+        with open(vtt_path, "w", encoding="utf-8") as f:
+            f.write(build_webvtt(
+                sprite_names, thumb_count, interval, duration,
+                thumb_width, thumb_height, columns, rows
+            ))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "input_path": input_path,
+        "output_dir": output_dir,
+        "sprites": sprite_names,
+        "vtt_path": vtt_path,
+        "thumb_count": thumb_count,
+        "thumb_size": f"{thumb_width}x{thumb_height}",
+        "grid": f"{columns}x{rows}",
+        "interval": interval,
+        "keyframes_only": keyframes_only,
+        "proxy": proxy,
+        "duration": duration,
+        "elapsed": elapsed,
+        "seconds_per_hour": elapsed / (duration / 3600)
+    }
+
+
+def register_preview_tools(mcp: FastMCP):
+    """注册预览图相关的工具到 MCP 服务器"""
+
+    @mcp.tool()
+    async def generate_sprite_sheet(
+        input_paths: str,
+        output_dir: Optional[str] = None,
+        interval: Optional[float] = None,
+        thumbnail_count: Optional[int] = None,
+        thumb_width: int = 160,
+        columns: int = 10,
+        max_rows: int = 10,
+        image_format: str = "jpg",
+        keyframes_only: Optional[bool] = None,
+        smart_select: bool = False,
+        generate_vtt: bool = True,
+        max_workers: int = 2
+    ) -> str:
+        """
+        一次解码生成视频雪碧图（联系表）及 WebVTT 缩略图轨，支持批量处理
+
+        Args:
+            input_paths: 输入视频文件路径列表，用逗号分隔
+            output_dir: 输出目录（可选，默认每个视频同目录下的 <文件名>_sprites）
+            interval: 缩略图间隔秒数（与thumbnail_count二选一）
+            thumbnail_count: 缩略图总数（默认100张，按时长均分）
+            thumb_width: 单张缩略图宽度（高度按比例计算）
+            columns: 每行缩略图数量
+            max_rows: 每张雪碧图最多行数，超出后输出多张
+            image_format: 图片格式（jpg, png, webp）
+            keyframes_only: 是否只解码关键帧（默认间隔较大时自动启用）
+            smart_select: 是否在每个间隔内挑选最具代表性的帧（需完整解码，较慢）
+            generate_vtt: 是否生成 WebVTT 缩略图轨
+            max_workers: 批量处理时的并发进程数
+
+        Returns:
+            生成结果信息
+        """
+        try:
+            # 同一文件只处理一次
+            paths = list(dict.fromkeys(path.strip() for path in input_paths.split(",") if path.strip()))
+            if not paths:
+                return "错误：至少需要一个输入文件"
+
+            if interval is not None and interval <= 0:
+                return "错误：interval必须大于0"
+
+            if columns < 1 or max_rows < 1:
+                return "错误：columns和max_rows必须大于0"
+
+            file_stems = dict(zip(paths, sprite_file_stems(paths, output_dir)))
+
+            async def worker(path: str) -> dict:
+                return await generate_sprite_for_file(
+                    path, output_dir, interval, thumbnail_count, thumb_width,
+                    columns, max_rows, image_format, keyframes_only,
+                    smart_select, generate_vtt, file_stems[path]
+                )
+
+            start = time.perf_counter()
+            results = await gather_bounded(paths, worker, max_workers)
+            total_elapsed = time.perf_counter() - start
+
+            report = f"雪碧图生成完成！共 {len(paths)} 个文件，总耗时: {total_elapsed:.2f}秒\n"
+            total_duration = 0.0
+            for path, item in zip(paths, results):
+                if isinstance(item, Exception):
+                    report += f"\n✗ {path}\n  失败: {item}\n"
+                    continue
+                total_duration += item["duration"]
+                mode = "仅关键帧" if item["keyframes_only"] else "完整解码"
+                if item["proxy"]:
+                    mode += f"（代理文件 {item['proxy']['width']}x{item['proxy']['height']}）"
+                report += (
+                    f"\n✓ {path}\n  输出目录: {item['output_dir']}"
+                    f"\n  雪碧图: {', '.join(item['sprites'])}"
+                    f"\n  缩略图: {item['thumb_count']} 张 ({item['thumb_size']}，网格 {item['grid']}，间隔 {item['interval']:.2f}秒)"
+                    f"\n  解码方式: {mode}"
+                    f"\n  耗时: {item['elapsed']:.2f}秒（每小时视频 {item['seconds_per_hour']:.1f}秒）\n"
+                )
+                if item["vtt_path"]:
+                    report += f"  WebVTT: {item['vtt_path']}\n"
+
+            if total_duration > 0:
+                report += f"\n整体速度: 每小时视频 {total_elapsed / (total_duration / 3600):.1f}秒"
+
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def extract_thumbnail(
+        input_path: str,
+        timestamp: str = "00:00:00",
+        output_path: Optional[str] = None,
+        width: Optional[int] = None
+    ) -> str:
+        """
+        截取指定时间点附近的关键帧作为缩略图（只解码一帧，安装 PyAV 时在进程内完成）
+
+        Args:
+            input_path: 输入视频文件路径
+            timestamp: 时间点（格式：HH:MM:SS 或秒数），取该时间点之前最近的关键帧
+            output_path: 输出图片路径（可选，默认 <文件名>_thumb.jpg，支持 jpg/png）
+            width: 缩略图宽度（可选，高度按比例计算，默认原始尺寸）
+
+        Returns:
+            截图结果信息
+        """
+        try:
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+
+            if width is not None and width <= 0:
+                return "错误：width必须大于0"
+
+            if output_path is None:
+                input_file = Path(input_path)
+                output_path = str(input_file.parent / f"{input_file.stem}_thumb.jpg")
+
+            start = time.perf_counter()
+            # 指定宽度且不超过代理文件时从代理文件截取（代理关键帧更密集，截图更接近时间点）
+            source_path, proxy = await resolve_preview_input(input_path, width=width)
+            engine = await get_engine_router().extract_keyframe(
+                source_path, output_path, parse_timecode(timestamp), width
+            )
+            elapsed = time.perf_counter() - start
+
+            proxy_info = f"\n读取: 代理文件（{proxy['width']}x{proxy['height']}）" if proxy else ""
+            return (
+                f"成功截取缩略图！\n输入文件: {input_path}\n输出文件: {output_path}"
+                f"\n时间点: {timestamp}（最近关键帧）\n引擎: {engine}{proxy_info}\n耗时: {elapsed * 1000:.1f}毫秒"
+            )
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,126 @@
+"""
+代理文件工具
+预先为大尺寸视频生成低分辨率代理文件，查看和清理代理缓存；
+GIF、抽帧、雪碧图和缩略图工具在输出尺寸允许时自动读取代理文件
+"""
+
+import os
+import time
+from typing import Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..core import gather_bounded, get_proxy_cache
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f}MB"
+
+
+def register_proxy_tools(mcp: FastMCP):
+    """注册代理文件相关的工具到 MCP 服务器"""
+
+    @mcp.tool()
+    async def create_proxies(input_paths: str, max_workers: int = 2, force: bool = False) -> str:
+        """
+        为视频生成低分辨率代理文件（短关键帧间隔，供预览工具读取），已有代理的文件直接跳过
+
+        Args:
+            input_paths: 输入视频文件路径列表，用逗号分隔
+            max_workers: 同时生成的文件数
+            force: 是否重新生成已有的代理文件
+
+        Returns:
+            生成结果信息
+        """
+        try:
+            cache = get_proxy_cache()
+            if cache is None:
+                return "错误：代理文件已在服务器配置中关闭（proxy_enabled）"
+
+            paths = [path.strip() for path in input_paths.split(",") if path.strip()]
+            if not paths:
+                return "错误：至少需要一个输入文件"
+
+            async def worker(path: str) -> Optional[dict]:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"输入文件不存在 - {path}")
+                return await cache.build(path, force=force)
+
+            start = time.perf_counter()
+            results = await gather_bounded(paths, worker, max_workers)
+            total_elapsed = time.perf_counter() - start
+
+            report = f"代理文件处理完成！共 {len(paths)} 个文件，总耗时: {total_elapsed:.2f}秒\n"
+            for path, item in zip(paths, results):
+                if isinstance(item, Exception):
+                    report += f"\n✗ {path}\n  失败: {item}\n"
+                elif item is None:
+                    report += f"\n- {path}\n  跳过: 短边小于 {cache.min_source_short_side} 像素，直接读取原文件即可\n"
+                else:
+                    status = f"已生成，耗时 {item['build_seconds']:.2f}秒" if item["built"] else "已存在"
+                    report += (
+                        f"\n✓ {path}\n  代理文件: {item['proxy_path']}"
+                        f"\n  尺寸: {item['source_width']}x{item['source_height']} → {item['width']}x{item['height']}"
+                        f"，大小 {_mb(item['size'])}（{status}）\n"
+                    )
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def list_proxies(limit: int = 20) -> str:
+        """
+        查看代理文件缓存：数量、总大小和最近使用的代理文件
+
+        Args:
+            limit: 最多显示的代理文件数
+
+        Returns:
+            代理缓存状态
+        """
+        cache = get_proxy_cache()
+        if cache is None:
+            return "代理文件已在服务器配置中关闭（proxy_enabled）"
+
+        stats = cache.stats()
+        report = (
+            f"代理文件: {stats['entries']} 个，共 {_mb(stats['cached_bytes'])}（上限 {_mb(stats['max_bytes'])}）"
+            f"\n生成方式: {cache.build_mode}，短边 {cache.short_side} 像素，关键帧间隔 {cache.gop_seconds}秒"
+            f"\n正在生成: {stats['building']} 个\n"
+        )
+        for entry in cache.entries()[:limit]:
+            report += (
+                f"\n  {entry.get('source_path', '（元数据缺失）')}"
+                f"\n    {entry.get('width', '?')}x{entry.get('height', '?')}，{_mb(entry['size'])}，"
+                f"最近使用 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_used']))}\n"
+            )
+        return report
+
+    @mcp.tool()
+    async def clear_proxies(input_path: Optional[str] = None) -> str:
+        """
+        删除代理文件
+
+        Args:
+            input_path: 只删除该视频的代理文件（可选，默认删除全部）
+
+        Returns:
+            删除结果
+        """
+        try:
+            cache = get_proxy_cache()
+            if cache is None:
+                return "错误：代理文件已在服务器配置中关闭（proxy_enabled）"
+
+            if input_path is None:
+                return f"已删除 {cache.clear()} 个代理文件"
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+            if cache.remove(input_path):
+                return f"已删除代理文件: {input_path}"
+            return f"该文件没有代理文件: {input_path}"
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,193 @@
+"""
+场景切换检测工具
+一次解码得到全部场景分数并按文件标识缓存，之后不同阈值的查询直接读取索引
+"""
+
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    FileIndexCache,
+    format_timecode,
+    get_file_identity,
+    parse_duration_from_log,
+    run_ffmpeg_command,
+)
+
+# 索引中保留的最低场景分数；低于该值的阈值查询需要重新解码
+SCENE_SCORE_FLOOR = 0.1
+
+_PTS_TIME_RE = re.compile(r"pts_time:(-?[0-9.]+)")
+_SCENE_SCORE_RE = re.compile(r"lavfi\.scene_score=([0-9.]+)")
+
+
+def build_scene_detect_command(
+    input_path: str,
+    analysis_width: Optional[int] = 320,
+    analysis_fps: Optional[float] = None,
+    keyframes_only: bool = False,
+    score_floor: float = SCENE_SCORE_FLOOR
+) -> List[str]:
+    """构建场景检测命令：可选只解码关键帧、抽帧和缩小分辨率以加快分析"""
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    if keyframes_only:
+        cmd.extend(["-skip_frame", "nokey"])
+    cmd.extend(["-i", input_path, "-map", "0:v:0"])
+
+    filters = []
+    if analysis_fps:
+        filters.append(f"fps={analysis_fps}")
+    if analysis_width:
+        filters.append(f"scale={analysis_width}:-2:flags=fast_bilinear")
+    filters.append(f"select='gte(scene,{score_floor})'")
+    filters.append("metadata=print")
+
+    cmd.extend(["-vf", ",".join(filters), "-f", "null", "-"])
+    return cmd
+
+
+def parse_scene_scores(stderr: str) -> List[Tuple[float, float]]:
+    """从 metadata=print 的日志中解析 (时间, 场景分数) 列表"""
+    scenes = []
+    pending_time = None
+    for line in stderr.splitlines():
+        time_match = _PTS_TIME_RE.search(line)
+        if time_match:
+            pending_time = float(time_match.group(1))
+            continue
+        score_match = _SCENE_SCORE_RE.search(line)
+        if score_match and pending_time is not None:
+            scenes.append((round(pending_time, 3), round(float(score_match.group(1)), 4)))
+            pending_time = None
+    return scenes
+
+
+def _variant_key(analysis_width: Optional[int], analysis_fps: Optional[float], keyframes_only: bool) -> str:
+    """分析参数会影响分数，因此每组参数单独存储"""
+    return f"w{analysis_width or 0}_fps{analysis_fps or 0}_{'key' if keyframes_only else 'all'}"
+
+
+async def detect_scene_boundaries(
+    cache: FileIndexCache,
+    input_path: str,
+    threshold: float = 0.4,
+    analysis_width: Optional[int] = 320,
+    analysis_fps: Optional[float] = None,
+    keyframes_only: bool = False,
+    force_refresh: bool = False
+):
+    """
+    获取场景边界，优先读取缓存索引
+
+    Returns:
+        (边界列表[(时间, 分数)], 视频时长, 是否命中缓存)
+    """
+    identity = get_file_identity(input_path)
+    variant = _variant_key(analysis_width, analysis_fps, keyframes_only)
+
+    index = cache.load(identity) or {"version": 1, "variants": {}}
+    entry = index["variants"].get(variant)
+
+    if entry and not force_refresh and threshold >= entry["floor"]:
+        boundaries = [
+            (t, s) for t, s in zip(entry["times"], entry["scores"]) if s >= threshold
+        ]
+        return boundaries, index.get("duration"), True
+
+    floor = min(SCENE_SCORE_FLOOR, threshold)
+    cmd = build_scene_detect_command(
+        input_path, analysis_width, analysis_fps, keyframes_only, score_floor=floor
+    )
+    result = await run_ffmpeg_command(cmd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    scenes = parse_scene_scores(result.stderr)
+    duration = parse_duration_from_log(result.stderr)
+
+    index["path"] = identity.path
+    if duration is not None:
+        index["duration"] = duration
+    index["variants"][variant] = {
+        "floor": floor,
+        "created": time.time(),
+        "times": [t for t, _ in scenes],
+        "scores": [s for _, s in scenes]
+    }
+    cache.save(identity, index)
+
+    boundaries = [(t, s) for t, s in scenes if s >= threshold]
+    return boundaries, index.get("duration"), False
+
+
+def register_scene_tools(mcp: FastMCP, config: ServerConfig):
+    """注册场景检测相关的工具到 MCP 服务器"""
+
+    cache = FileIndexCache(config.cache_dir, "scenes")
+
+    @mcp.tool()
+    async def detect_scenes(
+        input_path: str,
+        threshold: float = 0.4,
+        analysis_width: int = 320,
+        analysis_fps: Optional[float] = None,
+        keyframes_only: bool = False,
+        force_refresh: bool = False,
+        max_results: int = 200
+    ) -> str:
+        """
+        检测视频场景切换点（结果按文件缓存，更换阈值无需重新解码）
+
+        Args:
+            input_path: 输入视频文件路径
+            threshold: 场景切换阈值（0-1，越大越严格，建议0.3-0.5）
+            analysis_width: 分析时缩放到的宽度（0表示不缩放，越小越快）
+            analysis_fps: 分析帧率（可选，抽帧加速，时间精度随之降低）
+            keyframes_only: 是否只解码关键帧（最快，但只能发现关键帧处的切换）
+            force_refresh: 是否忽略缓存重新检测
+            max_results: 最多列出的切换点数量
+
+        Returns:
+            场景切换点列表
+        """
+        try:
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+
+            if not 0 < threshold <= 1:
+                return "错误：threshold必须在0到1之间"
+
+            start = time.perf_counter()
+            boundaries, duration, cached = await detect_scene_boundaries(
+                cache,
+                input_path,
+                threshold=threshold,
+                analysis_width=analysis_width,
+                analysis_fps=analysis_fps,
+                keyframes_only=keyframes_only,
+                force_refresh=force_refresh
+            )
+            elapsed = time.perf_counter() - start
+
+            source_info = "缓存索引" if cached else "重新解码"
+            duration_info = f"\n视频时长: {format_timecode(duration)}" if duration else ""
+            report = (
+                f"场景检测完成！\n输入文件: {input_path}\n阈值: {threshold}"
+                f"{duration_info}\n场景切换点: {len(boundaries)} 个\n场景数量: {len(boundaries) + 1}"
+                f"\n数据来源: {source_info}\n耗时: {elapsed:.2f}秒\n"
+            )
+
+            for i, (t, score) in enumerate(boundaries[:max_results], 1):
+                report += f"  {i}. {format_timecode(t)} (分数: {score:.3f})\n"
+            if len(boundaries) > max_results:
+                report += f"  ... 以及其他 {len(boundaries) - max_results} 个切换点\n"
+
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,157 @@
+"""
+视频分段工具
+用 segment 复用器一次读取输入输出全部分段，替代多次调用 cut_video_segment
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..core import (
+    CONVERT_QUALITY,
+    format_timecode,
+    get_duration,
+    parse_timecode,
+    probe_media,
+    quality_args,
+    quality_value,
+    run_segment_muxer,
+)
+
+
+def parse_split_times(value: str) -> List[float]:
+    """解析逗号分隔的时间点列表（HH:MM:SS 或秒数），返回升序去重后的秒数"""
+    times = sorted({parse_timecode(v) for v in value.split(",") if v.strip()})
+    return [t for t in times if t > 0]
+
+
+def build_reencode_args(
+    video_codec: str,
+    quality: str,
+    segment_time: Optional[float] = None,
+    segment_times: Optional[List[float]] = None
+) -> List[str]:
+    """重新编码参数：在每个切分点强制插入关键帧，使分段边界精确"""
+    args = ["-map", "0:v:0", "-map", "0:a?", "-c:v", video_codec]
+    args.extend(quality_args(video_codec, quality_value(CONVERT_QUALITY, quality)))
+
+    if segment_times:
+        args.extend(["-force_key_frames", ",".join(f"{t:.3f}" for t in segment_times)])
+    elif segment_time:
+        args.extend(["-force_key_frames", f"expr:gte(t,n_forced*{segment_time:.3f})"])
+
+    args.extend(["-c:a", "aac"])
+    return args
+
+
+def register_segment_tools(mcp: FastMCP):
+    """注册视频分段相关的工具到 MCP 服务器"""
+
+    @mcp.tool()
+    async def split_video(
+        input_path: str,
+        segment_duration: Optional[str] = None,
+        split_times: Optional[str] = None,
+        target_size_mb: Optional[float] = None,
+        output_dir: Optional[str] = None,
+        output_format: Optional[str] = None,
+        reencode: bool = False,
+        video_codec: str = "libx264",
+        quality: str = "medium"
+    ) -> str:
+        """
+        一次处理将视频切分为多个分段（按固定时长、时间点列表或目标大小）
+
+        Args:
+            input_path: 输入视频文件路径
+            segment_duration: 固定分段时长（格式：HH:MM:SS 或秒数）
+            split_times: 切分时间点列表，用逗号分隔（如 00:05:00,00:12:30）
+            target_size_mb: 每个分段的目标大小（MB，按平均码率换算为时长）
+            output_dir: 输出目录（可选，默认与输入同目录下的 <文件名>_parts）
+            output_format: 输出格式（可选，默认与输入相同）
+            reencode: 是否重新编码（默认直接复制，分段边界对齐到关键帧；重新编码时在切分点强制关键帧）
+            video_codec: 重新编码时使用的视频编码器
+            quality: 重新编码质量（high, medium, low）
+
+        Returns:
+            分段清单（每段的实际开始时间和时长）
+        """
+        try:
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+
+            modes = [segment_duration, split_times, target_size_mb]
+            if sum(mode is not None for mode in modes) != 1:
+                return "错误：segment_duration、split_times、target_size_mb必须且只能提供一个"
+
+            input_file = Path(input_path)
+            if output_dir is None:
+                output_dir = str(input_file.parent / f"{input_file.stem}_parts")
+            if output_format is None:
+                output_format = input_file.suffix[1:]
+
+            segment_time = None
+            segment_times = None
+            if segment_duration is not None:
+                segment_time = parse_timecode(segment_duration)
+                if segment_time <= 0:
+                    return "错误：segment_duration必须大于0"
+            elif split_times is not None:
+                segment_times = parse_split_times(split_times)
+            else:
+                if target_size_mb <= 0:
+                    return "错误：target_size_mb必须大于0"
+                info = await probe_media(input_path)
+                duration = get_duration(info)
+                bit_rate = float(info.get("format", {}).get("bit_rate") or 0)
+                if not bit_rate and duration:
+                    bit_rate = os.path.getsize(input_path) * 8 / duration
+                if not bit_rate:
+                    return "错误：无法获取视频码率，不能按目标大小切分"
+                segment_time = target_size_mb * 8 * 1024 * 1024 / bit_rate
+
+            if reencode:
+                output_args = build_reencode_args(video_codec, quality, segment_time, segment_times)
+            else:
+                output_args = ["-map", "0:v:0", "-map", "0:a?", "-c", "copy"]
+
+            output_pattern = os.path.join(output_dir, f"{input_file.stem}_%03d.{output_format}")
+
+            start = time.perf_counter()
+            segments = await run_segment_muxer(
+                input_path,
+                output_pattern,
+                segment_times=segment_times,
+                segment_time=segment_time,
+                output_args=output_args
+            )
+            elapsed = time.perf_counter() - start
+
+            manifest_path = os.path.join(output_dir, f"{input_file.stem}_manifest.json")
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump({"input_path": input_path, "segments": segments}, f, ensure_ascii=False, indent=2)
+
+            if segment_time is not None:
+                mode_info = f"固定时长 {segment_time:.2f}秒"
+            else:
+                mode_info = f"{len(segment_times)} 个时间点"
+
+            report = (
+                f"成功切分视频！\n输入文件: {input_path}\n输出目录: {output_dir}"
+                f"\n切分方式: {mode_info}\n处理方式: {'重新编码（强制关键帧）' if reencode else '直接复制（关键帧对齐）'}"
+                f"\n分段数量: {len(segments)}\n清单文件: {manifest_path}\n耗时: {elapsed:.2f}秒\n"
+            )
+            for i, segment in enumerate(segments, 1):
+                size_mb = os.path.getsize(segment["path"]) / (1024 * 1024) if os.path.exists(segment["path"]) else 0
+                report += (
+                    f"  {i}. {os.path.basename(segment['path'])}  开始: {format_timecode(segment['start'])}"
+                    f"  时长: {segment['duration']:.3f}秒  大小: {size_mb:.1f}MB\n"
+                )
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,202 @@
+"""
+静音检测与自动分段工具
+silencedetect 只运行一次并按文件缓存，随后用 segment 复用器一次输出全部分段
+"""
+
+import os
+import re
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    FileIndexCache,
+    format_timecode,
+    get_file_identity,
+    parse_duration_from_log,
+    run_ffmpeg_command,
+    run_segment_muxer,
+)
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[0-9.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[0-9.]+)")
+
+
+def parse_silence_events(stderr: str, duration: Optional[float] = None) -> List[Tuple[float, float]]:
+    """从 silencedetect 日志解析静音区间；结尾未闭合的静音延伸到文件末尾"""
+    silences = []
+    pending_start = None
+    for line in stderr.splitlines():
+        start_match = _SILENCE_START_RE.search(line)
+        if start_match:
+            pending_start = max(0.0, float(start_match.group(1)))
+            continue
+        end_match = _SILENCE_END_RE.search(line)
+        if end_match and pending_start is not None:
+            silences.append((round(pending_start, 3), round(float(end_match.group(1)), 3)))
+            pending_start = None
+    if pending_start is not None and duration is not None:
+        silences.append((round(pending_start, 3), round(duration, 3)))
+    return silences
+
+
+def compute_split_points(
+    silences: List[Tuple[float, float]],
+    duration: float,
+    min_segment_length: float = 0.0,
+    padding: Optional[float] = None
+) -> List[float]:
+    """
+    根据静音区间计算切分点
+
+    Args:
+        silences: 静音区间列表
+        duration: 总时长
+        min_segment_length: 分段最短时长，过近的切分点会被跳过
+        padding: 前一段末尾保留的静音秒数（默认在静音中点切分）
+    """
+    points = []
+    last = 0.0
+    for start, end in silences:
+        # 位于开头或结尾的静音不产生切分点
+        if start <= 0 or end >= duration:
+            continue
+        middle = (start + end) / 2
+        point = middle if padding is None else min(start + max(padding, 0.0), middle)
+        if point - last >= min_segment_length:
+            points.append(round(point, 3))
+            last = point
+    while points and duration - points[-1] < min_segment_length:
+        points.pop()
+    return points
+
+
+async def detect_silences(
+    cache: FileIndexCache,
+    input_path: str,
+    noise_db: float = -30.0,
+    min_silence_duration: float = 0.5,
+    force_refresh: bool = False
+):
+    """
+    获取静音区间，优先读取缓存
+
+    Returns:
+        (静音区间列表, 总时长, 是否命中缓存)
+    """
+    identity = get_file_identity(input_path)
+    variant = f"n{noise_db:g}_d{min_silence_duration:g}"
+
+    index = cache.load(identity) or {"version": 1, "variants": {}}
+    entry = index["variants"].get(variant)
+    if entry is not None and not force_refresh and index.get("duration"):
+        return [tuple(s) for s in entry["silences"]], index["duration"], True
+
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-af", f"silencedetect=noise={noise_db:g}dB:d={min_silence_duration:g}",
+        "-f", "null", "-"
+    ]
+    result = await run_ffmpeg_command(cmd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    duration = parse_duration_from_log(result.stderr)
+    if duration is None:
+        raise RuntimeError(f"无法获取音频时长 - {input_path}")
+    silences = parse_silence_events(result.stderr, duration)
+
+    index["path"] = identity.path
+    index["duration"] = duration
+    index["variants"][variant] = {"created": time.time(), "silences": silences}
+    cache.save(identity, index)
+    return silences, duration, False
+
+
+def register_silence_tools(mcp: FastMCP, config: ServerConfig):
+    """注册静音检测相关的工具到 MCP 服务器"""
+
+    cache = FileIndexCache(config.cache_dir, "silence")
+
+    @mcp.tool()
+    async def split_on_silence(
+        input_path: str,
+        output_dir: Optional[str] = None,
+        noise_db: float = -30.0,
+        min_silence_duration: float = 0.5,
+        min_segment_length: float = 0.0,
+        padding: Optional[float] = None,
+        reencode: bool = False,
+        output_format: Optional[str] = None,
+        force_refresh: bool = False
+    ) -> str:
+        """
+        在静音处自动切分长音频（静音检测结果按文件缓存，一次进程输出全部分段）
+
+        Args:
+            input_path: 输入音频文件路径（视频文件则切分其音轨）
+            output_dir: 输出目录（可选，默认与输入同目录下的 <文件名>_segments）
+            noise_db: 静音判定阈值（dB，如-30）
+            min_silence_duration: 最短静音时长（秒）
+            min_segment_length: 分段最短时长（秒），过近的切分点会被跳过
+            padding: 前一段末尾保留的静音秒数（可选，默认在静音中点切分）
+            reencode: 是否重新编码（默认直接复制音频流，速度最快）
+            output_format: 输出格式（可选，默认与输入相同）
+            force_refresh: 是否忽略缓存重新检测静音
+
+        Returns:
+            分段结果信息
+        """
+        try:
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+
+            if min_silence_duration <= 0:
+                return "错误：min_silence_duration必须大于0"
+
+            input_file = Path(input_path)
+            if output_dir is None:
+                output_dir = str(input_file.parent / f"{input_file.stem}_segments")
+            if output_format is None:
+                output_format = input_file.suffix[1:]
+
+            start = time.perf_counter()
+            silences, duration, cached = await detect_silences(
+                cache, input_path, noise_db, min_silence_duration, force_refresh
+            )
+            detect_elapsed = time.perf_counter() - start
+
+            split_points = compute_split_points(silences, duration, min_segment_length, padding)
+
+            output_args = ["-map", "0:a:0", "-vn", "-sn", "-dn"]
+            if not reencode:
+                output_args.extend(["-c:a", "copy"])
+            output_pattern = os.path.join(output_dir, f"{input_file.stem}_%03d.{output_format}")
+
+            segments = await run_segment_muxer(
+                input_path, output_pattern, segment_times=split_points, output_args=output_args
+            )
+            elapsed = time.perf_counter() - start
+
+            detect_info = "缓存" if cached else f"解码检测 {detect_elapsed:.2f}秒"
+            report = (
+                f"成功按静音切分音频！\n输入文件: {input_path}\n输出目录: {output_dir}"
+                f"\n总时长: {format_timecode(duration)}\n检测到静音: {len(silences)} 处（{detect_info}）"
+                f"\n分段数量: {len(segments)}\n处理方式: {'重新编码' if reencode else '直接复制'}"
+                f"\n总耗时: {elapsed:.2f}秒\n"
+            )
+            for i, segment in enumerate(segments, 1):
+                report += (
+                    f"  {i}. {os.path.basename(segment['path'])}  "
+                    f"{format_timecode(segment['start'])} - {format_timecode(segment['end'])}"
+                    f"（{segment['duration']:.2f}秒）\n"
+                )
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
@@ -0,0 +1,369 @@
+"""
+管道流式处理工具
+输入可以是文件、URL 或客户端分块写入的字节流，输出写入标准输出管道并按块读取，
+FFmpeg 处理与客户端读取同时进行，全程不落地文件
+"""
+
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import re
+import shlex
+from typing import List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    PIPE_FORMATS,
+    STREAM_URI_PREFIX,
+    MediaStream,
+    StreamRegistry,
+    pipe_output_args,
+    resolve_input,
+    stream_ffmpeg_output,
+)
+
+# 只输出音频的管道格式
+AUDIO_PIPE_FORMATS = {"adts", "mp3", "s16le", "f32le"}
+
+# 写入输入流时等待缓冲区空出的最长秒数
+INPUT_WRITE_TIMEOUT = 30.0
+
+# extra_args 允许的输出选项（每个选项带一个值）；额外的输出文件、-f、-i 和协议选项等一律拒绝
+EXTRA_ARG_OPTIONS = {
+    "-vf", "-af", "-filter:v", "-filter:a",
+    "-b:v", "-b:a", "-maxrate", "-minrate", "-bufsize", "-crf", "-qp", "-q:v", "-q:a",
+    "-preset", "-tune", "-profile:v", "-level", "-g", "-keyint_min", "-bf",
+    "-r", "-s", "-aspect", "-pix_fmt", "-ar", "-ac", "-frames:v", "-ss", "-t", "-to",
+}
+FILTER_OPTIONS = {"-vf", "-af", "-filter:v", "-filter:a"}
+
+# -vf / -af 中允许的滤镜：只处理已解码的帧，不读写文件、不加载插件、不接收外部命令
+EXTRA_ARG_FILTERS = {
+    "scale", "crop", "pad", "fps", "format", "setpts", "setsar", "setdar", "transpose", "hflip", "vflip",
+    "rotate", "yadif", "bwdif", "eq", "hue", "unsharp", "gblur", "boxblur", "hqdn3d", "deband", "fade",
+    "trim", "tpad", "colorspace", "null",
+    "volume", "atempo", "aresample", "aformat", "pan", "highpass", "lowpass", "afade", "atrim", "apad",
+    "asetpts", "loudnorm", "dynaudnorm", "acompressor", "alimiter", "anull",
+}
+
+
+def _filter_names(graph: str) -> List[str]:
+    """滤镜图中用到的滤镜名（忽略引号内的参数、转义字符和连接标签）"""
+    graph = re.sub(r"'[^']*'|\\.|\[[^\]]*\]", "", graph)
+    return [segment.split("=", 1)[0].split("@", 1)[0].strip() for segment in re.split(r"[;,]", graph)]
+
+
+def parse_extra_args(extra_args: str) -> List[str]:
+    """
+    校验额外的输出参数：只接受 EXTRA_ARG_OPTIONS 中的 "选项 值" 对，滤镜只接受 EXTRA_ARG_FILTERS 中的滤镜
+
+    Raises:
+        ValueError: 参数不成对、选项或滤镜不在允许范围内
+    """
+    tokens = shlex.split(extra_args)
+    if len(tokens) % 2:
+        raise ValueError("extra_args 必须由成对的 \"选项 值\" 组成")
+    for option, value in zip(tokens[::2], tokens[1::2]):
+        if option not in EXTRA_ARG_OPTIONS:
+            raise ValueError(f"extra_args 不支持选项 {option}（可选: {', '.join(sorted(EXTRA_ARG_OPTIONS))}）")
+        if option in FILTER_OPTIONS:
+            rejected = sorted({name for name in _filter_names(value) if name not in EXTRA_ARG_FILTERS})
+            if rejected:
+                raise ValueError(
+                    f"extra_args 不支持滤镜 {', '.join(rejected)}（可选: {', '.join(sorted(EXTRA_ARG_FILTERS))}）"
+                )
+    return tokens
+
+
+def build_stream_command(
+    input_arg: str,
+    output_format: str,
+    video_codec: Optional[str] = None,
+    audio_codec: Optional[str] = None,
+    input_format: Optional[str] = None,
+    start_time: Optional[str] = None,
+    duration: Optional[str] = None,
+    extra_args: Optional[str] = None
+) -> list:
+    """构建输出到标准输出管道的 FFmpeg 命令"""
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    if input_format:
+        cmd.extend(["-f", input_format])
+    if start_time:
+        cmd.extend(["-ss", start_time])
+    cmd.extend(["-i", input_arg])
+    if duration:
+        cmd.extend(["-t", duration])
+
+    if output_format in AUDIO_PIPE_FORMATS:
+        # 音频格式未指定编码器时使用复用器的默认编码器
+        cmd.extend(["-map", "0:a:0", "-vn"])
+        if audio_codec:
+            cmd.extend(["-c:a", audio_codec])
+    else:
+        cmd.extend(["-c:v", video_codec or "copy", "-c:a", audio_codec or "copy"])
+
+    if extra_args:
+        cmd.extend(parse_extra_args(extra_args))
+    cmd.extend([*pipe_output_args(output_format), "pipe:1"])
+    return cmd
+
+
+def describe_stream(stream: MediaStream) -> str:
+    """单个流的状态描述"""
+    if stream.eof:
+        state = "已读完"
+    elif stream.finished:
+        state = "写入完成，待读取"
+    else:
+        state = "进行中"
+    if stream.error:
+        state = "失败"
+    source = f"，来源 {stream.description}" if stream.description else ""
+    return (
+        f"{stream.stream_id}（{stream.kind}, {stream.mime_type}{source}）: {state}，"
+        f"已写入 {stream.bytes_written / 1024:.0f}KB，已读取 {stream.bytes_read / 1024:.0f}KB，"
+        f"缓冲 {stream.buffered_chunks} 块"
+    )
+
+
+def register_stream_tools(mcp: FastMCP, config: ServerConfig):
+    """注册管道流式处理相关的工具和资源到 MCP 服务器"""
+
+    registry = StreamRegistry(config.stream_idle_timeout)
+
+    async def produce(stream: MediaStream, cmd: list, stdin_source, chunk_size: int):
+        """运行 FFmpeg 并把标准输出逐块写入流；读取方跟不上时 FFmpeg 随管道写满而暂停"""
+        try:
+            async with contextlib.aclosing(stream_ffmpeg_output(
+                cmd,
+                chunk_size=chunk_size,
+                stdin_source=stdin_source,
+                pipe_buffer_size=config.pipe_buffer_size
+            )) as chunks:
+                async for chunk in chunks:
+                    await stream.write(chunk)
+            await stream.finish()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await stream.finish(str(e).strip()[-2000:] or "FFmpeg 处理失败")
+        finally:
+            # 输入流只能被读取一次，处理结束后释放
+            if isinstance(stdin_source, MediaStream):
+                with contextlib.suppress(ValueError):
+                    await registry.close(stdin_source.stream_id)
+
+    @mcp.tool()
+    async def open_input_stream(max_buffered_chunks: Optional[int] = None) -> str:
+        """
+        创建一个输入字节流，之后用 write_input_stream 分块写入数据，并作为 stream_media 的输入
+
+        Args:
+            max_buffered_chunks: 最多缓冲的块数（可选，默认使用服务器配置），写满后写入会等待处理进度
+
+        Returns:
+            输入流地址
+        """
+        try:
+            await registry.expire_idle()
+            stream = registry.create(
+                "input", "application/octet-stream",
+                max_buffered_chunks or config.stream_max_buffered_chunks
+            )
+            return (
+                f"已创建输入流！\n流地址: {stream.uri}"
+                f"\n用法: 用 write_input_stream 写入 base64 数据块（最后一块设置 end_of_stream），"
+                f"并在 stream_media 中使用 input_source=\"{stream.uri}\""
+            )
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def write_input_stream(stream_id: str, data_base64: str = "", end_of_stream: bool = False) -> str:
+        """
+        向输入流写入一块数据
+
+        Args:
+            stream_id: 输入流 id 或 stream:// 地址
+            data_base64: base64 编码的数据块（可为空，仅用于结束写入）
+            end_of_stream: 是否为最后一块
+
+        Returns:
+            写入结果
+        """
+        try:
+            stream = registry.get(stream_id)
+            if stream.kind != "input":
+                return f"错误：只能写入输入流 - {stream_id}"
+
+            data = base64.b64decode(data_base64) if data_base64 else b""
+            try:
+                await asyncio.wait_for(stream.write(data), INPUT_WRITE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return f"错误：输入流缓冲区已满，{INPUT_WRITE_TIMEOUT:.0f}秒内没有被读取（是否已启动 stream_media？）"
+            if end_of_stream:
+                await stream.finish()
+
+            return f"已写入 {len(data)} 字节\n{describe_stream(stream)}"
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def stream_media(
+        input_source: str,
+        output_format: str = "mpegts",
+        video_codec: Optional[str] = None,
+        audio_codec: Optional[str] = None,
+        input_format: Optional[str] = None,
+        start_time: Optional[str] = None,
+        duration: Optional[str] = None,
+        extra_args: Optional[str] = None,
+        chunk_size_kb: Optional[int] = None
+    ) -> str:
+        """
+        以管道方式处理媒体，输出按块读取（read_stream_chunk 或资源 stream://<id>/<序号>），不生成文件
+
+        Args:
+            input_source: 输入文件路径、URL，或 stream:// 地址（输入流或另一个 stream_media 的输出）
+            output_format: 管道输出格式（mpegts, matroska, webm, fmp4：分片MP4, adts, mp3, s16le, f32le）
+            video_codec: 视频编码器（可选，默认直接复制）
+            audio_codec: 音频编码器（可选，视频格式默认直接复制，音频格式默认使用格式对应的编码器）
+            input_format: 输入格式（可选，管道输入无法自动识别时指定，如 mpegts）
+            start_time: 开始时间（格式：HH:MM:SS，可选）
+            duration: 持续时间（格式：HH:MM:SS，可选）
+            extra_args: 额外的 FFmpeg 输出参数（可选，如 "-vf scale=640:-2"）；只接受成对的 "选项 值"，
+                选项限于滤镜（-vf/-af，只允许常用的帧处理滤镜）、码率、质量、预设、帧率、尺寸、采样率、声道和时间范围
+            chunk_size_kb: 每块大小（KB，可选，默认使用服务器配置）
+
+        Returns:
+            输出流地址和读取方式
+        """
+        try:
+            await registry.expire_idle()
+
+            if output_format not in PIPE_FORMATS:
+                return f"错误：不支持管道输出的格式: {output_format}（可选: {', '.join(PIPE_FORMATS)}）"
+
+            stdin_source = None
+            if input_source.startswith(STREAM_URI_PREFIX):
+                stdin_source = registry.get(input_source)
+                input_arg = "pipe:0"
+            elif "://" in input_source or os.path.exists(input_source):
+                input_arg = await resolve_input(input_source)
+            else:
+                return f"错误：输入文件不存在 - {input_source}"
+
+            try:
+                cmd = build_stream_command(
+                    input_arg, output_format, video_codec, audio_codec,
+                    input_format, start_time, duration, extra_args
+                )
+            except ValueError as e:
+                return f"错误：{e}"
+            chunk_size = (chunk_size_kb * 1024) if chunk_size_kb else config.stream_chunk_size
+            if chunk_size <= 0:
+                return "错误：chunk_size_kb必须大于0"
+
+            stream = registry.create(
+                "output", PIPE_FORMATS[output_format]["mime_type"], config.stream_max_buffered_chunks
+            )
+            stream.description = input_source
+            stream.task = asyncio.create_task(produce(stream, cmd, stdin_source, chunk_size))
+
+            max_memory_mb = (config.stream_max_buffered_chunks * chunk_size + 2 * config.pipe_buffer_size) / (1024 * 1024)
+            return (
+                f"已开始流式处理！\n输入: {input_source}\n输出流地址: {stream.uri}"
+                f"\n格式: {output_format}（{stream.mime_type}）\n块大小: {chunk_size // 1024}KB"
+                f"\n缓冲上限: 约 {max_memory_mb:.1f}MB（读取跟不上时 FFmpeg 自动暂停）"
+                f"\n读取方式: read_stream_chunk(stream_id=\"{stream.stream_id}\")，"
+                f"或资源 {stream.uri}/0、{stream.uri}/1 ... 依次读取"
+            )
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def read_stream_chunk(stream_id: str, index: Optional[int] = None, timeout: float = 30.0) -> str:
+        """
+        按顺序读取输出流的下一块数据
+
+        Args:
+            stream_id: 流 id 或 stream:// 地址
+            index: 期望的块序号（可选，用于重试时重新获取上一块）
+            timeout: 等待数据的最长秒数
+
+        Returns:
+            JSON：index（序号）、eof（是否结束）、size（字节数）、data（base64 数据）
+        """
+        try:
+            stream = registry.get(stream_id)
+            try:
+                chunk_index, data, eof = await stream.read_chunk(index, timeout)
+            except asyncio.TimeoutError:
+                return f"错误：{timeout:.0f}秒内没有新数据\n{describe_stream(stream)}"
+            if eof and stream.kind == "output":
+                await registry.close(stream.stream_id)
+            return json.dumps({
+                "stream_id": stream.stream_id,
+                "index": chunk_index,
+                "eof": eof,
+                "size": len(data),
+                "mime_type": stream.mime_type,
+                "data": base64.b64encode(data).decode("ascii")
+            })
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def list_streams() -> str:
+        """
+        列出进行中的输入流和输出流
+
+        Returns:
+            每个流的状态、已传输字节数和缓冲块数
+        """
+        try:
+            await registry.expire_idle()
+            streams = registry.list()
+            if not streams:
+                return "当前没有进行中的流"
+            return "进行中的流:\n" + "\n".join(f"  {describe_stream(s)}" for s in streams)
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def close_stream(stream_id: str) -> str:
+        """
+        关闭流并终止对应的 FFmpeg 进程
+
+        Args:
+            stream_id: 流 id 或 stream:// 地址
+
+        Returns:
+            关闭结果
+        """
+        try:
+            stream = registry.get(stream_id)
+            await registry.close(stream.stream_id)
+            return f"已关闭流: {stream.stream_id}"
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.resource("stream://{stream_id}/{index}", mime_type="application/octet-stream")
+    async def get_stream_chunk(stream_id: str, index: str) -> bytes:
+        """按序号读取输出流的一块数据（读到结尾时返回空内容）"""
+        stream = registry.get(stream_id)
+        _, data, eof = await stream.read_chunk(int(index), config.stream_read_timeout)
+        if eof and stream.kind == "output":
+            await registry.close(stream.stream_id)
+        return data
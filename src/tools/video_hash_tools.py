@@ -0,0 +1,254 @@
+"""
+视频感知哈希工具
+hash_video 计算视频关键帧的感知哈希并可与媒体目录中已有的签名比较；find_similar_videos 在整个目录中查找
+画面内容相同的视频（重新编码、改变分辨率或容器、截取片段、轻微调色）。签名保存在 SQLite 中，
+重复运行只解码新增或修改过的文件
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import (
+    DEFAULT_MAX_DISTANCE,
+    DEFAULT_MIN_MATCH_RATIO,
+    VIDEO_EXTENSIONS,
+    VideoHashStore,
+    VideoMatch,
+    find_video_matches,
+    group_matches,
+    update_video_hashes,
+    walk_media_files,
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+
+def _split(value: Optional[str]) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _describe_update(stats: dict) -> str:
+    return (
+        f"签名: 新计算 {stats['computed']} 个，未变化跳过 {stats['unchanged']} 个，"
+        f"无视频或解码失败 {stats['failed']} 个（{stats['elapsed']:.2f}秒）"
+    )
+
+
+def _describe_match(match: VideoMatch, path: str) -> str:
+    """从 path 一方描述匹配：双方各有多少关键帧找到近似帧"""
+    if match.a == path:
+        own, own_total, other, other_total = match.matched_a, match.frames_a, match.matched_b, match.frames_b
+    else:
+        own, own_total, other, other_total = match.matched_b, match.frames_b, match.matched_a, match.frames_a
+    return (
+        f"覆盖率 {match.coverage:.0%}（本文件 {own}/{own_total} 个关键帧，"
+        f"对方 {other}/{other_total} 个），平均距离 {match.mean_distance:.1f}"
+    )
+
+
+def _check_options(max_distance: int, min_match_ratio: float) -> Optional[str]:
+    if not 1 <= max_distance <= 24:
+        return "错误：max_distance 必须在 1 到 24 之间"
+    if not 0 < min_match_ratio <= 1:
+        return "错误：min_match_ratio 必须在 0 到 1 之间"
+    return None
+
+
+def register_video_hash_tools(mcp: FastMCP, config: ServerConfig):
+    """注册视频感知哈希相关的工具到 MCP 服务器"""
+
+    store = VideoHashStore(os.path.join(config.cache_dir, "video_hashes.db"))
+
+    async def collect(directory: Optional[str], extensions: Optional[str]) -> List[str]:
+        suffixes = {f".{e.lower().lstrip('.')}" for e in _split(extensions)} or VIDEO_EXTENSIONS
+        files = await asyncio.to_thread(walk_media_files, os.path.realpath(directory), suffixes)
+        return sorted(path for path, _ in files)
+
+    @mcp.tool()
+    async def hash_video(
+        input_paths: str,
+        library_dir: Optional[str] = None,
+        extensions: Optional[str] = None,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        min_match_ratio: float = DEFAULT_MIN_MATCH_RATIO,
+        max_keyframes: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        force: bool = False
+    ) -> str:
+        """
+        计算视频签名（每个关键帧的 64 位 pHash 和 dHash），并可查找媒体目录中画面相同的视频
+
+        只解码关键帧并在解码端缩小为 32x32 灰度图；签名保存在签名库中，大小和修改时间未变化的文件
+        不会重新解码，新增文件只需与已有签名比较。
+
+        Args:
+            input_paths: 输入视频路径列表，用逗号分隔
+            library_dir: 要比较的媒体目录（可选，目录中尚无签名的文件会先计算签名）
+            extensions: 媒体目录中要收录的扩展名，逗号分隔（可选，默认常见视频格式）
+            max_distance: 关键帧 pHash 的最大汉明距离（1-24，越小越严格）
+            min_match_ratio: 至少有该比例的关键帧找到近似帧才判定为相同内容（0-1）
+            max_keyframes: 每个文件最多保留的关键帧数（可选，默认使用服务器配置）
+            max_workers: 同时解码的文件数（可选，默认使用服务器配置）
+            force: 是否忽略已有签名重新计算
+
+        Returns:
+            签名信息和匹配结果
+        """
+        try:
+            if np is None:
+                return "错误：视频哈希需要安装 numpy（uv sync --extra analysis）"
+            paths = [os.path.realpath(path) for path in _split(input_paths)]
+            if not paths:
+                return "错误：至少需要一个输入文件"
+            for path in paths:
+                if not os.path.isfile(path):
+                    return f"错误：输入文件不存在 - {path}"
+            if library_dir is not None and not os.path.isdir(library_dir):
+                return f"错误：目录不存在 - {library_dir}"
+            error = _check_options(max_distance, min_match_ratio)
+            if error:
+                return error
+            keyframes = max_keyframes or config.video_hash_max_keyframes
+            workers = max_workers or config.video_hash_workers
+            if keyframes < 1 or workers < 1:
+                return "错误：max_keyframes 和 max_workers 必须大于0"
+
+            start = time.perf_counter()
+            library = await collect(library_dir, extensions) if library_dir is not None else []
+            everything = sorted(set(paths) | set(library))
+            stats = await update_video_hashes(store, everything, keyframes, workers, force)
+            signatures = await asyncio.to_thread(store.load, everything)
+            errors = await asyncio.to_thread(store.errors, paths)
+
+            matches: Dict[str, List[VideoMatch]] = {path: [] for path in paths}
+            if library_dir is not None:
+                found = await asyncio.to_thread(
+                    find_video_matches, signatures, max_distance, min_match_ratio, paths
+                )
+                for match in found:
+                    for path in (match.a, match.b):
+                        if path in matches:
+                            matches[path].append(match)
+
+            report = (
+                f"视频哈希完成！共 {len(paths)} 个文件，总耗时: {time.perf_counter() - start:.2f}秒\n"
+                f"{_describe_update(stats)}\n"
+            )
+            if library_dir is not None:
+                report += f"比较目录: {os.path.realpath(library_dir)}（{len(library)} 个视频文件）\n"
+            for path in paths:
+                signature = signatures.get(path)
+                if signature is None:
+                    report += f"\n✗ {path}\n  失败: {errors.get(path, '没有签名')}\n"
+                    continue
+                report += f"\n✓ {path}\n  关键帧: 解码 {signature.keyframes} 个，参与匹配 {signature.frames} 个\n"
+                if library_dir is None:
+                    continue
+                if not matches[path]:
+                    report += "  没有找到画面相同的视频\n"
+                for match in matches[path]:
+                    other = match.b if match.a == path else match.a
+                    report += f"  匹配: {other}\n    {_describe_match(match, path)}\n"
+            return report + f"\n签名库: {store.db_path}"
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def find_similar_videos(
+        directory: Optional[str] = None,
+        input_paths: Optional[str] = None,
+        extensions: Optional[str] = None,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        min_match_ratio: float = DEFAULT_MIN_MATCH_RATIO,
+        max_keyframes: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        force: bool = False,
+        limit: int = 50
+    ) -> str:
+        """
+        按画面内容查找近似重复的视频：重新编码、改变分辨率或容器、截取片段、轻微调色的文件也会被识别
+
+        签名保存在签名库中，重复运行只解码新增或修改过的文件；比较使用多索引哈希表，
+        不对所有关键帧两两比较。
+
+        Args:
+            directory: 要查找的媒体目录（与 input_paths 至少指定一个）
+            input_paths: 视频路径列表，用逗号分隔（可选，与目录中的文件一起比较）
+            extensions: 目录中要收录的扩展名，逗号分隔（可选，默认常见视频格式）
+            max_distance: 关键帧 pHash 的最大汉明距离（1-24，越小越严格）
+            min_match_ratio: 至少有该比例的关键帧找到近似帧才判定为相同内容（0-1）
+            max_keyframes: 每个文件最多保留的关键帧数（可选，默认使用服务器配置）
+            max_workers: 同时解码的文件数（可选，默认使用服务器配置）
+            force: 是否忽略已有签名重新计算
+            limit: 最多列出的相似组数
+
+        Returns:
+            相似视频分组
+        """
+        try:
+            if np is None:
+                return "错误：视频哈希需要安装 numpy（uv sync --extra analysis）"
+            if directory is None and not input_paths:
+                return "错误：请指定 directory 或 input_paths"
+            if directory is not None and not os.path.isdir(directory):
+                return f"错误：目录不存在 - {directory}"
+            paths = [os.path.realpath(path) for path in _split(input_paths)]
+            for path in paths:
+                if not os.path.isfile(path):
+                    return f"错误：输入文件不存在 - {path}"
+            error = _check_options(max_distance, min_match_ratio)
+            if error:
+                return error
+            keyframes = max_keyframes or config.video_hash_max_keyframes
+            workers = max_workers or config.video_hash_workers
+            if keyframes < 1 or workers < 1 or limit < 1:
+                return "错误：max_keyframes、max_workers 和 limit 必须大于0"
+
+            start = time.perf_counter()
+            if directory is not None:
+                paths = sorted(set(paths) | set(await collect(directory, extensions)))
+            stats = await update_video_hashes(store, paths, keyframes, workers, force)
+            signatures = await asyncio.to_thread(store.load, paths)
+
+            match_start = time.perf_counter()
+            matches = await asyncio.to_thread(find_video_matches, signatures, max_distance, min_match_ratio)
+            groups = group_matches(matches)
+            match_elapsed = time.perf_counter() - match_start
+
+            report = (
+                f"相似视频查找完成！共 {len(paths)} 个文件，总耗时: {time.perf_counter() - start:.2f}秒\n"
+                f"{_describe_update(stats)}\n"
+                f"比较: {len(signatures)} 个签名，{sum(s.frames for s in signatures.values())} 个关键帧哈希，"
+                f"{len(matches)} 对匹配（{match_elapsed:.2f}秒）\n"
+            )
+            if not groups:
+                return report + "\n没有找到画面相同的视频"
+
+            by_pair = {frozenset((m.a, m.b)): m for m in matches}
+            duplicates = sum(len(group) - 1 for group in groups)
+            report += f"\n相似组: {len(groups)} 个，可去除的重复文件: {duplicates} 个\n"
+            if len(groups) > limit:
+                report += f"（仅显示前 {limit} 组）\n"
+            for index, group in enumerate(groups[:limit], 1):
+                # 以参与匹配的关键帧最多的文件为参考（通常是最长、最完整的版本）
+                reference = max(group, key=lambda path: (signatures[path].frames, path))
+                report += f"\n组 {index}（{len(group)} 个文件）\n  参考: {reference}\n"
+                for path in group:
+                    if path == reference:
+                        continue
+                    match = by_pair.get(frozenset((path, reference)))
+                    detail = _describe_match(match, path) if match else "通过组内其他文件匹配"
+                    report += f"  {path}\n    {detail}\n"
+            return report
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"
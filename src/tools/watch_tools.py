@@ -0,0 +1,206 @@
+"""
+监视文件夹工具
+用 inotify 监视输入目录（不支持时退回轮询），文件写入完成后按处理方案排队，以有限并发输出到输出目录；
+队列状态、检测延迟和每个文件的额外开销可通过工具查询
+"""
+
+import itertools
+import os
+import time
+from typing import Dict, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import MEDIA_EXTENSIONS, WATCH_PROFILES, WatchFolder
+
+STATUS_LABELS = {
+    "pending": "排队中",
+    "running": "处理中",
+    "done": "完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+}
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}毫秒"
+
+
+def _describe(folder: WatchFolder) -> str:
+    stats = folder.stats()
+    activity = f"事件 {stats['events']} 个" if folder.backend == "inotify" else f"轮询 {stats['polls']} 次"
+    report = (
+        f"{folder.watch_id}（{folder.backend}，{activity}）\n"
+        f"  {folder.input_dir} → {folder.output_dir}\n"
+        f"  方案: {folder.profile}，并发: {folder.max_concurrent}，稳定等待: {folder.settle_seconds}秒"
+        f"{'，包含子目录' if folder.recursive else ''}\n"
+        f"  等待写入完成: {stats['settling']}，排队: {stats['pending']}，处理中: {stats['running']}，"
+        f"完成: {stats['done']}，失败: {stats['failed']}，已取消: {stats['cancelled']}\n"
+        f"  检测延迟 p50/p99: {_ms(stats['latency_p50'])} / {_ms(stats['latency_p99'])}，"
+        f"每文件额外开销 p50/p99: {_ms(stats['overhead_p50'])} / {_ms(stats['overhead_p99'])}\n"
+    )
+    if folder.error:
+        report += f"  警告: {folder.error}\n"
+    return report
+
+
+def register_watch_tools(mcp: FastMCP, config: ServerConfig):
+    """注册监视文件夹相关的工具到 MCP 服务器"""
+
+    folders: Dict[str, WatchFolder] = {}
+    counter = itertools.count(1)
+
+    def get_folder(watch_id: str) -> WatchFolder:
+        folder = folders.get(watch_id)
+        if folder is None:
+            raise ValueError(f"监视任务不存在 - {watch_id}")
+        return folder
+
+    @mcp.tool()
+    async def start_watch_folder(
+        input_dir: str,
+        output_dir: str,
+        profile: str = "compress",
+        max_concurrent: Optional[int] = None,
+        settle_seconds: Optional[float] = None,
+        recursive: bool = False,
+        extensions: Optional[str] = None,
+        streaming_mode: str = "none",
+        process_existing: bool = False
+    ) -> str:
+        """
+        开始监视文件夹：新文件写入完成后自动按处理方案处理
+
+        Args:
+            input_dir: 监视的输入目录
+            output_dir: 输出目录（不能位于输入目录中）
+            profile: 处理方案（compress, convert_mp4, hevc_mp4, remux_mp4, audio_mp3）
+            max_concurrent: 同时处理的文件数（可选，默认使用服务器配置）
+            settle_seconds: 最后一次写入后等待的秒数，期间没有新的写入才开始处理（可选）
+            recursive: 是否包含子目录
+            extensions: 要处理的扩展名，逗号分隔（可选，默认常见音视频格式）
+            streaming_mode: MP4封装方式（none, faststart：moov前置, fragmented：分片MP4）
+            process_existing: 是否同时处理目录中已有的文件
+
+        Returns:
+            监视任务信息
+        """
+        try:
+            suffixes = {
+                f".{e.strip().lower().lstrip('.')}" for e in (extensions or "").split(",") if e.strip()
+            } or MEDIA_EXTENSIONS
+            watch_id = f"watch-{next(counter)}"
+            folder = WatchFolder(
+                watch_id, input_dir, output_dir,
+                profile=profile,
+                max_concurrent=max_concurrent or config.watch_max_concurrent,
+                settle_seconds=config.watch_settle_seconds if settle_seconds is None else settle_seconds,
+                recursive=recursive,
+                extensions=suffixes,
+                streaming_mode=streaming_mode,
+                poll_interval=config.watch_poll_interval
+            )
+            await folder.start(process_existing=process_existing)
+            folders[watch_id] = folder
+
+            polling_info = "" if folder.backend == "inotify" else f"（inotify 不可用，每 {folder.poll_interval} 秒轮询）"
+            return (
+                f"已开始监视文件夹！\n监视任务: {watch_id}\n输入目录: {folder.input_dir}\n输出目录: {folder.output_dir}"
+                f"\n处理方案: {profile}（{WATCH_PROFILES[profile]['description']}）"
+                f"\n监视方式: {folder.backend}{polling_info}\n并发: {folder.max_concurrent}"
+                f"\n稳定等待: {folder.settle_seconds}秒"
+            )
+
+        except ValueError as e:
+            return f"错误：{str(e)}"
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def list_watch_folders() -> str:
+        """
+        列出监视任务及其队列状态、检测延迟和每文件额外开销
+
+        Returns:
+            监视任务列表与可用的处理方案
+        """
+        report = ""
+        if folders:
+            report += f"监视任务（{len(folders)} 个）:\n"
+            for folder in folders.values():
+                report += _describe(folder)
+        else:
+            report += "当前没有监视任务\n"
+        report += "\n可用的处理方案:\n"
+        for name, profile in WATCH_PROFILES.items():
+            report += f"  {name}: {profile['description']}\n"
+        return report
+
+    @mcp.tool()
+    async def get_watch_queue(watch_id: str, status: Optional[str] = None, limit: int = 20) -> str:
+        """
+        查看监视任务的文件队列（新的在前）
+
+        Args:
+            watch_id: 监视任务 id
+            status: 只显示该状态的文件（可选：pending, running, done, failed, cancelled）
+            limit: 最多显示的文件数
+
+        Returns:
+            队列状态
+        """
+        try:
+            folder = get_folder(watch_id)
+            if status is not None and status not in STATUS_LABELS:
+                return f"错误：不支持的状态 {status}，可选：{', '.join(STATUS_LABELS)}"
+
+            jobs = folder.jobs(status)
+            report = _describe(folder)
+            if not jobs:
+                return report + "\n没有匹配的文件"
+            report += f"\n文件（共 {len(jobs)} 个，显示 {min(limit, len(jobs))} 个）:\n"
+            now = time.time()
+            for job in jobs[:limit]:
+                report += f"  [{STATUS_LABELS[job.status]}] {os.path.relpath(job.path, folder.input_dir)}\n"
+                detail = f"检测延迟 {_ms(job.detection_latency)}"
+                if job.started_at is not None:
+                    detail += f"，排队 {_ms(job.started_at - job.queued_at)}"
+                if job.status == "running":
+                    detail += f"，已处理 {now - job.started_at:.1f}秒"
+                elif job.finished_at is not None and job.started_at is not None:
+                    detail += f"，FFmpeg {job.process_seconds:.2f}秒，额外开销 {_ms(job.overhead)}"
+                report += f"    {detail}\n"
+                if job.output_path:
+                    report += f"    输出: {job.output_path}\n"
+                if job.error:
+                    report += f"    错误: {job.error.splitlines()[-1] if job.error.splitlines() else job.error}\n"
+            return report
+
+        except ValueError as e:
+            return f"错误：{str(e)}"
+        except Exception as e:
+            return f"发生错误：{str(e)}"
+
+    @mcp.tool()
+    async def stop_watch_folder(watch_id: str, wait: bool = False) -> str:
+        """
+        停止监视任务
+
+        Args:
+            watch_id: 监视任务 id
+            wait: 是否等待已排队和正在处理的文件完成（默认取消排队文件并终止正在运行的处理）
+
+        Returns:
+            停止结果
+        """
+        try:
+            folder = get_folder(watch_id)
+            await folder.stop(wait=wait)
+            del folders[watch_id]
+            return f"已停止监视任务！\n{_describe(folder)}"
+
+        except ValueError as e:
+            return f"错误：{str(e)}"
+        except Exception as e:
+            return f"发生错误：{str(e)}"
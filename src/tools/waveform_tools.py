@@ -0,0 +1,274 @@
+"""
+音频波形峰值工具
+以固定大小分块读取 FFmpeg 解码出的 PCM，用 NumPy 归约为多级 min/max 峰值，
+写入可内存映射的紧凑二进制文件，内存占用与音频长度无关
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from ..config import ServerConfig
+from ..core import FileIndexCache, get_file_identity, stream_ffmpeg_output
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖（uv sync --extra analysis）
+    np = None
+
+# 峰值文件格式（小端）：
+#   文件头: magic(4s) version(H) bits(H) sample_rate(I) level_count(H) reserved(H) total_samples(Q)
+#   级别表: 每级 samples_per_peak(I) reserved(I) peak_count(Q) data_offset(Q)
+#   数据:   每级 peak_count 个 (min, max) 交错数组，int8 或 int16，按 8 字节对齐
+PEAKS_MAGIC = b"WFPK"
+PEAKS_VERSION = 1
+_HEADER = struct.Struct("<4sHHIHHQ")
+_LEVEL = struct.Struct("<IIQQ")
+
+# 每次从管道读取的字节数（16位单声道 PCM 即 512K 个采样）
+PCM_CHUNK_BYTES = 1 << 20
+
+
+def parse_zoom_levels(value: str) -> List[int]:
+    """解析缩放级别（每个峰值对应的采样数），每级必须是上一级的整数倍"""
+    levels = sorted({int(v) for v in value.split(",") if v.strip()})
+    if not levels or levels[0] < 1:
+        raise ValueError("缩放级别必须是正整数")
+    for previous, current in zip(levels, levels[1:]):
+        if current % previous:
+            raise ValueError(f"缩放级别 {current} 不是 {previous} 的整数倍")
+    return levels
+
+
+class _PeakLevel:
+    """单个缩放级别的流式归约状态，峰值增量写入临时文件"""
+
+    def __init__(self, samples_per_peak: int, ratio: int, bits: int, path: str):
+        self.samples_per_peak = samples_per_peak
+        self.ratio = ratio
+        self.bits = bits
+        self.path = path
+        self.file = open(path, "wb")
+        self.peak_count = 0
+        self.carry_min = np.empty(0, dtype=np.int16)
+        self.carry_max = np.empty(0, dtype=np.int16)
+
+    def feed(self, mins, maxs, final: bool = False):
+        """输入上一级的 min/max（第0级为原始采样），返回本级新产生的峰值"""
+        mins = np.concatenate((self.carry_min, mins))
+        maxs = np.concatenate((self.carry_max, maxs))
+        full = len(mins) // self.ratio * self.ratio
+        out_min = mins[:full].reshape(-1, self.ratio).min(axis=1)
+        out_max = maxs[:full].reshape(-1, self.ratio).max(axis=1)
+        self.carry_min, self.carry_max = mins[full:], maxs[full:]
+
+        if final and len(self.carry_min):
+            out_min = np.append(out_min, self.carry_min.min())
+            out_max = np.append(out_max, self.carry_max.max())
+            self.carry_min = self.carry_min[:0]
+            self.carry_max = self.carry_max[:0]
+
+        if len(out_min):
+            self._write(out_min, out_max)
+        return out_min, out_max
+
+    def _write(self, mins, maxs):
+        pairs = np.column_stack((mins, maxs))
+        if self.bits == 8:
+            self.file.write((pairs >> 8).astype("i1").tobytes())
+        else:
+            self.file.write(pairs.astype("<i2").tobytes())
+        self.peak_count += len(mins)
+
+    def close(self):
+        self.file.close()
+
+
+async def compute_waveform_peaks(
+    input_path: str,
+    output_path: str,
+    sample_rate: int = 8000,
+    zoom_levels: Optional[List[int]] = None,
+    bits: int = 16
+) -> dict:
+    """流式解码音频并写出多级峰值文件，返回统计信息"""
+    zoom_levels = zoom_levels or [256, 1024, 4096, 16384]
+
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-v", "error",
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-vn", "-sn", "-dn",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-"
+    ]
+
+    work_dir = tempfile.mkdtemp(prefix="waveform_", dir=os.path.dirname(output_path) or ".")
+    levels = []
+    previous = 1
+    for samples_per_peak in zoom_levels:
+        levels.append(_PeakLevel(
+            samples_per_peak, samples_per_peak // previous, bits,
+            os.path.join(work_dir, f"level_{samples_per_peak}.bin")
+        ))
+        previous = samples_per_peak
+
+    total_samples = 0
+    try:
+        async for chunk in stream_ffmpeg_output(cmd, PCM_CHUNK_BYTES):
+            samples = np.frombuffer(chunk[:len(chunk) // 2 * 2], dtype="<i2")
+            total_samples += len(samples)
+            mins, maxs = samples, samples
+            for level in levels:
+                mins, maxs = level.feed(mins, maxs)
+
+        # 刷新各级剩余的不完整块，逐级向上传递
+        mins = maxs = np.empty(0, dtype=np.int16)
+        for level in levels:
+            mins, maxs = level.feed(mins, maxs, final=True)
+        for level in levels:
+            level.close()
+
+        _assemble_peaks_file(output_path, levels, bits, sample_rate, total_samples)
+    finally:
+        for level in levels:
+            level.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "sample_rate": sample_rate,
+        "total_samples": total_samples,
+        "duration": total_samples / sample_rate,
+        "levels": [(level.samples_per_peak, level.peak_count) for level in levels]
+    }
+
+
+def _assemble_peaks_file(output_path: str, levels, bits: int, sample_rate: int, total_samples: int):
+    """把各级临时数据拼接为最终峰值文件（原子替换）"""
+    pair_bytes = 2 * (bits // 8)
+    offset = _HEADER.size + _LEVEL.size * len(levels)
+    offsets = []
+    for level in levels:
+        offset = (offset + 7) // 8 * 8
+        offsets.append(offset)
+        offset += level.peak_count * pair_bytes
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, bits, sample_rate, len(levels), 0, total_samples))
+        for level, data_offset in zip(levels, offsets):
+            f.write(_LEVEL.pack(level.samples_per_peak, 0, level.peak_count, data_offset))
+        for level, data_offset in zip(levels, offsets):
+            f.write(b"\0" * (data_offset - f.tell()))
+            with open(level.path, "rb") as src:
+                shutil.copyfileobj(src, f)
+    os.replace(tmp_path, output_path)
+
+
+def read_waveform(path: str) -> dict:
+    """以内存映射方式读取峰值文件，每级返回形状为 (peak_count, 2) 的 min/max 数组"""
+    with open(path, "rb") as f:
+        magic, version, bits, sample_rate, level_count, _, total_samples = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != PEAKS_MAGIC or version != PEAKS_VERSION:
+            raise ValueError(f"不是有效的峰值文件 - {path}")
+        table = [_LEVEL.unpack(f.read(_LEVEL.size)) for _ in range(level_count)]
+
+    dtype = "<i2" if bits == 16 else "i1"
+    levels = {}
+    for samples_per_peak, _, peak_count, data_offset in table:
+        levels[samples_per_peak] = (
+            np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=(peak_count, 2))
+            if peak_count else np.empty((0, 2), dtype=dtype)
+        )
+    return {
+        "bits": bits,
+        "sample_rate": sample_rate,
+        "total_samples": total_samples,
+        "levels": levels
+    }
+
+
+def register_waveform_tools(mcp: FastMCP, config: ServerConfig):
+    """注册音频波形相关的工具到 MCP 服务器"""
+
+    cache = FileIndexCache(config.cache_dir, "waveforms")
+
+    @mcp.tool()
+    async def compute_waveform(
+        input_path: str,
+        output_path: Optional[str] = None,
+        sample_rate: int = 8000,
+        zoom_levels: str = "256,1024,4096,16384",
+        bits: int = 16,
+        force_refresh: bool = False
+    ) -> str:
+        """
+        预计算音频波形峰值，输出可内存映射的二进制峰值文件（结果按文件缓存）
+
+        Args:
+            input_path: 输入音频或视频文件路径
+            output_path: 输出峰值文件路径（可选，默认与输入同目录的 .peaks 文件）
+            sample_rate: 分析采样率（单声道，越低越快）
+            zoom_levels: 缩放级别，每个峰值对应的采样数，用逗号分隔，每级须为上一级的整数倍
+            bits: 峰值精度（8 或 16）
+            force_refresh: 是否忽略缓存重新计算
+
+        Returns:
+            计算结果信息
+        """
+        try:
+            if np is None:
+                return "错误：计算波形需要安装 numpy（uv sync --extra analysis）"
+
+            if not os.path.exists(input_path):
+                return f"错误：输入文件不存在 - {input_path}"
+
+            if bits not in (8, 16):
+                return "错误：bits只能是8或16"
+
+            levels = parse_zoom_levels(zoom_levels)
+
+            if output_path is None:
+                input_file = Path(input_path)
+                output_path = str(input_file.parent / f"{input_file.stem}.peaks")
+
+            identity = get_file_identity(input_path)
+            variant = f".{sample_rate}_{bits}_{'-'.join(map(str, levels))}.peaks"
+            cached_path = cache.index_path(identity, suffix=variant)
+
+            start = time.perf_counter()
+            cached = cached_path.exists() and not force_refresh
+            if not cached:
+                cached_path.parent.mkdir(parents=True, exist_ok=True)
+                await compute_waveform_peaks(input_path, str(cached_path), sample_rate, levels, bits)
+
+            if os.path.abspath(output_path) != str(cached_path):
+                shutil.copyfile(cached_path, output_path)
+            elapsed = time.perf_counter() - start
+
+            waveform = read_waveform(output_path)
+            duration = waveform["total_samples"] / waveform["sample_rate"]
+            level_info = "\n".join(
+                f"  - 每峰值 {spp} 采样（{sample_rate / spp:.1f} 峰值/秒）: {len(peaks)} 个"
+                for spp, peaks in waveform["levels"].items()
+            )
+            source_info = "缓存" if cached else "流式解码"
+
+            return (
+                f"成功计算波形峰值！\n输入文件: {input_path}\n输出文件: {output_path}"
+                f"\n音频时长: {duration:.1f}秒\n采样率: {sample_rate}Hz\n精度: int{bits}"
+                f"\n文件大小: {os.path.getsize(output_path) / 1024:.1f}KB"
+                f"\n数据来源: {source_info}\n耗时: {elapsed:.2f}秒\n缩放级别:\n{level_info}"
+            )
+
+        except Exception as e:
+            return f"发生错误：{str(e)}"